@@ -1,6 +1,7 @@
 from google.adk.agents import LlmAgent
 
 from ..prompts.concierge import CONCIERGE_SYSTEM_PROMPT
+from ..session_compaction import inject_conversation_summary
 from ..tools.inventory_tools import (
     get_inventory_summary,
     search_inventory,
@@ -36,4 +37,5 @@ def create_concierge_agent(sub_agents: list) -> LlmAgent:
             search_catalog,
         ],
         sub_agents=sub_agents,
+        before_model_callback=inject_conversation_summary,
     )
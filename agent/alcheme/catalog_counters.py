@@ -0,0 +1,201 @@
+"""Sharded counters for global catalog entries.
+
+Every inventory registration and suggestion increments contributor_count and
+have_count / want_count on one ``catalog/{id}`` doc. A viral product turns
+that doc into a hotspot beyond Firestore's sustained per-document write rate.
+
+With CATALOG_COUNTER_SHARDS > 1, increments for an existing entry go to one
+of N docs under ``catalog/{id}/counter_shards`` picked at random instead. The
+true count is the catalog doc field plus the sum of its shards:
+read_shard_totals() adds the shards in for reads, and CounterRollup
+periodically folds shards into the catalog doc (one transaction per entry),
+so the stored fields that the browse page sorts by lag by at most
+CATALOG_ROLLUP_INTERVAL seconds.
+
+Entries touched by this instance are rolled up in the background; shards
+left over by a crashed instance are still counted on reads and are folded in
+the next time that entry is touched (or by scripts/rollup_catalog_counters.py).
+Roll up all entries before lowering CATALOG_COUNTER_SHARDS.
+
+The web app's lib/api/catalog-upsert.ts writes to the same shards when it
+is given the same CATALOG_COUNTER_SHARDS. This instance does not see those
+writes, so they are folded in when the agent next touches the entry or by
+the periodic sweep in scripts/rollup_catalog_counters.py.
+
+Configuration (environment):
+  CATALOG_COUNTER_SHARDS   Shards per catalog entry; 1 disables sharding (default 1)
+  CATALOG_ROLLUP_INTERVAL  Seconds between background roll-ups (default 60)
+"""
+
+import asyncio
+import logging
+import os
+import random
+import threading
+from typing import Any, Iterable
+
+from google.cloud import firestore
+
+from .io_executor import run_blocking
+
+logger = logging.getLogger(__name__)
+
+CATALOG_COUNTER_SHARDS = int(os.environ.get("CATALOG_COUNTER_SHARDS", "1"))
+CATALOG_ROLLUP_INTERVAL = float(os.environ.get("CATALOG_ROLLUP_INTERVAL", "60"))
+
+COUNTER_FIELDS = ("contributor_count", "have_count", "want_count")
+SHARDS_COLLECTION = "counter_shards"
+
+_firestore_db: firestore.Client | None = None
+
+
+def _get_firestore() -> firestore.Client:
+    global _firestore_db
+    if _firestore_db is None:
+        _firestore_db = firestore.Client()
+    return _firestore_db
+
+
+def sharding_enabled() -> bool:
+    return CATALOG_COUNTER_SHARDS > 1
+
+
+def _shard_refs(catalog_ref: Any, num_shards: int) -> list[Any]:
+    shards = catalog_ref.collection(SHARDS_COLLECTION)
+    return [shards.document(str(i)) for i in range(num_shards)]
+
+
+def increment_shard(writer: Any, catalog_ref: Any, counts: dict[str, int], num_shards: int | None = None) -> None:
+    """Add counts to a random shard of catalog_ref within a transaction or batch."""
+    num_shards = num_shards or CATALOG_COUNTER_SHARDS
+    shard_ref = catalog_ref.collection(SHARDS_COLLECTION).document(str(random.randrange(num_shards)))
+    writer.set(shard_ref, {field: firestore.Increment(n) for field, n in counts.items()}, merge=True)
+
+
+def read_shard_totals(
+    db: firestore.Client, catalog_ids: Iterable[str], num_shards: int | None = None,
+) -> dict[str, dict[str, int]]:
+    """Un-rolled-up shard sums per catalog ID, read with one get_all.
+
+    Entries without shard docs are omitted.
+    """
+    num_shards = num_shards or CATALOG_COUNTER_SHARDS
+    catalog = db.collection("catalog")
+    refs = [ref for cid in catalog_ids for ref in _shard_refs(catalog.document(cid), num_shards)]
+    totals: dict[str, dict[str, int]] = {}
+    if not refs:
+        return totals
+    for snap in db.get_all(refs):
+        if not snap.exists:
+            continue
+        data = snap.to_dict() or {}
+        catalog_id = snap.reference.parent.parent.id
+        entry = totals.setdefault(catalog_id, dict.fromkeys(COUNTER_FIELDS, 0))
+        for field in COUNTER_FIELDS:
+            entry[field] += data.get(field, 0) or 0
+    return totals
+
+
+@firestore.transactional
+def _rollup_entry(transaction: firestore.Transaction, db: firestore.Client, catalog_id: str, num_shards: int) -> bool:
+    """Fold the shards of one entry into the catalog doc. Returns False if nothing to do."""
+    catalog_ref = db.collection("catalog").document(catalog_id)
+    shard_refs = _shard_refs(catalog_ref, num_shards)
+    by_path = {
+        snap.reference.path: snap
+        for snap in db.get_all([catalog_ref, *shard_refs], transaction=transaction)
+        if snap.exists
+    }
+    shard_snaps = [by_path[ref.path] for ref in shard_refs if ref.path in by_path]
+    if catalog_ref.path not in by_path or not shard_snaps:
+        return False
+
+    totals = dict.fromkeys(COUNTER_FIELDS, 0)
+    for snap in shard_snaps:
+        data = snap.to_dict() or {}
+        for field in COUNTER_FIELDS:
+            totals[field] += data.get(field, 0) or 0
+        transaction.delete(snap.reference)
+    transaction.update(catalog_ref, {
+        **{field: firestore.Increment(n) for field, n in totals.items() if n},
+        "updated_at": firestore.SERVER_TIMESTAMP,
+    })
+    return True
+
+
+def rollup_catalog_counters(catalog_id: str, db: firestore.Client | None = None, num_shards: int | None = None) -> bool:
+    """Fold one entry's shards into its catalog doc (blocking)."""
+    db = db or _get_firestore()
+    return _rollup_entry(db.transaction(), db, catalog_id, num_shards or CATALOG_COUNTER_SHARDS)
+
+
+class CounterRollup:
+    """Collects catalog IDs with pending shard increments and rolls them up periodically.
+
+    mark() is thread-safe (tools run in worker threads); the roll-up loop runs
+    on the event loop and does its Firestore work through run_blocking.
+    """
+
+    def __init__(self, interval: float = CATALOG_ROLLUP_INTERVAL):
+        self.interval = interval
+        self._dirty: set[str] = set()
+        self._lock = threading.Lock()
+        self._task: asyncio.Task | None = None
+        self.rollups = 0
+        self.failures = 0
+
+    def mark(self, catalog_ids: Iterable[str]) -> None:
+        with self._lock:
+            self._dirty.update(catalog_ids)
+
+    def start(self) -> None:
+        """Spawn the roll-up loop on the running event loop (idempotent)."""
+        if self._task is None and sharding_enabled():
+            self._task = asyncio.create_task(self._loop(), name="catalog-counter-rollup")
+
+    async def stop(self) -> None:
+        """Stop the loop and roll up what is still pending."""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        await self.flush()
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    async def flush(self) -> int:
+        """Roll up every marked entry now. Returns the number rolled up."""
+        with self._lock:
+            pending, self._dirty = self._dirty, set()
+        done = 0
+        for catalog_id in pending:
+            try:
+                if await run_blocking(rollup_catalog_counters, catalog_id):
+                    done += 1
+            except Exception as e:
+                self.failures += 1
+                self.mark([catalog_id])
+                logger.warning("Catalog counter roll-up failed for %s: %s", catalog_id, e)
+        self.rollups += done
+        return done
+
+    def stats(self) -> dict:
+        return {
+            "shards": CATALOG_COUNTER_SHARDS,
+            "pending": len(self._dirty),
+            "rollups": self.rollups,
+            "failures": self.failures,
+        }
+
+
+_rollup: CounterRollup | None = None
+
+
+def get_counter_rollup() -> CounterRollup:
+    global _rollup
+    if _rollup is None:
+        _rollup = CounterRollup()
+    return _rollup
@@ -0,0 +1,219 @@
+"""Single-pass classification of ADK events for the streaming endpoints.
+
+classify_event() walks ``event.content.parts`` once and returns an
+EventResult with everything the endpoints act on:
+
+  text       concatenated text parts
+  progress   user-facing status for an agent transfer or tool call
+  cards      rich card events built from tool responses
+  recipe_id  ID reported by a save_recipe response
+
+Tool responses are routed by tool name to handlers registered with
+@response_handler, which receive the response as a dict. Adding a card for a
+new tool means registering one handler here; /chat and the other endpoints
+pick it up without another scan of the event.
+"""
+
+import logging
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+TOOL_PROGRESS: dict[str, str] = {
+    "get_inventory_summary": "手持ちコスメを確認中...",
+    "get_inventory": "在庫データを取得中...",
+    "search_inventory": "コスメを検索中...",
+    "filter_inventory_by_category": "カテゴリで絞り込み中...",
+    "validate_recipe_items": "レシピのアイテムを検証中...",
+    "save_recipe": "メイクレシピを保存中...",
+    "search_rakuten_api": "楽天で商品情報を検索中...",
+    "google_search": "商品情報をWeb検索中...",
+    "generate_item_id": "アイテムを登録準備中...",
+    "add_items_to_inventory": "在庫に追加中...",
+    "analyze_product_compatibility": "手持ちコスメとの相性を分析中...",
+    "compare_products_against_inventory": "商品を比較分析中...",
+    "save_beauty_log": "メイクログを保存中...",
+    "get_beauty_logs": "メイク履歴を取得中...",
+    "get_weather": "天気情報を取得中...",
+    "get_today_schedule": "今日の予定を確認中...",
+    "analyze_preference_history": "好みの傾向を分析中...",
+    "get_substitution_technique": "代用テクニックを検索中...",
+}
+
+AGENT_PROGRESS: dict[str, str] = {
+    "alchemist_agent": "メイクレシピを作成中...",
+    "inventory_agent": "コスメ在庫を分析中...",
+    "product_search_agent": "商品情報を検索中...",
+    "memory_keeper_agent": "メイクログを確認中...",
+    "trend_hunter_agent": "トレンドを分析中...",
+    "tpo_tactician_agent": "TPOに合わせた提案を準備中...",
+    "profiler_agent": "好み傾向を分析中...",
+    "instructor_agent": "メイク手順を作成中...",
+}
+
+
+class EventResult:
+    """What one ADK event contributes to a stream."""
+
+    __slots__ = ("text", "progress", "cards", "recipe_id")
+
+    def __init__(self) -> None:
+        self.text = ""
+        self.progress: str | None = None
+        # [{"type": "product_card"|"technique_card"|"profiler_card", "data": {...}}, ...]
+        self.cards: list[dict] = []
+        self.recipe_id: str | None = None
+
+
+ResponseHandler = Callable[[dict, EventResult], None]
+
+_RESPONSE_HANDLERS: dict[str, ResponseHandler] = {}
+
+
+def response_handler(*tool_names: str) -> Callable[[ResponseHandler], ResponseHandler]:
+    """Register a handler for the function responses of the given tools."""
+    def register(handler: ResponseHandler) -> ResponseHandler:
+        for name in tool_names:
+            _RESPONSE_HANDLERS[name] = handler
+        return handler
+    return register
+
+
+def _as_dict(response: Any) -> dict | None:
+    # Plain dict (most common); ADK may also wrap responses in a proto Struct
+    if isinstance(response, dict):
+        return response
+    if hasattr(response, "get"):
+        try:
+            return dict(response)
+        except (TypeError, ValueError):
+            return None
+    return None
+
+
+def classify_event(event) -> EventResult:
+    """Walk an ADK event once and collect its text, progress, cards and recipe_id."""
+    result = EventResult()
+    tool_progress: str | None = None
+    try:
+        content = event.content
+        parts = content.parts if content else None
+        if parts:
+            texts: list[str] = []
+            for part in parts:
+                text = part.text
+                if text and isinstance(text, str):
+                    texts.append(text)
+                call = part.function_call
+                if call and tool_progress is None:
+                    tool_progress = TOOL_PROGRESS.get(call.name)
+                resp = part.function_response
+                if resp:
+                    _dispatch_response(resp, result)
+            result.text = texts[0] if len(texts) == 1 else "".join(texts)
+    except Exception as e:
+        logger.warning("Failed to classify event: %s", e)
+
+    # An agent transfer takes precedence over the tool being called
+    actions = getattr(event, "actions", None)
+    target = getattr(actions, "transfer_to_agent", None) if actions else None
+    result.progress = (AGENT_PROGRESS.get(target) if isinstance(target, str) else None) or tool_progress
+    return result
+
+
+def _dispatch_response(resp, result: EventResult) -> None:
+    name = resp.name
+    handler = _RESPONSE_HANDLERS.get(name) if isinstance(name, str) else None
+    if handler is None:
+        return
+    data = _as_dict(resp.response)
+    if data is None:
+        logger.warning("%s response format unexpected: %r", name, resp.response)
+        return
+    try:
+        handler(data, result)
+    except Exception as e:
+        logger.warning("%s response handler failed: %s", name, e)
+
+
+# ---------------------------------------------------------------------------
+# Handlers
+# ---------------------------------------------------------------------------
+@response_handler("save_recipe")
+def _save_recipe(data: dict, result: EventResult) -> None:
+    recipe_id = data.get("recipe_id")
+    if recipe_id and result.recipe_id is None:
+        result.recipe_id = str(recipe_id)
+
+
+def _product_card(product: dict, analysis: dict) -> dict:
+    return {
+        "type": "product_card",
+        "data": {
+            "brand": product.get("brand", ""),
+            "product_name": product.get("product_name", ""),
+            "category": product.get("category", ""),
+            "price": product.get("price"),
+            "image_url": product.get("image_url"),
+            "product_url": product.get("product_url"),
+            "duplicate_risk": analysis.get("duplicate_risk", "none"),
+            "gap_analysis": analysis.get("gap_analysis", "adds_variety"),
+            "similar_items_count": len(analysis.get("similar_items", [])),
+            "compatibility_summary": "",
+        },
+    }
+
+
+@response_handler("analyze_product_compatibility")
+def _analyze_product(data: dict, result: EventResult) -> None:
+    if data.get("status") != "success":
+        return
+    product = data.get("product_analyzed", {})
+    if isinstance(product, dict):
+        result.cards.append(_product_card(product, data))
+
+
+@response_handler("compare_products_against_inventory")
+def _compare_products(data: dict, result: EventResult) -> None:
+    if data.get("status") != "success":
+        return
+    for comp in data.get("comparisons", []):
+        if not isinstance(comp, dict):
+            continue
+        product = comp.get("product", {})
+        if isinstance(product, dict):
+            result.cards.append(_product_card(product, comp))
+
+
+@response_handler("get_substitution_technique")
+def _substitution_technique(data: dict, result: EventResult) -> None:
+    if data.get("status") != "success":
+        return
+    result.cards.append({
+        "type": "technique_card",
+        "data": {
+            "title": data.get("title", "代用テクニック"),
+            "original_item": data.get("original_item", ""),
+            "substitute_item": data.get("substitute_item", ""),
+            "techniques": data.get("techniques", []),
+            "reasons": data.get("reasons", []),
+            "general_tips": data.get("general_tips", []),
+        },
+    })
+
+
+@response_handler("analyze_preference_history")
+def _preference_history(data: dict, result: EventResult) -> None:
+    if data.get("status") != "success":
+        return
+    result.cards.append({
+        "type": "profiler_card",
+        "data": {
+            "color_preferences": data.get("color_preferences", {}),
+            "texture_preferences": data.get("texture_preferences", {}),
+            "area_frequency": data.get("area_frequency", {}),
+            "average_satisfaction": data.get("average_satisfaction"),
+            "monotony_alert": data.get("monotony_alert"),
+            "underused_items": data.get("underused_items", []),
+        },
+    })
@@ -0,0 +1,147 @@
+"""Process-wide registry of google-genai clients.
+
+Building a genai.Client resolves credentials and creates a fresh HTTP
+transport, so constructing one per image/theme request pays auth + TLS setup
+every time. Tools call get_genai_client() instead, which returns one shared
+client per (vertexai, project, location) and keeps its connections alive
+between calls.
+
+HTTP/2 is enabled on the shared transport when the optional ``h2`` package
+is installed (``pip install httpx[http2]``); otherwise HTTP/1.1 keep-alive is
+used.
+
+Configuration (environment):
+  GOOGLE_GENAI_USE_VERTEXAI  Use Vertex AI (TRUE) or the Gemini API key
+  GOOGLE_CLOUD_PROJECT       Vertex AI project
+  GOOGLE_CLOUD_LOCATION      Default Vertex AI location (default us-central1)
+  GENAI_HTTP2                Set to 0 to force HTTP/1.1 (default 1)
+"""
+
+import importlib.util
+import logging
+import os
+import threading
+
+from google import genai
+from google.genai import types
+
+logger = logging.getLogger(__name__)
+
+GENAI_HTTP2 = os.environ.get("GENAI_HTTP2", "1") != "0"
+
+_ClientKey = tuple[bool, str, str]
+
+_clients: dict[_ClientKey, genai.Client] = {}
+_lock = threading.Lock()
+_created = 0
+_reused = 0
+
+
+def _use_vertexai() -> bool:
+    return os.environ.get("GOOGLE_GENAI_USE_VERTEXAI", "").upper() == "TRUE"
+
+
+def _client_key(location: str | None) -> _ClientKey:
+    if not _use_vertexai():
+        return (False, "", "")
+    project = os.environ.get("GOOGLE_CLOUD_PROJECT", "")
+    return (True, project, location or os.environ.get("GOOGLE_CLOUD_LOCATION", "us-central1"))
+
+
+def _http_options() -> types.HttpOptions | None:
+    # aiohttp, when installed, replaces httpx for async calls and rejects httpx args
+    if (
+        not GENAI_HTTP2
+        or importlib.util.find_spec("h2") is None
+        or importlib.util.find_spec("aiohttp") is not None
+    ):
+        return None
+    return types.HttpOptions(client_args={"http2": True}, async_client_args={"http2": True})
+
+
+def _build_client(key: _ClientKey) -> genai.Client:
+    vertexai, project, location = key
+    kwargs = {}
+    http_options = _http_options()
+    if http_options is not None:
+        kwargs["http_options"] = http_options
+    if vertexai:
+        return genai.Client(vertexai=True, project=project, location=location, **kwargs)
+    return genai.Client(**kwargs)
+
+
+def get_genai_client(location: str | None = None) -> genai.Client:
+    """Shared client for the configured backend.
+
+    Args:
+        location: Vertex AI location override (e.g. the image model's region).
+            Ignored when using the Gemini API.
+    """
+    global _created, _reused
+    key = _client_key(location)
+    client = _clients.get(key)
+    if client is not None:
+        _reused += 1
+        return client
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _build_client(key)
+            _clients[key] = client
+            _created += 1
+            logger.info("Created genai client (vertexai=%s, project=%s, location=%s)", *key)
+        else:
+            _reused += 1
+    return client
+
+
+def evict_genai_client(location: str | None = None) -> None:
+    """Drop the cached client so the next call rebuilds it (e.g. after auth errors)."""
+    with _lock:
+        _clients.pop(_client_key(location), None)
+
+
+async def check_genai_client(location: str | None = None) -> bool:
+    """Health check: list one model through the shared client.
+
+    A failing client is evicted so the next request starts from a fresh one.
+    """
+    try:
+        pager = await get_genai_client(location).aio.models.list(config={"page_size": 1})
+        async for _ in pager:
+            break
+        return True
+    except Exception as e:
+        logger.warning("genai client health check failed (location=%s): %s", location, e)
+        evict_genai_client(location)
+        return False
+
+
+async def aclose_genai_clients() -> None:
+    """Close every cached client (app shutdown)."""
+    with _lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        try:
+            await client.aio.aclose()
+        except Exception as e:
+            logger.debug("genai client close failed: %s", e)
+
+
+def reset_genai_clients() -> None:
+    """Forget every cached client without closing it (tests)."""
+    global _created, _reused
+    with _lock:
+        _clients.clear()
+        _created = 0
+        _reused = 0
+
+
+def stats() -> dict:
+    return {
+        "clients": len(_clients),
+        "created": _created,
+        "reused": _reused,
+        "http2": _http_options() is not None,
+    }
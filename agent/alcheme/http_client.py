@@ -0,0 +1,123 @@
+"""Shared outbound HTTP clients with keep-alive pools and retries.
+
+Every tool that calls an external API (Rakuten, Google Weather, Open-Meteo)
+goes through these clients so the TCP+TLS handshake is paid once per worker
+per host instead of once per call. Both clients retry 429 / 5xx responses and
+connection errors with exponential backoff, honouring Retry-After.
+
+Configuration (environment):
+  HTTP_POOL_CONNECTIONS  Number of per-host pools kept by the sync client (default 10)
+  HTTP_POOL_MAXSIZE      Keep-alive connections per host (default 10)
+  HTTP_MAX_RETRIES       Retries after the first attempt (default 2)
+  HTTP_BACKOFF_FACTOR    Backoff base in seconds: factor * 2**retry (default 0.5)
+"""
+
+import asyncio
+import logging
+import os
+import threading
+from typing import Any
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+POOL_CONNECTIONS = int(os.environ.get("HTTP_POOL_CONNECTIONS", "10"))
+POOL_MAXSIZE = int(os.environ.get("HTTP_POOL_MAXSIZE", "10"))
+MAX_RETRIES = int(os.environ.get("HTTP_MAX_RETRIES", "2"))
+BACKOFF_FACTOR = float(os.environ.get("HTTP_BACKOFF_FACTOR", "0.5"))
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+_MAX_RETRY_AFTER = 10.0  # never sleep longer than this on a Retry-After header
+
+_session: requests.Session | None = None
+_async_client: httpx.AsyncClient | None = None
+_lock = threading.Lock()
+
+
+def _build_session() -> requests.Session:
+    retry = Retry(
+        total=MAX_RETRIES,
+        backoff_factor=BACKOFF_FACTOR,
+        status_forcelist=sorted(RETRY_STATUSES),
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=POOL_CONNECTIONS,
+        pool_maxsize=POOL_MAXSIZE,
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_http_session() -> requests.Session:
+    """Process-wide requests.Session (thread-safe for GETs via urllib3 pools)."""
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Process-wide httpx.AsyncClient with keep-alive connection limits."""
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        _async_client = httpx.AsyncClient(
+            timeout=10,
+            limits=httpx.Limits(
+                max_connections=POOL_CONNECTIONS * POOL_MAXSIZE,
+                max_keepalive_connections=POOL_MAXSIZE,
+            ),
+        )
+    return _async_client
+
+
+def _retry_delay(attempt: int, response: httpx.Response | None) -> float:
+    if response is not None:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after:
+            try:
+                return min(float(retry_after), _MAX_RETRY_AFTER)
+            except ValueError:
+                pass
+    return BACKOFF_FACTOR * (2 ** attempt)
+
+
+async def async_get(url: str, **kwargs: Any) -> httpx.Response:
+    """GET through the shared async client, retrying 429/5xx and transport errors.
+
+    Returns the last response (the caller decides whether to raise_for_status);
+    re-raises the last transport error if every attempt failed to connect.
+    """
+    client = get_async_http_client()
+    for attempt in range(MAX_RETRIES + 1):
+        response: httpx.Response | None = None
+        try:
+            response = await client.get(url, **kwargs)
+            if response.status_code not in RETRY_STATUSES or attempt == MAX_RETRIES:
+                return response
+        except httpx.TransportError:
+            if attempt == MAX_RETRIES:
+                raise
+        delay = _retry_delay(attempt, response)
+        logger.info("Retrying GET %s in %.1fs (attempt %d)", url, delay, attempt + 1)
+        await asyncio.sleep(delay)
+    raise RuntimeError("unreachable")
+
+
+async def aclose() -> None:
+    """Close the shared async client (app shutdown)."""
+    global _async_client
+    if _async_client is not None and not _async_client.is_closed:
+        await _async_client.aclose()
+    _async_client = None
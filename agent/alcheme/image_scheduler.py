@@ -0,0 +1,217 @@
+"""Process-wide rate limiter and priority scheduler for the Gemini image model.
+
+Every image generation (recipe previews, theme images, /generate-image) asks
+this scheduler for a token before calling the model. Tokens refill at the
+configured quota rate; when several requests are waiting, the highest
+priority class is served first (FIFO within a class).
+
+On 429 RESOURCE_EXHAUSTED the whole scheduler pauses for a jittered backoff
+instead of each request sleeping on its own schedule, so concurrent requests
+do not retry in lockstep and stampede the quota again. A request that cannot
+get a token within its class's wait budget fails fast with ImageSchedulerBusy
+rather than hanging until the caller's timeout.
+
+Configuration (environment):
+  IMAGE_RPM             Sustained image requests per minute (default 10)
+  IMAGE_BURST           Bucket size / burst allowance (default 3)
+  IMAGE_MAX_ATTEMPTS    Attempts per request including 429 retries (default 4)
+  IMAGE_RETRY_BASE      Backoff base in seconds: base * 2**attempt, jittered (default 3)
+  IMAGE_WAIT_INTERACTIVE / IMAGE_WAIT_PREVIEW / IMAGE_WAIT_THEME
+                        Max seconds a request of that class waits for a token
+                        (defaults 60 / 90 / 120)
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import random
+import time
+from typing import Awaitable, Callable, TypeVar
+
+logger = logging.getLogger(__name__)
+
+# Priority classes — lower value is served first
+PRIORITY_INTERACTIVE = 0  # POST /generate-image (user is waiting on it)
+PRIORITY_PREVIEW = 1      # chat recipe previews (background job queue)
+PRIORITY_THEME = 2        # theme suggestion images
+
+_PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: "interactive",
+    PRIORITY_PREVIEW: "preview",
+    PRIORITY_THEME: "theme",
+}
+
+IMAGE_RPM = float(os.environ.get("IMAGE_RPM", "10"))
+IMAGE_BURST = float(os.environ.get("IMAGE_BURST", "3"))
+IMAGE_MAX_ATTEMPTS = int(os.environ.get("IMAGE_MAX_ATTEMPTS", "4"))
+IMAGE_RETRY_BASE = float(os.environ.get("IMAGE_RETRY_BASE", "3"))
+
+_MAX_WAIT = {
+    PRIORITY_INTERACTIVE: float(os.environ.get("IMAGE_WAIT_INTERACTIVE", "60")),
+    PRIORITY_PREVIEW: float(os.environ.get("IMAGE_WAIT_PREVIEW", "90")),
+    PRIORITY_THEME: float(os.environ.get("IMAGE_WAIT_THEME", "120")),
+}
+
+_T = TypeVar("_T")
+
+
+class ImageSchedulerBusy(Exception):
+    """No token became available within the request's wait budget."""
+
+
+class ImageRateLimited(Exception):
+    """The model kept returning 429 after every retry."""
+
+
+def is_rate_limit_error(err: Exception) -> bool:
+    text = str(err)
+    return "429" in text or "RESOURCE_EXHAUSTED" in text
+
+
+class ImageScheduler:
+    """Token bucket with a priority wait queue."""
+
+    def __init__(
+        self,
+        rate_per_minute: float = IMAGE_RPM,
+        burst: float = IMAGE_BURST,
+        max_attempts: int = IMAGE_MAX_ATTEMPTS,
+        retry_base: float = IMAGE_RETRY_BASE,
+        max_wait: dict[int, float] | None = None,
+    ):
+        self.rate = rate_per_minute / 60.0
+        self.burst = max(1.0, burst)
+        self.max_attempts = max(1, max_attempts)
+        self.retry_base = retry_base
+        self.max_wait = dict(_MAX_WAIT if max_wait is None else max_wait)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._wakeup: asyncio.TimerHandle | None = None
+        # Metrics
+        self.granted = 0
+        self.rejected = 0
+        self.throttled = 0
+        self.total_wait = 0.0
+        self.max_wait_seen = 0.0
+
+    # -- token bucket ------------------------------------------------------
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _pump(self) -> None:
+        """Hand tokens to waiters in priority order; re-arm the timer if starved."""
+        self._wakeup = None
+        loop = asyncio.get_running_loop()
+        now = time.monotonic()
+        self._refill(now)
+        while self._waiters:
+            if now < self._paused_until:
+                delay = self._paused_until - now
+                break
+            if self._tokens < 1.0:
+                delay = (1.0 - self._tokens) / self.rate if self.rate > 0 else 1.0
+                break
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():  # waiter timed out or was cancelled
+                continue
+            self._tokens -= 1.0
+            future.set_result(None)
+        else:
+            return
+        self._wakeup = loop.call_later(delay, self._pump)
+
+    def _kick(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.cancel()
+        self._pump()
+
+    async def acquire(self, priority: int = PRIORITY_PREVIEW) -> None:
+        """Wait for a token, or raise ImageSchedulerBusy after the class budget."""
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        start = time.monotonic()
+        self._kick()
+        try:
+            await asyncio.wait_for(future, timeout=self.max_wait.get(priority))
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise ImageSchedulerBusy(
+                f"Image generation busy ({_PRIORITY_NAMES.get(priority, priority)} queue)"
+            ) from None
+        waited = time.monotonic() - start
+        self.granted += 1
+        self.total_wait += waited
+        self.max_wait_seen = max(self.max_wait_seen, waited)
+
+    def _backoff(self, attempt: int) -> float:
+        """Exponential backoff with +/-50% jitter."""
+        return self.retry_base * (2 ** attempt) * random.uniform(0.5, 1.5)
+
+    # -- public API --------------------------------------------------------
+
+    async def generate(
+        self,
+        call: Callable[[], Awaitable[_T]],
+        priority: int = PRIORITY_PREVIEW,
+    ) -> _T:
+        """Run a model call under the rate limit, retrying 429s.
+
+        Raises:
+            ImageSchedulerBusy: no token within the priority's wait budget.
+            ImageRateLimited: still 429 after max_attempts.
+        """
+        for attempt in range(self.max_attempts):
+            await self.acquire(priority)
+            try:
+                return await call()
+            except Exception as err:
+                if not is_rate_limit_error(err):
+                    raise
+                self.throttled += 1
+                delay = self._backoff(attempt)
+                # Quota is shared: pause everyone, and drop banked tokens
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+                self._tokens = 0.0
+                self._updated = time.monotonic()
+                logger.warning(
+                    "Gemini 429 on attempt %d (%s), pausing image scheduler %.1fs",
+                    attempt + 1, _PRIORITY_NAMES.get(priority, priority), delay,
+                )
+        raise ImageRateLimited("Gemini rate limit exceeded after retries")
+
+    def queue_depth(self) -> dict[str, int]:
+        depth = {name: 0 for name in _PRIORITY_NAMES.values()}
+        for priority, _, future in self._waiters:
+            if not future.done():
+                name = _PRIORITY_NAMES.get(priority, str(priority))
+                depth[name] = depth.get(name, 0) + 1
+        return depth
+
+    def stats(self) -> dict:
+        return {
+            "rate_per_minute": round(self.rate * 60, 2),
+            "tokens": round(min(self.burst, self._tokens), 2),
+            "queue_depth": self.queue_depth(),
+            "granted": self.granted,
+            "rejected": self.rejected,
+            "throttled": self.throttled,
+            "avg_wait_s": round(self.total_wait / self.granted, 3) if self.granted else 0.0,
+            "max_wait_s": round(self.max_wait_seen, 3),
+        }
+
+
+_scheduler: ImageScheduler | None = None
+
+
+def get_image_scheduler() -> ImageScheduler:
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = ImageScheduler()
+    return _scheduler
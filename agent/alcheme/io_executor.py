@@ -0,0 +1,26 @@
+"""Bounded thread pool for blocking I/O called from async code.
+
+Firestore / GCS / Rakuten clients are synchronous. Calling them directly from
+an async endpoint stalls the single uvicorn event loop (and every other
+user's SSE stream), so async code hands blocking calls to this pool instead.
+
+Pool size is set with IO_MAX_WORKERS (default 32).
+"""
+
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+IO_MAX_WORKERS = int(os.environ.get("IO_MAX_WORKERS", "32"))
+
+_executor = ThreadPoolExecutor(max_workers=IO_MAX_WORKERS, thread_name_prefix="alcheme-io")
+
+_T = TypeVar("_T")
+
+
+async def run_blocking(fn: Callable[..., _T], *args: Any, **kwargs: Any) -> _T:
+    """Run a blocking function on the I/O pool without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(fn, *args, **kwargs))
@@ -0,0 +1,125 @@
+"""Incremental extraction of fenced JSON blocks from streamed agent text.
+
+The agents put structured output (recipes, scan results, product matches)
+in ```json fenced blocks inside their text. JsonBlockStream consumes the
+text deltas as they arrive and returns each block's parsed value as soon as
+its closing fence is seen, so /chat can emit a recipe card while the agent
+is still talking instead of re-scanning the whole text at the end.
+
+Text is kept as a list of chunks (joined once, on demand), and each delta is
+scanned only for its own newlines, so a turn costs O(total length).
+
+Fences follow the previous regex extraction: an opening ``` optionally
+tagged ``json`` followed by the end of its line, and a closing ``` at the
+start of a line. Blocks that are not valid JSON are skipped; fences tagged
+with another language are passed over. If no block parsed, finish() falls
+back to parsing the whole text as JSON.
+"""
+
+import json
+from typing import Any
+
+_FENCE = "```"
+
+_OUTSIDE = 0
+_IN_JSON = 1
+_IN_OTHER = 2
+
+
+class JsonBlockStream:
+    """Feed text deltas, get parsed JSON blocks back as soon as they close."""
+
+    def __init__(self) -> None:
+        self._chunks: list[str] = []
+        self._text: str | None = ""
+        self._line: list[str] = []
+        self._body: list[str] = []
+        self._state = _OUTSIDE
+        self._skip_line = False
+        self.blocks = 0
+
+    def feed(self, delta: str) -> list[Any]:
+        """Consume a text delta; return the blocks it completed (in order)."""
+        if not delta:
+            return []
+        self._chunks.append(delta)
+        self._text = None
+        completed: list[Any] = []
+        start = 0
+        while (newline := delta.find("\n", start)) >= 0:
+            self._line.append(delta[start:newline])
+            line = "".join(self._line)
+            self._line = []
+            self._handle_line(line, completed)
+            start = newline + 1
+        if start < len(delta):
+            self._line.append(delta[start:])
+            # A closing fence is final as soon as it starts the line
+            if self._state == _IN_JSON and self._line_prefix(len(_FENCE)) == _FENCE:
+                self._close(completed)
+                self._skip_line = True
+        return completed
+
+    def finish(self) -> list[Any]:
+        """End of stream: blocks still pending, or the whole text as JSON if no block parsed."""
+        completed: list[Any] = []
+        if self._line:
+            line = "".join(self._line)
+            self._line = []
+            if self._state == _IN_JSON and line.startswith(_FENCE):
+                self._close(completed)
+        if not self.blocks:
+            try:
+                completed.append(json.loads(self.text()))
+                self.blocks += 1
+            except json.JSONDecodeError:
+                pass
+        return completed
+
+    def text(self) -> str:
+        """All text fed so far."""
+        if self._text is None:
+            self._text = "".join(self._chunks)
+            self._chunks = [self._text]
+        return self._text
+
+    def _line_prefix(self, n: int) -> str:
+        prefix = ""
+        for chunk in self._line:
+            prefix += chunk[: n - len(prefix)]
+            if len(prefix) >= n:
+                break
+        return prefix
+
+    def _handle_line(self, line: str, completed: list[Any]) -> None:
+        if self._skip_line:
+            self._skip_line = False
+            return
+        if self._state == _OUTSIDE:
+            fence = line.find(_FENCE)
+            if fence >= 0:
+                info = line[fence + len(_FENCE):].strip()
+                self._state = _IN_JSON if info in ("", "json") else _IN_OTHER
+        elif self._state == _IN_JSON:
+            if line.startswith(_FENCE):
+                self._close(completed)
+            else:
+                self._body.append(line)
+        elif line.startswith(_FENCE):
+            self._state = _OUTSIDE
+
+    def _close(self, completed: list[Any]) -> None:
+        body = "\n".join(self._body)
+        self._body = []
+        self._state = _OUTSIDE
+        try:
+            completed.append(json.loads(body))
+        except json.JSONDecodeError:
+            return
+        self.blocks += 1
+
+
+def extract_json_blocks(text: str) -> list[Any]:
+    """All JSON blocks in a complete text (see JsonBlockStream)."""
+    stream = JsonBlockStream()
+    return stream.feed(text) + stream.finish()
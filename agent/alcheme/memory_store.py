@@ -0,0 +1,266 @@
+"""Persistent cross-session memory service.
+
+ADK's InMemoryMemoryService keeps every ingested event in process RAM,
+forever, and answers search_memory with a linear scan. SQLiteMemoryService
+stores the text of memory events in a local SQLite file instead:
+
+* rows are partitioned by (app_name, user_id) — every read and eviction is
+  scoped to one user through the partition index;
+* an FTS5 index (trigram tokenizer, so Japanese text without spaces is
+  searchable) serves keyword retrieval ranked by bm25;
+* each user keeps at most MEMORY_MAX_PER_USER entries and the file at most
+  MEMORY_MAX_ENTRIES; the oldest entries are evicted first.
+
+Only event text is stored (inline images and tool payloads are dropped), and
+an event is stored once no matter how often its session is re-ingested.
+
+Configuration (environment):
+  MEMORY_BACKEND        "sqlite" (default) or "memory" (ADK InMemoryMemoryService)
+  MEMORY_DB_PATH        SQLite file (default memory.db)
+  MEMORY_MAX_PER_USER   Entries kept per user (default 500)
+  MEMORY_MAX_ENTRIES    Entries kept in total (default 50000)
+  MEMORY_SEARCH_LIMIT   Memories returned per search (default 10)
+"""
+
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from datetime import datetime
+from typing import Any, Mapping, Sequence
+
+from google.adk.events.event import Event
+from google.adk.memory import BaseMemoryService, InMemoryMemoryService
+from google.adk.memory.base_memory_service import SearchMemoryResponse
+from google.adk.memory.memory_entry import MemoryEntry
+from google.adk.sessions import Session
+from google.genai import types
+
+from .io_executor import run_blocking
+
+logger = logging.getLogger(__name__)
+
+MEMORY_MAX_PER_USER = int(os.environ.get("MEMORY_MAX_PER_USER", "500"))
+MEMORY_MAX_ENTRIES = int(os.environ.get("MEMORY_MAX_ENTRIES", "50000"))
+MEMORY_SEARCH_LIMIT = int(os.environ.get("MEMORY_SEARCH_LIMIT", "10"))
+
+# The trigram tokenizer cannot match terms shorter than three characters
+_MIN_FTS_TERM = 3
+_TERM_SPLIT_RE = re.compile(r"[\s、。，．,.!?！？「」『』()（）\[\]【】\"'/]+")
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS memories ("
+    " id INTEGER PRIMARY KEY,"
+    " app_name TEXT NOT NULL, user_id TEXT NOT NULL, session_id TEXT,"
+    " event_id TEXT NOT NULL, author TEXT, timestamp REAL NOT NULL,"
+    " text TEXT NOT NULL, search_text TEXT NOT NULL,"
+    " UNIQUE (app_name, user_id, event_id))",
+    "CREATE INDEX IF NOT EXISTS memories_user_ts ON memories (app_name, user_id, timestamp)",
+    "CREATE INDEX IF NOT EXISTS memories_ts ON memories (timestamp)",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS memories_fts USING fts5("
+    " search_text, content='memories', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS memories_ai AFTER INSERT ON memories BEGIN"
+    " INSERT INTO memories_fts (rowid, search_text) VALUES (new.id, new.search_text); END",
+    "CREATE TRIGGER IF NOT EXISTS memories_ad AFTER DELETE ON memories BEGIN"
+    " INSERT INTO memories_fts (memories_fts, rowid, search_text)"
+    " VALUES ('delete', old.id, old.search_text); END",
+)
+
+
+def _normalize(text: str) -> str:
+    return unicodedata.normalize("NFKC", text).lower()
+
+
+def _event_text(event: Event) -> str:
+    if not event.content or not event.content.parts:
+        return ""
+    return " ".join(part.text for part in event.content.parts if part.text and not part.thought).strip()
+
+
+def _query_terms(query: str) -> list[str]:
+    return list(dict.fromkeys(t for t in _TERM_SPLIT_RE.split(_normalize(query)) if t))
+
+
+class SQLiteMemoryService(BaseMemoryService):
+    """BaseMemoryService on a local SQLite file with an FTS5 keyword index."""
+
+    def __init__(
+        self,
+        path: str,
+        max_per_user: int = MEMORY_MAX_PER_USER,
+        max_entries: int = MEMORY_MAX_ENTRIES,
+        search_limit: int = MEMORY_SEARCH_LIMIT,
+    ):
+        self.path = path
+        self.max_per_user = max_per_user
+        self.max_entries = max_entries
+        self.search_limit = search_limit
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self.added = 0
+        self.evicted = 0
+        self.searches = 0
+        # Row count kept in step with writes, so stats() never touches the file
+        self.entries = 0
+
+    def _db(self) -> sqlite3.Connection:
+        """Open the file and create the schema on first use (caller holds the lock)."""
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            for statement in _SCHEMA:
+                conn.execute(statement)
+            self.entries = conn.execute("SELECT COUNT(*) FROM memories").fetchone()[0]
+            self._conn = conn
+        return self._conn
+
+    # -- writes ------------------------------------------------------------
+
+    async def add_session_to_memory(self, session: Session) -> None:
+        await run_blocking(self._add, session.app_name, session.user_id, session.id, session.events)
+
+    async def add_events_to_memory(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        events: Sequence[Event],
+        session_id: str | None = None,
+        custom_metadata: Mapping[str, object] | None = None,
+    ) -> None:
+        await run_blocking(self._add, app_name, user_id, session_id, list(events))
+
+    def _add(self, app_name: str, user_id: str, session_id: str | None, events: Sequence[Event]) -> int:
+        rows = []
+        for event in events:
+            text = _event_text(event)
+            if text:
+                rows.append((
+                    app_name, user_id, session_id, event.id, event.author,
+                    event.timestamp or time.time(), text, _normalize(text),
+                ))
+        if not rows:
+            return 0
+        with self._lock:
+            conn = self._db()
+            conn.execute("BEGIN")
+            try:
+                cursor = conn.executemany(
+                    "INSERT OR IGNORE INTO memories"
+                    " (app_name, user_id, session_id, event_id, author, timestamp, text, search_text)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                inserted = cursor.rowcount
+                evicted = self._evict(conn, app_name, user_id) if inserted else 0
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            self.added += inserted
+            self.evicted += evicted
+            self.entries += inserted - evicted
+        return inserted
+
+    def _evict(self, conn: sqlite3.Connection, app_name: str, user_id: str) -> int:
+        """Drop the user's oldest entries beyond the per-user bound, then globally."""
+        cursor = conn.execute(
+            "DELETE FROM memories WHERE id IN ("
+            " SELECT id FROM memories WHERE app_name = ? AND user_id = ?"
+            " ORDER BY timestamp DESC LIMIT -1 OFFSET ?)",
+            (app_name, user_id, self.max_per_user),
+        )
+        evicted = cursor.rowcount
+        cursor = conn.execute(
+            "DELETE FROM memories WHERE id IN ("
+            " SELECT id FROM memories ORDER BY timestamp DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+        return evicted + cursor.rowcount
+
+    # -- reads -------------------------------------------------------------
+
+    async def search_memory(self, *, app_name: str, user_id: str, query: str) -> SearchMemoryResponse:
+        rows = await run_blocking(self._search, app_name, user_id, query)
+        return SearchMemoryResponse(memories=[
+            MemoryEntry(
+                id=str(row_id),
+                content=types.Content(
+                    role="user" if author == "user" else "model",
+                    parts=[types.Part(text=text)],
+                ),
+                author=author,
+                timestamp=datetime.fromtimestamp(timestamp).isoformat(),
+                custom_metadata={"session_id": session_id} if session_id else {},
+            )
+            for row_id, session_id, author, timestamp, text in rows
+        ])
+
+    def _search(self, app_name: str, user_id: str, query: str) -> list[tuple[Any, ...]]:
+        terms = _query_terms(query)
+        if not terms:
+            return []
+        long_terms = [t for t in terms if len(t) >= _MIN_FTS_TERM]
+        with self._lock:
+            self.searches += 1
+            if long_terms:
+                match = " OR ".join('"' + t.replace('"', '""') + '"' for t in long_terms)
+                return self._db().execute(
+                    "SELECT m.id, m.session_id, m.author, m.timestamp, m.text"
+                    " FROM memories_fts JOIN memories m ON m.id = memories_fts.rowid"
+                    " WHERE memories_fts MATCH ? AND m.app_name = ? AND m.user_id = ?"
+                    " ORDER BY bm25(memories_fts), m.timestamp DESC LIMIT ?",
+                    (match, app_name, user_id, self.search_limit),
+                ).fetchall()
+            # Only short terms: substring scan over this user's (bounded) partition
+            clause = " OR ".join("instr(search_text, ?) > 0" for _ in terms)
+            return self._db().execute(
+                "SELECT id, session_id, author, timestamp, text FROM memories"
+                f" WHERE app_name = ? AND user_id = ? AND ({clause})"
+                " ORDER BY timestamp DESC LIMIT ?",
+                (app_name, user_id, *terms, self.search_limit),
+            ).fetchall()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db().execute("SELECT COUNT(*) FROM memories").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def stats(self) -> dict:
+        return {
+            "backend": "sqlite",
+            "entries": self.entries,
+            "added": self.added,
+            "evicted": self.evicted,
+            "searches": self.searches,
+        }
+
+
+def _fts5_trigram_available() -> bool:
+    try:
+        conn = sqlite3.connect(":memory:")
+        try:
+            conn.execute("CREATE VIRTUAL TABLE probe USING fts5(x, tokenize='trigram')")
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return False
+    return True
+
+
+def create_memory_service() -> BaseMemoryService:
+    """Memory service for MEMORY_BACKEND (see module docstring)."""
+    kind = os.environ.get("MEMORY_BACKEND", "sqlite").lower()
+    if kind == "sqlite":
+        if _fts5_trigram_available():
+            return SQLiteMemoryService(os.environ.get("MEMORY_DB_PATH", "memory.db"))
+        logger.warning("SQLite lacks FTS5 trigram support, falling back to in-memory memory service")
+    return InMemoryMemoryService()
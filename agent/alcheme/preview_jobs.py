@@ -0,0 +1,240 @@
+"""In-process job queue for recipe preview image generation.
+
+Preview generation takes 10-40s against the Gemini image model. Instead of
+holding the /chat SSE stream (and its Cloud Run concurrency slot) open until
+the image is ready, /chat enqueues a job here and closes the stream. A small
+worker pool drains the queue; the worker count is the concurrency bound
+against the image model.
+
+Job progress is written to the recipe doc as ``preview_status``
+(queued → running → done | error) next to ``preview_image_url``, so the
+frontend can poll the recipe from any instance. The latest status per recipe
+is also kept in memory for GET /preview-status.
+
+Configuration (environment):
+  PREVIEW_WORKERS      Concurrent image generations (default 2)
+  PREVIEW_QUEUE_MAX    Pending jobs before new ones are rejected (default 100)
+  PREVIEW_JOB_TIMEOUT  Seconds before a single generation is abandoned (default 120)
+"""
+
+import asyncio
+import logging
+import os
+from collections import OrderedDict
+from typing import Any
+
+from google.cloud import firestore
+
+from .io_executor import run_blocking
+from .prompts.simulator import DEFAULT_THEME
+from .tools.simulator_tools import generate_preview_image
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_WORKERS = int(os.environ.get("PREVIEW_WORKERS", "2"))
+PREVIEW_QUEUE_MAX = int(os.environ.get("PREVIEW_QUEUE_MAX", "100"))
+PREVIEW_JOB_TIMEOUT = float(os.environ.get("PREVIEW_JOB_TIMEOUT", "120"))
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_ERROR = "error"
+
+_STATUS_CACHE_MAX = 1000
+
+_firestore_db: firestore.Client | None = None
+
+
+def _get_firestore() -> firestore.Client:
+    global _firestore_db
+    if _firestore_db is None:
+        _firestore_db = firestore.Client()
+    return _firestore_db
+
+
+def _write_status(user_id: str, recipe_id: str, status: str, error: str | None = None) -> None:
+    """Record job status on the recipe doc (best effort)."""
+    data: dict[str, Any] = {"preview_status": status}
+    if error is not None:
+        data["preview_error"] = error[:200]
+    try:
+        _get_firestore().collection("users").document(user_id).collection(
+            "recipes"
+        ).document(recipe_id).update(data)
+    except Exception as e:
+        logger.warning("Failed to write preview_status for recipe %s: %s", recipe_id, e)
+
+
+def _read_status(user_id: str, recipe_id: str) -> dict | None:
+    """Read preview status from the recipe doc, or None if it does not exist."""
+    doc = _get_firestore().collection("users").document(user_id).collection(
+        "recipes"
+    ).document(recipe_id).get()
+    if not doc.exists:
+        return None
+    data = doc.to_dict() or {}
+    image_url = data.get("preview_image_url")
+    status = data.get("preview_status") or (STATUS_DONE if image_url else None)
+    return {"status": status, "image_url": image_url}
+
+
+class _PreviewJob:
+    __slots__ = ("user_id", "recipe_id", "steps", "theme", "queued_written")
+
+    def __init__(self, user_id: str, recipe_id: str, steps: list[dict], theme: str):
+        self.user_id = user_id
+        self.recipe_id = recipe_id
+        self.steps = steps
+        self.theme = theme
+        # Set once submit() has written "queued"; the worker's writes wait for it
+        self.queued_written = asyncio.Event()
+
+
+class PreviewJobQueue:
+    """asyncio.Queue drained by a fixed pool of worker tasks."""
+
+    def __init__(
+        self,
+        workers: int = PREVIEW_WORKERS,
+        max_pending: int = PREVIEW_QUEUE_MAX,
+        job_timeout: float = PREVIEW_JOB_TIMEOUT,
+    ):
+        self.workers = max(1, workers)
+        self.max_pending = max_pending
+        self.job_timeout = job_timeout
+        self._queue: asyncio.Queue[_PreviewJob] | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._status: OrderedDict[tuple[str, str], dict] = OrderedDict()
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks) and self._loop is asyncio.get_running_loop()
+
+    def start(self) -> None:
+        """Spawn the workers on the running event loop (idempotent)."""
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._tasks = [
+            asyncio.create_task(self._worker(i), name=f"preview-worker-{i}")
+            for i in range(self.workers)
+        ]
+
+    async def stop(self) -> None:
+        """Cancel the workers. Pending jobs are dropped (status stays queued)."""
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._queue = None
+        self._loop = None
+
+    def _set_status(self, job: _PreviewJob, status: str, **extra: Any) -> None:
+        key = (job.user_id, job.recipe_id)
+        self._status[key] = {"status": status, **extra}
+        self._status.move_to_end(key)
+        while len(self._status) > _STATUS_CACHE_MAX:
+            self._status.popitem(last=False)
+
+    async def submit(
+        self,
+        user_id: str,
+        recipe_id: str,
+        steps: list[dict],
+        theme: str = DEFAULT_THEME,
+    ) -> bool:
+        """Enqueue a preview job. Returns False if the queue is full."""
+        self.start()
+        job = _PreviewJob(user_id, recipe_id, steps, theme)
+        assert self._queue is not None
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            logger.warning("Preview queue full (%d), skipping recipe %s", self.max_pending, recipe_id)
+            return False
+        self._set_status(job, STATUS_QUEUED)
+        try:
+            await run_blocking(_write_status, user_id, recipe_id, STATUS_QUEUED)
+        finally:
+            job.queued_written.set()
+        return True
+
+    async def _worker(self, index: int) -> None:
+        assert self._queue is not None
+        queue = self._queue
+        while True:
+            job = await queue.get()
+            try:
+                await self._run(job)
+            except Exception as e:
+                logger.error("Preview worker %d crashed on recipe %s: %s", index, job.recipe_id, e, exc_info=True)
+            finally:
+                queue.task_done()
+
+    async def _run(self, job: _PreviewJob) -> None:
+        # A worker can pick the job up before submit()'s "queued" write lands;
+        # writing "running" first would let "queued" overwrite it
+        await job.queued_written.wait()
+        self._set_status(job, STATUS_RUNNING)
+        await run_blocking(_write_status, job.user_id, job.recipe_id, STATUS_RUNNING)
+        logger.info("Starting preview image generation for recipe %s (%d steps)", job.recipe_id, len(job.steps))
+        try:
+            result = await asyncio.wait_for(
+                generate_preview_image(
+                    recipe_id=job.recipe_id,
+                    user_id=job.user_id,
+                    steps=job.steps,
+                    theme=job.theme,
+                ),
+                timeout=self.job_timeout,
+            )
+        except asyncio.TimeoutError:
+            result = {"status": "error", "error": "Preview image generation timed out"}
+
+        if result.get("status") == "success":
+            self.completed += 1
+            self._set_status(job, STATUS_DONE, image_url=result["image_url"])
+            await run_blocking(_write_status, job.user_id, job.recipe_id, STATUS_DONE)
+        else:
+            self.failed += 1
+            error = result.get("error", "unknown")
+            logger.warning("Preview image generation failed for recipe %s: %s", job.recipe_id, error)
+            self._set_status(job, STATUS_ERROR, error=error)
+            await run_blocking(_write_status, job.user_id, job.recipe_id, STATUS_ERROR, error)
+
+    async def join(self) -> None:
+        """Wait until every queued job has finished (tests, graceful drain)."""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def get_status(self, user_id: str, recipe_id: str) -> dict | None:
+        """Latest job status: in-memory first, then the recipe doc."""
+        status = self._status.get((user_id, recipe_id))
+        if status is not None:
+            return {"status": status["status"], "image_url": status.get("image_url")}
+        return await run_blocking(_read_status, user_id, recipe_id)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers if self._tasks else 0,
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+        }
+
+
+_queue: PreviewJobQueue | None = None
+
+
+def get_preview_queue() -> PreviewJobQueue:
+    global _queue
+    if _queue is None:
+        _queue = PreviewJobQueue()
+    return _queue
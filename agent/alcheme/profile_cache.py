@@ -0,0 +1,188 @@
+"""Per-user profile cache for the Firestore ``users/{userId}`` document.
+
+Session creation (/chat, /scan, /search/product, /enhance-recipe and the
+/chat retry path) and the theme / simulator tools all read the same profile
+doc. ProfileCache serves them from one read: entries live for
+PROFILE_CACHE_TTL seconds, and concurrent misses for the same user wait for
+a single in-flight read instead of each going to Firestore.
+
+Only the fields consumers need are cached (personal color, skin type,
+location, goals, preferences, calendar flags, hair) — calendar OAuth tokens
+are never cached and calendar_tools keeps reading them fresh.
+
+Writers call invalidate(user_id): the profiler tool after persisting
+preferences, and POST /profile/invalidate, which the frontend calls after a
+settings change. Invalidation is per instance; the TTL bounds staleness on
+other instances. An invalidation that lands while a read for the same user
+is in flight bumps that user's generation, and the read's result is then
+returned but not cached. Callers get deep copies, so mutating a profile
+(session state holds its nested preferences) never changes the cache.
+
+Configuration (environment):
+  PROFILE_CACHE_TTL          Entry lifetime in seconds (default 300)
+  PROFILE_CACHE_MAX_ENTRIES  LRU size bound (default 2000)
+"""
+
+import copy
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+
+from google.cloud import firestore
+
+logger = logging.getLogger(__name__)
+
+PROFILE_CACHE_TTL = float(os.environ.get("PROFILE_CACHE_TTL", "300"))
+PROFILE_CACHE_MAX_ENTRIES = int(os.environ.get("PROFILE_CACHE_MAX_ENTRIES", "2000"))
+
+_PROFILE_FIELDS = (
+    "personalColor",
+    "skinType",
+    "displayName",
+    "location",
+    "beautyGoals",
+    "preferences",
+    "manualSchedule",
+    "hairType",
+    "hairColor",
+)
+
+_firestore_db: firestore.Client | None = None
+
+
+def _get_firestore() -> firestore.Client:
+    global _firestore_db
+    if _firestore_db is None:
+        _firestore_db = firestore.Client()
+    return _firestore_db
+
+
+def _read_profile(user_id: str) -> dict[str, Any]:
+    """Fetch the cacheable subset of users/{user_id} ({} if the doc is missing)."""
+    doc = _get_firestore().collection("users").document(user_id).get()
+    if not doc.exists:
+        return {}
+    data = doc.to_dict() or {}
+    profile = {field: data[field] for field in _PROFILE_FIELDS if data.get(field)}
+    cal = data.get("calendarIntegration")
+    if cal and cal.get("connected"):
+        profile["calendarConnected"] = True
+    return profile
+
+
+class ProfileCache:
+    """TTL + LRU cache of user profiles with single-flight misses.
+
+    get() is blocking (Firestore); call it through run_blocking from async
+    code. A failed read is not cached and returns an empty profile.
+    """
+
+    def __init__(self, ttl: float = PROFILE_CACHE_TTL, max_entries: int = PROFILE_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data: OrderedDict[str, tuple[float, dict[str, Any]]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._user_locks: dict[str, threading.Lock] = {}
+        # Bumped by invalidate(); a read that saw another generation is not stored
+        self._generations: dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _cached(self, user_id: str) -> dict[str, Any] | None:
+        with self._lock:
+            entry = self._data.get(user_id)
+            if entry is None:
+                return None
+            expires_at, profile = entry
+            if time.monotonic() >= expires_at:
+                del self._data[user_id]
+                return None
+            self._data.move_to_end(user_id)
+            self.hits += 1
+        return copy.deepcopy(profile)
+
+    def get(self, user_id: str) -> dict[str, Any]:
+        """Profile fields for user_id, reading Firestore at most once per TTL."""
+        profile = self._cached(user_id)
+        if profile is not None:
+            return profile
+        with self._lock:
+            user_lock = self._user_locks.setdefault(user_id, threading.Lock())
+        with user_lock:
+            # Another thread may have filled the entry while we waited
+            profile = self._cached(user_id)
+            if profile is not None:
+                return profile
+            with self._lock:
+                self.misses += 1
+                generation = self._generations.setdefault(user_id, 0)
+            try:
+                profile = _read_profile(user_id)
+            except Exception as e:
+                logger.warning("Failed to fetch user profile for %s: %s", user_id, e)
+                return {}
+            with self._lock:
+                if self._generations.get(user_id) == generation:
+                    self._data[user_id] = (time.monotonic() + self.ttl, profile)
+                    self._data.move_to_end(user_id)
+                    while len(self._data) > self.max_entries:
+                        evicted, _ = self._data.popitem(last=False)
+                        self._user_locks.pop(evicted, None)
+                        self._generations.pop(evicted, None)
+            return copy.deepcopy(profile)
+
+    def invalidate(self, user_id: str) -> None:
+        """Drop a user's cached profile after it was written."""
+        with self._lock:
+            if user_id in self._generations:
+                self._generations[user_id] += 1
+            if self._data.pop(user_id, None) is not None:
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._user_locks.clear()
+            self._generations.clear()
+            self.hits = 0
+            self.misses = 0
+            self.invalidations = 0
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+
+_cache: ProfileCache | None = None
+
+
+def get_profile_cache() -> ProfileCache:
+    global _cache
+    if _cache is None:
+        _cache = ProfileCache()
+    return _cache
+
+
+def get_user_profile(user_id: str) -> dict[str, Any]:
+    """Cached profile fields for user_id (blocking)."""
+    return get_profile_cache().get(user_id)
+
+
+def get_hair_preferences(user_id: str) -> tuple[str | None, str | None]:
+    """(hairType, hairColor) from the cached profile, or Nones (blocking)."""
+    profile = get_user_profile(user_id)
+    return profile.get("hairType"), profile.get("hairColor")
+
+
+def invalidate_user_profile(user_id: str) -> None:
+    get_profile_cache().invalidate(user_id)
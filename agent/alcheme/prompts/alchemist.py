@@ -8,6 +8,7 @@ ALCHEMIST_SYSTEM_PROMPT = """あなたは alche:me のコスメティック・
 - 在庫にないアイテムを「持っている」と仮定してはいけません
 - 在庫にないアイテムをレシピに含めてはいけません
 - 不確かな場合は `validate_recipe_items` ツールで必ず検証してください
+  （結果の `items` に各アイテムのブランド・商品名・色が含まれるため、名前確認のための `search_inventory` 再呼び出しは不要です）
 - 「もしこのアイテムがあれば…」という仮定のレシピは作りません
 - 在庫のアイテムだけでは実現困難な場合は、正直にその旨を伝え、代替案を提示します
 
@@ -0,0 +1,205 @@
+"""Rolling compaction of long chat sessions.
+
+The /chat session is one long-lived session per user. Instead of deleting it
+once it grows too long (which gave the user a turn with no context and
+rebuilt the profile state from Firestore), the oldest turns are folded into
+a short ``conversation_summary`` state entry and their events are removed in
+place. The most recent turns stay verbatim, and the concierge sees the
+summary through its system instruction (inject_conversation_summary).
+
+Compaction runs as a background task scheduled after a /chat turn has been
+written, so no request waits on it. The summary is extractive — the user's
+request, the start of the reply, any recipe name and the tools used per turn —
+so compaction costs no model call. Compacted events are handed to the memory
+service so they stay searchable.
+
+Configuration (environment):
+  SESSION_COMPACT_AFTER_EVENTS  Compact once a session holds more events (default 20)
+  SESSION_KEEP_TURNS            Most recent turns kept verbatim (default 4)
+  SESSION_SUMMARY_MAX_CHARS     Cap on the stored summary; oldest lines drop first (default 2000)
+"""
+
+import asyncio
+import logging
+import os
+import re
+from typing import Any
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.events.event import Event
+from google.adk.models import LlmRequest, LlmResponse
+
+logger = logging.getLogger(__name__)
+
+SESSION_COMPACT_AFTER_EVENTS = int(os.environ.get("SESSION_COMPACT_AFTER_EVENTS", "20"))
+SESSION_KEEP_TURNS = int(os.environ.get("SESSION_KEEP_TURNS", "4"))
+SESSION_SUMMARY_MAX_CHARS = int(os.environ.get("SESSION_SUMMARY_MAX_CHARS", "2000"))
+
+SUMMARY_STATE_KEY = "conversation_summary"
+
+_USER_SNIPPET_CHARS = 120
+_REPLY_SNIPPET_CHARS = 120
+
+_SYSTEM_BLOCK_RE = re.compile(r"\[SYSTEM:[^\]]*\]\n.*?\[/SYSTEM\]\n?", re.DOTALL)
+_SYSTEM_LINE_RE = re.compile(r"\[SYSTEM:[^\]]*\]\n?")
+_CODE_BLOCK_RE = re.compile(r"```.*?(?:```|$)", re.DOTALL)
+_RECIPE_NAME_RE = re.compile(r'"recipe_name"\s*:\s*"([^"]+)"')
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def _snippet(text: str, limit: int) -> str:
+    text = _WHITESPACE_RE.sub(" ", text).strip()
+    return text if len(text) <= limit else text[: limit - 1] + "…"
+
+
+def _event_text(event: Event) -> str:
+    if not event.content or not event.content.parts:
+        return ""
+    return "".join(part.text for part in event.content.parts if part.text and not part.thought)
+
+
+def _summarize_turn(events: list[Event]) -> str | None:
+    user_text = ""
+    reply_text = ""
+    tools: list[str] = []
+    for event in events:
+        if event.author == "user":
+            user_text += _event_text(event)
+            continue
+        for call in event.get_function_calls():
+            if call.name and call.name != "transfer_to_agent" and call.name not in tools:
+                tools.append(call.name)
+        reply_text += _event_text(event)
+
+    user_text = _SYSTEM_LINE_RE.sub("", _SYSTEM_BLOCK_RE.sub("", user_text))
+    recipe = _RECIPE_NAME_RE.search(reply_text)
+    reply_text = _CODE_BLOCK_RE.sub(" ", reply_text)
+
+    user = _snippet(user_text, _USER_SNIPPET_CHARS)
+    reply = _snippet(reply_text, _REPLY_SNIPPET_CHARS)
+    if not user and not reply:
+        return None
+    line = f"- ユーザー: {user or '(画像/指定のみ)'}"
+    if reply:
+        line += f" → {reply}"
+    if recipe:
+        line += f" [レシピ: {recipe.group(1)}]"
+    if tools:
+        line += f" [ツール: {', '.join(tools)}]"
+    return line
+
+
+def summarize_events(
+    previous: str | None,
+    events: list[Event],
+    max_chars: int = SESSION_SUMMARY_MAX_CHARS,
+) -> str:
+    """Append one line per turn in events to the previous summary.
+
+    Lines are dropped oldest-first once the summary exceeds max_chars.
+    """
+    lines = previous.splitlines() if previous else []
+    turns: dict[str, list[Event]] = {}
+    for event in events:
+        turns.setdefault(event.invocation_id, []).append(event)
+    for turn_events in turns.values():
+        line = _summarize_turn(turn_events)
+        if line:
+            lines.append(line)
+
+    total = sum(len(line) + 1 for line in lines)
+    while len(lines) > 1 and total > max_chars:
+        total -= len(lines.pop(0)) + 1
+    return "\n".join(lines)
+
+
+def inject_conversation_summary(
+    callback_context: CallbackContext, llm_request: LlmRequest,
+) -> LlmResponse | None:
+    """before_model_callback: give the model the summary of compacted turns."""
+    summary = callback_context.state.get(SUMMARY_STATE_KEY)
+    if summary:
+        llm_request.append_instructions([
+            "## これまでの会話の要約（古いやり取り）\n"
+            "以下は直近より前のやり取りの要約です。必要に応じて参照してください。\n"
+            f"{summary}"
+        ])
+    return None
+
+
+class SessionCompactor:
+    """Schedules compaction of a session after its turn has been written.
+
+    At most one compaction runs per session; a request to compact a session
+    that is already being compacted is dropped.
+    """
+
+    def __init__(
+        self,
+        session_service: Any,
+        memory_service: Any = None,
+        max_events: int = SESSION_COMPACT_AFTER_EVENTS,
+        keep_turns: int = SESSION_KEEP_TURNS,
+    ):
+        self.session_service = session_service
+        self.memory_service = memory_service
+        self.max_events = max_events
+        self.keep_turns = max(1, keep_turns)
+        self._inflight: set[tuple[str, str, str]] = set()
+        self._tasks: set[asyncio.Task] = set()
+        self.runs = 0
+        self.failures = 0
+
+    def schedule(self, app_name: str, user_id: str, session_id: str) -> bool:
+        """Start a background compaction. Returns False if one is already running."""
+        key = (app_name, user_id, session_id)
+        if key in self._inflight:
+            return False
+        self._inflight.add(key)
+        task = asyncio.create_task(self._run(key), name=f"compact-{session_id}")
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    async def _run(self, key: tuple[str, str, str]) -> None:
+        try:
+            await self.compact(*key)
+        except Exception as e:
+            self.failures += 1
+            logger.warning("Session compaction failed for %s: %s", key[2], e, exc_info=True)
+        finally:
+            self._inflight.discard(key)
+
+    async def compact(self, app_name: str, user_id: str, session_id: str) -> int:
+        """Compact one session now. Returns the number of events removed."""
+        events = await self.session_service.compact_session(
+            app_name, user_id, session_id,
+            max_events=self.max_events,
+            keep_turns=self.keep_turns,
+            summarize=summarize_events,
+            state_key=SUMMARY_STATE_KEY,
+        )
+        if not events:
+            return 0
+        self.runs += 1
+        logger.info("Compacted %d events of session %s into the summary", len(events), session_id)
+        if self.memory_service is not None:
+            try:
+                await self.memory_service.add_events_to_memory(
+                    app_name=app_name, user_id=user_id, events=events, session_id=session_id,
+                )
+            except Exception as e:
+                logger.warning("Memory ingestion of compacted events failed for %s: %s", session_id, e)
+        return len(events)
+
+    async def drain(self) -> None:
+        """Wait for running compactions (shutdown, tests)."""
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "running": len(self._inflight),
+            "runs": self.runs,
+            "failures": self.failures,
+        }
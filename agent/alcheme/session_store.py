@@ -0,0 +1,388 @@
+"""ADK session backend configuration.
+
+Builds the session service used by the Runner from SESSION_DB_URL:
+
+* ``postgresql+asyncpg://...`` (production): a pooled engine shared by every
+  /chat request on the instance, with sessions shared across instances.
+* ``sqlite+aiosqlite:///file.db`` (local / tests): the file is switched to
+  WAL mode so readers never block on the writer, with a busy timeout
+  instead of immediate "database is locked" errors.
+
+Event appends are write-batched: each non-partial event is applied to the
+in-memory session immediately (so the running agent sees it), while the
+database write is buffered per session and flushed in a single transaction
+when the batch fills, after SESSION_APPEND_FLUSH_MS, when the turn ends
+(flush_session) or before the session is read or deleted. A turn with
+tool calls therefore costs one write transaction instead of one per event.
+Buffered events are only in memory until their flush: if the process dies,
+up to SESSION_APPEND_FLUSH_MS worth of a session's events (never more than
+SESSION_APPEND_BATCH) is lost. Set SESSION_APPEND_BATCH=1 where that matters.
+
+A batch is written with the same stale-writer check as upstream
+append_event: if another instance advanced the session in storage since it
+was loaded, the flush raises StaleSessionError instead of interleaving the
+two writers' events.
+
+The subclass uses private DatabaseSessionService members (_get_schema_classes,
+_with_session_lock, _commit_event_to_session, ...); google-adk is pinned in
+pyproject.toml for that reason. Re-check this module when upgrading it.
+
+compact_session() trims a long session in place: the oldest turns are folded
+into a summary kept in session state and their event rows are deleted, while
+the most recent turns stay intact (see alcheme/session_compaction.py).
+
+Configuration (environment):
+  SESSION_DB_URL             Database URL (default sqlite+aiosqlite:///sessions.db)
+  SESSION_DB_POOL_SIZE       Pooled connections per instance (default 10, server DBs only)
+  SESSION_DB_MAX_OVERFLOW    Extra connections under burst (default 10)
+  SESSION_DB_POOL_TIMEOUT    Seconds to wait for a pooled connection (default 30)
+  SESSION_DB_POOL_RECYCLE    Recycle connections after N seconds (default 1800)
+  SESSION_SQLITE_BUSY_MS     SQLite busy timeout in milliseconds (default 5000)
+  SESSION_APPEND_BATCH       Events buffered per session before a write (default 16; 1 disables batching)
+  SESSION_APPEND_FLUSH_MS    Max time an event stays buffered (default 250)
+"""
+
+import asyncio
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Any, Callable
+
+from google.adk.errors._stale_session_error import StaleSessionError
+from google.adk.errors.session_not_found_error import SessionNotFoundError
+from google.adk.events.event import Event
+from google.adk.sessions import DatabaseSessionService, Session, _session_util
+from google.adk.sessions.base_session_service import GetSessionConfig, ListSessionsResponse
+from google.adk.sessions.database_session_service import (
+    _STALE_SESSION_ERROR_MESSAGE,
+    _select_required_state,
+)
+from sqlalchemy import delete, event as sa_event, func, select
+from sqlalchemy.engine import make_url
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SESSION_DB_URL = "sqlite+aiosqlite:///sessions.db"
+
+SESSION_DB_POOL_SIZE = int(os.environ.get("SESSION_DB_POOL_SIZE", "10"))
+SESSION_DB_MAX_OVERFLOW = int(os.environ.get("SESSION_DB_MAX_OVERFLOW", "10"))
+SESSION_DB_POOL_TIMEOUT = float(os.environ.get("SESSION_DB_POOL_TIMEOUT", "30"))
+SESSION_DB_POOL_RECYCLE = int(os.environ.get("SESSION_DB_POOL_RECYCLE", "1800"))
+SESSION_SQLITE_BUSY_MS = int(os.environ.get("SESSION_SQLITE_BUSY_MS", "5000"))
+SESSION_APPEND_BATCH = int(os.environ.get("SESSION_APPEND_BATCH", "16"))
+SESSION_APPEND_FLUSH_MS = float(os.environ.get("SESSION_APPEND_FLUSH_MS", "250"))
+
+_SessionKey = tuple[str, str, str]
+
+
+def engine_kwargs_for(db_url: str) -> dict[str, Any]:
+    """create_async_engine kwargs: pool sizing for server DBs, none for SQLite."""
+    url = make_url(db_url)
+    if url.get_backend_name() == "sqlite":
+        return {}
+    return {
+        "pool_size": SESSION_DB_POOL_SIZE,
+        "max_overflow": SESSION_DB_MAX_OVERFLOW,
+        "pool_timeout": SESSION_DB_POOL_TIMEOUT,
+        "pool_recycle": SESSION_DB_POOL_RECYCLE,
+    }
+
+
+def _enable_sqlite_wal(dbapi_connection: Any, connection_record: object) -> None:
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={SESSION_SQLITE_BUSY_MS}")
+    cursor.close()
+
+
+class _PendingAppends:
+    __slots__ = ("session", "events", "timer", "base_update_time")
+
+    def __init__(self, session: Session):
+        self.session = session
+        self.events: list[Event] = []
+        self.timer: asyncio.TimerHandle | None = None
+        # Revision of the in-memory session before any buffered event
+        self.base_update_time = session.last_update_time
+
+
+class BatchedDatabaseSessionService(DatabaseSessionService):
+    """DatabaseSessionService that group-commits event appends per session."""
+
+    def __init__(
+        self,
+        db_url: str,
+        batch_size: int = SESSION_APPEND_BATCH,
+        flush_interval_ms: float = SESSION_APPEND_FLUSH_MS,
+        **kwargs: Any,
+    ):
+        super().__init__(db_url=db_url, **{**engine_kwargs_for(db_url), **kwargs})
+        if self.db_engine.dialect.name == "sqlite" and make_url(db_url).database not in (None, "", ":memory:"):
+            sa_event.listen(self.db_engine.sync_engine, "connect", _enable_sqlite_wal)
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval_ms / 1000.0
+        self._pending: dict[_SessionKey, _PendingAppends] = {}
+        self._flush_tasks: set[asyncio.Task] = set()
+        self.batches_written = 0
+        self.events_written = 0
+        self.sessions_compacted = 0
+        self.events_compacted = 0
+
+    # -- buffered appends --------------------------------------------------
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        if self.batch_size <= 1:
+            return await super().append_event(session, event)
+        await self.prepare_tables()
+        if event.partial:
+            return event
+
+        self._apply_temp_state(session, event)
+        event = self._trim_temp_delta_state(event)
+
+        key = (session.app_name, session.user_id, session.id)
+        pending = self._pending.get(key)
+        if pending is not None and pending.session is not session:
+            # A different Session object for the same id (new turn): write
+            # the old buffer first so revisions stay ordered.
+            await self.flush_session(*key)
+            pending = None
+        if pending is None:
+            pending = self._pending[key] = _PendingAppends(session)
+        pending.events.append(event)
+
+        if len(pending.events) >= self.batch_size:
+            await self.flush_session(*key)
+        elif pending.timer is None:
+            pending.timer = asyncio.get_running_loop().call_later(
+                self.flush_interval, self._schedule_flush, key,
+            )
+        return self._commit_event_to_session(session, event)
+
+    def _schedule_flush(self, key: _SessionKey) -> None:
+        task = asyncio.ensure_future(self._flush_in_background(key))
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+
+    async def _flush_in_background(self, key: _SessionKey) -> None:
+        try:
+            await self.flush_session(*key)
+        except Exception as e:
+            logger.error("Background session flush failed for %s: %s", key[2], e, exc_info=True)
+
+    async def flush_session(self, app_name: str, user_id: str, session_id: str) -> None:
+        """Write every buffered event of one session in a single transaction."""
+        key = (app_name, user_id, session_id)
+        pending = self._pending.pop(key, None)
+        if pending is None:
+            return
+        if pending.timer is not None:
+            pending.timer.cancel()
+        if pending.events:
+            await self._write_batch(pending.session, pending.events, pending.base_update_time)
+
+    async def flush(self) -> None:
+        """Write every buffered event (Runner.close / app shutdown)."""
+        for key in list(self._pending):
+            await self.flush_session(*key)
+
+    async def _write_batch(self, session: Session, events: list[Event], base_update_time: float) -> None:
+        schema = self._get_schema_classes()
+        use_row_level_locking = self._supports_row_level_locking()
+        deltas = [
+            _session_util.extract_json_safe_state_delta(e.actions.state_delta or {})
+            for e in events
+        ]
+        has_app_delta = any(d["app"] for d in deltas)
+        has_user_delta = any(d["user"] for d in deltas)
+
+        async with self._with_session_lock(
+            app_name=session.app_name, user_id=session.user_id, session_id=session.id,
+        ):
+            async with self._rollback_on_exception_session() as sql_session:
+                stmt = (
+                    select(schema.StorageSession)
+                    .filter(schema.StorageSession.app_name == session.app_name)
+                    .filter(schema.StorageSession.user_id == session.user_id)
+                    .filter(schema.StorageSession.id == session.id)
+                )
+                if use_row_level_locking:
+                    stmt = stmt.with_for_update()
+                storage_session = (await sql_session.execute(stmt)).scalars().one_or_none()
+                if storage_session is None:
+                    raise SessionNotFoundError(f"Session {session.id} not found.")
+
+                # Stale-writer check, as in DatabaseSessionService.append_event
+                if session._storage_update_marker is not None:
+                    if session._storage_update_marker != storage_session.get_update_marker():
+                        raise StaleSessionError(_STALE_SESSION_ERROR_MESSAGE)
+                elif storage_session.get_update_timestamp() > base_update_time:
+                    raise StaleSessionError(_STALE_SESSION_ERROR_MESSAGE)
+
+                app_state = await _select_required_state(
+                    sql_session=sql_session,
+                    state_model=schema.StorageAppState,
+                    predicates=(schema.StorageAppState.app_name == session.app_name,),
+                    use_row_level_locking=use_row_level_locking and has_app_delta,
+                    missing_message=f"App state missing for app_name={session.app_name!r}.",
+                )
+                user_state = await _select_required_state(
+                    sql_session=sql_session,
+                    state_model=schema.StorageUserState,
+                    predicates=(
+                        schema.StorageUserState.app_name == session.app_name,
+                        schema.StorageUserState.user_id == session.user_id,
+                    ),
+                    use_row_level_locking=use_row_level_locking and has_user_delta,
+                    missing_message=f"User state missing for user_id={session.user_id!r}.",
+                )
+
+                for event, delta in zip(events, deltas):
+                    if delta["app"]:
+                        app_state.state.update(delta["app"])
+                    if delta["user"]:
+                        user_state.state.update(delta["user"])
+                    if delta["session"]:
+                        storage_session.state.update(delta["session"])
+                    sql_session.add(schema.StorageEvent.from_event(session, event))
+
+                update_time = datetime.fromtimestamp(events[-1].timestamp, timezone.utc)
+                if self._uses_naive_datetime():
+                    update_time = update_time.replace(tzinfo=None)
+                storage_session.update_time = update_time
+
+                last_update_time = storage_session.get_update_timestamp()
+                update_marker = storage_session.get_update_marker()
+                await sql_session.commit()
+
+        session.last_update_time = last_update_time
+        session._storage_update_marker = update_marker
+        self.batches_written += 1
+        self.events_written += len(events)
+
+    # -- compaction --------------------------------------------------------
+
+    async def compact_session(
+        self,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        *,
+        max_events: int,
+        keep_turns: int,
+        summarize: Callable[[str | None, list[Event]], str],
+        state_key: str = "conversation_summary",
+    ) -> list[Event]:
+        """Fold the oldest turns of a session into a state summary.
+
+        When the session holds more than max_events events, every turn
+        (invocation) except the last keep_turns is passed to
+        ``summarize(previous_summary, events)``; the result is stored under
+        state_key and the events are deleted, all in one transaction.
+        Whole turns are cut so a function call is never separated from its
+        response. The session's update_time is left untouched, so a turn
+        running concurrently does not see its session as stale.
+
+        Returns the removed events (empty if nothing was compacted).
+        """
+        await self.prepare_tables()
+        await self.flush_session(app_name, user_id, session_id)
+        schema = self._get_schema_classes()
+        event_filter = (
+            schema.StorageEvent.app_name == app_name,
+            schema.StorageEvent.user_id == user_id,
+            schema.StorageEvent.session_id == session_id,
+        )
+
+        async with self._with_session_lock(app_name=app_name, user_id=user_id, session_id=session_id):
+            async with self._rollback_on_exception_session() as sql_session:
+                count = (await sql_session.execute(
+                    select(func.count()).select_from(schema.StorageEvent).filter(*event_filter)
+                )).scalar_one()
+                if count <= max_events:
+                    return []
+
+                stmt = (
+                    select(schema.StorageSession)
+                    .filter(schema.StorageSession.app_name == app_name)
+                    .filter(schema.StorageSession.user_id == user_id)
+                    .filter(schema.StorageSession.id == session_id)
+                )
+                if self._supports_row_level_locking():
+                    stmt = stmt.with_for_update()
+                storage_session = (await sql_session.execute(stmt)).scalars().one_or_none()
+                if storage_session is None:
+                    return []
+
+                rows = (await sql_session.execute(
+                    select(schema.StorageEvent)
+                    .filter(*event_filter)
+                    .order_by(schema.StorageEvent.timestamp, schema.StorageEvent.id)
+                )).scalars().all()
+                turns = list(dict.fromkeys(row.invocation_id for row in rows))
+                kept = set(turns[-keep_turns:]) if keep_turns > 0 else set()
+                dropped = [row for row in rows if row.invocation_id not in kept]
+                if not dropped:
+                    return []
+
+                events = [row.to_event() for row in dropped]
+                storage_session.state[state_key] = summarize(storage_session.state.get(state_key), events)
+                await sql_session.execute(
+                    delete(schema.StorageEvent)
+                    .where(*event_filter)
+                    .where(schema.StorageEvent.id.in_([row.id for row in dropped]))
+                )
+                await sql_session.commit()
+
+        self.sessions_compacted += 1
+        self.events_compacted += len(events)
+        return events
+
+    # -- reads / deletes see buffered events -------------------------------
+
+    async def get_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        config: GetSessionConfig | None = None,
+    ) -> Session | None:
+        await self.flush_session(app_name, user_id, session_id)
+        return await super().get_session(
+            app_name=app_name, user_id=user_id, session_id=session_id, config=config,
+        )
+
+    async def list_sessions(self, *, app_name: str, user_id: str | None = None) -> ListSessionsResponse:
+        for key in [k for k in self._pending if k[0] == app_name and (user_id is None or k[1] == user_id)]:
+            await self.flush_session(*key)
+        return await super().list_sessions(app_name=app_name, user_id=user_id)
+
+    async def delete_session(self, app_name: str, user_id: str, session_id: str) -> None:
+        pending = self._pending.pop((app_name, user_id, session_id), None)
+        if pending is not None and pending.timer is not None:
+            pending.timer.cancel()
+        await super().delete_session(app_name=app_name, user_id=user_id, session_id=session_id)
+
+    async def close(self) -> None:
+        await self.flush()
+        await super().close()
+
+    def stats(self) -> dict:
+        pool = self.db_engine.pool
+        status = pool.status() if hasattr(pool, "status") else ""
+        return {
+            "dialect": self.db_engine.dialect.name,
+            "pool": status,
+            "pending_sessions": len(self._pending),
+            "batches_written": self.batches_written,
+            "events_written": self.events_written,
+            "sessions_compacted": self.sessions_compacted,
+            "events_compacted": self.events_compacted,
+        }
+
+
+def create_session_service(db_url: str | None = None) -> BatchedDatabaseSessionService:
+    """Session service for SESSION_DB_URL (see module docstring)."""
+    return BatchedDatabaseSessionService(db_url or os.environ.get("SESSION_DB_URL", DEFAULT_SESSION_DB_URL))
@@ -0,0 +1,210 @@
+"""SSE frame encoding for the streaming endpoints.
+
+Every frame on the wire is ``data: {"type": ..., "data": ...}\\n\\n``. Card
+frames (recipe_card, product_card, ...) carry their payload as a JSON
+*string* in ``data``; the frontend parses it a second time. frame() builds
+the whole frame in one encoder call: a Nested payload is serialized once and
+spliced into the frame as a string literal. That replaces the old
+``json.dumps`` of ``json.dumps(...)``, and the bytes on the wire still parse
+the same way.
+
+Encoding uses orjson when it is installed (``pip install .[speedups]``) and
+falls back to json with compact separators otherwise.
+
+stream() turns an async iterator of (type, data) events into frames. Text
+deltas that arrive within SSE_COALESCE_MS of each other are merged into one
+text_delta frame. A pending delta is flushed when the interval runs out,
+when it reaches SSE_COALESCE_MAX_CHARS, or when any other event arrives, so
+frame order is unchanged. To let a quiet interval flush on time, the
+producer runs in its own task and hands events over through a queue. The
+producer owns the agent run, which keeps ADK's context-local state in one
+task. Closing the stream cancels the producer.
+
+Given an is_disconnected callable (Request.is_disconnected), stream() also
+polls for the client going away every SSE_DISCONNECT_POLL_MS. When the client
+has gone, the producer is cancelled and the stream ends, even while the agent
+is inside a long tool call and no frame is due to be sent. Cancellations are
+counted in stats().
+
+Configuration (environment):
+  SSE_COALESCE_MS         Max delay for merging text deltas; 0 disables (default 30)
+  SSE_COALESCE_MAX_CHARS  Flush merged text at this size (default 1024)
+  SSE_DISCONNECT_POLL_MS  Client disconnect check interval (default 500)
+"""
+
+import asyncio
+import json
+import logging
+import os
+from contextlib import suppress
+from typing import Any, AsyncIterator, Awaitable, Callable
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+SSE_COALESCE_MS = float(os.environ.get("SSE_COALESCE_MS", "30"))
+SSE_COALESCE_MAX_CHARS = int(os.environ.get("SSE_COALESCE_MAX_CHARS", "1024"))
+SSE_DISCONNECT_POLL_MS = float(os.environ.get("SSE_DISCONNECT_POLL_MS", "500"))
+
+TEXT_DELTA = "text_delta"
+
+_QUEUE_MAX = 64
+
+_stats = {"streams": 0, "completed": 0, "cancelled": 0, "disconnects": 0}
+
+
+def dumps(obj: Any) -> str:
+    """Compact JSON text, non-ASCII left as is."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj).decode()
+        except TypeError:
+            pass  # e.g. non-str dict keys; let json decide
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+class Nested:
+    """Event data sent as a JSON-encoded string (the card frame format)."""
+
+    __slots__ = ("payload",)
+
+    def __init__(self, payload: Any):
+        self.payload = payload
+
+
+def _encode_frame(event_type: str, data: Any) -> str:
+    if isinstance(data, Nested):
+        data = dumps(data.payload)
+    return f'data: {{"type":{dumps(event_type)},"data":{dumps(data)}}}\n\n'
+
+
+DONE_FRAME = _encode_frame("done", "")
+CONTENT_DONE_FRAME = _encode_frame("content_done", "")
+
+# Data-less marker frames are encoded once
+_EMPTY_FRAMES = {"done": DONE_FRAME, "content_done": CONTENT_DONE_FRAME}
+
+
+def frame(event_type: str, data: Any = "") -> str:
+    """One SSE frame for an event."""
+    if isinstance(data, str) and not data and event_type in _EMPTY_FRAMES:
+        return _EMPTY_FRAMES[event_type]
+    return _encode_frame(event_type, data)
+
+
+_END = object()
+
+
+class _Raised:
+    __slots__ = ("error",)
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def stats() -> dict:
+    return dict(_stats)
+
+
+async def stream(
+    events: AsyncIterator[tuple[str, Any]],
+    coalesce_ms: float = SSE_COALESCE_MS,
+    max_chars: int = SSE_COALESCE_MAX_CHARS,
+    is_disconnected: Callable[[], Awaitable[bool]] | None = None,
+    poll_ms: float = SSE_DISCONNECT_POLL_MS,
+) -> AsyncIterator[str]:
+    """Encode (type, data) events as SSE frames, merging bursts of text deltas."""
+    _stats["streams"] += 1
+    if coalesce_ms <= 0 and is_disconnected is None:
+        async for event_type, data in events:
+            yield frame(event_type, data)
+        _stats["completed"] += 1
+        return
+
+    queue: asyncio.Queue = asyncio.Queue(maxsize=_QUEUE_MAX)
+    disconnected = False
+
+    async def produce() -> None:
+        try:
+            async for event in events:
+                await queue.put(event)
+        except asyncio.CancelledError:
+            # Never wait on a full queue here: the consumer may be closing. If
+            # it is still reading, the queued items wake it instead.
+            with suppress(asyncio.QueueFull):
+                queue.put_nowait(_END)
+            raise
+        except Exception as e:
+            await queue.put(_Raised(e))
+        await queue.put(_END)
+
+    async def watch() -> None:
+        nonlocal disconnected
+        while not await is_disconnected():
+            await asyncio.sleep(poll_ms / 1000)
+        disconnected = True
+        _stats["disconnects"] += 1
+        logger.info("SSE client disconnected, cancelling the stream")
+        producer.cancel()
+
+    producer = asyncio.create_task(produce(), name="sse-producer")
+    watcher = asyncio.create_task(watch(), name="sse-disconnect") if is_disconnected is not None else None
+    loop = asyncio.get_running_loop()
+    coalesce = coalesce_ms > 0
+    interval = coalesce_ms / 1000
+    pending: list[str] = []
+    pending_chars = 0
+    deadline = 0.0
+    try:
+        while True:
+            if not queue.empty():
+                item = queue.get_nowait()
+            elif pending:
+                try:
+                    item = await asyncio.wait_for(queue.get(), max(deadline - loop.time(), 0))
+                except asyncio.TimeoutError:
+                    item = None
+            else:
+                item = await queue.get()
+            if disconnected:
+                return
+            if pending and (item is None or loop.time() >= deadline):
+                yield frame(TEXT_DELTA, "".join(pending))
+                pending, pending_chars = [], 0
+            if item is None:
+                continue
+
+            if item is _END:
+                break
+            if isinstance(item, _Raised):
+                raise item.error
+            event_type, data = item
+            if coalesce and event_type == TEXT_DELTA and isinstance(data, str):
+                if not pending:
+                    deadline = loop.time() + interval
+                pending.append(data)
+                pending_chars += len(data)
+                if pending_chars >= max_chars:
+                    yield frame(TEXT_DELTA, "".join(pending))
+                    pending, pending_chars = [], 0
+                continue
+            if pending:
+                yield frame(TEXT_DELTA, "".join(pending))
+                pending, pending_chars = [], 0
+            yield frame(event_type, data)
+
+        if pending:
+            yield frame(TEXT_DELTA, "".join(pending))
+        _stats["completed"] += 1
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+        if disconnected or not producer.done():
+            _stats["cancelled"] += 1
+        if not producer.done():
+            producer.cancel()
+        await asyncio.gather(producer, *([watcher] if watcher else []), return_exceptions=True)
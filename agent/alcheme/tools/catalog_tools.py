@@ -1,7 +1,10 @@
 """Global product catalog tools.
 
 Provides catalog upsert (mirroring the TypeScript lib/api/catalog-upsert.ts)
-and search functionality for the shared product catalog.
+and search functionality for the shared product catalog. Upserts are
+transactional; upsert_catalog_many writes several products in one commit.
+With CATALOG_COUNTER_SHARDS > 1, counts of existing entries go to sharded
+counters (see alcheme/catalog_counters.py).
 """
 
 import hashlib
@@ -11,6 +14,8 @@ from typing import Any
 from google.adk.tools import ToolContext
 from google.cloud import firestore
 
+from .. import catalog_counters
+
 logger = logging.getLogger(__name__)
 
 _db: firestore.Client | None = None
@@ -45,27 +50,14 @@ def _catalog_doc_id(brand: str, product_name: str, color_code: str | None = None
     return hashlib.sha256(normalized.encode()).hexdigest()[:20]
 
 
-def upsert_catalog(product_fields: dict, count_type: str = "have") -> str:
-    """Upsert a product into the global catalog collection.
-
-    - New entry: set all fields + have_count/want_count based on count_type
-    - Existing entry: fill null fields only + increment the appropriate count
-
-    Args:
-        product_fields: Product data dict.
-        count_type: "have" (inventory registration) or "want" (suggestion/wishlist).
-
-    Returns the catalog document ID, or empty string if brand/product_name missing.
-    """
+def _catalog_data(product_fields: dict) -> tuple[str, dict[str, Any]] | None:
+    """(doc ID, catalog-eligible fields) for a product, or None if brand/product_name missing."""
     brand = (product_fields.get("brand") or "").strip()
     product_name = (product_fields.get("product_name") or "").strip()
     if not brand or not product_name:
-        return ""
+        return None
 
     color_code = product_fields.get("color_code")
-    doc_id = _catalog_doc_id(brand, product_name, color_code)
-    db = _get_db()
-    catalog_ref = db.collection("catalog").document(doc_id)
 
     # Extract catalog-eligible fields (skip None/empty)
     catalog_data: dict[str, Any] = {}
@@ -79,37 +71,112 @@ def upsert_catalog(product_fields: dict, count_type: str = "have") -> str:
     catalog_data["dedupe_key"] = (
         f"{brand.lower()}::{product_name.lower()}::{(color_code or '').strip().lower()}"
     )
+    return _catalog_doc_id(brand, product_name, color_code), catalog_data
+
+
+@firestore.transactional
+def _upsert_entries(
+    transaction: firestore.Transaction,
+    db: firestore.Client,
+    entries: dict[str, tuple[dict[str, Any], int]],
+    count_type: str,
+    num_shards: int = 1,
+) -> None:
+    """Create or merge catalog docs in one transaction.
+
+    entries maps doc ID -> (catalog data, number of contributions). Existing
+    docs only get empty fields filled and their counts incremented — on a
+    random counter shard when num_shards > 1, so the hot doc itself is only
+    written when a field gets filled.
+    """
+    refs = {doc_id: db.collection("catalog").document(doc_id) for doc_id in entries}
+    snapshots = {snap.id: snap for snap in db.get_all(list(refs.values()), transaction=transaction)}
+    count_field = "have_count" if count_type == "have" else "want_count"
+
+    for doc_id, (catalog_data, contributions) in entries.items():
+        ref = refs[doc_id]
+        snapshot = snapshots.get(doc_id)
+        if snapshot is not None and snapshot.exists:
+            existing_data = snapshot.to_dict() or {}
+            counts = {"contributor_count": contributions, count_field: contributions}
+            updates: dict[str, Any] = {
+                key: val for key, val in catalog_data.items() if val and not existing_data.get(key)
+            }
+            if num_shards > 1:
+                catalog_counters.increment_shard(transaction, ref, counts, num_shards)
+                if updates:
+                    transaction.update(ref, {**updates, "updated_at": firestore.SERVER_TIMESTAMP})
+            else:
+                transaction.update(ref, {
+                    **updates,
+                    **{field: firestore.Increment(n) for field, n in counts.items()},
+                    "updated_at": firestore.SERVER_TIMESTAMP,
+                })
+        else:
+            transaction.create(ref, {
+                **catalog_data,
+                "contributor_count": contributions,
+                "have_count": contributions if count_type == "have" else 0,
+                "want_count": contributions if count_type == "want" else 0,
+                "use_count": 0,
+                "total_rating": 0,
+                "rating_count": 0,
+                "created_at": firestore.SERVER_TIMESTAMP,
+                "updated_at": firestore.SERVER_TIMESTAMP,
+            })
+
+
+def upsert_catalog_many(products: list[dict], count_type: str = "have") -> list[str]:
+    """Upsert several products into the global catalog in one transaction.
+
+    All catalog docs are read with one get_all and written in one commit, so
+    a scan registering N new products costs two round trips instead of 2N.
+    The same product appearing twice is counted twice.
 
-    existing = catalog_ref.get()
-
-    if existing.exists:
-        existing_data = existing.to_dict() or {}
-        count_field = "have_count" if count_type == "have" else "want_count"
-        updates: dict[str, Any] = {
-            "updated_at": firestore.SERVER_TIMESTAMP,
-            "contributor_count": firestore.Increment(1),
-            count_field: firestore.Increment(1),
-        }
-        for key, val in catalog_data.items():
-            if val and not existing_data.get(key):
-                updates[key] = val
-        catalog_ref.update(updates)
-        logger.info("Updated catalog entry %s (contributor +1)", doc_id)
-    else:
-        catalog_ref.set({
-            **catalog_data,
-            "contributor_count": 1,
-            "have_count": 1 if count_type == "have" else 0,
-            "want_count": 1 if count_type == "want" else 0,
-            "use_count": 0,
-            "total_rating": 0,
-            "rating_count": 0,
-            "created_at": firestore.SERVER_TIMESTAMP,
-            "updated_at": firestore.SERVER_TIMESTAMP,
-        })
-        logger.info("Created catalog entry %s", doc_id)
-
-    return doc_id
+    Returns catalog doc IDs aligned with products ("" where brand/product_name
+    is missing).
+    """
+    doc_ids: list[str] = []
+    entries: dict[str, tuple[dict[str, Any], int]] = {}
+    for product_fields in products:
+        parsed = _catalog_data(product_fields)
+        if parsed is None:
+            doc_ids.append("")
+            continue
+        doc_id, catalog_data = parsed
+        doc_ids.append(doc_id)
+        if doc_id in entries:
+            merged, contributions = entries[doc_id]
+            entries[doc_id] = ({**catalog_data, **merged}, contributions + 1)
+        else:
+            entries[doc_id] = (catalog_data, 1)
+
+    if entries:
+        db = _get_db()
+        num_shards = catalog_counters.CATALOG_COUNTER_SHARDS
+        _upsert_entries(db.transaction(), db, entries, count_type, num_shards)
+        if num_shards > 1:
+            catalog_counters.get_counter_rollup().mark(entries)
+        logger.info("Upserted %d catalog entries", len(entries))
+    return doc_ids
+
+
+def upsert_catalog(product_fields: dict, count_type: str = "have") -> str:
+    """Upsert a product into the global catalog collection.
+
+    - New entry: set all fields + have_count/want_count based on count_type
+    - Existing entry: fill null fields only + increment the appropriate count
+
+    The read and write run in a transaction, so concurrent registrations of
+    the same product neither lose a create nor race on the filled fields.
+
+    Args:
+        product_fields: Product data dict.
+        count_type: "have" (inventory registration) or "want" (suggestion/wishlist).
+
+    Returns the catalog document ID, or empty string if brand/product_name missing.
+    """
+    return upsert_catalog_many([product_fields], count_type)[0]
 
 
 def search_catalog(query: str, tool_context: ToolContext) -> dict:
@@ -170,6 +237,12 @@ def search_catalog(query: str, tool_context: ToolContext) -> dict:
                 "rating_count": data.get("rating_count", 0),
             })
 
+        if results and catalog_counters.sharding_enabled():
+            shard_totals = catalog_counters.read_shard_totals(db, [r["catalog_id"] for r in results])
+            for result in results:
+                for field, n in shard_totals.get(result["catalog_id"], {}).items():
+                    result[field] += n
+
         return {"status": "success", "results": results, "count": len(results)}
     except Exception as e:
         logger.error("search_catalog error: %s", e, exc_info=True)
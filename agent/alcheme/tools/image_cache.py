@@ -0,0 +1,292 @@
+"""Content-addressed cache for generated preview / theme images.
+
+The image prompts are deterministic: the same recipe steps, character theme
+and hair settings always build the same prompt. Images are therefore cached
+by sha256(model + prompt). The index maps that key to the blob uploaded on
+the first generation, so a hit skips the image model call.
+
+The key is shared across users, but a blob is not: every recipe or theme
+owns its image under its user's path (``<user>/<doc id>-<key prefix>.webp``).
+On a hit the indexed blob is copied server-side into the requesting doc's
+path with copy_cached_image(), which costs neither a generation nor an
+upload. After a doc is linked to a new image, delete_superseded_images()
+removes that doc's earlier blobs, so regenerated previews leave no orphans.
+An index entry whose blob was deleted that way is stale: the copy finds
+nothing and the caller regenerates, which re-indexes the key.
+
+generate_cached_image() is the whole flow shared by the preview and theme
+tools: cache lookup, copy into the doc's path, otherwise generation through
+the image scheduler, upload and indexing. The tools supply only the
+blocking store / reuse callables that know their blob paths and docs.
+
+Configuration (environment):
+  IMAGE_CACHE_BACKEND  "gcs" (default), "local" or "none"
+  IMAGE_CACHE_PREFIX   Object prefix for the GCS index (default image-cache/)
+  IMAGE_CACHE_DIR      Directory for the local backend (default .image_cache)
+  IMAGE_GEN_COST_USD   Cost of one image generation, for the spend metric (default 0.039)
+  SIMULATOR_MODEL      Image generation model (default gemini-2.5-flash-image)
+  SIMULATOR_LOCATION   Vertex AI location for the image model (default us-central1)
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Protocol
+
+from google.api_core.exceptions import NotFound
+from google.cloud import storage
+from google.genai import types
+
+from ..genai_clients import get_genai_client
+from ..image_scheduler import ImageRateLimited, ImageSchedulerBusy, get_image_scheduler
+from ..io_executor import run_blocking
+
+logger = logging.getLogger(__name__)
+
+IMAGE_GEN_COST_USD = float(os.environ.get("IMAGE_GEN_COST_USD", "0.039"))
+
+
+def image_cache_key(prompt: str, model: str) -> str:
+    """Hex sha256 of the model name and the final prompt."""
+    digest = hashlib.sha256()
+    digest.update(model.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(prompt.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ImageIndexBackend(Protocol):
+    def get(self, key: str) -> dict | None: ...
+
+    def put(self, key: str, entry: dict) -> None: ...
+
+
+class GCSImageIndex:
+    """One small JSON object per key under a prefix of the preview bucket."""
+
+    def __init__(self, bucket_name: str, prefix: str = "image-cache/"):
+        self.bucket_name = bucket_name
+        self.prefix = prefix
+        self._client: storage.Client | None = None
+
+    def _bucket(self) -> storage.Bucket:
+        if self._client is None:
+            self._client = storage.Client()
+        return self._client.bucket(self.bucket_name)
+
+    def get(self, key: str) -> dict | None:
+        blob = self._bucket().blob(f"{self.prefix}{key}.json")
+        try:
+            return json.loads(blob.download_as_bytes())
+        except NotFound:
+            return None
+
+    def put(self, key: str, entry: dict) -> None:
+        blob = self._bucket().blob(f"{self.prefix}{key}.json")
+        blob.upload_from_string(json.dumps(entry), content_type="application/json")
+
+
+class LocalImageIndex:
+    """Filesystem index (tests / local development)."""
+
+    def __init__(self, directory: str | Path):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def get(self, key: str) -> dict | None:
+        path = self.directory / f"{key}.json"
+        if not path.exists():
+            return None
+        return json.loads(path.read_text())
+
+    def put(self, key: str, entry: dict) -> None:
+        (self.directory / f"{key}.json").write_text(json.dumps(entry))
+
+
+class GeneratedImageCache:
+    """Prompt-keyed image URL cache with hit/miss counters.
+
+    Index failures are logged and treated as misses; the cache never makes
+    image generation fail.
+    """
+
+    def __init__(self, backend: ImageIndexBackend | None):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def lookup(self, key: str) -> dict | None:
+        """Return the index entry (image_url, blob_path) for key (blocking I/O)."""
+        if self.backend is None:
+            return None
+        try:
+            entry = self.backend.get(key)
+        except Exception as e:
+            logger.warning("Image cache read failed: %s", e)
+            entry = None
+        # Entries without a blob path cannot be copied for another doc
+        if not entry or not entry.get("blob_path"):
+            entry = None
+        with self._lock:
+            if entry:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return entry
+
+    def mark_stale(self) -> None:
+        """Count a hit whose blob was gone as a miss."""
+        with self._lock:
+            self.hits -= 1
+            self.misses += 1
+
+    def store(self, key: str, image_url: str, blob_path: str, model: str) -> None:
+        """Index a freshly generated image (blocking I/O)."""
+        if self.backend is None:
+            return
+        try:
+            self.backend.put(key, {
+                "image_url": image_url, "blob_path": blob_path, "model": model, "created_at": time.time(),
+            })
+        except Exception as e:
+            logger.warning("Image cache write failed: %s", e)
+
+    def stats(self) -> dict:
+        """Counters for monitoring — each hit is one image generation avoided."""
+        total = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__ if self.backend else "disabled",
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "spend_avoided_usd": round(self.hits * IMAGE_GEN_COST_USD, 3),
+        }
+
+
+def copy_cached_image(bucket: storage.Bucket, source_path: str, dest_path: str) -> str | None:
+    """Copy a cached blob to dest_path and return its URL, or None if it is gone."""
+    if source_path == dest_path:
+        blob = bucket.blob(dest_path)
+        return blob.public_url if blob.exists() else None
+    try:
+        return bucket.copy_blob(bucket.blob(source_path), bucket, dest_path).public_url
+    except NotFound:
+        return None
+
+
+def delete_superseded_images(bucket: storage.Bucket, owner_path: str, keep_path: str) -> None:
+    """Delete the images of one doc (``<owner_path>-*.webp`` or ``<owner_path>.webp``) except keep_path.
+
+    Failures are logged; a leftover blob never fails the generation.
+    """
+    try:
+        for blob in bucket.list_blobs(prefix=owner_path):
+            rest = blob.name[len(owner_path):]
+            if blob.name == keep_path or not (rest == ".webp" or (rest.startswith("-") and rest.endswith(".webp"))):
+                continue
+            try:
+                blob.delete()
+            except NotFound:
+                pass
+    except Exception as e:
+        logger.warning("Failed to delete superseded images under %s: %s", owner_path, e)
+
+
+def _create_backend() -> ImageIndexBackend | None:
+    kind = os.environ.get("IMAGE_CACHE_BACKEND", "gcs").lower()
+    if kind == "none":
+        return None
+    if kind == "local":
+        return LocalImageIndex(os.environ.get("IMAGE_CACHE_DIR", ".image_cache"))
+    return GCSImageIndex(
+        os.environ.get("GCS_PREVIEW_BUCKET", "alcheme-previews"),
+        os.environ.get("IMAGE_CACHE_PREFIX", "image-cache/"),
+    )
+
+
+_cache: GeneratedImageCache | None = None
+
+
+def get_image_cache() -> GeneratedImageCache:
+    global _cache
+    if _cache is None:
+        _cache = GeneratedImageCache(_create_backend())
+    return _cache
+
+
+async def generate_cached_image(
+    prompt: str,
+    *,
+    priority: int,
+    store: Callable[[bytes, str], tuple[str, str]],
+    reuse: Callable[[str, str], str | None],
+    label: str,
+) -> dict[str, Any]:
+    """Serve an image for prompt from the cache, or generate, store and index it.
+
+    Args:
+        prompt: Final image prompt (with the model, the cache key).
+        priority: Image scheduler priority class.
+        store: Blocking (image_data, cache_key) -> (image_url, blob_path);
+            uploads the image and links it from the doc.
+        reuse: Blocking (cache_key, cached_blob_path) -> image_url, or None
+            when the cached blob is gone; copies it for the doc and links it.
+        label: What is being generated, for log lines.
+
+    Returns:
+        Dict with 'status', 'image_url', and optionally 'error'.
+    """
+    model_name = os.environ.get("SIMULATOR_MODEL", "gemini-2.5-flash-image")
+    # Image generation models may only be available in us-central1 on Vertex AI
+    image_location = os.environ.get("SIMULATOR_LOCATION", "us-central1")
+
+    # Same prompt + model → reuse the image generated earlier
+    image_cache = get_image_cache()
+    cache_key = image_cache_key(prompt, model_name)
+    cached = await run_blocking(image_cache.lookup, cache_key)
+    if cached:
+        cached_url = await run_blocking(reuse, cache_key, cached["blob_path"])
+        if cached_url:
+            logger.info("Image cache hit for %s: %s", label, cached_url)
+            return {"status": "success", "image_url": cached_url}
+        image_cache.mark_stale()
+
+    logger.info("Generating %s (model=%s, location=%s)", label, model_name, image_location)
+
+    # The shared scheduler enforces the image quota and retries 429s
+    client = get_genai_client(image_location)
+    try:
+        response = await get_image_scheduler().generate(
+            lambda: client.aio.models.generate_content(
+                model=model_name,
+                contents=prompt,
+                config=types.GenerateContentConfig(
+                    response_modalities=["IMAGE", "TEXT"],
+                ),
+            ),
+            priority=priority,
+        )
+    except (ImageSchedulerBusy, ImageRateLimited) as e:
+        logger.warning("%s not generated: %s", label, e)
+        return {"status": "error", "error": str(e)}
+
+    image_data: bytes | None = None
+    if response.candidates:
+        for part in response.candidates[0].content.parts:
+            if part.inline_data and part.inline_data.mime_type.startswith("image/"):
+                image_data = part.inline_data.data
+                break
+
+    if not image_data:
+        return {"status": "error", "error": "No image generated by model"}
+
+    image_url, blob_path = await run_blocking(store, image_data, cache_key)
+    await run_blocking(image_cache.store, cache_key, image_url, blob_path, model_name)
+
+    logger.info("Image saved for %s: %s", label, image_url)
+    return {"status": "success", "image_url": image_url}
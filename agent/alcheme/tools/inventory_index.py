@@ -0,0 +1,131 @@
+"""In-process inverted index for inventory search.
+
+Indexes brand, product_name, color_code, color_name and color_description of
+enriched inventory items with character unigrams + bigrams so that kana/kanji
+queries (which have no word boundaries) can be looked up without scanning
+every item. Postings only narrow the candidate set; every candidate is then
+verified with a substring check, so results match the plain linear scan.
+"""
+
+import unicodedata
+
+# Searchable fields and their ranking weight
+SEARCH_FIELDS: dict[str, float] = {
+    "brand": 3.0,
+    "product_name": 3.0,
+    "color_code": 2.0,
+    "color_name": 2.0,
+    "color_description": 1.0,
+}
+
+_EXACT_BONUS = 2.0
+_PREFIX_BONUS = 1.0
+
+
+def normalize_text(text: str | None) -> str:
+    """NFKC-normalize and lowercase (full-width ASCII, half-width kana, etc.)."""
+    if not text:
+        return ""
+    return unicodedata.normalize("NFKC", str(text)).lower()
+
+
+def ngrams(text: str) -> set[str]:
+    """Return character unigrams and bigrams of already-normalized text.
+
+    Whitespace is not indexed; bigrams never span a space.
+    """
+    grams: set[str] = set()
+    for word in text.split():
+        grams.update(word)
+        grams.update(word[i:i + 2] for i in range(len(word) - 1))
+    return grams
+
+
+def _query_grams(term: str) -> set[str]:
+    """Smallest gram set whose postings must all contain a match for term."""
+    if len(term) == 1:
+        return {term}
+    return {term[i:i + 2] for i in range(len(term) - 1)}
+
+
+class InventorySearchIndex:
+    """Inverted index over a list of enriched inventory items.
+
+    Items are referenced by position in insertion order, so the index can be
+    extended with add() as new items are registered.
+    """
+
+    def __init__(self, items: list[dict] | None = None):
+        self._items: list[dict] = []
+        self._fields: list[dict[str, str]] = []
+        self._postings: dict[str, set[int]] = {}
+        for item in items or []:
+            self.add(item)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def add(self, item: dict) -> None:
+        """Index a single item."""
+        pos = len(self._items)
+        fields = {f: normalize_text(item.get(f)) for f in SEARCH_FIELDS}
+        self._items.append(item)
+        self._fields.append(fields)
+        grams: set[str] = set()
+        for text in fields.values():
+            grams |= ngrams(text)
+        for gram in grams:
+            self._postings.setdefault(gram, set()).add(pos)
+
+    def _score(self, pos: int, terms: list[str]) -> float:
+        """Score an item; 0 means at least one term matched no field."""
+        fields = self._fields[pos]
+        total = 0.0
+        for term in terms:
+            best = 0.0
+            for field, weight in SEARCH_FIELDS.items():
+                text = fields[field]
+                if term not in text:
+                    continue
+                score = weight
+                if text == term:
+                    score += _EXACT_BONUS
+                elif text.startswith(term):
+                    score += _PREFIX_BONUS
+                best = max(best, score)
+            if best == 0.0:
+                return 0.0
+            total += best
+        return total
+
+    def search(self, query: str) -> list[dict]:
+        """Return items matching every whitespace-separated term, best first.
+
+        A term matches an item if it is a substring of any indexed field.
+        Ties keep insertion order.
+        """
+        terms = normalize_text(query).split()
+        if not terms:
+            return []
+
+        candidates: set[int] | None = None
+        # Intersect the rarest postings first to keep the candidate set small
+        grams = sorted(
+            {g for t in terms for g in _query_grams(t)},
+            key=lambda g: len(self._postings.get(g, ())),
+        )
+        for gram in grams:
+            posting = self._postings.get(gram)
+            if not posting:
+                return []
+            candidates = set(posting) if candidates is None else candidates & posting
+            if not candidates:
+                return []
+
+        scored = []
+        for pos in candidates or ():
+            score = self._score(pos, terms)
+            if score > 0:
+                scored.append((-score, pos))
+        scored.sort()
+        return [self._items[pos] for _, pos in scored]
@@ -11,12 +11,19 @@ Data model:
 """
 
 import json
+import logging
+import threading
 import uuid
+from collections import OrderedDict
 from typing import Any
 
 from google.adk.tools import ToolContext
 from google.cloud import firestore
 
+from .inventory_index import InventorySearchIndex
+
+logger = logging.getLogger(__name__)
+
 _db: firestore.Client | None = None
 
 
@@ -69,30 +76,182 @@ def _get_enriched_items(user_id: str) -> list[dict]:
     products_docs = list(_products_ref(user_id).stream())
     inventory_docs = list(_inventory_ref(user_id).stream())
 
+    product_map: dict[str, dict] = {doc.id: doc.to_dict() for doc in products_docs}
+    return [_join_item(doc.id, doc.to_dict(), product_map) for doc in inventory_docs]
+
+
+def _join_item(item_id: str, data: dict, product_map: dict[str, dict]) -> dict:
+    """Merge an inventory instance with its product master."""
+    if data.get("product_id") and data["product_id"] in product_map:
+        product = product_map[data["product_id"]]
+        return {
+            "id": item_id,
+            "product_id": data["product_id"],
+            **{k: v for k, v in product.items() if k != "id"},
+            "estimated_remaining": data.get("estimated_remaining", "100%"),
+            "purchase_date": data.get("purchase_date"),
+            "open_date": data.get("open_date"),
+            "memo": data.get("memo"),
+        }
+    # Legacy item (not yet migrated)
+    return data | {"id": item_id}
+
+
+def get_items_by_ids(user_id: str, item_ids: list[str]) -> dict[str, dict]:
+    """Fetch specific inventory items joined with product data in two round trips.
+
+    All inventory docs are read with one batched get_all, then every
+    referenced product doc with a second one. Unknown IDs are absent from the
+    result; the result follows the order of item_ids.
+    """
+    ids = list(dict.fromkeys(i for i in item_ids if i))
+    if not ids:
+        return {}
+    db = _get_db()
+    inventory_ref = _inventory_ref(user_id)
+    inventory = {
+        doc.id: doc.to_dict() or {}
+        for doc in db.get_all([inventory_ref.document(i) for i in ids])
+        if doc.exists
+    }
+    product_ids = list(dict.fromkeys(d["product_id"] for d in inventory.values() if d.get("product_id")))
     product_map: dict[str, dict] = {}
-    for doc in products_docs:
-        product_map[doc.id] = doc.to_dict() | {"id": doc.id}
-
-    items = []
-    for doc in inventory_docs:
-        data = doc.to_dict()
-        if data.get("product_id") and data["product_id"] in product_map:
-            product = product_map[data["product_id"]]
-            enriched = {
-                "id": doc.id,
-                "product_id": data["product_id"],
-                **{k: v for k, v in product.items() if k != "id"},
-                "estimated_remaining": data.get("estimated_remaining", "100%"),
-                "purchase_date": data.get("purchase_date"),
-                "open_date": data.get("open_date"),
-                "memo": data.get("memo"),
-            }
-            items.append(enriched)
-        else:
-            # Legacy item (not yet migrated)
-            items.append(data | {"id": doc.id})
+    if product_ids:
+        products_ref = _products_ref(user_id)
+        product_map = {
+            doc.id: doc.to_dict() or {}
+            for doc in db.get_all([products_ref.document(p) for p in product_ids])
+            if doc.exists
+        }
+    return {i: _join_item(i, inventory[i], product_map) for i in ids if i in inventory}
+
+
+# ---------------------------------------------------------------------------
+# Per-turn enriched-inventory snapshot cache
+# ---------------------------------------------------------------------------
+# One /chat turn often calls several inventory tools back to back (concierge →
+# alchemist). The products/inventory join is done once per turn and shared by
+# all tools. Entries are keyed on user:id and are only reused within the same
+# invocation and while the user's inventory version is unchanged; writes made
+# through add_items_to_inventory bump the version (and patch the snapshot in
+# place when it is still current). _snapshot_lock only guards the cache and
+# version maps; the join and the search index build run outside it, so a large
+# inventory never holds up other users' tools.
+_SNAPSHOT_CACHE_MAX = 256
+
+
+class _Snapshot:
+    __slots__ = ("turn_id", "version", "items", "index", "index_lock")
+
+    def __init__(self, turn_id: str, version: int, items: list[dict]):
+        self.turn_id = turn_id
+        self.version = version
+        self.items = items
+        self.index: InventorySearchIndex | None = None
+        # Single-flight for the index build of this snapshot
+        self.index_lock = threading.Lock()
+
 
-    return items
+_snapshot_cache: OrderedDict[str, _Snapshot] = OrderedDict()
+_inventory_versions: dict[str, int] = {}
+_snapshot_lock = threading.Lock()
+
+
+def _turn_id(tool_context: ToolContext) -> str | None:
+    return getattr(tool_context, "invocation_id", None)
+
+
+def _bump_inventory_version(user_id: str, added: list[dict] | None = None) -> int:
+    """Record an inventory write for the user.
+
+    If `added` holds the enriched form of the new items and the cached
+    snapshot is still current, the snapshot and its search index are updated
+    incrementally; otherwise the snapshot is dropped.
+    """
+    with _snapshot_lock:
+        current = _inventory_versions.get(user_id, 0)
+        version = current + 1
+        _inventory_versions[user_id] = version
+        entry = _snapshot_cache.get(user_id)
+        if entry is None:
+            return version
+        if added is None or entry.version != current:
+            del _snapshot_cache[user_id]
+            return version
+        # Copy so lists already handed out to callers stay unchanged
+        entry.items = entry.items + added
+        if entry.index is not None:
+            for item in added:
+                entry.index.add(item)
+        entry.version = version
+        return version
+
+
+def _get_cached_snapshot(user_id: str, turn_id: str | None) -> _Snapshot | None:
+    """Return the cached snapshot if it belongs to this turn and version."""
+    if turn_id is None:
+        return None
+    with _snapshot_lock:
+        entry = _snapshot_cache.get(user_id)
+        if entry is None:
+            return None
+        if entry.turn_id != turn_id or entry.version != _inventory_versions.get(user_id, 0):
+            del _snapshot_cache[user_id]
+            return None
+        _snapshot_cache.move_to_end(user_id)
+        return entry
+
+
+def _set_snapshot(user_id: str, entry: _Snapshot) -> None:
+    if entry.turn_id is None:
+        return
+    with _snapshot_lock:
+        # A write landed while we were reading — don't cache a stale join.
+        if entry.version != _inventory_versions.get(user_id, 0):
+            return
+        _snapshot_cache[user_id] = entry
+        _snapshot_cache.move_to_end(user_id)
+        while len(_snapshot_cache) > _SNAPSHOT_CACHE_MAX:
+            _snapshot_cache.popitem(last=False)
+
+
+def _load_snapshot(tool_context: ToolContext) -> _Snapshot:
+    user_id = _resolve_user_id(tool_context)
+    turn_id = _turn_id(tool_context)
+    cached = _get_cached_snapshot(user_id, turn_id)
+    if cached is not None:
+        return cached
+    entry = _Snapshot(turn_id, _inventory_versions.get(user_id, 0), _get_enriched_items(user_id))
+    _set_snapshot(user_id, entry)
+    return entry
+
+
+def _get_inventory_snapshot(tool_context: ToolContext) -> list[dict]:
+    """Return enriched items for the current user, joining at most once per turn.
+
+    The returned list is shared between tools in the same turn — treat it as
+    read-only.
+    """
+    return _load_snapshot(tool_context).items
+
+
+def _get_search_index(tool_context: ToolContext) -> InventorySearchIndex:
+    """Return the search index for the current snapshot, building it on first use."""
+    entry = _load_snapshot(tool_context)
+    if entry.index is not None:
+        return entry.index
+    with entry.index_lock:
+        if entry.index is not None:
+            return entry.index
+        with _snapshot_lock:
+            items = entry.items
+        index = InventorySearchIndex(items)
+        with _snapshot_lock:
+            # Items added while the index was built are appended to entry.items
+            for item in entry.items[len(items):]:
+                index.add(item)
+            entry.index = index
+        return index
 
 
 def generate_item_id() -> str:
@@ -107,8 +266,7 @@ def generate_item_id() -> str:
 def get_inventory_summary(tool_context: ToolContext) -> dict:
     """Get a summary of the user's cosmetics inventory including category counts and total items."""
     try:
-        user_id = _resolve_user_id(tool_context)
-        items = _get_enriched_items(user_id)
+        items = _get_inventory_snapshot(tool_context)
 
         categories: dict[str, int] = {}
         item_summaries: list[str] = []
@@ -141,22 +299,14 @@ def get_inventory_summary(tool_context: ToolContext) -> dict:
 def search_inventory(query: str, tool_context: ToolContext) -> dict:
     """Search inventory items by brand name, product name, color code, or color name.
 
+    Results are ranked with the best matches (brand / product name) first.
+
     Args:
         query: Search keyword to match against brand, product_name, color_code, color_name, or color_description.
     """
     try:
-        user_id = _resolve_user_id(tool_context)
-        items = _get_enriched_items(user_id)
-        results = []
-        q_lower = query.lower()
-        for item in items:
-            brand = (item.get("brand") or "").lower()
-            name = (item.get("product_name") or "").lower()
-            color = (item.get("color_description") or "").lower()
-            color_code = (item.get("color_code") or "").lower()
-            color_name = (item.get("color_name") or "").lower()
-            if q_lower in brand or q_lower in name or q_lower in color or q_lower in color_code or q_lower in color_name:
-                results.append(_slim_item(item))
+        index = _get_search_index(tool_context)
+        results = [_slim_item(item) for item in index.search(query)]
         return {"status": "success", "items": results, "count": len(results)}
     except Exception as e:
         return {"status": "error", "message": str(e)}
@@ -169,8 +319,7 @@ def filter_inventory_by_category(category: str, tool_context: ToolContext) -> di
         category: Category to filter by — one of ベースメイク, アイメイク, リップ, スキンケア, その他.
     """
     try:
-        user_id = _resolve_user_id(tool_context)
-        items = _get_enriched_items(user_id)
+        items = _get_inventory_snapshot(tool_context)
         filtered = [_slim_item(item) for item in items if item.get("category") == category]
         return {"status": "success", "items": filtered, "count": len(filtered)}
     except Exception as e:
@@ -194,11 +343,16 @@ def add_items_to_inventory(items_json: str, tool_context: ToolContext) -> dict:
         inventory_ref = _inventory_ref(user_id)
 
         # Load existing products for dedupe
-        existing = {_dedupe_key(d.get("brand", ""), d.get("product_name", ""), d.get("color_code")): doc.id
-                    for doc in products_ref.stream()
-                    for d in [doc.to_dict()]}
-
-        added_ids = []
+        existing: dict[str, str] = {}
+        product_data: dict[str, dict] = {}
+        for doc in products_ref.stream():
+            d = doc.to_dict()
+            existing[_dedupe_key(d.get("brand", ""), d.get("product_name", ""), d.get("color_code"))] = doc.id
+            product_data[doc.id] = d
+
+        # Resolve each item to an existing or new product
+        resolved: list[tuple[str, dict]] = []
+        new_products: dict[str, tuple[Any, dict]] = {}
         for item in items:
             item.pop("id", None)
 
@@ -218,31 +372,56 @@ def add_items_to_inventory(items_json: str, tool_context: ToolContext) -> dict:
                 product_doc = products_ref.document()
                 product_fields["created_at"] = firestore.SERVER_TIMESTAMP
                 product_fields["updated_at"] = firestore.SERVER_TIMESTAMP
-                # Upsert to global catalog (best-effort)
-                try:
-                    from .catalog_tools import upsert_catalog
-                    catalog_id = upsert_catalog(product_fields)
+                product_id = product_doc.id
+                existing[key] = product_id
+                product_data[product_id] = product_fields
+                new_products[product_id] = (product_doc, product_fields)
+            resolved.append((product_id, instance_fields))
+
+        # Upsert all new products to the global catalog in one commit (best-effort)
+        if new_products:
+            try:
+                from .catalog_tools import upsert_catalog_many
+                fields = [product_fields for _, product_fields in new_products.values()]
+                for product_fields, catalog_id in zip(fields, upsert_catalog_many(fields)):
                     if catalog_id:
                         product_fields["catalog_id"] = catalog_id
-                except Exception:
-                    pass  # Catalog failure should not block inventory registration
+            except Exception as e:
+                # Catalog failure should not block inventory registration
+                logger.warning("Catalog upsert failed for user %s: %s", user_id, e)
+            for product_doc, product_fields in new_products.values():
                 product_doc.set(product_fields)
-                product_id = product_doc.id
-                existing[key] = product_id
 
+        added_ids = []
+        for product_id, instance_fields in resolved:
             # Create inventory instance
             inv_doc = inventory_ref.document()
-            inv_doc.set({
-                "product_id": product_id,
+            instance = {
                 "estimated_remaining": instance_fields.get("estimated_remaining", "100%"),
                 "purchase_date": instance_fields.get("purchase_date"),
                 "open_date": instance_fields.get("open_date"),
                 "memo": instance_fields.get("memo"),
+            }
+            inv_doc.set({
+                "product_id": product_id,
+                **instance,
                 "created_at": firestore.SERVER_TIMESTAMP,
                 "updated_at": firestore.SERVER_TIMESTAMP,
             })
             added_ids.append(inv_doc.id)
 
+            # Same shape as _get_enriched_items, minus unresolved server timestamps
+            enriched = {
+                "id": inv_doc.id,
+                "product_id": product_id,
+                **{
+                    k: v for k, v in product_data[product_id].items()
+                    if k != "id" and v is not firestore.SERVER_TIMESTAMP
+                },
+                **instance,
+            }
+            _bump_inventory_version(user_id, added=[enriched])
+
         return {"status": "success", "added_ids": added_ids}
     except Exception as e:
         return {"status": "error", "message": str(e)}
@@ -251,16 +430,22 @@ def add_items_to_inventory(items_json: str, tool_context: ToolContext) -> dict:
 def get_inventory(tool_context: ToolContext) -> dict:
     """Get the full inventory for the current user as a list of items (enriched with product data)."""
     try:
-        user_id = _resolve_user_id(tool_context)
-        items = _get_enriched_items(user_id)
+        items = _get_inventory_snapshot(tool_context)
         return {"status": "success", "items": [_slim_item(i) for i in items]}
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
 
+# Item fields returned by validate_recipe_items so the agent can name items
+_VALIDATION_FIELDS = ("brand", "product_name", "category", "item_type", "color_code", "color_name", "texture")
+
+
 def validate_recipe_items(item_ids_json: str, tool_context: ToolContext) -> dict:
     """Validate that all item IDs in a recipe exist in the user's inventory.
 
+    Also returns brand, product name, category and color for every valid item,
+    so no separate search is needed to describe them.
+
     Args:
         item_ids_json: A JSON string representing a list of item ID strings to validate.
     """
@@ -270,17 +455,23 @@ def validate_recipe_items(item_ids_json: str, tool_context: ToolContext) -> dict
         if not isinstance(item_ids, list):
             return {"status": "error", "message": "item_ids_json must be a JSON array of strings"}
 
-        ref = _inventory_ref(user_id)
-        missing = []
-        for item_id in item_ids:
-            doc = ref.document(item_id).get()
-            if not doc.exists:
-                missing.append(item_id)
+        # A snapshot already loaded this turn answers without any Firestore read
+        snapshot = _get_cached_snapshot(user_id, _turn_id(tool_context))
+        if snapshot is not None:
+            by_id = {item["id"]: item for item in snapshot.items}
+            found = {i: by_id[i] for i in item_ids if i in by_id}
+        else:
+            found = get_items_by_ids(user_id, item_ids)
 
+        missing = [i for i in item_ids if i not in found]
         return {
             "status": "success",
             "all_valid": len(missing) == 0,
             "missing_items": missing,
+            "items": {
+                item_id: {k: item[k] for k in _VALIDATION_FIELDS if item.get(k)}
+                for item_id, item in found.items()
+            },
         }
     except Exception as e:
         return {"status": "error", "message": str(e)}
@@ -13,6 +13,8 @@ from typing import Any
 from google.adk.tools import ToolContext
 from google.cloud import firestore
 
+from ..profile_cache import invalidate_user_profile
+
 logger = logging.getLogger(__name__)
 
 _db: firestore.Client | None = None
@@ -214,6 +216,7 @@ def analyze_preference_history(tool_context: ToolContext) -> dict:
             _get_db().collection("users").document(user_id).update(
                 {"preferences": prefs}
             )
+            invalidate_user_profile(user_id)
             logger.info("Persisted profiler preferences for user %s", user_id)
         except Exception as e:
             logger.warning("Failed to persist preferences for %s: %s", user_id, e)
@@ -8,10 +8,15 @@ import re
 
 from urllib.parse import urlparse
 
+import httpx
 import requests
 
+from ..http_client import async_get, get_http_session
+from .rakuten_cache import get_rakuten_cache
+
 RAKUTEN_API_URL = "https://openapi.rakuten.co.jp/ichibams/api/IchibaItem/Search/20220601"
 _DEFAULT_REFERER = "https://alcheme-web-x3hwwomrxa-an.a.run.app/"
+_HITS = 5
 
 # Regex patterns to extract color code and name from Rakuten product titles
 # e.g. "リップモンスター 03 陽炎" → code="03", name="陽炎"
@@ -35,6 +40,55 @@ def _extract_color_info(product_name: str) -> dict:
     return {}
 
 
+def _build_request(app_id: str, access_key: str, keyword: str) -> tuple[dict, dict]:
+    """Return (params, headers) for an Ichiba item search."""
+    params = {
+        "applicationId": app_id,
+        "accessKey": access_key,
+        "keyword": keyword,
+        "hits": _HITS,
+        "sort": "standard",
+        "format": "json",
+        "formatVersion": "2",
+        "imageFlag": 1,
+    }
+    referer = os.environ.get("RAKUTEN_REFERER_URL", _DEFAULT_REFERER)
+    parsed = urlparse(referer)
+    headers = {
+        "Referer": referer,
+        "Origin": f"{parsed.scheme}://{parsed.netloc}",
+    }
+    return params, headers
+
+
+def _parse_items(data: dict) -> list[dict]:
+    """Convert a formatVersion=2 response into result dicts."""
+    results = []
+    for item in data.get("Items", []):
+        name = item.get("itemName", "")
+        images = item.get("mediumImageUrls", [])
+        color_info = _extract_color_info(name)
+        results.append({
+            "name": name,
+            "price": item.get("itemPrice", 0),
+            "url": item.get("itemUrl", ""),
+            "shop": item.get("shopName", ""),
+            "image_url": images[0] if images else "",
+            "review_count": item.get("reviewCount", 0),
+            "review_average": item.get("reviewAverage", 0),
+            **color_info,
+        })
+    return results
+
+
+def _candidate_keyword(brand: str, product_name: str, color_hint: str = "") -> str:
+    # Build keyword — brand + product_name, optionally color
+    keyword = f"{brand} {product_name}"
+    if color_hint:
+        keyword += f" {color_hint}"
+    return keyword
+
+
 def search_rakuten_api(keyword: str) -> dict:
     """Search for cosmetic products on Rakuten Ichiba by keyword.
 
@@ -49,56 +103,31 @@ def search_rakuten_api(keyword: str) -> dict:
     if not app_id or not access_key:
         return {"status": "error", "message": "RAKUTEN_APP_ID and RAKUTEN_ACCESS_KEY must be configured"}
 
+    cache = get_rakuten_cache()
+    cached = cache.get(keyword, _HITS)
+    if cached is not None:
+        return {"status": "success", "results": cached, "count": len(cached)}
+
     try:
-        params = {
-            "applicationId": app_id,
-            "accessKey": access_key,
-            "keyword": keyword,
-            "hits": 5,
-            "sort": "standard",
-            "format": "json",
-            "formatVersion": "2",
-            "imageFlag": 1,
-        }
-        referer = os.environ.get("RAKUTEN_REFERER_URL", _DEFAULT_REFERER)
-        parsed = urlparse(referer)
-        headers = {
-            "Referer": referer,
-            "Origin": f"{parsed.scheme}://{parsed.netloc}",
-        }
-        resp = requests.get(RAKUTEN_API_URL, params=params, headers=headers, timeout=10)
+        params, headers = _build_request(app_id, access_key, keyword)
+        resp = get_http_session().get(RAKUTEN_API_URL, params=params, headers=headers, timeout=10)
         resp.raise_for_status()
-        data = resp.json()
-
-        results = []
-        for item in data.get("Items", []):
-            name = item.get("itemName", "")
-            images = item.get("mediumImageUrls", [])
-            color_info = _extract_color_info(name)
-            results.append({
-                "name": name,
-                "price": item.get("itemPrice", 0),
-                "url": item.get("itemUrl", ""),
-                "shop": item.get("shopName", ""),
-                "image_url": images[0] if images else "",
-                "review_count": item.get("reviewCount", 0),
-                "review_average": item.get("reviewAverage", 0),
-                **color_info,
-            })
-
+        results = _parse_items(resp.json())
+        cache.set(keyword, _HITS, results)
         return {"status": "success", "results": results, "count": len(results)}
     except requests.RequestException as e:
         return {"status": "error", "message": str(e)}
 
 
-def search_rakuten_for_candidates(
+async def search_rakuten_for_candidates_async(
     brand: str,
     product_name: str,
     color_hint: str = "",
 ) -> dict:
     """Search Rakuten for product candidates matching brand + product name.
 
-    Used as a server-side fallback when the agent doesn't call search_rakuten_api.
+    Used by /scan as a server-side fallback when the agent doesn't call
+    search_rakuten_api. Requests go through the shared async HTTP client.
 
     Args:
         brand: Brand name (e.g. "KATE")
@@ -113,48 +142,18 @@ def search_rakuten_for_candidates(
     if not app_id or not access_key:
         return {"candidates": []}
 
-    # Build keyword — brand + product_name, optionally color
-    keyword = f"{brand} {product_name}"
-    if color_hint:
-        keyword += f" {color_hint}"
+    keyword = _candidate_keyword(brand, product_name, color_hint)
+    cache = get_rakuten_cache()
+    cached = await cache.get_async(keyword, _HITS)
+    if cached is not None:
+        return {"candidates": cached, "count": len(cached)}
 
     try:
-        params = {
-            "applicationId": app_id,
-            "accessKey": access_key,
-            "keyword": keyword,
-            "hits": 5,
-            "sort": "standard",
-            "format": "json",
-            "formatVersion": "2",
-            "imageFlag": 1,
-        }
-        referer = os.environ.get("RAKUTEN_REFERER_URL", _DEFAULT_REFERER)
-        parsed = urlparse(referer)
-        headers = {
-            "Referer": referer,
-            "Origin": f"{parsed.scheme}://{parsed.netloc}",
-        }
-        resp = requests.get(RAKUTEN_API_URL, params=params, headers=headers, timeout=10)
+        params, headers = _build_request(app_id, access_key, keyword)
+        resp = await async_get(RAKUTEN_API_URL, params=params, headers=headers)
         resp.raise_for_status()
-        data = resp.json()
-
-        candidates = []
-        for item in data.get("Items", []):
-            name = item.get("itemName", "")
-            images = item.get("mediumImageUrls", [])
-            color_info = _extract_color_info(name)
-            candidates.append({
-                "name": name,
-                "price": item.get("itemPrice", 0),
-                "url": item.get("itemUrl", ""),
-                "shop": item.get("shopName", ""),
-                "image_url": images[0] if images else "",
-                "review_count": item.get("reviewCount", 0),
-                "review_average": item.get("reviewAverage", 0),
-                **color_info,
-            })
-
+        candidates = _parse_items(resp.json())
+        await cache.set_async(keyword, _HITS, candidates)
         return {"candidates": candidates, "count": len(candidates)}
-    except requests.RequestException:
+    except httpx.HTTPError:
         return {"candidates": []}
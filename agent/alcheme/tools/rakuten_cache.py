@@ -0,0 +1,245 @@
+"""Shared TTL + LRU cache for Rakuten Ichiba search results.
+
+The same popular products (KATE リップモンスター, CANMAKE, ...) are searched
+constantly across users, so parsed search results are cached by normalized
+keyword + hit count.
+
+Backends with blocking I/O (sqlite) set ``blocking = True``; async callers
+go through get_async()/set_async(), which move those reads and writes onto
+the I/O pool. Values are copied in and out of the memory backend, so a
+caller that mutates its results cannot change what later callers get.
+
+Configuration (environment):
+  RAKUTEN_CACHE_BACKEND      "memory" (default), "sqlite" or "none"
+  RAKUTEN_CACHE_PATH         SQLite file for the sqlite backend (default rakuten_cache.db)
+  RAKUTEN_CACHE_TTL          Entry lifetime in seconds (default 21600 = 6h)
+  RAKUTEN_CACHE_MAX_ENTRIES  LRU size bound (default 2000)
+"""
+
+import copy
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Protocol
+
+from ..io_executor import run_blocking
+
+logger = logging.getLogger(__name__)
+
+
+def cache_key(keyword: str, hits: int) -> str:
+    """Normalize a search keyword (NFKC, lowercase, collapsed spaces)."""
+    normalized = " ".join(unicodedata.normalize("NFKC", keyword or "").lower().split())
+    return f"{hits}:{normalized}"
+
+
+class CacheBackend(Protocol):
+    blocking: bool
+
+    def get(self, key: str) -> list[dict] | None: ...
+
+    def set(self, key: str, value: list[dict]) -> None: ...
+
+    def clear(self) -> None: ...
+
+    def __len__(self) -> int: ...
+
+
+class MemoryCacheBackend:
+    """Process-local LRU with per-entry expiry."""
+
+    blocking = False
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data: OrderedDict[str, tuple[float, list[dict]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> list[dict] | None:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if time.time() >= expires_at:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+        return copy.deepcopy(value)
+
+    def set(self, key: str, value: list[dict]) -> None:
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._data[key] = (time.time() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SQLiteCacheBackend:
+    """Local SQLite store that survives process restarts."""
+
+    blocking = True
+
+    def __init__(self, path: str, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS rakuten_cache ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS rakuten_cache_last_access ON rakuten_cache (last_access)"
+        )
+        # Kept in step by the writes, so len() (stats() on /health) does no I/O
+        self._entries = self._count()
+
+    def _count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM rakuten_cache").fetchone()[0]
+
+    def get(self, key: str) -> list[dict] | None:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM rakuten_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if now >= expires_at:
+                self._conn.execute("DELETE FROM rakuten_cache WHERE key = ?", (key,))
+                self._entries -= 1
+                return None
+            self._conn.execute("UPDATE rakuten_cache SET last_access = ? WHERE key = ?", (now, key))
+        return json.loads(value)
+
+    def set(self, key: str, value: list[dict]) -> None:
+        now = time.time()
+        payload = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO rakuten_cache (key, value, expires_at, last_access)"
+                " VALUES (?, ?, ?, ?)",
+                (key, payload, now + self.ttl, now),
+            )
+            # Drop expired rows first, then least-recently-used beyond the bound
+            self._conn.execute("DELETE FROM rakuten_cache WHERE expires_at <= ?", (now,))
+            self._conn.execute(
+                "DELETE FROM rakuten_cache WHERE key IN ("
+                " SELECT key FROM rakuten_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._entries = self._count()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM rakuten_cache")
+            self._entries = 0
+
+    def __len__(self) -> int:
+        return self._entries
+
+
+class RakutenResultCache:
+    """Search-result cache with hit/miss counters."""
+
+    def __init__(self, backend: CacheBackend | None):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, keyword: str, hits: int) -> list[dict] | None:
+        if self.backend is None:
+            return None
+        try:
+            value = self.backend.get(cache_key(keyword, hits))
+        except Exception as e:
+            logger.warning("Rakuten cache read failed: %s", e)
+            value = None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, keyword: str, hits: int, results: list[dict]) -> None:
+        if self.backend is None:
+            return
+        try:
+            self.backend.set(cache_key(keyword, hits), results)
+        except Exception as e:
+            logger.warning("Rakuten cache write failed: %s", e)
+
+    async def get_async(self, keyword: str, hits: int) -> list[dict] | None:
+        """get() for the event loop: blocking backends are read on the I/O pool."""
+        if self.backend is not None and self.backend.blocking:
+            return await run_blocking(self.get, keyword, hits)
+        return self.get(keyword, hits)
+
+    async def set_async(self, keyword: str, hits: int, results: list[dict]) -> None:
+        if self.backend is not None and self.backend.blocking:
+            await run_blocking(self.set, keyword, hits, results)
+        else:
+            self.set(keyword, hits, results)
+
+    def clear(self) -> None:
+        if self.backend is not None:
+            self.backend.clear()
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        """Counters for monitoring — each hit is one Rakuten API call saved."""
+        total = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__ if self.backend else "disabled",
+            "entries": len(self.backend) if self.backend is not None else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+def _create_backend() -> CacheBackend | None:
+    kind = os.environ.get("RAKUTEN_CACHE_BACKEND", "memory").lower()
+    ttl = float(os.environ.get("RAKUTEN_CACHE_TTL", "21600"))
+    max_entries = int(os.environ.get("RAKUTEN_CACHE_MAX_ENTRIES", "2000"))
+    if kind == "none":
+        return None
+    if kind == "sqlite":
+        path = os.environ.get("RAKUTEN_CACHE_PATH", "rakuten_cache.db")
+        try:
+            return SQLiteCacheBackend(path, ttl, max_entries)
+        except sqlite3.Error as e:
+            logger.warning("Rakuten SQLite cache unavailable (%s), falling back to memory", e)
+    return MemoryCacheBackend(ttl, max_entries)
+
+
+_cache: RakutenResultCache | None = None
+
+
+def get_rakuten_cache() -> RakutenResultCache:
+    global _cache
+    if _cache is None:
+        _cache = RakutenResultCache(_create_backend())
+    return _cache
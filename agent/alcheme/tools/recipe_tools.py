@@ -11,6 +11,8 @@ from typing import Any
 from google.adk.tools import ToolContext
 from google.cloud import firestore
 
+from ..turn_checkpoint import retry_doc_id_key
+
 _db: firestore.Client | None = None
 
 
@@ -81,7 +83,9 @@ def save_recipe(recipe_json: str, tool_context: ToolContext) -> dict:
         recipe.pop("createdAt", None)
         recipe.pop("updatedAt", None)
 
-        doc_ref = _recipes_ref(user_id).document()
+        # On a retried /chat turn, overwrite the recipe the failed attempt saved
+        retry_id = tool_context.state.get(retry_doc_id_key("save_recipe"))
+        doc_ref = _recipes_ref(user_id).document(retry_id) if retry_id else _recipes_ref(user_id).document()
         doc_ref.set(recipe)
         return {"status": "success", "recipe_id": doc_ref.id}
     except Exception as e:
@@ -4,15 +4,21 @@ Uses Gemini native image generation to create makeup preview illustrations
 and uploads them to Cloud Storage.
 """
 
-import asyncio
 import logging
 import os
+from functools import partial
 from typing import Any
 
-from google import genai
 from google.cloud import firestore, storage
-from google.genai import types
 
+from ..image_scheduler import PRIORITY_PREVIEW
+from ..io_executor import run_blocking
+from ..profile_cache import get_hair_preferences
+from .image_cache import (
+    copy_cached_image,
+    delete_superseded_images,
+    generate_cached_image,
+)
 from ..prompts.simulator import build_image_prompt, DEFAULT_THEME
 
 logger = logging.getLogger(__name__)
@@ -35,11 +41,61 @@ def _get_firestore() -> firestore.Client:
     return _firestore_db
 
 
+def _link_preview_image(user_id: str, recipe_id: str, image_url: str, theme: str) -> None:
+    """Point the recipe doc at a preview image URL."""
+    _get_firestore().collection("users").document(user_id).collection(
+        "recipes"
+    ).document(recipe_id).update(
+        {
+            "preview_image_url": image_url,
+            "character_theme": theme,
+        }
+    )
+
+
+def _preview_blob_path(user_id: str, recipe_id: str, cache_key: str) -> str:
+    # The cache key is part of the path so a regenerated preview never
+    # overwrites a blob that the image cache still points to
+    return f"{user_id}/{recipe_id}-{cache_key[:16]}.webp"
+
+
+def _store_preview_image(
+    bucket_name: str, user_id: str, recipe_id: str, theme: str, image_data: bytes, cache_key: str,
+) -> tuple[str, str]:
+    """Upload the preview to GCS and link it from the recipe doc. Returns (URL, blob path)."""
+    blob_path = _preview_blob_path(user_id, recipe_id, cache_key)
+    bucket = _get_storage().bucket(bucket_name)
+    blob = bucket.blob(blob_path)
+    blob.upload_from_string(image_data, content_type="image/webp")
+    # Public access is granted via bucket-level IAM (uniform access)
+    image_url = blob.public_url
+
+    # Update Firestore recipe document with preview image URL
+    _link_preview_image(user_id, recipe_id, image_url, theme)
+    delete_superseded_images(bucket, f"{user_id}/{recipe_id}", blob_path)
+    return image_url, blob_path
+
+
+def _reuse_preview_image(
+    bucket_name: str, user_id: str, recipe_id: str, theme: str, cache_key: str, source_path: str,
+) -> str | None:
+    """Copy a cached preview into the recipe's own path and link it. None if the blob is gone."""
+    blob_path = _preview_blob_path(user_id, recipe_id, cache_key)
+    bucket = _get_storage().bucket(bucket_name)
+    image_url = copy_cached_image(bucket, source_path, blob_path)
+    if image_url is None:
+        return None
+    _link_preview_image(user_id, recipe_id, image_url, theme)
+    delete_superseded_images(bucket, f"{user_id}/{recipe_id}", blob_path)
+    return image_url
+
+
 async def generate_preview_image(
     recipe_id: str,
     user_id: str,
     steps: list[dict],
     theme: str = DEFAULT_THEME,
+    priority: int = PRIORITY_PREVIEW,
 ) -> dict[str, Any]:
     """Generate a preview image for a makeup recipe using Gemini image generation.
 
@@ -51,96 +107,29 @@ async def generate_preview_image(
         user_id: User ID for storage path and Firestore update.
         steps: Recipe steps from the Alchemist agent output.
         theme: Character theme ('cute', 'cool', 'elegant').
+        priority: Image scheduler priority class (PRIORITY_INTERACTIVE for
+            requests a user is waiting on).
 
     Returns:
         Dict with 'status', 'image_url', and optionally 'error'.
     """
     bucket_name = os.environ.get("GCS_PREVIEW_BUCKET", "alcheme-previews")
-    model_name = os.environ.get("SIMULATOR_MODEL", "gemini-2.5-flash-image")
-    # Image generation models may only be available in us-central1 on Vertex AI
-    image_location = os.environ.get("SIMULATOR_LOCATION", "us-central1")
 
     try:
         # Fetch user hair preferences from profile
-        hair_style, hair_color = None, None
-        try:
-            user_doc = _get_firestore().collection("users").document(user_id).get()
-            if user_doc.exists:
-                profile = user_doc.to_dict() or {}
-                hair_style = profile.get("hairType")
-                hair_color = profile.get("hairColor")
-        except Exception as e:
-            logger.warning("Failed to fetch user profile for hair: %s", e)
+        hair_style, hair_color = await run_blocking(get_hair_preferences, user_id)
 
         # Build the image generation prompt
         prompt = build_image_prompt(steps, theme, hair_style=hair_style, hair_color=hair_color)
-        logger.info(
-            "Generating preview image for recipe %s (theme=%s, model=%s, location=%s)",
-            recipe_id, theme, model_name, image_location,
-        )
 
-        # Call Gemini with image generation — use dedicated location for Vertex AI
-        # Retry with exponential backoff on 429 RESOURCE_EXHAUSTED
-        use_vertexai = os.environ.get("GOOGLE_GENAI_USE_VERTEXAI", "").upper() == "TRUE"
-        if use_vertexai:
-            project = os.environ.get("GOOGLE_CLOUD_PROJECT", "")
-            client = genai.Client(vertexai=True, project=project, location=image_location)
-        else:
-            client = genai.Client()
-
-        response = None
-        for attempt in range(4):
-            try:
-                response = await client.aio.models.generate_content(
-                    model=model_name,
-                    contents=prompt,
-                    config=types.GenerateContentConfig(
-                        response_modalities=["IMAGE", "TEXT"],
-                    ),
-                )
-                break
-            except Exception as retry_err:
-                if "429" in str(retry_err) or "RESOURCE_EXHAUSTED" in str(retry_err):
-                    wait = 2 ** attempt * 3  # 3s, 6s, 12s, 24s
-                    logger.warning("Gemini 429 on attempt %d, retrying in %ds...", attempt + 1, wait)
-                    await asyncio.sleep(wait)
-                else:
-                    raise
-        if response is None:
-            return {"status": "error", "error": "Gemini rate limit exceeded after retries"}
-
-        # Extract image from response
-        image_data: bytes | None = None
-        if response.candidates:
-            for part in response.candidates[0].content.parts:
-                if part.inline_data and part.inline_data.mime_type.startswith("image/"):
-                    image_data = part.inline_data.data
-                    break
-
-        if not image_data:
-            return {"status": "error", "error": "No image generated by model"}
-
-        # Upload to Cloud Storage
-        blob_path = f"{user_id}/{recipe_id}.webp"
-        bucket = _get_storage().bucket(bucket_name)
-        blob = bucket.blob(blob_path)
-        blob.upload_from_string(image_data, content_type="image/webp")
-        # Public access is granted via bucket-level IAM (uniform access)
-        image_url = blob.public_url
-
-        # Update Firestore recipe document with preview image URL
-        _get_firestore().collection("users").document(user_id).collection(
-            "recipes"
-        ).document(recipe_id).update(
-            {
-                "preview_image_url": image_url,
-                "character_theme": theme,
-            }
+        return await generate_cached_image(
+            prompt,
+            priority=priority,
+            store=partial(_store_preview_image, bucket_name, user_id, recipe_id, theme),
+            reuse=partial(_reuse_preview_image, bucket_name, user_id, recipe_id, theme),
+            label=f"preview image for recipe {recipe_id} (theme={theme})",
         )
 
-        logger.info("Preview image saved: %s", image_url)
-        return {"status": "success", "image_url": image_url}
-
     except Exception as e:
         logger.error("Preview image generation failed for recipe %s: %s", recipe_id, e, exc_info=True)
         return {"status": "error", "error": str(e)}
@@ -2,10 +2,24 @@
 
 When the alchemist suggests a plus-one item, this tool persists it to
 the user's suggested_items collection in Firestore with deduplication.
+
+Suggestions are deduplicated on brand / product name / color code. New docs
+use a doc ID derived from that key (suggestion_doc_id) and every doc carries
+the key in an indexed ``dedupe_key`` field, so an upsert is one keyed
+read-modify-write in a transaction instead of a scan of the collection.
+Docs created before this scheme are found through ``dedupe_key`` once
+scripts/migrate_suggestion_dedupe_keys.py has backfilled it.
+
+A re-recommendation increments ``recommendation_count`` and keeps only the
+latest HISTORY_LIMIT entries in the doc's ``history`` array (what the want
+list shows); every entry is also appended to the ``history`` subcollection,
+so each write costs the same no matter how often an item was suggested.
 """
 
+import hashlib
 import json
 import logging
+from datetime import datetime, timezone
 from typing import Any
 
 from google.adk.tools import ToolContext
@@ -13,6 +27,10 @@ from google.cloud import firestore
 
 logger = logging.getLogger(__name__)
 
+# Recent entries kept inline on the suggestion doc; the full log lives in
+# suggested_items/{id}/history. Mirrored in app/api/suggestions/route.ts.
+HISTORY_LIMIT = 10
+
 _db: firestore.Client | None = None
 
 
@@ -31,6 +49,50 @@ def _dedupe_key(brand: str, product_name: str, color_code: str | None = None) ->
     return f"{(brand or '').lower()}::{(product_name or '').lower()}::{(color_code or '').lower()}"
 
 
+def suggestion_doc_id(dedupe_key: str) -> str:
+    """Deterministic suggested_items doc ID for a dedupe key."""
+    return "sg_" + hashlib.sha256(dedupe_key.encode("utf-8")).hexdigest()[:32]
+
+
+@firestore.transactional
+def _upsert_suggestion(
+    transaction: firestore.Transaction,
+    col_ref: Any,
+    key: str,
+    new_doc: dict,
+    history_entry: dict,
+) -> tuple[str, bool]:
+    """Increment the suggestion for key, or create it. Returns (doc id, incremented).
+
+    history_entry is appended to the doc's capped ``history`` ring and, as
+    its own doc, to the ``history`` subcollection.
+    """
+    doc_ref = col_ref.document(suggestion_doc_id(key))
+    snapshot = doc_ref.get(transaction=transaction)
+    if not snapshot.exists:
+        # Docs from before deterministic IDs are found by the indexed field
+        legacy = list(col_ref.where("dedupe_key", "==", key).limit(1).stream(transaction=transaction))
+        if legacy:
+            snapshot = legacy[0]
+
+    if snapshot.exists:
+        existing = snapshot.to_dict() or {}
+        history = existing.get("history") or []
+        recent = history[max(0, len(history) - HISTORY_LIMIT + 1):]
+        transaction.update(snapshot.reference, {
+            "recommendation_count": existing.get("recommendation_count", 1) + 1,
+            "history": recent + [history_entry],
+            "reason": new_doc["reason"] or existing.get("reason", ""),
+            "updated_at": firestore.SERVER_TIMESTAMP,
+        })
+        transaction.create(snapshot.reference.collection("history").document(), history_entry)
+        return snapshot.id, True
+
+    transaction.create(doc_ref, new_doc)
+    transaction.create(doc_ref.collection("history").document(), history_entry)
+    return doc_ref.id, False
+
+
 def save_suggestion(suggestion_json: str, tool_context: ToolContext) -> dict:
     """Save a buy-more item suggestion to the user's suggestion list.
 
@@ -61,44 +123,14 @@ def save_suggestion(suggestion_json: str, tool_context: ToolContext) -> dict:
         col_ref = _suggestions_ref(user_id)
         key = _dedupe_key(brand, product_name, color_code)
 
-        # Check for duplicates
-        existing_doc = None
-        for doc in col_ref.stream():
-            d = doc.to_dict()
-            if _dedupe_key(d.get("brand", ""), d.get("product_name", ""), d.get("color_code")) == key:
-                existing_doc = doc
-                break
-
+        # Sentinels such as SERVER_TIMESTAMP are not allowed inside arrays
         history_entry = {
             "recipe_id": data.get("recipe_id"),
             "recipe_name": data.get("recipe_name"),
-            "suggested_at": firestore.SERVER_TIMESTAMP,
+            "suggested_at": datetime.now(timezone.utc).isoformat(),
             "context": reason,
         }
-
-        if existing_doc:
-            # Increment recommendation count
-            existing_data = existing_doc.to_dict()
-            history = existing_data.get("history", [])
-            existing_doc.reference.update({
-                "recommendation_count": (existing_data.get("recommendation_count", 1)) + 1,
-                "history": history + [history_entry],
-                "reason": reason or existing_data.get("reason", ""),
-                "updated_at": firestore.SERVER_TIMESTAMP,
-            })
-            logger.info("Updated existing suggestion %s for user %s", existing_doc.id, user_id)
-            return {"status": "success", "suggestion_id": existing_doc.id, "incremented": True}
-
-        # Upsert to global catalog (best-effort)
-        try:
-            from .catalog_tools import upsert_catalog
-            upsert_catalog(data, "want")
-        except Exception:
-            pass  # Catalog failure should not block suggestion creation
-
-        # Create new suggestion
-        doc_ref = col_ref.document()
-        doc_ref.set({
+        new_doc = {
             "brand": brand,
             "product_name": product_name,
             "color_code": color_code,
@@ -106,15 +138,32 @@ def save_suggestion(suggestion_json: str, tool_context: ToolContext) -> dict:
             "category": data.get("category"),
             "item_type": data.get("item_type"),
             "reason": reason,
+            "dedupe_key": key,
             "recommendation_count": 1,
             "history": [history_entry],
             "status": "候補",
             "source": "ai",
             "created_at": firestore.SERVER_TIMESTAMP,
             "updated_at": firestore.SERVER_TIMESTAMP,
-        })
-        logger.info("Created new suggestion %s for user %s", doc_ref.id, user_id)
-        return {"status": "success", "suggestion_id": doc_ref.id, "incremented": False}
+        }
+
+        suggestion_id, incremented = _upsert_suggestion(
+            _get_db().transaction(), col_ref, key, new_doc, history_entry,
+        )
+        if incremented:
+            logger.info("Updated existing suggestion %s for user %s", suggestion_id, user_id)
+            return {"status": "success", "suggestion_id": suggestion_id, "incremented": True}
+
+        # Upsert to global catalog (best-effort)
+        try:
+            from .catalog_tools import upsert_catalog
+            upsert_catalog(data, "want")
+        except Exception:
+            # Catalog failure should not block suggestion creation
+            logger.warning("Catalog upsert failed for suggestion %s", suggestion_id, exc_info=True)
+
+        logger.info("Created new suggestion %s for user %s", suggestion_id, user_id)
+        return {"status": "success", "suggestion_id": suggestion_id, "incremented": False}
 
     except Exception as e:
         logger.error("save_suggestion error: %s", e, exc_info=True)
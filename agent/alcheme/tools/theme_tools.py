@@ -5,18 +5,26 @@ preview images for each theme.
 Results are persisted to the *recipes* collection (source="theme").
 """
 
-import asyncio
 import json
 import logging
 import os
 import uuid
 from datetime import datetime, timezone
+from functools import partial
 from typing import Any
 
-from google import genai
 from google.cloud import firestore, storage
 from google.genai import types
 
+from ..genai_clients import get_genai_client
+from ..image_scheduler import PRIORITY_THEME
+from ..io_executor import run_blocking
+from ..profile_cache import get_hair_preferences, get_user_profile
+from .image_cache import (
+    copy_cached_image,
+    delete_superseded_images,
+    generate_cached_image,
+)
 from ..prompts.theme_generator import build_theme_generation_prompt, build_theme_image_prompt
 from ..prompts.simulator import CHARACTER_THEMES
 
@@ -46,17 +54,13 @@ def _build_user_context(user_id: str) -> dict:
     context: dict[str, Any] = {}
 
     # --- User profile ---
-    try:
-        user_doc = db.collection("users").document(user_id).get()
-        if user_doc.exists:
-            profile_data = user_doc.to_dict() or {}
-            context["profile"] = {
-                "personal_color": profile_data.get("personalColor", ""),
-                "skin_type": profile_data.get("skinType", ""),
-                "beauty_goals": profile_data.get("beautyGoals", ""),
-            }
-    except Exception as e:
-        logger.warning("Failed to fetch user profile for theme gen: %s", e)
+    profile_data = get_user_profile(user_id)
+    if profile_data:
+        context["profile"] = {
+            "personal_color": profile_data.get("personalColor", ""),
+            "skin_type": profile_data.get("skinType", ""),
+            "beauty_goals": profile_data.get("beautyGoals", ""),
+        }
 
     # --- Inventory summary ---
     try:
@@ -143,6 +147,61 @@ def _build_user_context(user_id: str) -> dict:
     return context
 
 
+def _save_theme_docs(user_id: str, docs: dict[str, dict]) -> None:
+    """Write theme docs (theme_id → doc) to the user's recipes collection."""
+    recipes_ref = _get_firestore().collection("users").document(user_id).collection("recipes")
+    for theme_id, theme_doc in docs.items():
+        recipes_ref.document(theme_id).set(theme_doc)
+
+
+def _update_theme_doc(user_id: str, theme_id: str, update_data: dict[str, Any]) -> None:
+    _get_firestore().collection("users").document(user_id).collection(
+        "recipes"
+    ).document(theme_id).update(update_data)
+
+
+def _link_theme_image(user_id: str, theme_id: str, image_url: str) -> None:
+    """Point the theme entry at a preview image URL."""
+    _update_theme_doc(user_id, theme_id, {
+        "preview_image_url": image_url,
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+    })
+
+
+def _theme_blob_path(user_id: str, theme_id: str, cache_key: str) -> str:
+    return f"{user_id}/themes/{theme_id}-{cache_key[:16]}.webp"
+
+
+def _store_theme_image(
+    bucket_name: str, user_id: str, theme_id: str, image_data: bytes, cache_key: str,
+) -> tuple[str, str]:
+    """Upload a theme image to GCS and link it from the theme doc. Returns (URL, blob path)."""
+    blob_path = _theme_blob_path(user_id, theme_id, cache_key)
+    bucket = _get_storage().bucket(bucket_name)
+    blob = bucket.blob(blob_path)
+    blob.upload_from_string(image_data, content_type="image/webp")
+    image_url = blob.public_url
+
+    # Update Firestore recipe document (theme entry)
+    _link_theme_image(user_id, theme_id, image_url)
+    delete_superseded_images(bucket, f"{user_id}/themes/{theme_id}", blob_path)
+    return image_url, blob_path
+
+
+def _reuse_theme_image(
+    bucket_name: str, user_id: str, theme_id: str, cache_key: str, source_path: str,
+) -> str | None:
+    """Copy a cached theme image into the theme's own path and link it. None if the blob is gone."""
+    blob_path = _theme_blob_path(user_id, theme_id, cache_key)
+    bucket = _get_storage().bucket(bucket_name)
+    image_url = copy_cached_image(bucket, source_path, blob_path)
+    if image_url is None:
+        return None
+    _link_theme_image(user_id, theme_id, image_url)
+    delete_superseded_images(bucket, f"{user_id}/themes/{theme_id}", blob_path)
+    return image_url
+
+
 async def generate_theme_suggestions(user_id: str) -> dict[str, Any]:
     """Generate 3 makeup theme suggestions using Gemini and save to Firestore.
 
@@ -156,20 +215,14 @@ async def generate_theme_suggestions(user_id: str) -> dict[str, Any]:
 
     try:
         # Build user context
-        user_context = _build_user_context(user_id)
+        user_context = await run_blocking(_build_user_context, user_id)
 
         # Build prompt
         prompt = build_theme_generation_prompt(user_context)
         logger.info("Generating theme suggestions for user %s (model=%s)", user_id, model_name)
 
         # Call Gemini for text generation
-        use_vertexai = os.environ.get("GOOGLE_GENAI_USE_VERTEXAI", "").upper() == "TRUE"
-        if use_vertexai:
-            project = os.environ.get("GOOGLE_CLOUD_PROJECT", "")
-            location = os.environ.get("GOOGLE_CLOUD_LOCATION", "us-central1")
-            client = genai.Client(vertexai=True, project=project, location=location)
-        else:
-            client = genai.Client()
+        client = get_genai_client()
 
         response = await client.aio.models.generate_content(
             model=model_name,
@@ -193,8 +246,7 @@ async def generate_theme_suggestions(user_id: str) -> dict[str, Any]:
             return {"status": "error", "error": "Invalid response format from model"}
 
         # Validate and save each theme to the recipes collection
-        db = _get_firestore()
-        recipes_ref = db.collection("users").document(user_id).collection("recipes")
+        theme_docs: dict[str, dict] = {}
         now_iso = datetime.now(timezone.utc).isoformat()
         saved_themes: list[dict] = []
 
@@ -230,7 +282,7 @@ async def generate_theme_suggestions(user_id: str) -> dict[str, Any]:
                 "updated_at": now_iso,
             }
 
-            recipes_ref.document(theme_id).set(theme_doc)
+            theme_docs[theme_id] = theme_doc
             # Return with legacy field names for frontend compatibility
             saved_themes.append({
                 "id": theme_id,
@@ -243,7 +295,10 @@ async def generate_theme_suggestions(user_id: str) -> dict[str, Any]:
                 "created_at": now_iso,
                 "updated_at": now_iso,
             })
-            logger.info("Theme saved to recipes: %s — %s (%s)", theme_id, title, char_theme)
+
+        await run_blocking(_save_theme_docs, user_id, theme_docs)
+        for theme in saved_themes:
+            logger.info("Theme saved to recipes: %s — %s (%s)", theme["id"], theme["title"], theme["character_theme"])
 
         return {"status": "success", "themes": saved_themes}
 
@@ -271,87 +326,21 @@ async def generate_theme_image(
         Dict with 'status', 'image_url', and optionally 'error'.
     """
     bucket_name = os.environ.get("GCS_PREVIEW_BUCKET", "alcheme-previews")
-    model_name = os.environ.get("SIMULATOR_MODEL", "gemini-2.5-flash-image")
-    image_location = os.environ.get("SIMULATOR_LOCATION", "us-central1")
 
     try:
         # Fetch user hair preferences from profile
-        hair_style, hair_color = None, None
-        try:
-            user_doc = _get_firestore().collection("users").document(user_id).get()
-            if user_doc.exists:
-                profile = user_doc.to_dict() or {}
-                hair_style = profile.get("hairType")
-                hair_color = profile.get("hairColor")
-        except Exception as e:
-            logger.warning("Failed to fetch user profile for hair: %s", e)
+        hair_style, hair_color = await run_blocking(get_hair_preferences, user_id)
 
         prompt = build_theme_image_prompt(theme, hair_style=hair_style, hair_color=hair_color)
-        logger.info(
-            "Generating theme image for %s (theme=%s, model=%s)",
-            theme_id, theme.get("character_theme", "cute"), model_name,
-        )
 
-        # Call Gemini image generation — retry with exponential backoff on 429
-        use_vertexai = os.environ.get("GOOGLE_GENAI_USE_VERTEXAI", "").upper() == "TRUE"
-        if use_vertexai:
-            project = os.environ.get("GOOGLE_CLOUD_PROJECT", "")
-            client = genai.Client(vertexai=True, project=project, location=image_location)
-        else:
-            client = genai.Client()
-
-        response = None
-        for attempt in range(4):
-            try:
-                response = await client.aio.models.generate_content(
-                    model=model_name,
-                    contents=prompt,
-                    config=types.GenerateContentConfig(
-                        response_modalities=["IMAGE", "TEXT"],
-                    ),
-                )
-                break
-            except Exception as retry_err:
-                if "429" in str(retry_err) or "RESOURCE_EXHAUSTED" in str(retry_err):
-                    wait = 2 ** attempt * 3  # 3s, 6s, 12s, 24s
-                    logger.warning("Gemini 429 on attempt %d, retrying in %ds...", attempt + 1, wait)
-                    await asyncio.sleep(wait)
-                else:
-                    raise
-        if response is None:
-            return {"status": "error", "error": "Gemini rate limit exceeded after retries"}
-
-        # Extract image
-        image_data: bytes | None = None
-        if response.candidates:
-            for part in response.candidates[0].content.parts:
-                if part.inline_data and part.inline_data.mime_type.startswith("image/"):
-                    image_data = part.inline_data.data
-                    break
-
-        if not image_data:
-            return {"status": "error", "error": "No image generated by model"}
-
-        # Upload to GCS
-        blob_path = f"{user_id}/themes/{theme_id}.webp"
-        bucket = _get_storage().bucket(bucket_name)
-        blob = bucket.blob(blob_path)
-        blob.upload_from_string(image_data, content_type="image/webp")
-        image_url = blob.public_url
-
-        # Update Firestore recipe document (theme entry)
-        _get_firestore().collection("users").document(user_id).collection(
-            "recipes"
-        ).document(theme_id).update(
-            {
-                "preview_image_url": image_url,
-                "updated_at": datetime.now(timezone.utc).isoformat(),
-            }
+        return await generate_cached_image(
+            prompt,
+            priority=PRIORITY_THEME,
+            store=partial(_store_theme_image, bucket_name, user_id, theme_id),
+            reuse=partial(_reuse_theme_image, bucket_name, user_id, theme_id),
+            label=f"theme image for {theme_id} (theme={theme.get('character_theme', 'cute')})",
         )
 
-        logger.info("Theme image saved: %s", image_url)
-        return {"status": "success", "image_url": image_url}
-
     except Exception as e:
         logger.error("Theme image generation failed for %s: %s", theme_id, e, exc_info=True)
         return {"status": "error", "error": str(e)}
@@ -382,9 +371,7 @@ async def update_theme_status(
         if recipe_id:
             update_data["recipe_id"] = recipe_id
 
-        _get_firestore().collection("users").document(user_id).collection(
-            "recipes"
-        ).document(theme_id).update(update_data)
+        await run_blocking(_update_theme_doc, user_id, theme_id, update_data)
 
         logger.info("Theme %s status updated to %s", theme_id, status)
         return {"status": "success"}
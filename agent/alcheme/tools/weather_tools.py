@@ -16,6 +16,8 @@ from typing import Any
 import requests
 from google.adk.tools import ToolContext
 
+from ..http_client import get_http_session
+
 logger = logging.getLogger(__name__)
 
 GOOGLE_WEATHER_API_KEY = os.environ.get("GOOGLE_WEATHER_API_KEY", "")
@@ -154,7 +156,7 @@ def _fetch_open_meteo(lat: float, lng: float, location: str) -> dict | None:
     Data by Open-Meteo.com (https://open-meteo.com/) under CC BY 4.0.
     """
     try:
-        resp = requests.get(
+        resp = get_http_session().get(
             OPEN_METEO_BASE_URL,
             params={
                 "latitude": lat,
@@ -263,7 +265,7 @@ def get_weather(location: str, tool_context: ToolContext) -> dict:
     # Try Google Weather API first (if key is configured)
     if GOOGLE_WEATHER_API_KEY:
         try:
-            resp = requests.get(
+            resp = get_http_session().get(
                 GOOGLE_WEATHER_BASE_URL,
                 params={
                     "key": GOOGLE_WEATHER_API_KEY,
@@ -0,0 +1,160 @@
+"""Per-turn checkpoint of tool results, replayed when /chat retries a turn.
+
+When the first run of a /chat turn fails, /chat resets the session and runs
+the agent again. Without a checkpoint, every tool call made before the
+failure (inventory reads, Rakuten lookups, save_recipe writes) runs a second
+time, and a recipe saved by the first run gets saved again.
+
+/chat opens a TurnCheckpoint for the turn. TurnCheckpointPlugin is installed
+on the Runner. Its after_tool_callback records each successful tool result,
+together with the state the tool wrote, under the tool name and its
+arguments. Once /chat calls start_replay() for the retry, before_tool_callback
+answers a call that matches a recorded one with the recorded result, so the
+tool does not run again. Results are only replayed in the retry, never
+within the run that produced them, so a read after a write in the same run
+still sees the write.
+
+Calls are matched by tool name and arguments. Results with
+``status == "error"`` are not recorded. Tools in SAVE_TOOLS create one
+document per turn, and the retried model rarely writes a byte-identical
+recipe. When such a call does not match, the tool runs again, and the ID
+from the failed attempt is put in the tool's state under
+retry_doc_id_key(tool). The tool then overwrites that document with the new
+arguments rather than creating a second one, so the turn keeps one recipe
+under the ID /chat has already reported. The ID travels through ``temp:``
+state rather than the context variable because ADK may run sync tools on a
+thread pool. ``temp:`` keys are not persisted.
+
+The checkpoint is found through a context variable. It is set in the task
+that runs the agent, so it is visible to the tool callbacks of that run and
+of no other request.
+"""
+
+import contextvars
+import copy
+import json
+import logging
+from typing import Any
+
+from google.adk.plugins.base_plugin import BasePlugin
+
+logger = logging.getLogger(__name__)
+
+# Tools that create one document per turn → result field holding its ID
+SAVE_TOOLS: dict[str, str] = {"save_recipe": "recipe_id"}
+
+_current: contextvars.ContextVar["TurnCheckpoint | None"] = contextvars.ContextVar(
+    "turn_checkpoint", default=None,
+)
+
+_stats = {"turns": 0, "retries": 0, "recorded": 0, "replayed": 0}
+
+
+class _Entry:
+    __slots__ = ("result", "state_delta")
+
+    def __init__(self, result: dict, state_delta: dict):
+        self.result = result
+        self.state_delta = state_delta
+
+
+class TurnCheckpoint:
+    """Tool results recorded during one /chat turn."""
+
+    def __init__(self) -> None:
+        self._entries: dict[str, _Entry] = {}
+        self._saved_ids: dict[str, str] = {}
+        self.replaying = False
+
+    @staticmethod
+    def key(tool_name: str, args: dict[str, Any]) -> str:
+        return tool_name + ":" + json.dumps(args, sort_keys=True, ensure_ascii=False, default=str)
+
+    def record(self, tool_name: str, args: dict[str, Any], result: dict, state_delta: dict | None = None) -> None:
+        key = self.key(tool_name, args)
+        # A replayed result is already in the checkpoint
+        if self.replaying and key in self._entries:
+            return
+        self._entries[key] = _Entry(copy.deepcopy(result), dict(state_delta or {}))
+        id_field = SAVE_TOOLS.get(tool_name)
+        if id_field and result.get(id_field) and tool_name not in self._saved_ids:
+            self._saved_ids[tool_name] = str(result[id_field])
+        _stats["recorded"] += 1
+
+    def lookup(self, tool_name: str, args: dict[str, Any]) -> _Entry | None:
+        if not self.replaying:
+            return None
+        return self._entries.get(self.key(tool_name, args))
+
+    def saved_id(self, tool_name: str) -> str | None:
+        """ID of the document a SAVE_TOOLS tool created in the failed attempt."""
+        if not self.replaying:
+            return None
+        return self._saved_ids.get(tool_name)
+
+    def start_replay(self) -> None:
+        """Serve recorded results from now on (call before the retried run)."""
+        self.replaying = True
+        _stats["retries"] += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def retry_doc_id_key(tool_name: str) -> str:
+    """State key holding the document ID a retried save tool should overwrite."""
+    return f"temp:retry_doc_id:{tool_name}"
+
+
+def begin_turn() -> TurnCheckpoint:
+    """Open a checkpoint for the current task's turn."""
+    checkpoint = TurnCheckpoint()
+    _current.set(checkpoint)
+    _stats["turns"] += 1
+    return checkpoint
+
+
+def end_turn() -> None:
+    _current.set(None)
+
+
+def current() -> TurnCheckpoint | None:
+    return _current.get()
+
+
+def stats() -> dict:
+    return dict(_stats)
+
+
+class TurnCheckpointPlugin(BasePlugin):
+    """Records tool results per turn and replays them on a retried run."""
+
+    def __init__(self) -> None:
+        super().__init__(name="turn_checkpoint")
+
+    async def before_tool_callback(self, *, tool, tool_args, tool_context) -> dict | None:
+        checkpoint = _current.get()
+        if checkpoint is None:
+            return None
+        entry = checkpoint.lookup(tool.name, tool_args)
+        if entry is None:
+            doc_id = checkpoint.saved_id(tool.name)
+            if doc_id:
+                tool_context.state[retry_doc_id_key(tool.name)] = doc_id
+                logger.info("Retried %s differs from the failed attempt; updating %s", tool.name, doc_id)
+            return None
+        for key, value in entry.state_delta.items():
+            tool_context.state[key] = value
+        _stats["replayed"] += 1
+        logger.info("Replaying %s result from the failed attempt", tool.name)
+        return copy.deepcopy(entry.result)
+
+    async def after_tool_callback(self, *, tool, tool_args, tool_context, result) -> dict | None:
+        checkpoint = _current.get()
+        if checkpoint is not None and isinstance(result, dict) and result.get("status") != "error":
+            state_delta = {
+                key: value for key, value in tool_context.actions.state_delta.items()
+                if key != retry_doc_id_key(tool.name)
+            }
+            checkpoint.record(tool.name, tool_args, result, state_delta)
+        return None
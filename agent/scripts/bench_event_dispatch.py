@@ -0,0 +1,184 @@
+"""Benchmark per-event classification for /chat: four extractor scans vs. one pass.
+
+Usage:
+    python -m scripts.bench_event_dispatch [--events recorded.jsonl] [--turns 200] [--rounds 5]
+
+Replays an ADK event stream through both paths:
+  legacy     the previous separate progress / card / recipe_id / text scans,
+             each walking event.content.parts with its own probing
+  dispatch   alcheme.event_dispatch.classify_event (one walk per event)
+
+--events takes a recorded stream, one serialized ADK Event per line
+(``event.model_dump_json()``). Without it a synthetic turn is used: agent
+transfer, tool calls and responses (save_recipe, a product comparison, a
+substitution technique) and many small text deltas.
+"""
+
+import argparse
+import time
+
+from google.adk.events.event import Event
+from google.adk.events.event_actions import EventActions
+from google.genai import types
+
+from alcheme.event_dispatch import (
+    _RESPONSE_HANDLERS,
+    AGENT_PROGRESS,
+    TOOL_PROGRESS,
+    EventResult,
+    classify_event,
+)
+
+_TEXT = "春っぽいピンクのリップに、ブラウンのアイシャドウを合わせたメイクです。"
+_PRODUCT = {"brand": "KATE", "product_name": "リップモンスター", "category": "リップ", "price": 1540}
+
+
+def _synthetic_turn(deltas: int) -> list[Event]:
+    def event(*parts, **actions) -> Event:
+        return Event(
+            author="alchemist_agent",
+            invocation_id="bench",
+            content=types.Content(role="model", parts=list(parts)),
+            actions=EventActions(**actions),
+        )
+
+    def call(name: str) -> types.Part:
+        return types.Part(function_call=types.FunctionCall(name=name, args={}))
+
+    def response(name: str, data: dict) -> types.Part:
+        return types.Part(function_response=types.FunctionResponse(name=name, response=data))
+
+    comparisons = [{"product": _PRODUCT, "duplicate_risk": "low", "similar_items": []}] * 3
+    events = [
+        event(transfer_to_agent="alchemist_agent"),
+        event(call("get_inventory_summary")),
+        event(response("get_inventory_summary", {"status": "success", "total": 42})),
+        event(call("compare_products_against_inventory")),
+        event(response("compare_products_against_inventory", {"status": "success", "comparisons": comparisons})),
+        event(call("get_substitution_technique")),
+        event(response("get_substitution_technique", {"status": "success", "title": "代用", "techniques": [_TEXT]})),
+        event(call("save_recipe")),
+        event(response("save_recipe", {"status": "success", "recipe_id": "recipe-1"})),
+    ]
+    events += [event(types.Part(text=_TEXT[i % len(_TEXT):][:4] or "。")) for i in range(deltas)]
+    return events
+
+
+def _load(path: str) -> list[Event]:
+    with open(path, encoding="utf-8") as f:
+        return [Event.model_validate_json(line) for line in f if line.strip()]
+
+
+# Previous per-concern scans, kept here as the baseline
+def _legacy_text(event) -> str:
+    if event.content and event.content.parts:
+        texts = []
+        for part in event.content.parts:
+            if hasattr(part, "text") and part.text:
+                texts.append(part.text)
+        return "".join(texts)
+    return ""
+
+
+def _legacy_progress(event) -> str | None:
+    if hasattr(event, "actions") and event.actions:
+        target = getattr(event.actions, "transfer_to_agent", None)
+        if target and target in AGENT_PROGRESS:
+            return AGENT_PROGRESS[target]
+    try:
+        for call in event.get_function_calls() or []:
+            if call.name in TOOL_PROGRESS:
+                return TOOL_PROGRESS[call.name]
+    except Exception:
+        pass
+    return None
+
+
+def _legacy_responses(event, names) -> list[tuple[str, dict]]:
+    found = []
+    if not hasattr(event, "content") or not event.content:
+        return found
+    parts = getattr(event.content, "parts", None)
+    if not parts:
+        return found
+    for part in parts:
+        resp = getattr(part, "function_response", None)
+        if not resp:
+            continue
+        name = getattr(resp, "name", "")
+        if name not in names:
+            continue
+        data = getattr(resp, "response", None)
+        if isinstance(data, dict):
+            found.append((name, data))
+        elif hasattr(data, "get"):
+            try:
+                found.append((name, dict(data)))
+            except (TypeError, ValueError):
+                continue
+    return found
+
+
+_CARD_TOOLS = set(_RESPONSE_HANDLERS) - {"save_recipe"}
+
+
+def _legacy(events) -> int:
+    results = 0
+    for event in events:
+        _legacy_progress(event)
+        cards = EventResult()
+        for name, data in _legacy_responses(event, _CARD_TOOLS):
+            _RESPONSE_HANDLERS[name](data, cards)
+        for _, data in _legacy_responses(event, {"save_recipe"}):
+            data.get("recipe_id")
+        _legacy_text(event)
+        results += 1
+    return results
+
+
+def _dispatch(events) -> int:
+    results = 0
+    for event in events:
+        classify_event(event)
+        results += 1
+    return results
+
+
+def _time(fn, events, rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn(events)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", help="recorded stream: one Event JSON per line")
+    parser.add_argument("--deltas", type=int, default=400, help="text deltas per synthetic turn")
+    parser.add_argument("--turns", type=int, default=50, help="times the stream is replayed per round")
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    stream = _load(args.events) if args.events else _synthetic_turn(args.deltas)
+    events = stream * args.turns
+
+    # Both paths must agree before timing them
+    for event in stream:
+        info = classify_event(event)
+        assert info.text == _legacy_text(event)
+        assert info.progress == _legacy_progress(event)
+
+    legacy_s = _time(_legacy, events, args.rounds)
+    dispatch_s = _time(_dispatch, events, args.rounds)
+
+    print(f"events:    {len(stream)} per stream x {args.turns} replays"
+          f" ({'recorded' if args.events else 'synthetic'})")
+    print(f"legacy:    {len(events) / legacy_s:12,.0f} events/s  {legacy_s / args.turns * 1e3:7.3f} ms/turn")
+    print(f"dispatch:  {len(events) / dispatch_s:12,.0f} events/s  {dispatch_s / args.turns * 1e3:7.3f} ms/turn"
+          f"  ({legacy_s / dispatch_s:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
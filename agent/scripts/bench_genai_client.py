@@ -0,0 +1,47 @@
+"""Benchmark per-call genai client setup: new Client per call vs shared registry.
+
+Usage:
+    python -m scripts.bench_genai_client [--calls 200]
+
+Measures only client construction / lookup (no model requests are sent).
+Uses the Gemini API-key mode with a dummy key so no credentials are needed.
+"""
+
+import argparse
+import os
+import time
+
+from google import genai
+
+from alcheme import genai_clients
+
+
+def _bench(fn, calls: int) -> float:
+    """Return mean milliseconds per call."""
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) * 1000 / calls
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200)
+    args = parser.parse_args()
+
+    os.environ.pop("GOOGLE_GENAI_USE_VERTEXAI", None)
+    os.environ.setdefault("GOOGLE_API_KEY", "bench-dummy-key")
+
+    per_call_ms = _bench(lambda: genai.Client(), args.calls)
+    genai_clients.reset_genai_clients()
+    shared_ms = _bench(genai_clients.get_genai_client, args.calls)
+
+    print(f"calls:               {args.calls}")
+    print(f"new Client per call: {per_call_ms:.4f} ms/call")
+    print(f"shared registry:     {shared_ms:.4f} ms/call (first call builds the client)")
+    print(f"speedup:             {per_call_ms / shared_ms:.1f}x")
+    print("note: excludes the TLS handshake a fresh client also pays on its first request")
+
+
+if __name__ == "__main__":
+    main()
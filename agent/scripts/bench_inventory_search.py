@@ -0,0 +1,76 @@
+"""Benchmark search_inventory: inverted index vs. linear substring scan.
+
+Usage:
+    python -m scripts.bench_inventory_search [--items 1000] [--rounds 200]
+
+Runs fully in-process on synthetic inventory data (no Firestore access).
+"""
+
+import argparse
+import random
+import time
+
+from alcheme.tools.inventory_index import InventorySearchIndex
+
+_BRANDS = ["KATE", "CANMAKE", "EXCEL", "CEZANNE", "Dior", "CHANEL", "ROMAND", "rom&nd", "MAQuillAGE", "SHISEIDO"]
+_NAMES = ["リップモンスター", "スキニーリッチシャドウ", "グロウフルールチークス", "ルージュ ディオール",
+          "パーフェクトマルチアイズ", "ジューシーラスティングティント", "ドラマティックルージュ", "ラスティンググロウ"]
+_COLORS = ["陽炎", "センシュアルブラウン", "ピーチフルール", "ローズピンク", "コーラル", "テラコッタ", "ベージュ"]
+_DESCS = ["ほんのり赤みのあるブラウンレッド", "肌なじみの良いブラウン", "透け感のあるピンク", "ツヤ感のあるコーラル"]
+_QUERIES = ["KATE", "リップ", "モンスター", "陽炎", "ブラウン", "03", "dior ルージュ", "ピンク", "存在しない商品"]
+
+
+def _make_items(n: int) -> list[dict]:
+    rng = random.Random(42)
+    return [
+        {
+            "id": f"item_{i:05d}",
+            "brand": rng.choice(_BRANDS),
+            "product_name": rng.choice(_NAMES),
+            "color_code": f"{rng.randint(1, 40):02d}",
+            "color_name": rng.choice(_COLORS),
+            "color_description": rng.choice(_DESCS),
+        }
+        for i in range(n)
+    ]
+
+
+def _linear_scan(items: list[dict], query: str) -> list[dict]:
+    q = query.lower()
+    fields = ("brand", "product_name", "color_code", "color_name", "color_description")
+    return [i for i in items if any(q in (i.get(f) or "").lower() for f in fields)]
+
+
+def _bench(fn, rounds: int) -> float:
+    """Return mean milliseconds per call across all queries."""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for q in _QUERIES:
+            fn(q)
+    return (time.perf_counter() - start) * 1000 / (rounds * len(_QUERIES))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    items = _make_items(args.items)
+
+    start = time.perf_counter()
+    index = InventorySearchIndex(items)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    index_ms = _bench(index.search, args.rounds)
+    scan_ms = _bench(lambda q: _linear_scan(items, q), args.rounds)
+
+    print(f"items:          {args.items}")
+    print(f"index build:    {build_ms:.2f} ms (once per snapshot)")
+    print(f"index lookup:   {index_ms:.4f} ms/query")
+    print(f"linear scan:    {scan_ms:.4f} ms/query")
+    print(f"speedup:        {scan_ms / index_ms:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""Benchmark selected-item lookup: per-item gets vs. batched get_all.
+
+Usage:
+    # Against the Firestore emulator (firebase emulators:start --only firestore)
+    FIRESTORE_EMULATOR_HOST=localhost:8081 GOOGLE_CLOUD_PROJECT=demo-alcheme \\
+        python -m scripts.bench_selected_items [--items 5] [--rounds 50]
+
+    # Without an emulator: in-process fake client with a fixed per-RPC latency
+    python -m scripts.bench_selected_items --fake-rtt-ms 15
+
+Seeds one user with --items inventory items (each with its own product doc),
+then times the old sequential lookup (inventory get + product get per item)
+against get_items_by_ids (one get_all for inventory, one for products).
+"""
+
+import argparse
+import os
+import statistics
+import time
+import uuid
+from unittest.mock import patch
+
+from alcheme.tools import inventory_tools
+from alcheme.tools.inventory_tools import get_items_by_ids
+
+
+def _sequential_lookup(db, user_id: str, item_ids: list[str]) -> dict[str, dict]:
+    """The previous _fetch_selected_items_description access pattern."""
+    user_ref = db.collection("users").document(user_id)
+    inv_ref = user_ref.collection("inventory")
+    prod_ref = user_ref.collection("products")
+    items = {}
+    for item_id in item_ids:
+        inv_doc = inv_ref.document(item_id).get()
+        if not inv_doc.exists:
+            continue
+        data = inv_doc.to_dict() or {}
+        product = {}
+        if data.get("product_id"):
+            prod_doc = prod_ref.document(data["product_id"]).get()
+            if prod_doc.exists:
+                product = prod_doc.to_dict() or {}
+        items[item_id] = {**product, **data, "id": item_id}
+    return items
+
+
+class _FakeSnapshot:
+    def __init__(self, doc_id: str, data: dict | None):
+        self.id = doc_id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self) -> dict | None:
+        return self._data
+
+
+class _FakeDocRef:
+    def __init__(self, client: "_FakeClient", path: str):
+        self._client = client
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    def collection(self, name: str) -> "_FakeCollection":
+        return _FakeCollection(self._client, f"{self.path}/{name}")
+
+    def get(self) -> _FakeSnapshot:
+        self._client.rpc()
+        return _FakeSnapshot(self.id, self._client.docs.get(self.path))
+
+    def set(self, data: dict) -> None:
+        self._client.docs[self.path] = data
+
+
+class _FakeCollection:
+    def __init__(self, client: "_FakeClient", path: str):
+        self._client = client
+        self.path = path
+
+    def document(self, doc_id: str) -> _FakeDocRef:
+        return _FakeDocRef(self._client, f"{self.path}/{doc_id}")
+
+
+class _FakeClient:
+    """Dict-backed stand-in for firestore.Client: every RPC sleeps rtt seconds."""
+
+    def __init__(self, rtt: float):
+        self.rtt = rtt
+        self.docs: dict[str, dict] = {}
+        self.rpcs = 0
+
+    def rpc(self) -> None:
+        self.rpcs += 1
+        time.sleep(self.rtt)
+
+    def collection(self, name: str) -> _FakeCollection:
+        return _FakeCollection(self, name)
+
+    def get_all(self, refs):
+        self.rpc()
+        return [_FakeSnapshot(ref.id, self.docs.get(ref.path)) for ref in refs]
+
+
+def _client(fake_rtt_ms: float | None):
+    if fake_rtt_ms is not None:
+        return _FakeClient(fake_rtt_ms / 1000)
+    if not os.environ.get("FIRESTORE_EMULATOR_HOST"):
+        raise SystemExit("Set FIRESTORE_EMULATOR_HOST (or pass --fake-rtt-ms) — refusing to write to real Firestore")
+    from google.cloud import firestore
+
+    return firestore.Client(project=os.environ.get("GOOGLE_CLOUD_PROJECT", "demo-alcheme"))
+
+
+def _seed(db, user_id: str, n: int) -> list[str]:
+    user_ref = db.collection("users").document(user_id)
+    item_ids = []
+    for i in range(n):
+        product_id = f"prod_{i:03d}"
+        item_id = f"item_{i:03d}"
+        user_ref.collection("products").document(product_id).set(
+            {"brand": "KATE", "product_name": f"リップモンスター {i}", "color_name": "陽炎", "item_type": "リップ"}
+        )
+        user_ref.collection("inventory").document(item_id).set(
+            {"product_id": product_id, "estimated_remaining": "80%"}
+        )
+        item_ids.append(item_id)
+    return item_ids
+
+
+def _time(fn, rounds: int) -> list[float]:
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=5)
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--fake-rtt-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    db = _client(args.fake_rtt_ms)
+    user_id = f"bench-{uuid.uuid4().hex[:8]}"
+    item_ids = _seed(db, user_id, args.items)
+
+    with patch.object(inventory_tools, "_get_db", return_value=db):
+        assert _sequential_lookup(db, user_id, item_ids).keys() == get_items_by_ids(user_id, item_ids).keys()
+        sequential = _time(lambda: _sequential_lookup(db, user_id, item_ids), args.rounds)
+        batched = _time(lambda: get_items_by_ids(user_id, item_ids), args.rounds)
+
+    seq_p50, batch_p50 = statistics.median(sequential), statistics.median(batched)
+    print(f"backend:        {'fake rtt %.0f ms' % args.fake_rtt_ms if args.fake_rtt_ms is not None else 'emulator'}")
+    print(f"items:          {args.items}")
+    print(f"round trips:    sequential {2 * args.items}, batched 2")
+    print(f"sequential p50: {seq_p50:.2f} ms")
+    print(f"batched p50:    {batch_p50:.2f} ms")
+    print(f"speedup:        {seq_p50 / batch_p50:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Benchmark session append/read latency under concurrent chat sessions.
+
+Usage:
+    python -m scripts.bench_sessions [--sessions 50] [--turns 5] [--events 6]
+                                     [--db-url postgresql+asyncpg://...]
+
+Each simulated chat session runs several turns. A turn appends --events
+events (user message, tool call/response, model text) and then re-reads the
+session, which is what the next /chat request does. Runs once with per-event
+writes (SESSION_APPEND_BATCH=1) and once with write batching, against a
+fresh SQLite-WAL file by default or the given --db-url (e.g. a local
+Postgres container).
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+from google.adk.events.event import Event
+from google.adk.events.event_actions import EventActions
+from google.genai import types
+
+from alcheme.session_store import BatchedDatabaseSessionService
+
+APP = "alcheme-bench"
+
+
+def _event(i: int) -> Event:
+    return Event(
+        author="user" if i == 0 else "concierge",
+        invocation_id="bench",
+        content=types.Content(role="model", parts=[types.Part(text=f"event {i} " + "x" * 200)]),
+        actions=EventActions(state_delta={"last_event": i}),
+    )
+
+
+def _pct(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+async def _run(db_url: str, app: str, batch_size: int, sessions: int, turns: int, events: int) -> dict:
+    svc = BatchedDatabaseSessionService(db_url, batch_size=batch_size)
+    await svc.prepare_tables()
+    append_ms: list[float] = []
+    turn_write_ms: list[float] = []
+    read_ms: list[float] = []
+
+    async def chat(n: int) -> None:
+        user_id, session_id = f"user-{n}", f"session-{n}"
+        session = await svc.create_session(app_name=app, user_id=user_id, session_id=session_id)
+        for _ in range(turns):
+            turn_start = time.perf_counter()
+            for i in range(events):
+                start = time.perf_counter()
+                await svc.append_event(session, _event(i))
+                append_ms.append((time.perf_counter() - start) * 1000)
+            await svc.flush_session(app, user_id, session_id)
+            turn_write_ms.append((time.perf_counter() - turn_start) * 1000)
+
+            start = time.perf_counter()
+            session = await svc.get_session(app_name=app, user_id=user_id, session_id=session_id)
+            read_ms.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(chat(n) for n in range(sessions)))
+    wall = time.perf_counter() - start
+    await svc.close()
+    return {
+        "append_p50": statistics.median(append_ms),
+        "append_p95": _pct(append_ms, 0.95),
+        "turn_p50": statistics.median(turn_write_ms),
+        "turn_p95": _pct(turn_write_ms, 0.95),
+        "read_p50": statistics.median(read_ms),
+        "read_p95": _pct(read_ms, 0.95),
+        "wall_s": wall,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--events", type=int, default=6)
+    parser.add_argument("--db-url", default=None)
+    args = parser.parse_args()
+
+    print(f"sessions={args.sessions} turns={args.turns} events/turn={args.events}")
+    print(f"{'mode':<14}{'append p50/p95 ms':>20}{'turn write p50/p95 ms':>24}{'read p50/p95 ms':>20}{'wall s':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, batch in (("per-event", 1), ("batched", 16)):
+            db_url = args.db_url or f"sqlite+aiosqlite:///{os.path.join(tmp, f'{label}.db')}"
+            r = asyncio.run(_run(db_url, f"{APP}-{label}-{os.getpid()}", batch, args.sessions, args.turns, args.events))
+            print(
+                f"{label:<14}"
+                f"{r['append_p50']:>10.2f}/{r['append_p95']:<9.2f}"
+                f"{r['turn_p50']:>12.2f}/{r['turn_p95']:<11.2f}"
+                f"{r['read_p50']:>10.2f}/{r['read_p95']:<9.2f}"
+                f"{r['wall_s']:>9.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Benchmark SSE frame encoding: legacy f-string/json.dumps vs. alcheme.sse.
+
+Usage:
+    python -m scripts.bench_sse [--deltas 2000] [--delta-chars 4] [--cards 3] [--rounds 20]
+
+Replays a synthetic /chat turn (progress events, many small text deltas, card
+and recipe frames) fully in-process and reports encoded frames/sec for:
+  legacy     the previous per-frame json.dumps, with card data double-encoded
+  frame()    alcheme.sse.frame for every event (orjson if installed)
+  stream()   alcheme.sse.stream with text-delta coalescing (frames on the wire)
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from alcheme import sse
+from alcheme.sse import Nested
+
+_TEXT = "春っぽいピンクのリップに、ブラウンのアイシャドウを合わせたメイクです。"
+_RECIPE = {
+    "recipe": {
+        "recipe_name": "春のほんのりピンクメイク",
+        "steps": [
+            {"step": i, "area": area, "item_id": f"item_{i:03d}", "instruction": _TEXT, "amount": "適量"}
+            for i, area in enumerate(["base", "eye", "cheek", "lip", "brow", "highlight"], 1)
+        ],
+        "pro_tips": [_TEXT] * 3,
+    }
+}
+_CARD = {"brand": "KATE", "product_name": "リップモンスター", "duplicate_risk": "low", "gap_analysis": "adds_variety"}
+
+
+def _turn(deltas: int, delta_chars: int, cards: int) -> list[tuple[str, object]]:
+    text = (_TEXT * (deltas * delta_chars // len(_TEXT) + 1))
+    events: list[tuple[str, object]] = [("progress", "手持ちコスメを確認中...")]
+    events += [("product_card", _CARD)] * cards
+    events += [("text_delta", text[i * delta_chars:(i + 1) * delta_chars]) for i in range(deltas)]
+    events += [("recipe_card", _RECIPE), ("content_done", ""), ("done", "")]
+    return events
+
+
+def _legacy(events) -> list[str]:
+    frames = []
+    for event_type, data in events:
+        if event_type.endswith("_card"):
+            payload = json.dumps({"type": event_type, "data": json.dumps(data, ensure_ascii=False)}, ensure_ascii=False)
+        else:
+            payload = json.dumps({"type": event_type, "data": data}, ensure_ascii=False)
+        frames.append(f"data: {payload}\n\n")
+    return frames
+
+
+def _nested(events):
+    return [(t, Nested(d) if t.endswith("_card") else d) for t, d in events]
+
+
+def _encode(events) -> list[str]:
+    return [sse.frame(t, d) for t, d in events]
+
+
+async def _stream(events, coalesce_ms: float) -> list[str]:
+    async def source():
+        for event in events:
+            yield event
+
+    return [f async for f in sse.stream(source(), coalesce_ms=coalesce_ms)]
+
+
+def _time(fn, rounds: int) -> tuple[float, int]:
+    frames = 0
+    start = time.perf_counter()
+    for _ in range(rounds):
+        frames = len(fn())
+    return (time.perf_counter() - start) / rounds, frames
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--deltas", type=int, default=2000)
+    parser.add_argument("--delta-chars", type=int, default=4)
+    parser.add_argument("--cards", type=int, default=3)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--coalesce-ms", type=float, default=sse.SSE_COALESCE_MS)
+    args = parser.parse_args()
+
+    events = _turn(args.deltas, args.delta_chars, args.cards)
+    nested = _nested(events)
+
+    legacy_s, legacy_frames = _time(lambda: _legacy(events), args.rounds)
+    frame_s, frame_frames = _time(lambda: _encode(nested), args.rounds)
+    stream_s, stream_frames = _time(lambda: asyncio.run(_stream(nested, args.coalesce_ms)), args.rounds)
+
+    print(f"backend:   {'orjson' if sse.orjson is not None else 'json'}")
+    print(f"events:    {len(events)} ({args.deltas} text deltas of {args.delta_chars} chars)")
+    print(f"legacy:    {legacy_frames / legacy_s:12,.0f} frames/s  {legacy_s * 1000:7.2f} ms/turn")
+    print(f"frame():   {frame_frames / frame_s:12,.0f} frames/s  {frame_s * 1000:7.2f} ms/turn"
+          f"  ({legacy_s / frame_s:.1f}x)")
+    print(f"stream():  {stream_frames} frames on the wire  {stream_s * 1000:7.2f} ms/turn"
+          f"  (coalesce {args.coalesce_ms:g} ms)")
+
+
+if __name__ == "__main__":
+    main()
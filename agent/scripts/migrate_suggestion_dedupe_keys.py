@@ -0,0 +1,71 @@
+"""Backfill ``dedupe_key`` on existing suggested_items docs.
+
+save_suggestion finds a suggestion by its deterministic doc ID, falling back
+to an indexed ``dedupe_key`` query for docs created before that scheme. This
+one-off migration writes ``dedupe_key`` onto every suggested_items doc that
+lacks it, and reports keys that already have more than one doc.
+
+Usage:
+    python -m scripts.migrate_suggestion_dedupe_keys [--dry-run] [--project alcheme-c36ef]
+
+Requires ADC authentication. Safe to re-run: docs that already carry the
+correct key are skipped.
+"""
+
+import argparse
+from collections import defaultdict
+
+from google.cloud import firestore
+
+from alcheme.tools.suggestion_tools import _dedupe_key
+
+PROJECT_ID = "alcheme-c36ef"
+_BATCH_SIZE = 400  # Firestore allows 500 writes per batch
+
+
+def migrate(db: firestore.Client, dry_run: bool = False) -> dict:
+    batch = db.batch()
+    pending = 0
+    scanned = 0
+    updated = 0
+    by_key: dict[tuple[str, str], list[str]] = defaultdict(list)
+
+    for doc in db.collection_group("suggested_items").stream():
+        scanned += 1
+        data = doc.to_dict() or {}
+        key = _dedupe_key(data.get("brand", ""), data.get("product_name", ""), data.get("color_code"))
+        by_key[(doc.reference.parent.parent.id, key)].append(doc.id)
+        if data.get("dedupe_key") == key:
+            continue
+        updated += 1
+        if dry_run:
+            continue
+        batch.update(doc.reference, {"dedupe_key": key})
+        pending += 1
+        if pending >= _BATCH_SIZE:
+            batch.commit()
+            batch = db.batch()
+            pending = 0
+
+    if pending:
+        batch.commit()
+
+    duplicates = {k: ids for k, ids in by_key.items() if len(ids) > 1}
+    return {"scanned": scanned, "updated": updated, "duplicates": duplicates}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--project", default=PROJECT_ID)
+    args = parser.parse_args()
+
+    result = migrate(firestore.Client(project=args.project), dry_run=args.dry_run)
+    verb = "would update" if args.dry_run else "updated"
+    print(f"Scanned {result['scanned']} suggestions, {verb} {result['updated']}.")
+    for (user_id, key), ids in result["duplicates"].items():
+        print(f"  duplicate key for user {user_id}: {key} -> {', '.join(ids)}")
+
+
+if __name__ == "__main__":
+    main()
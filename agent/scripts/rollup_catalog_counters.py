@@ -0,0 +1,43 @@
+"""Fold every catalog entry's counter shards into the catalog doc.
+
+The agent rolls up entries it touched itself (see alcheme/catalog_counters.py);
+this sweep catches shards left behind by instances that stopped before their
+next roll-up. Run it periodically (e.g. from Cloud Scheduler), and before
+lowering CATALOG_COUNTER_SHARDS.
+
+Usage:
+    python -m scripts.rollup_catalog_counters [--shards 10] [--project alcheme-c36ef]
+
+Requires ADC authentication (or FIRESTORE_EMULATOR_HOST).
+"""
+
+import argparse
+
+from google.cloud import firestore
+
+from alcheme.catalog_counters import CATALOG_COUNTER_SHARDS, SHARDS_COLLECTION, rollup_catalog_counters
+
+PROJECT_ID = "alcheme-c36ef"
+
+
+def rollup_all(db: firestore.Client, num_shards: int) -> int:
+    catalog_ids = {
+        doc.reference.parent.parent.id
+        for doc in db.collection_group(SHARDS_COLLECTION).stream()
+        if doc.reference.parent.parent.parent.id == "catalog"
+    }
+    return sum(rollup_catalog_counters(cid, db=db, num_shards=num_shards) for cid in sorted(catalog_ids))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--shards", type=int, default=max(CATALOG_COUNTER_SHARDS, 1))
+    parser.add_argument("--project", default=PROJECT_ID)
+    args = parser.parse_args()
+
+    rolled = rollup_all(firestore.Client(project=args.project), args.shards)
+    print(f"Rolled up {rolled} catalog entries.")
+
+
+if __name__ == "__main__":
+    main()
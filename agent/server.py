@@ -3,6 +3,7 @@
 Exposes HTTP endpoints for the Next.js BFF to call:
   POST /scan   — Image scan → inventory_agent → structured items
   POST /chat   — Chat message → concierge (SSE streaming)
+  GET  /preview-status/{recipe_id} — Poll a queued recipe preview image
   GET  /health — Health check
 """
 
@@ -13,6 +14,7 @@ import logging
 import os
 import re
 import uuid
+from contextlib import asynccontextmanager
 from typing import Any
 
 # Load .env before any ADK / genai imports
@@ -24,16 +26,30 @@ from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 
+from google.adk.apps import App
 from google.adk.runners import Runner
-from google.adk.sessions import DatabaseSessionService
-from google.adk.memory import InMemoryMemoryService
 from google.genai import types
 
 from google.cloud import firestore as firestore_lib
 
 from alcheme.agent import root_agent
+from alcheme import genai_clients, http_client, sse, turn_checkpoint
 from alcheme.agents.product_search import create_product_search_agent
-from alcheme.tools.rakuten_api import search_rakuten_for_candidates
+from alcheme.catalog_counters import get_counter_rollup
+from alcheme.event_dispatch import classify_event
+from alcheme.image_scheduler import PRIORITY_INTERACTIVE, get_image_scheduler
+from alcheme.io_executor import run_blocking
+from alcheme.json_blocks import JsonBlockStream
+from alcheme.memory_store import create_memory_service
+from alcheme.preview_jobs import get_preview_queue
+from alcheme.profile_cache import get_profile_cache, get_user_profile, invalidate_user_profile
+from alcheme.session_compaction import SESSION_COMPACT_AFTER_EVENTS, SessionCompactor
+from alcheme.session_store import DEFAULT_SESSION_DB_URL, create_session_service
+from alcheme.sse import Nested
+from alcheme.tools.image_cache import get_image_cache
+from alcheme.tools.inventory_tools import get_items_by_ids
+from alcheme.tools.rakuten_api import search_rakuten_for_candidates_async
+from alcheme.tools.rakuten_cache import get_rakuten_cache
 from alcheme.tools.simulator_tools import generate_preview_image
 from alcheme.tools.theme_tools import (
     generate_theme_suggestions,
@@ -53,74 +69,46 @@ def _get_firestore() -> firestore_lib.Client:
 
 
 def _build_user_state(user_id: str) -> dict:
-    """Build initial session state with user profile data from Firestore."""
+    """Build initial session state with user profile data (cached, see profile_cache)."""
     state: dict[str, Any] = {"user:id": user_id}
-    try:
-        doc = _get_firestore().collection("users").document(user_id).get()
-        if doc.exists:
-            profile = doc.to_dict() or {}
-            if profile.get("personalColor"):
-                state["user:personal_color"] = profile["personalColor"]
-            if profile.get("skinType"):
-                state["user:skin_type"] = profile["skinType"]
-            if profile.get("displayName"):
-                state["user:display_name"] = profile["displayName"]
-            if profile.get("location"):
-                state["user:location"] = profile["location"]
-            if profile.get("beautyGoals"):
-                state["user:beauty_goals"] = profile["beautyGoals"]
-            if profile.get("preferences"):
-                state["user:profiler_preferences"] = profile["preferences"]
-            # Calendar integration
-            cal = profile.get("calendarIntegration")
-            if cal and cal.get("connected"):
-                state["user:calendar_connected"] = True
-            if profile.get("manualSchedule"):
-                state["user:manual_schedule"] = profile["manualSchedule"]
-    except Exception as e:
-        logger.warning("Failed to fetch user profile for %s: %s", user_id, e)
+    profile = get_user_profile(user_id)
+    if profile.get("personalColor"):
+        state["user:personal_color"] = profile["personalColor"]
+    if profile.get("skinType"):
+        state["user:skin_type"] = profile["skinType"]
+    if profile.get("displayName"):
+        state["user:display_name"] = profile["displayName"]
+    if profile.get("location"):
+        state["user:location"] = profile["location"]
+    if profile.get("beautyGoals"):
+        state["user:beauty_goals"] = profile["beautyGoals"]
+    if profile.get("preferences"):
+        state["user:profiler_preferences"] = profile["preferences"]
+    # Calendar integration
+    if profile.get("calendarConnected"):
+        state["user:calendar_connected"] = True
+    if profile.get("manualSchedule"):
+        state["user:manual_schedule"] = profile["manualSchedule"]
     return state
 
 
 def _fetch_selected_items_description(user_id: str, item_ids: list[str]) -> list[str]:
     """Fetch inventory + product details for selected items, return human-readable lines."""
-    descriptions: list[str] = []
-    db = _get_firestore()
-    inv_ref = db.collection("users").document(user_id).collection("inventory")
-    prod_ref = db.collection("users").document(user_id).collection("products")
-
-    for item_id in item_ids[:5]:  # Cap at 5 items
-        try:
-            inv_doc = inv_ref.document(item_id).get()
-            if not inv_doc.exists:
-                continue
-            inv_data = inv_doc.to_dict() or {}
-            product_id = inv_data.get("product_id", "")
-
-            # Fetch product details
-            brand = ""
-            product_name = ""
-            color_name = ""
-            item_type = ""
-            if product_id:
-                prod_doc = prod_ref.document(product_id).get()
-                if prod_doc.exists:
-                    prod_data = prod_doc.to_dict() or {}
-                    brand = prod_data.get("brand", "")
-                    product_name = prod_data.get("product_name", "")
-                    color_name = prod_data.get("color_name", "")
-                    item_type = prod_data.get("item_type", "")
-
-            parts = [p for p in [brand, product_name] if p]
-            detail_parts = [p for p in [color_name, item_type] if p]
-            if parts:
-                line = " ".join(parts)
-                if detail_parts:
-                    line += f" ({', '.join(detail_parts)})"
-                descriptions.append(line)
-        except Exception as e:
-            logger.warning("Failed to fetch item %s for user %s: %s", item_id, user_id, e)
+    try:
+        items = get_items_by_ids(user_id, item_ids[:5])  # Cap at 5 items
+    except Exception as e:
+        logger.warning("Failed to fetch selected items for user %s: %s", user_id, e)
+        return []
 
+    descriptions: list[str] = []
+    for item in items.values():
+        parts = [p for p in [item.get("brand", ""), item.get("product_name", "")] if p]
+        detail_parts = [p for p in [item.get("color_name", ""), item.get("item_type", "")] if p]
+        if parts:
+            line = " ".join(parts)
+            if detail_parts:
+                line += f" ({', '.join(detail_parts)})"
+            descriptions.append(line)
     return descriptions
 
 
@@ -135,23 +123,43 @@ logger = logging.getLogger(__name__)
 # ---------------------------------------------------------------------------
 # ADK Runner setup
 # ---------------------------------------------------------------------------
-SESSION_DB_URL = os.environ.get(
-    "SESSION_DB_URL",
-    "sqlite+aiosqlite:///sessions.db",
-)
-session_service = DatabaseSessionService(db_url=SESSION_DB_URL)
-memory_service = InMemoryMemoryService()
+SESSION_DB_URL = os.environ.get("SESSION_DB_URL", DEFAULT_SESSION_DB_URL)
+session_service = create_session_service(SESSION_DB_URL)
+memory_service = create_memory_service()
 runner = Runner(
-    agent=root_agent,
-    app_name=APP_NAME,
+    app=App(
+        name=APP_NAME,
+        root_agent=root_agent,
+        plugins=[turn_checkpoint.TurnCheckpointPlugin()],
+    ),
     session_service=session_service,
     memory_service=memory_service,
 )
+session_compactor = SessionCompactor(session_service, memory_service)
+
+# Sessions are compacted in the background after each turn; a session this far
+# past the threshold means compaction keeps failing, so fall back to a reset.
+SESSION_RESET_EVENTS = SESSION_COMPACT_AFTER_EVENTS * 3
 
 # ---------------------------------------------------------------------------
 # FastAPI app
 # ---------------------------------------------------------------------------
-app = FastAPI(title="alche:me Agent API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    get_preview_queue().start()
+    get_counter_rollup().start()
+    yield
+    await get_preview_queue().stop()
+    await get_counter_rollup().stop()
+    await session_compactor.drain()
+    await genai_clients.aclose_genai_clients()
+    await session_service.close()
+    if hasattr(memory_service, "close"):
+        memory_service.close()
+    await http_client.aclose()
+
+
+app = FastAPI(title="alche:me Agent API", version="1.0.0", lifespan=lifespan)
 
 
 @app.exception_handler(RequestValidationError)
@@ -230,233 +238,6 @@ class UpdateThemeStatusRequest(BaseModel):
     recipe_id: str | None = None
 
 
-# ---------------------------------------------------------------------------
-# Helper: extract text from agent events
-# ---------------------------------------------------------------------------
-def _extract_text_from_event(event) -> str:
-    """Extract text content from an ADK Event."""
-    if event.content and event.content.parts:
-        texts = []
-        for part in event.content.parts:
-            if hasattr(part, "text") and part.text:
-                texts.append(part.text)
-        return "".join(texts)
-    return ""
-
-
-# ---------------------------------------------------------------------------
-# Helper: extract progress info from agent events
-# ---------------------------------------------------------------------------
-_TOOL_PROGRESS_MAP: dict[str, str] = {
-    "get_inventory_summary": "手持ちコスメを確認中...",
-    "get_inventory": "在庫データを取得中...",
-    "search_inventory": "コスメを検索中...",
-    "filter_inventory_by_category": "カテゴリで絞り込み中...",
-    "validate_recipe_items": "レシピのアイテムを検証中...",
-    "save_recipe": "メイクレシピを保存中...",
-    "search_rakuten_api": "楽天で商品情報を検索中...",
-    "google_search": "商品情報をWeb検索中...",
-    "generate_item_id": "アイテムを登録準備中...",
-    "add_items_to_inventory": "在庫に追加中...",
-    "analyze_product_compatibility": "手持ちコスメとの相性を分析中...",
-    "compare_products_against_inventory": "商品を比較分析中...",
-    "save_beauty_log": "メイクログを保存中...",
-    "get_beauty_logs": "メイク履歴を取得中...",
-    "get_weather": "天気情報を取得中...",
-    "get_today_schedule": "今日の予定を確認中...",
-    "analyze_preference_history": "好みの傾向を分析中...",
-    "get_substitution_technique": "代用テクニックを検索中...",
-}
-
-_AGENT_PROGRESS_MAP: dict[str, str] = {
-    "alchemist_agent": "メイクレシピを作成中...",
-    "inventory_agent": "コスメ在庫を分析中...",
-    "product_search_agent": "商品情報を検索中...",
-    "memory_keeper_agent": "メイクログを確認中...",
-    "trend_hunter_agent": "トレンドを分析中...",
-    "tpo_tactician_agent": "TPOに合わせた提案を準備中...",
-    "profiler_agent": "好み傾向を分析中...",
-    "instructor_agent": "メイク手順を作成中...",
-}
-
-
-def _extract_progress_from_event(event) -> str | None:
-    """Extract a user-facing progress message from an ADK Event."""
-    # Check for agent transfer
-    if hasattr(event, "actions") and event.actions:
-        target = getattr(event.actions, "transfer_to_agent", None)
-        if target and target in _AGENT_PROGRESS_MAP:
-            return _AGENT_PROGRESS_MAP[target]
-
-    # Check for function calls (tool invocations)
-    try:
-        function_calls = event.get_function_calls()
-        if function_calls:
-            for call in function_calls:
-                if call.name in _TOOL_PROGRESS_MAP:
-                    return _TOOL_PROGRESS_MAP[call.name]
-    except Exception:
-        pass
-
-    return None
-
-
-def _extract_recipe_id_from_event(event) -> str | None:
-    """Extract recipe_id from a save_recipe tool function response."""
-    try:
-        # ADK function responses are in event.content.parts
-        if not hasattr(event, "content") or not event.content:
-            return None
-        parts = getattr(event.content, "parts", None)
-        if not parts:
-            return None
-        for part in parts:
-            resp = getattr(part, "function_response", None)
-            if resp and getattr(resp, "name", None) == "save_recipe":
-                response_data = getattr(resp, "response", None)
-                if response_data is None:
-                    logger.warning("save_recipe response_data is None")
-                    return None
-                # Plain dict (most common)
-                if isinstance(response_data, dict):
-                    return response_data.get("recipe_id")
-                # Proto Struct / mapping-like objects (ADK may wrap responses)
-                if hasattr(response_data, "get"):
-                    rid = response_data.get("recipe_id")
-                    if rid:
-                        return str(rid)
-                # Try dict() conversion for proto Struct
-                try:
-                    data_dict = dict(response_data)
-                    rid = data_dict.get("recipe_id")
-                    if rid:
-                        return str(rid)
-                except (TypeError, ValueError):
-                    pass
-                logger.warning(
-                    "save_recipe response format unexpected: %r (type=%s)",
-                    response_data,
-                    type(response_data).__name__,
-                )
-    except Exception as e:
-        logger.warning("Failed to extract recipe_id from event: %s", e)
-    return None
-
-
-# Tools whose function responses should be emitted as rich card SSE events
-_CARD_TOOLS: dict[str, str] = {
-    "analyze_product_compatibility": "product_card",
-    "compare_products_against_inventory": "product_card",
-    "get_substitution_technique": "technique_card",
-    "analyze_preference_history": "profiler_card",
-}
-
-
-def _extract_card_events_from_event(event) -> list[dict]:
-    """Extract tool function response results that should be emitted as rich card SSE events.
-
-    Returns a list of dicts: [{"type": "product_card"|"technique_card", "data": {...}}, ...]
-    """
-    results: list[dict] = []
-    try:
-        if not hasattr(event, "content") or not event.content:
-            return results
-        parts = getattr(event.content, "parts", None)
-        if not parts:
-            return results
-        for part in parts:
-            resp = getattr(part, "function_response", None)
-            if not resp:
-                continue
-            name = getattr(resp, "name", "")
-            if name not in _CARD_TOOLS:
-                continue
-            card_type = _CARD_TOOLS[name]
-            response_data = getattr(resp, "response", None)
-            if response_data is None:
-                continue
-            # Convert to dict
-            if isinstance(response_data, dict):
-                data_dict = response_data
-            elif hasattr(response_data, "get"):
-                try:
-                    data_dict = dict(response_data)
-                except (TypeError, ValueError):
-                    continue
-            else:
-                continue
-
-            if data_dict.get("status") != "success":
-                continue
-
-            if card_type == "product_card" and name == "analyze_product_compatibility":
-                product = data_dict.get("product_analyzed", {})
-                if isinstance(product, dict):
-                    results.append({
-                        "type": "product_card",
-                        "data": {
-                            "brand": product.get("brand", ""),
-                            "product_name": product.get("product_name", ""),
-                            "category": product.get("category", ""),
-                            "price": product.get("price"),
-                            "image_url": product.get("image_url"),
-                            "product_url": product.get("product_url"),
-                            "duplicate_risk": data_dict.get("duplicate_risk", "none"),
-                            "gap_analysis": data_dict.get("gap_analysis", "adds_variety"),
-                            "similar_items_count": len(data_dict.get("similar_items", [])),
-                            "compatibility_summary": "",
-                        },
-                    })
-            elif card_type == "product_card" and name == "compare_products_against_inventory":
-                for comp in data_dict.get("comparisons", []):
-                    if not isinstance(comp, dict):
-                        continue
-                    product = comp.get("product", {})
-                    if isinstance(product, dict):
-                        results.append({
-                            "type": "product_card",
-                            "data": {
-                                "brand": product.get("brand", ""),
-                                "product_name": product.get("product_name", ""),
-                                "category": product.get("category", ""),
-                                "price": product.get("price"),
-                                "image_url": product.get("image_url"),
-                                "product_url": product.get("product_url"),
-                                "duplicate_risk": comp.get("duplicate_risk", "none"),
-                                "gap_analysis": comp.get("gap_analysis", "adds_variety"),
-                                "similar_items_count": len(comp.get("similar_items", [])),
-                                "compatibility_summary": "",
-                            },
-                        })
-            elif card_type == "technique_card":
-                results.append({
-                    "type": "technique_card",
-                    "data": {
-                        "title": data_dict.get("title", "代用テクニック"),
-                        "original_item": data_dict.get("original_item", ""),
-                        "substitute_item": data_dict.get("substitute_item", ""),
-                        "techniques": data_dict.get("techniques", []),
-                        "reasons": data_dict.get("reasons", []),
-                        "general_tips": data_dict.get("general_tips", []),
-                    },
-                })
-            elif card_type == "profiler_card":
-                results.append({
-                    "type": "profiler_card",
-                    "data": {
-                        "color_preferences": data_dict.get("color_preferences", {}),
-                        "texture_preferences": data_dict.get("texture_preferences", {}),
-                        "area_frequency": data_dict.get("area_frequency", {}),
-                        "average_satisfaction": data_dict.get("average_satisfaction"),
-                        "monotony_alert": data_dict.get("monotony_alert"),
-                        "underused_items": data_dict.get("underused_items", []),
-                    },
-                })
-    except Exception as e:
-        logger.warning("Failed to extract card events from event: %s", e)
-    return results
-
-
 def _inject_substitution_search_urls(block: dict) -> None:
     """Inject Rakuten search_url into substitution info for each recipe step."""
     import urllib.parse
@@ -532,26 +313,132 @@ def _fallback_save_recipe(recipe_block: dict, user_id: str) -> str | None:
         return None
 
 
-def _extract_json_blocks(text: str) -> list[dict]:
-    """Extract JSON code blocks from agent text output."""
-    results = []
-    # Match ```json ... ``` blocks
-    pattern = r"```(?:json)?\s*\n([\s\S]*?)\n```"
-    matches = re.findall(pattern, text)
-    for match in matches:
-        try:
-            parsed = json.loads(match)
-            results.append(parsed)
-        except json.JSONDecodeError:
-            continue
-    # Also try to parse the entire text as JSON
-    if not results:
+def _merge_recipe_into_theme(user_id: str, recipe_id: str, theme_id: str) -> str | None:
+    """Merge a freshly saved recipe into an existing theme doc.
+
+    Returns the theme doc ID on success (the recipe doc is deleted), or None
+    if the theme doc does not exist or the merge failed.
+    """
+    try:
+        db = _get_firestore()
+        user_recipes = db.collection("users").document(user_id).collection("recipes")
+        new_doc = user_recipes.document(recipe_id).get()
+        theme_doc = user_recipes.document(theme_id).get()
+        if new_doc.exists and theme_doc.exists:
+            recipe_data_dict = new_doc.to_dict()
+            theme_data_dict = theme_doc.to_dict()
+            merged = {
+                **recipe_data_dict,
+                "theme_title": theme_data_dict.get("theme_title", recipe_data_dict.get("theme_title", "")),
+                "theme_description": theme_data_dict.get("theme_description", ""),
+                "style_keywords": theme_data_dict.get("style_keywords", recipe_data_dict.get("style_keywords", [])),
+                "character_theme": theme_data_dict.get("character_theme"),
+                "theme_status": "liked",
+                "theme_context": theme_data_dict.get("theme_context", {}),
+                "preview_image_url": theme_data_dict.get("preview_image_url"),
+                "source": "ai",
+                "updated_at": firestore_lib.SERVER_TIMESTAMP,
+            }
+            user_recipes.document(theme_id).set(merged)
+            user_recipes.document(recipe_id).delete()
+            logger.info("Merged recipe into theme doc %s (deleted %s)", theme_id, recipe_id)
+            return theme_id
+        if new_doc.exists:
+            logger.info("Theme doc %s not found — keeping recipe as %s", theme_id, recipe_id)
+    except Exception as merge_err:
+        logger.warning("Theme-recipe merge failed: %s", merge_err)
+    return None
+
+
+def _as_recipe_block(block: Any) -> dict | None:
+    """The recipe block for a parsed JSON block, or None if it is not a recipe."""
+    # Handle unwrapped recipe format (steps + recipe_name at top level, no "recipe" wrapper)
+    if isinstance(block, dict) and "recipe" not in block and "steps" in block and "recipe_name" in block:
+        logger.info("Detected unwrapped recipe format — wrapping under 'recipe' key")
+        block = {"recipe": block}
+    if isinstance(block, dict) and "recipe" in block:
+        return block
+    return None
+
+
+def _finalize_recipe_block(block: dict, recipe_id: str | None) -> list[dict] | None:
+    """Attach the saved recipe_id and substitution links; return the recipe steps."""
+    steps = None
+    # Inject saved recipe_id so frontend can link to /recipes/{id}
+    if recipe_id and isinstance(block.get("recipe"), dict):
+        block["recipe"]["id"] = recipe_id
+        steps = block["recipe"].get("steps")
+        if not steps:
+            logger.warning("recipe_steps not found under block['recipe']['steps']. recipe keys: %s", list(block["recipe"].keys()))
+
+    # Inject search_url for substitution info
+    _inject_substitution_search_urls(block)
+    return steps
+
+
+# Rakuten fallback enrichment in /scan: per-request concurrency cap and an
+# overall deadline. Items whose lookup misses the deadline are returned
+# without candidates.
+SCAN_RAKUTEN_CONCURRENCY = int(os.environ.get("SCAN_RAKUTEN_CONCURRENCY", "3"))
+SCAN_RAKUTEN_DEADLINE = float(os.environ.get("SCAN_RAKUTEN_DEADLINE", "8"))
+
+
+def _apply_rakuten_candidates(item: dict, candidates: list[dict]) -> None:
+    """Attach Rakuten candidates to a scanned item, auto-matching a single hit."""
+    item["candidates"] = candidates
+    # Auto-match if single high-confidence result
+    if len(candidates) == 1:
+        best = candidates[0]
+        item["price"] = best.get("price")
+        item["product_url"] = best.get("url")
+        item["rakuten_image_url"] = best.get("image_url")
+        if best.get("color_code") and not item.get("color_code"):
+            item["color_code"] = best["color_code"]
+        if best.get("color_name") and not item.get("color_name"):
+            item["color_name"] = best["color_name"]
+
+
+async def _enrich_items_with_rakuten(items: list[dict]) -> None:
+    """Look up Rakuten candidates for scanned items concurrently (in place)."""
+    targets = []
+    for item in items:
+        if item.get("candidates"):
+            continue  # Agent already provided candidates
+        brand = item.get("brand", "")
+        product_name = item.get("product_name", "")
+        if brand and brand != "不明" and product_name and product_name != "不明":
+            targets.append(item)
+    if not targets:
+        return
+
+    semaphore = asyncio.Semaphore(SCAN_RAKUTEN_CONCURRENCY)
+
+    async def enrich(item: dict) -> None:
+        brand = item.get("brand", "")
+        product_name = item.get("product_name", "")
         try:
-            parsed = json.loads(text)
-            results.append(parsed)
-        except json.JSONDecodeError:
-            pass
-    return results
+            async with semaphore:
+                rakuten_res = await search_rakuten_for_candidates_async(
+                    brand=brand,
+                    product_name=product_name,
+                    color_hint=item.get("color_name") or item.get("color_code") or "",
+                )
+            candidates = rakuten_res.get("candidates", [])
+            if candidates:
+                _apply_rakuten_candidates(item, candidates)
+        except Exception as e:
+            logger.warning("Rakuten fallback failed for %s %s: %s", brand, product_name, e)
+
+    tasks = [asyncio.create_task(enrich(item)) for item in targets]
+    _, pending = await asyncio.wait(tasks, timeout=SCAN_RAKUTEN_DEADLINE)
+    if pending:
+        logger.warning(
+            "Rakuten fallback deadline (%.1fs) hit — %d/%d items returned without candidates",
+            SCAN_RAKUTEN_DEADLINE, len(pending), len(tasks),
+        )
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
 
 
 # ---------------------------------------------------------------------------
@@ -567,7 +454,7 @@ async def scan(req: ScanRequest):
         app_name=APP_NAME,
         user_id=req.user_id,
         session_id=session_id,
-        state=_build_user_state(req.user_id),
+        state=await run_blocking(_build_user_state, req.user_id),
     )
 
     # Build image list (support both multi-image and single-image)
@@ -602,22 +489,24 @@ async def scan(req: ScanRequest):
     message = types.Content(role="user", parts=parts)
 
     # Run agent and collect all events
-    full_text = ""
+    json_stream = JsonBlockStream()
+    json_blocks: list[Any] = []
     try:
         async for event in runner.run_async(
             user_id=req.user_id,
             session_id=session_id,
             new_message=message,
         ):
-            text = _extract_text_from_event(event)
+            text = classify_event(event).text
             if text:
-                full_text += text
+                json_blocks.extend(json_stream.feed(text))
     except Exception as e:
         logger.error(f"Scan agent error: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Agent error: {str(e)}")
 
     # Parse structured output from agent response
-    json_blocks = _extract_json_blocks(full_text)
+    json_blocks.extend(json_stream.finish())
+    full_text = json_stream.text()
 
     items = []
     for block in json_blocks:
@@ -631,33 +520,7 @@ async def scan(req: ScanRequest):
                 items.append(block)
 
     # --- Rakuten API fallback enrichment ---
-    for item in items:
-        if item.get("candidates"):
-            continue  # Agent already provided candidates
-        brand = item.get("brand", "")
-        product_name = item.get("product_name", "")
-        if brand and brand != "不明" and product_name and product_name != "不明":
-            try:
-                rakuten_res = search_rakuten_for_candidates(
-                    brand=brand,
-                    product_name=product_name,
-                    color_hint=item.get("color_name") or item.get("color_code") or "",
-                )
-                candidates = rakuten_res.get("candidates", [])
-                if candidates:
-                    item["candidates"] = candidates
-                    # Auto-match if single high-confidence result
-                    if len(candidates) == 1:
-                        best = candidates[0]
-                        item["price"] = best.get("price")
-                        item["product_url"] = best.get("url")
-                        item["rakuten_image_url"] = best.get("image_url")
-                        if best.get("color_code") and not item.get("color_code"):
-                            item["color_code"] = best["color_code"]
-                        if best.get("color_name") and not item.get("color_name"):
-                            item["color_name"] = best["color_name"]
-            except Exception as e:
-                logger.warning("Rakuten fallback failed for %s %s: %s", brand, product_name, e)
+    await _enrich_items_with_rakuten(items)
 
     return {
         "success": True,
@@ -671,20 +534,24 @@ async def scan(req: ScanRequest):
 # POST /chat
 # ---------------------------------------------------------------------------
 @app.post("/chat", dependencies=[Depends(verify_api_key)])
-async def chat(req: ChatRequest):
-    """Chat with the concierge agent, streaming SSE responses."""
+async def chat(req: ChatRequest, request: Request):
+    """Chat with the concierge agent, streaming SSE responses.
+
+    If the client disconnects, sse.stream cancels event_generator: the agent
+    run, any retry and the fallback save/preview steps stop there.
+    """
     # Session ID is server-determined (deterministic per user)
     session_id = f"chat-{req.user_id}"
 
-    # Create or reuse session; extract memories and reset if history is too large
-    MAX_SESSION_EVENTS = 20
+    # Create or reuse session. Long sessions are compacted in place after each
+    # turn; the reset below is only a last resort if compaction keeps failing.
     existing = await session_service.get_session(
         app_name=APP_NAME,
         user_id=req.user_id,
         session_id=session_id,
     )
-    if existing and len(existing.events) > MAX_SESSION_EVENTS:
-        logger.info("Session %s has %d events, extracting memories and resetting", session_id, len(existing.events))
+    if existing and len(existing.events) > SESSION_RESET_EVENTS:
+        logger.warning("Session %s has %d events despite compaction, extracting memories and resetting", session_id, len(existing.events))
         # Extract memories before deleting session
         try:
             await memory_service.add_session_to_memory(existing)
@@ -693,18 +560,21 @@ async def chat(req: ChatRequest):
             logger.warning("Memory extraction failed for session %s: %s (proceeding anyway)", session_id, mem_err)
         await session_service.delete_session(app_name=APP_NAME, user_id=req.user_id, session_id=session_id)
         existing = None
+    # Kept for a retry, which recreates the session
+    user_state: dict | None = None
     if not existing:
+        user_state = await run_blocking(_build_user_state, req.user_id)
         await session_service.create_session(
             app_name=APP_NAME,
             user_id=req.user_id,
             session_id=session_id,
-            state=_build_user_state(req.user_id),
+            state=user_state,
         )
 
     # Build message content — prepend selected items directive if present
     message_text = req.message
     if req.selected_item_ids:
-        item_lines = _fetch_selected_items_description(req.user_id, req.selected_item_ids)
+        item_lines = await run_blocking(_fetch_selected_items_description, req.user_id, req.selected_item_ids)
         if item_lines:
             directive = "[SYSTEM: ユーザーが以下のコスメを指定しました。レシピに必ず含めてください。]\n"
             directive += "\n".join(f"- {line}" for line in item_lines)
@@ -740,13 +610,17 @@ async def chat(req: ChatRequest):
     message = types.Content(role="user", parts=parts)
 
     async def event_generator():
-        """Generate SSE events from agent response."""
+        """Generate (type, data) events from the agent response; sse.stream encodes them."""
         import time as _time
         AGENT_DEADLINE = 90  # Max seconds for agent processing
 
-        encoder = json.dumps
-        full_text = ""
+        json_stream = JsonBlockStream()
+        # Recipe blocks seen before save_recipe reported an ID; handled after the run
+        deferred_blocks: list[dict] = []
+        recipe_steps: list[dict] | None = None
         saved_recipe_id: str | None = None
+        # Tool results of this turn, replayed if the run fails and is retried
+        checkpoint = turn_checkpoint.begin_turn()
         start_time = _time.monotonic()
         try:
             async for event in runner.run_async(
@@ -757,139 +631,82 @@ async def chat(req: ChatRequest):
                 # Safety: abort if processing exceeds deadline
                 if _time.monotonic() - start_time > AGENT_DEADLINE:
                     logger.warning("Agent processing exceeded %ds deadline, aborting", AGENT_DEADLINE)
-                    error_data = encoder(
-                        {"type": "text_delta", "data": "処理に時間がかかりすぎたため中断しました。もう少し具体的にリクエストしてみてください。"},
-                        ensure_ascii=False,
-                    )
-                    yield f"data: {error_data}\n\n"
+                    yield "text_delta", "処理に時間がかかりすぎたため中断しました。もう少し具体的にリクエストしてみてください。"
                     break
 
+                info = classify_event(event)
+
                 # Emit progress events for tool calls / agent transfers
-                progress = _extract_progress_from_event(event)
-                if progress:
-                    progress_data = encoder({"type": "progress", "data": progress}, ensure_ascii=False)
-                    yield f"data: {progress_data}\n\n"
+                if info.progress:
+                    yield "progress", info.progress
 
                 # Emit rich card events for tool results (product/technique)
-                card_events = _extract_card_events_from_event(event)
-                for card_evt in card_events:
-                    card_data = encoder(
-                        {"type": card_evt["type"], "data": json.dumps(card_evt["data"], ensure_ascii=False)},
-                        ensure_ascii=False,
-                    )
-                    yield f"data: {card_data}\n\n"
+                for card_evt in info.cards:
+                    yield card_evt["type"], Nested(card_evt["data"])
 
                 # Capture recipe_id from save_recipe tool result
                 if not saved_recipe_id:
-                    saved_recipe_id = _extract_recipe_id_from_event(event)
+                    saved_recipe_id = info.recipe_id
 
-                text = _extract_text_from_event(event)
+                text = info.text
                 if text:
-                    full_text += text
                     # Send text delta
-                    data = encoder({"type": "text_delta", "data": text}, ensure_ascii=False)
-                    yield f"data: {data}\n\n"
-
+                    yield "text_delta", text
+
+                    # Emit a recipe card as soon as its JSON block closes
+                    for block in json_stream.feed(text):
+                        block = _as_recipe_block(block)
+                        if block is None:
+                            continue
+                        if not saved_recipe_id:
+                            # May still be saved by the agent; otherwise fallback-saved below
+                            deferred_blocks.append(block)
+                            continue
+                        recipe_steps = _finalize_recipe_block(block, saved_recipe_id) or recipe_steps
+                        yield "recipe_card", Nested(block)
+
+            full_text = json_stream.text()
             if not full_text:
                 logger.warning("Agent produced no text output for user %s (session %s). Events may have been tool-only.", req.user_id, session_id)
 
-            # After all events, check for recipe JSON in the full text
-            json_blocks = _extract_json_blocks(full_text)
-            recipe_steps: list[dict] | None = None
-            if not json_blocks:
+            # End of stream: a trailing fence, whole-text JSON, and blocks waiting for a recipe_id
+            for block in json_stream.finish():
+                block = _as_recipe_block(block)
+                if block is not None:
+                    deferred_blocks.append(block)
+            if not json_stream.blocks:
                 logger.info("No JSON blocks found in agent output (%d chars). First 500 chars: %s", len(full_text), full_text[:500])
-            for block in json_blocks:
-                # Handle unwrapped recipe format (steps + recipe_name at top level, no "recipe" wrapper)
-                if isinstance(block, dict) and "recipe" not in block and "steps" in block and "recipe_name" in block:
-                    logger.info("Detected unwrapped recipe format — wrapping under 'recipe' key")
-                    block = {"recipe": block}
-                if isinstance(block, dict) and "recipe" in block:
-                    # Fallback save: if agent didn't call save_recipe, save it now
-                    if not saved_recipe_id and isinstance(block.get("recipe"), dict):
-                        fallback_id = _fallback_save_recipe(block, req.user_id)
-                        if fallback_id:
-                            saved_recipe_id = fallback_id
-
-                    # Inject saved recipe_id so frontend can link to /recipes/{id}
-                    if saved_recipe_id and isinstance(block.get("recipe"), dict):
-                        block["recipe"]["id"] = saved_recipe_id
-                        recipe_steps = block["recipe"].get("steps")
-                        if not recipe_steps:
-                            logger.warning("recipe_steps not found under block['recipe']['steps']. recipe keys: %s", list(block["recipe"].keys()))
-
-                    # Inject search_url for substitution info
-                    _inject_substitution_search_urls(block)
-
-                    recipe_data = encoder(
-                        {"type": "recipe_card", "data": json.dumps(block, ensure_ascii=False)},
-                        ensure_ascii=False,
-                    )
-                    yield f"data: {recipe_data}\n\n"
+            for block in deferred_blocks:
+                # Fallback save: if agent didn't call save_recipe, save it now
+                if not saved_recipe_id and isinstance(block.get("recipe"), dict):
+                    fallback_id = await run_blocking(_fallback_save_recipe, block, req.user_id)
+                    if fallback_id:
+                        saved_recipe_id = fallback_id
+
+                recipe_steps = _finalize_recipe_block(block, saved_recipe_id) or recipe_steps
+                yield "recipe_card", Nested(block)
 
             # Signal frontend that all text/card content is complete — UI can unlock
-            content_done_data = encoder({"type": "content_done", "data": ""}, ensure_ascii=False)
-            yield f"data: {content_done_data}\n\n"
+            yield "content_done", ""
 
             # Merge recipe into existing theme doc if theme_id was provided
             if saved_recipe_id and req.theme_id and saved_recipe_id != req.theme_id:
-                try:
-                    db = _get_firestore()
-                    user_recipes = db.collection("users").document(req.user_id).collection("recipes")
-                    new_doc = user_recipes.document(saved_recipe_id).get()
-                    theme_doc = user_recipes.document(req.theme_id).get()
-                    if new_doc.exists and theme_doc.exists:
-                        recipe_data_dict = new_doc.to_dict()
-                        theme_data_dict = theme_doc.to_dict()
-                        merged = {
-                            **recipe_data_dict,
-                            "theme_title": theme_data_dict.get("theme_title", recipe_data_dict.get("theme_title", "")),
-                            "theme_description": theme_data_dict.get("theme_description", ""),
-                            "style_keywords": theme_data_dict.get("style_keywords", recipe_data_dict.get("style_keywords", [])),
-                            "character_theme": theme_data_dict.get("character_theme"),
-                            "theme_status": "liked",
-                            "theme_context": theme_data_dict.get("theme_context", {}),
-                            "preview_image_url": theme_data_dict.get("preview_image_url"),
-                            "source": "ai",
-                            "updated_at": firestore_lib.SERVER_TIMESTAMP,
-                        }
-                        user_recipes.document(req.theme_id).set(merged)
-                        user_recipes.document(saved_recipe_id).delete()
-                        saved_recipe_id = req.theme_id
-                        logger.info("Merged recipe into theme doc %s (deleted %s)", req.theme_id, saved_recipe_id)
-                    elif new_doc.exists:
-                        logger.info("Theme doc %s not found — keeping recipe as %s", req.theme_id, saved_recipe_id)
-                except Exception as merge_err:
-                    logger.warning("Theme-recipe merge failed: %s", merge_err)
-
-            # Generate preview image if recipe was saved
+                merged_id = await run_blocking(_merge_recipe_into_theme, req.user_id, saved_recipe_id, req.theme_id)
+                if merged_id:
+                    saved_recipe_id = merged_id
+
+            # Queue preview image generation; the frontend polls for the result
             if saved_recipe_id and recipe_steps:
-                progress_data = encoder({"type": "progress", "data": "仕上がりプレビューを生成中..."}, ensure_ascii=False)
-                yield f"data: {progress_data}\n\n"
-                try:
-                    logger.info("Starting preview image generation for recipe %s (%d steps)", saved_recipe_id, len(recipe_steps))
-                    preview_result = await asyncio.wait_for(
-                        generate_preview_image(
-                            recipe_id=saved_recipe_id,
-                            user_id=req.user_id,
-                            steps=recipe_steps,
-                        ),
-                        timeout=45.0,
-                    )
-                    if preview_result.get("status") == "success":
-                        preview_data = encoder(
-                            {"type": "preview_image", "data": {"image_url": preview_result["image_url"], "recipe_id": saved_recipe_id}},
-                            ensure_ascii=False,
-                        )
-                        yield f"data: {preview_data}\n\n"
-                    else:
-                        logger.warning("Preview image generation returned error: %s", preview_result.get("error", "unknown"))
-                except asyncio.TimeoutError:
-                    logger.warning("Preview image generation timed out for recipe %s", saved_recipe_id)
-                except Exception as preview_err:
-                    logger.warning("Preview image generation failed: %s", preview_err)
+                if await get_preview_queue().submit(req.user_id, saved_recipe_id, recipe_steps):
+                    yield "preview_pending", {"recipe_id": saved_recipe_id}
             elif saved_recipe_id and not recipe_steps:
                 logger.info("Recipe %s saved but no steps extracted from JSON — skipping preview image", saved_recipe_id)
 
+        except asyncio.CancelledError:
+            # Client went away: stop the agent run (the finally below still
+            # writes the session)
+            logger.info("Chat turn for %s cancelled after %.1fs", req.user_id, _time.monotonic() - start_time)
+            raise
         except Exception as e:
             # Determine if we should retry with a fresh session
             error_str = str(e)
@@ -928,89 +745,88 @@ async def chat(req: ChatRequest):
                         app_name=APP_NAME,
                         user_id=req.user_id,
                         session_id=session_id,
-                        state=_build_user_state(req.user_id),
+                        state=user_state or await run_blocking(_build_user_state, req.user_id),
                     )
-                    retry_full_text = ""
-                    retry_recipe_id: str | None = None
+                    # The retried run gets the first attempt's tool results instead
+                    # of repeating their I/O (and their save_recipe write)
+                    checkpoint.start_replay()
+                    logger.info("Retrying turn with %d checkpointed tool results", len(checkpoint))
+                    retry_stream = JsonBlockStream()
+                    retry_blocks: list[dict] = []
+                    retry_steps: list[dict] | None = None
+                    # A recipe the first attempt already saved is not saved again
+                    retry_recipe_id: str | None = saved_recipe_id
                     async for event in runner.run_async(
                         user_id=req.user_id,
                         session_id=session_id,
                         new_message=message,
                     ):
-                        progress = _extract_progress_from_event(event)
-                        if progress:
-                            progress_data = encoder({"type": "progress", "data": progress}, ensure_ascii=False)
-                            yield f"data: {progress_data}\n\n"
+                        info = classify_event(event)
+                        if info.progress:
+                            yield "progress", info.progress
+                        for card_evt in info.cards:
+                            yield card_evt["type"], Nested(card_evt["data"])
                         if not retry_recipe_id:
-                            retry_recipe_id = _extract_recipe_id_from_event(event)
-                        text = _extract_text_from_event(event)
+                            retry_recipe_id = info.recipe_id
+                        text = info.text
                         if text:
-                            retry_full_text += text
-                            data = encoder({"type": "text_delta", "data": text}, ensure_ascii=False)
-                            yield f"data: {data}\n\n"
-
-                    # Check for recipe JSON in retry output
-                    retry_json_blocks = _extract_json_blocks(retry_full_text)
-                    retry_steps: list[dict] | None = None
-                    for block in retry_json_blocks:
-                        if isinstance(block, dict) and "recipe" in block:
-                            # Fallback save in retry path
-                            if not retry_recipe_id and isinstance(block.get("recipe"), dict):
-                                fallback_id = _fallback_save_recipe(block, req.user_id)
-                                if fallback_id:
-                                    retry_recipe_id = fallback_id
-
-                            if retry_recipe_id and isinstance(block.get("recipe"), dict):
-                                block["recipe"]["id"] = retry_recipe_id
-                                retry_steps = block["recipe"].get("steps")
-                            recipe_data = encoder(
-                                {"type": "recipe_card", "data": json.dumps(block, ensure_ascii=False)},
-                                ensure_ascii=False,
-                            )
-                            yield f"data: {recipe_data}\n\n"
+                            yield "text_delta", text
+                            for block in retry_stream.feed(text):
+                                block = _as_recipe_block(block)
+                                if block is None:
+                                    continue
+                                if not retry_recipe_id:
+                                    retry_blocks.append(block)
+                                    continue
+                                retry_steps = _finalize_recipe_block(block, retry_recipe_id) or retry_steps
+                                yield "recipe_card", Nested(block)
+
+                    # Check for recipe JSON left at the end of the retry output
+                    for block in retry_stream.finish():
+                        block = _as_recipe_block(block)
+                        if block is not None:
+                            retry_blocks.append(block)
+                    for block in retry_blocks:
+                        # Fallback save in retry path
+                        if not retry_recipe_id and isinstance(block.get("recipe"), dict):
+                            fallback_id = await run_blocking(_fallback_save_recipe, block, req.user_id)
+                            if fallback_id:
+                                retry_recipe_id = fallback_id
+
+                        retry_steps = _finalize_recipe_block(block, retry_recipe_id) or retry_steps
+                        yield "recipe_card", Nested(block)
 
                     # Signal frontend that all text/card content is complete — UI can unlock
-                    content_done_data = encoder({"type": "content_done", "data": ""}, ensure_ascii=False)
-                    yield f"data: {content_done_data}\n\n"
+                    yield "content_done", ""
 
-                    # Generate preview image in retry path
+                    # Queue preview image generation in retry path
                     if retry_recipe_id and retry_steps:
-                        progress_data = encoder({"type": "progress", "data": "仕上がりプレビューを生成中..."}, ensure_ascii=False)
-                        yield f"data: {progress_data}\n\n"
-                        try:
-                            preview_result = await asyncio.wait_for(
-                                generate_preview_image(
-                                    recipe_id=retry_recipe_id,
-                                    user_id=req.user_id,
-                                    steps=retry_steps,
-                                ),
-                                timeout=45.0,
-                            )
-                            if preview_result.get("status") == "success":
-                                preview_data = encoder(
-                                    {"type": "preview_image", "data": {"image_url": preview_result["image_url"], "recipe_id": retry_recipe_id}},
-                                    ensure_ascii=False,
-                                )
-                                yield f"data: {preview_data}\n\n"
-                        except asyncio.TimeoutError:
-                            logger.warning("Preview image generation timed out (retry) for recipe %s", retry_recipe_id)
-                        except Exception as preview_err:
-                            logger.warning("Preview image generation failed (retry): %s", preview_err)
+                        if await get_preview_queue().submit(req.user_id, retry_recipe_id, retry_steps):
+                            yield "preview_pending", {"recipe_id": retry_recipe_id}
                 except Exception as retry_err:
                     logger.error(f"Chat retry also failed: {retry_err}", exc_info=True)
-                    error_data = encoder({"type": "error", "data": str(retry_err)}, ensure_ascii=False)
-                    yield f"data: {error_data}\n\n"
+                    yield "error", str(retry_err)
             else:
                 logger.error(f"Chat agent error: {e}", exc_info=True)
-                error_data = encoder({"type": "error", "data": str(e)}, ensure_ascii=False)
-                yield f"data: {error_data}\n\n"
+                yield "error", str(e)
+        finally:
+            turn_checkpoint.end_turn()
+
+            # Persist this turn's buffered session events, also when the turn was
+            # cancelled; shielded so a cancelled stream can't abandon the write
+            try:
+                await asyncio.shield(session_service.flush_session(APP_NAME, req.user_id, session_id))
+            except Exception as flush_err:
+                logger.warning("Session flush failed for %s: %s", session_id, flush_err)
+            else:
+                # Trim old turns into the summary without holding up this response
+                session_compactor.schedule(APP_NAME, req.user_id, session_id)
 
         # Send done event
-        done_data = encoder({"type": "done", "data": ""})
-        yield f"data: {done_data}\n\n"
+        yield "done", ""
 
     return StreamingResponse(
-        event_generator(),
+        sse.stream(event_generator(), is_disconnected=request.is_disconnected),
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
@@ -1046,6 +862,20 @@ async def delete_chat_session(req: DeleteSessionRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# ---------------------------------------------------------------------------
+# POST /profile/invalidate — Drop the cached profile after a settings change
+# ---------------------------------------------------------------------------
+class ProfileInvalidateRequest(BaseModel):
+    user_id: str
+
+
+@app.post("/profile/invalidate", dependencies=[Depends(verify_api_key)])
+async def invalidate_profile(req: ProfileInvalidateRequest):
+    """Forget the cached users/{user_id} profile so the next read is fresh."""
+    invalidate_user_profile(req.user_id)
+    return {"success": True}
+
+
 # ---------------------------------------------------------------------------
 # POST /search/product
 # ---------------------------------------------------------------------------
@@ -1058,7 +888,7 @@ async def search_product(req: ProductSearchRequest):
         app_name=APP_NAME,
         user_id=req.user_id,
         session_id=session_id,
-        state=_build_user_state(req.user_id),
+        state=await run_blocking(_build_user_state, req.user_id),
     )
 
     # Create a dedicated runner for the product_search_agent
@@ -1074,22 +904,24 @@ async def search_product(req: ProductSearchRequest):
         parts=[types.Part(text=f"以下のコスメ商品を検索して、正確な商品情報をJSON形式で返してください: {req.keyword}")],
     )
 
-    full_text = ""
+    json_stream = JsonBlockStream()
+    json_blocks: list[Any] = []
     try:
         async for event in search_runner.run_async(
             user_id=req.user_id,
             session_id=session_id,
             new_message=message,
         ):
-            text = _extract_text_from_event(event)
+            text = classify_event(event).text
             if text:
-                full_text += text
+                json_blocks.extend(json_stream.feed(text))
     except Exception as e:
         logger.error("Product search agent error: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=f"Agent error: {str(e)}")
 
     # Parse structured output
-    json_blocks = _extract_json_blocks(full_text)
+    json_blocks.extend(json_stream.finish())
+    full_text = json_stream.text()
 
     results = []
     for block in json_blocks:
@@ -1125,7 +957,7 @@ async def enhance_recipe(req: EnhanceRecipeRequest):
         app_name=APP_NAME,
         user_id=req.user_id,
         session_id=session_id,
-        state=_build_user_state(req.user_id),
+        state=await run_blocking(_build_user_state, req.user_id),
     )
 
     steps_desc = "\n".join(
@@ -1157,22 +989,23 @@ JSON形式のみで回答してください。"""
         parts=[types.Part(text=prompt)],
     )
 
-    full_text = ""
+    json_stream = JsonBlockStream()
+    json_blocks: list[Any] = []
     try:
         async for event in runner.run_async(
             user_id=req.user_id,
             session_id=session_id,
             new_message=message,
         ):
-            text = _extract_text_from_event(event)
+            text = classify_event(event).text
             if text:
-                full_text += text
+                json_blocks.extend(json_stream.feed(text))
     except Exception as e:
         logger.error("Enhance recipe error: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=f"Agent error: {str(e)}")
 
     # Parse JSON from response
-    json_blocks = _extract_json_blocks(full_text)
+    json_blocks.extend(json_stream.finish())
     if json_blocks and isinstance(json_blocks[0], dict):
         return json_blocks[0]
 
@@ -1196,6 +1029,7 @@ async def generate_image_endpoint(req: GenerateImageRequest):
                 user_id=req.user_id,
                 steps=req.steps,
                 theme=req.theme,
+                priority=PRIORITY_INTERACTIVE,
             ),
             timeout=180,
         )
@@ -1207,6 +1041,22 @@ async def generate_image_endpoint(req: GenerateImageRequest):
         raise HTTPException(status_code=500, detail=f"Image generation failed: {str(e)}")
 
 
+# ---------------------------------------------------------------------------
+# GET /preview-status/{recipe_id} — Poll a queued preview image job
+# ---------------------------------------------------------------------------
+@app.get("/preview-status/{recipe_id}", dependencies=[Depends(verify_api_key)])
+async def preview_status(recipe_id: str, user_id: str):
+    """Return {status, image_url} for a recipe's preview image job."""
+    try:
+        status = await get_preview_queue().get_status(user_id, recipe_id)
+    except Exception as e:
+        logger.error("Preview status error: %s", e, exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Preview status lookup failed: {str(e)}")
+    if status is None:
+        raise HTTPException(status_code=404, detail="Recipe not found")
+    return {"recipe_id": recipe_id, **status}
+
+
 # ---------------------------------------------------------------------------
 # GET /health
 # ---------------------------------------------------------------------------
@@ -1232,23 +1082,7 @@ async def process_image(request: Request):
             None, _process_product_image, image_bytes
         )
 
-        # Upload to GCS
-        from google.cloud import storage as gcs
-        bucket_name = os.getenv("GCS_CATALOG_BUCKET", "alcheme-catalog-images")
-        client = gcs.Client()
-        bucket = client.bucket(bucket_name)
-        blob = bucket.blob(f"catalog/{catalog_id}.webp")
-        blob.upload_from_string(result_bytes, content_type="image/webp")
-        blob.make_public()
-        image_url = blob.public_url
-
-        # Update catalog entry with processed image
-        db = _get_firestore()
-        db.collection("catalog").document(catalog_id).update({
-            "image_url": image_url,
-            "updated_at": firestore_lib.SERVER_TIMESTAMP,
-        })
-
+        image_url = await run_blocking(_store_catalog_image, catalog_id, result_bytes)
         return {"image_url": image_url}
     except HTTPException:
         raise
@@ -1257,6 +1091,26 @@ async def process_image(request: Request):
         raise HTTPException(500, str(e))
 
 
+def _store_catalog_image(catalog_id: str, image_bytes: bytes) -> str:
+    """Upload a processed catalog image to GCS and point the catalog entry at it."""
+    from google.cloud import storage as gcs
+    bucket_name = os.getenv("GCS_CATALOG_BUCKET", "alcheme-catalog-images")
+    client = gcs.Client()
+    bucket = client.bucket(bucket_name)
+    blob = bucket.blob(f"catalog/{catalog_id}.webp")
+    blob.upload_from_string(image_bytes, content_type="image/webp")
+    blob.make_public()
+    image_url = blob.public_url
+
+    # Update catalog entry with processed image
+    db = _get_firestore()
+    db.collection("catalog").document(catalog_id).update({
+        "image_url": image_url,
+        "updated_at": firestore_lib.SERVER_TIMESTAMP,
+    })
+    return image_url
+
+
 def _process_product_image(image_bytes: bytes) -> bytes:
     """Normalize image to 512x512 square with white bg (no background removal)."""
     from io import BytesIO
@@ -1349,5 +1203,26 @@ async def update_theme_status_endpoint(req: UpdateThemeStatusRequest):
 
 
 @app.get("/health")
-async def health():
-    return {"status": "ok", "app": APP_NAME, "agent": root_agent.name}
+async def health(deep: bool = False):
+    """Liveness + cache/queue counters. ?deep=true also pings the genai client."""
+    result = {
+        "status": "ok",
+        "app": APP_NAME,
+        "agent": root_agent.name,
+        "caches": {
+            "rakuten": get_rakuten_cache().stats(),
+            "images": get_image_cache().stats(),
+            "profiles": get_profile_cache().stats(),
+        },
+        "preview_jobs": get_preview_queue().stats(),
+        "catalog_counters": get_counter_rollup().stats(),
+        "image_scheduler": get_image_scheduler().stats(),
+        "genai": genai_clients.stats(),
+        "turn_checkpoints": turn_checkpoint.stats(),
+        "sse": sse.stats(),
+        "sessions": {**session_service.stats(), "compaction": session_compactor.stats()},
+        "memory": memory_service.stats() if hasattr(memory_service, "stats") else {"backend": "memory"},
+    }
+    if deep:
+        result["genai"]["ok"] = await genai_clients.check_genai_client()
+    return result
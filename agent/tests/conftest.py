@@ -102,3 +102,14 @@ def mock_tool_context(sample_items):
         "user:id": "test-user-001",
     }
     return ctx
+
+
+@pytest.fixture(autouse=True)
+def profile_cache():
+    """Fresh profile cache per test that never reaches real Firestore."""
+    from alcheme.profile_cache import ProfileCache
+
+    cache = ProfileCache()
+    with patch("alcheme.profile_cache._cache", cache), \
+         patch("alcheme.profile_cache._read_profile", return_value={}):
+        yield cache
@@ -0,0 +1,193 @@
+"""Tests for alcheme/catalog_counters.py — sharded catalog counts.
+
+TestEmulator runs against the Firestore emulator and is skipped unless
+FIRESTORE_EMULATOR_HOST is set:
+
+    firebase emulators:start --only firestore
+    FIRESTORE_EMULATOR_HOST=localhost:8081 python -m pytest tests/test_catalog_counters.py
+"""
+
+import os
+import uuid
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from alcheme import catalog_counters
+from alcheme.catalog_counters import CounterRollup, increment_shard, read_shard_totals
+from alcheme.tools import catalog_tools
+from alcheme.tools.catalog_tools import _upsert_entries, upsert_catalog
+
+
+class TestIncrementShard:
+    def test_writes_one_shard_with_merge(self):
+        writer = MagicMock()
+        catalog_ref = MagicMock()
+
+        increment_shard(writer, catalog_ref, {"contributor_count": 1, "have_count": 1}, num_shards=4)
+
+        catalog_ref.collection.assert_called_once_with("counter_shards")
+        shard_id = catalog_ref.collection.return_value.document.call_args[0][0]
+        assert shard_id in {"0", "1", "2", "3"}
+        _, data = writer.set.call_args[0]
+        assert data["have_count"].value == 1
+        assert writer.set.call_args.kwargs == {"merge": True}
+
+
+class TestUpsertEntriesSharded:
+    def _db(self, existing: dict) -> MagicMock:
+        db = MagicMock()
+        snap = MagicMock(exists=True)
+        snap.id = "cat1"
+        snap.to_dict.return_value = existing
+        db.get_all.return_value = [snap]
+        db.collection.return_value.document.return_value = MagicMock(id="cat1")
+        return db
+
+    def test_counts_go_to_shard_not_doc(self):
+        db = self._db({"brand": "KATE", "product_name": "リップモンスター"})
+        txn = MagicMock()
+
+        _upsert_entries.to_wrap(txn, db, {"cat1": ({"brand": "KATE"}, 1)}, "have", 8)
+
+        txn.update.assert_not_called()
+        txn.set.assert_called_once()
+        assert txn.set.call_args[0][1]["contributor_count"].value == 1
+
+    def test_empty_fields_are_still_filled_on_doc(self):
+        db = self._db({"brand": "KATE", "product_name": "リップモンスター"})
+        txn = MagicMock()
+
+        _upsert_entries.to_wrap(txn, db, {"cat1": ({"texture": "matte"}, 1)}, "want", 8)
+
+        updates = txn.update.call_args[0][1]
+        assert updates["texture"] == "matte"
+        assert "want_count" not in updates
+        assert txn.set.call_args[0][1]["want_count"].value == 1
+
+    @patch("alcheme.tools.catalog_tools._get_db")
+    def test_upsert_marks_entry_for_rollup(self, mock_get_db):
+        mock_get_db.return_value.transaction.return_value._max_attempts = 1
+        mock_get_db.return_value.transaction.return_value._read_only = False
+        mock_get_db.return_value.get_all.return_value = []
+        rollup = CounterRollup()
+        with patch.object(catalog_counters, "CATALOG_COUNTER_SHARDS", 4), \
+             patch.object(catalog_counters, "_rollup", rollup):
+            doc_id = upsert_catalog({"brand": "KATE", "product_name": "リップモンスター"})
+        assert rollup.stats()["pending"] == 1
+        assert doc_id in rollup._dirty
+
+
+class TestReadShardTotals:
+    def test_sums_per_entry(self):
+        db = MagicMock()
+
+        def shard(catalog_id, data):
+            snap = MagicMock(exists=True)
+            snap.to_dict.return_value = data
+            snap.reference.parent.parent.id = catalog_id
+            return snap
+
+        db.get_all.return_value = [
+            shard("a", {"contributor_count": 2, "have_count": 2}),
+            shard("a", {"contributor_count": 1, "want_count": 1}),
+            MagicMock(exists=False),
+        ]
+
+        totals = read_shard_totals(db, ["a", "b"], num_shards=3)
+
+        assert totals == {"a": {"contributor_count": 3, "have_count": 2, "want_count": 1}}
+        assert len(db.get_all.call_args[0][0]) == 6
+
+    def test_search_adds_shard_totals(self):
+        doc = MagicMock()
+        doc.id = "a"
+        doc.to_dict.return_value = {"brand": "KATE", "contributor_count": 10, "have_count": 7}
+        db = MagicMock()
+        db.collection.return_value.where.return_value.where.return_value.limit.return_value.stream.side_effect = [[doc], []]
+        with patch.object(catalog_tools, "_get_db", return_value=db), \
+             patch.object(catalog_counters, "CATALOG_COUNTER_SHARDS", 4), \
+             patch.object(catalog_counters, "read_shard_totals",
+                          return_value={"a": {"contributor_count": 3, "have_count": 3, "want_count": 0}}):
+            result = catalog_tools.search_catalog("kate", MagicMock())
+        assert result["results"][0]["contributor_count"] == 13
+        assert result["results"][0]["have_count"] == 10
+
+
+class TestCounterRollup:
+    async def test_flush_rolls_up_marked_entries_once(self):
+        rollup = CounterRollup()
+        rollup.mark(["a", "b"])
+        rollup.mark(["a"])
+        with patch.object(catalog_counters, "rollup_catalog_counters", return_value=True) as mock_rollup:
+            assert await rollup.flush() == 2
+        assert sorted(c.args[0] for c in mock_rollup.call_args_list) == ["a", "b"]
+        assert rollup.stats()["pending"] == 0
+        assert rollup.stats()["rollups"] == 2
+
+    async def test_failed_entries_are_retried_later(self):
+        rollup = CounterRollup()
+        rollup.mark(["a"])
+        with patch.object(catalog_counters, "rollup_catalog_counters", side_effect=RuntimeError("aborted")):
+            assert await rollup.flush() == 0
+        assert rollup.stats()["pending"] == 1
+        assert rollup.stats()["failures"] == 1
+
+    async def test_loop_not_started_without_sharding(self):
+        rollup = CounterRollup()
+        rollup.start()
+        assert rollup._task is None
+        await rollup.stop()
+
+
+@pytest.mark.skipif(not os.environ.get("FIRESTORE_EMULATOR_HOST"), reason="needs the Firestore emulator")
+class TestEmulator:
+    SHARDS = 4
+
+    @pytest.fixture
+    def db(self):
+        from google.cloud import firestore
+
+        client = firestore.Client(project=os.environ.get("GOOGLE_CLOUD_PROJECT", "demo-alcheme"))
+        with patch.object(catalog_tools, "_get_db", return_value=client), \
+             patch.object(catalog_counters, "_get_firestore", return_value=client), \
+             patch.object(catalog_counters, "CATALOG_COUNTER_SHARDS", self.SHARDS), \
+             patch.object(catalog_counters, "_rollup", CounterRollup()):
+            yield client
+
+    def _product(self) -> dict:
+        return {"brand": f"BENCH-{uuid.uuid4().hex[:8]}", "product_name": "リップモンスター"}
+
+    def _count(self, db, catalog_id: str, field: str) -> int:
+        stored = db.collection("catalog").document(catalog_id).get().to_dict()[field]
+        pending = read_shard_totals(db, [catalog_id], self.SHARDS).get(catalog_id, {}).get(field, 0)
+        return stored + pending
+
+    def test_reads_aggregate_shards(self, db):
+        product = self._product()
+        for _ in range(12):
+            catalog_id = upsert_catalog(product)
+        upsert_catalog(product, "want")
+
+        assert self._count(db, catalog_id, "contributor_count") == 13
+        assert self._count(db, catalog_id, "have_count") == 12
+        assert self._count(db, catalog_id, "want_count") == 1
+
+    async def test_rollup_folds_shards_into_doc(self, db):
+        product = self._product()
+        for _ in range(10):
+            catalog_id = upsert_catalog(product)
+
+        assert await catalog_counters.get_counter_rollup().flush() == 1
+
+        data = db.collection("catalog").document(catalog_id).get().to_dict()
+        assert data["contributor_count"] == 10
+        assert data["have_count"] == 10
+        assert read_shard_totals(db, [catalog_id], self.SHARDS) == {}
+
+    def test_batched_upsert_counts_duplicates(self, db):
+        product = self._product()
+        catalog_tools.upsert_catalog_many([product, product])
+        ids = catalog_tools.upsert_catalog_many([product, product, product])
+
+        assert self._count(db, ids[0], "have_count") == 5
@@ -3,7 +3,7 @@
 from unittest.mock import MagicMock, patch
 import pytest
 
-from alcheme.tools.catalog_tools import _catalog_doc_id, upsert_catalog, search_catalog
+from alcheme.tools.catalog_tools import _catalog_doc_id, upsert_catalog, upsert_catalog_many, search_catalog
 
 
 # ---------- _catalog_doc_id tests ----------
@@ -76,9 +76,8 @@ class TestCatalogDocId:
 
 
 def _make_mock_db(existing_data=None):
-    """Create mock Firestore client."""
+    """Create mock Firestore client; returns (db, transaction)."""
     mock_db = MagicMock()
-    mock_doc_ref = MagicMock()
     mock_snapshot = MagicMock()
 
     if existing_data is not None:
@@ -87,10 +86,26 @@ def _make_mock_db(existing_data=None):
     else:
         mock_snapshot.exists = False
 
-    mock_doc_ref.get.return_value = mock_snapshot
-    mock_db.collection.return_value.document.return_value = mock_doc_ref
+    def get_all(refs, transaction=None):
+        snaps = []
+        for ref in refs:
+            snap = MagicMock(exists=mock_snapshot.exists, to_dict=mock_snapshot.to_dict)
+            snap.id = ref._doc_id
+            snaps.append(snap)
+        return snaps
 
-    return mock_db, mock_doc_ref
+    def document(doc_id):
+        ref = MagicMock()
+        ref._doc_id = doc_id
+        return ref
+
+    mock_db.collection.return_value.document.side_effect = document
+    mock_db.get_all.side_effect = get_all
+    mock_txn = mock_db.transaction.return_value
+    mock_txn._max_attempts = 1
+    mock_txn._read_only = False
+
+    return mock_db, mock_txn
 
 
 class TestUpsertCatalog:
@@ -98,7 +113,7 @@ class TestUpsertCatalog:
 
     @patch("alcheme.tools.catalog_tools._get_db")
     def test_creates_new_entry(self, mock_get_db):
-        mock_db, mock_doc_ref = _make_mock_db(existing_data=None)
+        mock_db, mock_txn = _make_mock_db(existing_data=None)
         mock_get_db.return_value = mock_db
 
         doc_id = upsert_catalog({
@@ -109,8 +124,8 @@ class TestUpsertCatalog:
         })
 
         assert doc_id != ""
-        mock_doc_ref.set.assert_called_once()
-        call_args = mock_doc_ref.set.call_args[0][0]
+        mock_txn.create.assert_called_once()
+        call_args = mock_txn.create.call_args[0][1]
         assert call_args["brand"] == "KATE"
         assert call_args["product_name"] == "リップモンスター"
         assert call_args["contributor_count"] == 1
@@ -118,7 +133,7 @@ class TestUpsertCatalog:
 
     @patch("alcheme.tools.catalog_tools._get_db")
     def test_merges_existing_entry(self, mock_get_db):
-        mock_db, mock_doc_ref = _make_mock_db(existing_data={
+        mock_db, mock_txn = _make_mock_db(existing_data={
             "brand": "KATE",
             "product_name": "リップモンスター",
             "color_code": "03",
@@ -136,14 +151,14 @@ class TestUpsertCatalog:
         })
 
         assert doc_id != ""
-        mock_doc_ref.update.assert_called_once()
-        call_args = mock_doc_ref.update.call_args[0][0]
+        mock_txn.update.assert_called_once()
+        call_args = mock_txn.update.call_args[0][1]
         # image_url was null, should be filled
         assert call_args["image_url"] == "https://example.com/image.jpg"
 
     @patch("alcheme.tools.catalog_tools._get_db")
     def test_does_not_overwrite_existing_values(self, mock_get_db):
-        mock_db, mock_doc_ref = _make_mock_db(existing_data={
+        mock_db, mock_txn = _make_mock_db(existing_data={
             "brand": "KATE",
             "product_name": "リップモンスター",
             "category": "リップ",
@@ -158,7 +173,7 @@ class TestUpsertCatalog:
             "image_url": "https://new.com/image.jpg",
         })
 
-        call_args = mock_doc_ref.update.call_args[0][0]
+        call_args = mock_txn.update.call_args[0][1]
         # Should NOT overwrite existing image_url
         assert "image_url" not in call_args or call_args.get("image_url") != "https://new.com/image.jpg"
 
@@ -173,6 +188,70 @@ class TestUpsertCatalog:
         assert doc_id == ""
 
 
+    @patch("alcheme.tools.catalog_tools._get_db")
+    def test_reads_inside_transaction(self, mock_get_db):
+        mock_db, mock_txn = _make_mock_db(existing_data=None)
+        mock_get_db.return_value = mock_db
+
+        upsert_catalog({"brand": "KATE", "product_name": "リップモンスター"})
+
+        assert mock_db.get_all.call_args.kwargs["transaction"] is mock_txn
+        mock_txn._commit.assert_called_once()
+
+
+class TestUpsertCatalogMany:
+    """Tests for the batched catalog upsert."""
+
+    @patch("alcheme.tools.catalog_tools._get_db")
+    def test_one_read_and_one_commit(self, mock_get_db):
+        mock_db, mock_txn = _make_mock_db(existing_data=None)
+        mock_get_db.return_value = mock_db
+
+        ids = upsert_catalog_many([
+            {"brand": "KATE", "product_name": "リップモンスター", "color_code": "03"},
+            {"brand": "CANMAKE", "product_name": "マシュマロフィニッシュパウダー"},
+        ])
+
+        assert ids == [
+            _catalog_doc_id("KATE", "リップモンスター", "03"),
+            _catalog_doc_id("CANMAKE", "マシュマロフィニッシュパウダー"),
+        ]
+        mock_db.get_all.assert_called_once()
+        assert mock_txn.create.call_count == 2
+        mock_txn._commit.assert_called_once()
+
+    @patch("alcheme.tools.catalog_tools._get_db")
+    def test_duplicates_are_counted_once_per_occurrence(self, mock_get_db):
+        mock_db, mock_txn = _make_mock_db(existing_data={"brand": "KATE", "product_name": "リップモンスター"})
+        mock_get_db.return_value = mock_db
+
+        upsert_catalog_many([
+            {"brand": "KATE", "product_name": "リップモンスター"},
+            {"brand": "kate", "product_name": "リップモンスター", "texture": "matte"},
+        ])
+
+        mock_txn.update.assert_called_once()
+        updates = mock_txn.update.call_args[0][1]
+        assert updates["contributor_count"].value == 2
+        assert updates["have_count"].value == 2
+        assert updates["texture"] == "matte"
+
+    @patch("alcheme.tools.catalog_tools._get_db")
+    def test_skips_incomplete_products(self, mock_get_db):
+        mock_db, mock_txn = _make_mock_db(existing_data=None)
+        mock_get_db.return_value = mock_db
+
+        ids = upsert_catalog_many([{"brand": "KATE"}, {"brand": "KATE", "product_name": "リップモンスター"}], "want")
+
+        assert ids[0] == ""
+        assert mock_txn.create.call_args[0][1]["want_count"] == 1
+
+    @patch("alcheme.tools.catalog_tools._get_db")
+    def test_nothing_to_write(self, mock_get_db):
+        assert upsert_catalog_many([{"product_name": "リップモンスター"}]) == [""]
+        mock_get_db.assert_not_called()
+
+
 # ---------- search_catalog tests ----------
 
 
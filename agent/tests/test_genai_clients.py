@@ -0,0 +1,78 @@
+"""Tests for alcheme/genai_clients.py — shared genai client registry."""
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from alcheme import genai_clients
+
+
+@pytest.fixture(autouse=True)
+def fresh_registry():
+    genai_clients.reset_genai_clients()
+    yield
+    genai_clients.reset_genai_clients()
+
+
+@pytest.fixture
+def vertex_env(monkeypatch):
+    monkeypatch.setenv("GOOGLE_GENAI_USE_VERTEXAI", "TRUE")
+    monkeypatch.setenv("GOOGLE_CLOUD_PROJECT", "test-project")
+    monkeypatch.setenv("GOOGLE_CLOUD_LOCATION", "asia-northeast1")
+
+
+class TestGetGenaiClient:
+    @patch("alcheme.genai_clients.genai.Client")
+    def test_reuses_client(self, mock_client_cls, vertex_env):
+        first = genai_clients.get_genai_client("us-central1")
+        second = genai_clients.get_genai_client("us-central1")
+        assert first is second
+        mock_client_cls.assert_called_once()
+        assert mock_client_cls.call_args.kwargs["location"] == "us-central1"
+        assert genai_clients.stats()["reused"] == 1
+
+    @patch("alcheme.genai_clients.genai.Client")
+    def test_one_client_per_location(self, mock_client_cls, vertex_env):
+        mock_client_cls.side_effect = lambda **kw: MagicMock()
+        image = genai_clients.get_genai_client("us-central1")
+        text = genai_clients.get_genai_client()
+        assert image is not text
+        assert mock_client_cls.call_args.kwargs["location"] == "asia-northeast1"
+        assert genai_clients.stats()["clients"] == 2
+
+    @patch("alcheme.genai_clients.genai.Client")
+    def test_api_key_mode_ignores_location(self, mock_client_cls, monkeypatch):
+        monkeypatch.delenv("GOOGLE_GENAI_USE_VERTEXAI", raising=False)
+        assert genai_clients.get_genai_client("us-central1") is genai_clients.get_genai_client()
+        mock_client_cls.assert_called_once()
+        assert "vertexai" not in mock_client_cls.call_args.kwargs
+
+    @patch("alcheme.genai_clients.genai.Client")
+    def test_evict_rebuilds(self, mock_client_cls, vertex_env):
+        mock_client_cls.side_effect = lambda **kw: MagicMock()
+        first = genai_clients.get_genai_client()
+        genai_clients.evict_genai_client()
+        assert genai_clients.get_genai_client() is not first
+
+
+class TestCheckGenaiClient:
+    async def test_failure_evicts(self, vertex_env):
+        broken = MagicMock()
+        broken.aio.models.list.side_effect = Exception("UNAUTHENTICATED")
+        with patch("alcheme.genai_clients.genai.Client", return_value=broken):
+            assert await genai_clients.check_genai_client() is False
+        assert genai_clients.stats()["clients"] == 0
+
+    async def test_success(self, vertex_env):
+        async def pager():
+            yield MagicMock()
+
+        client = MagicMock()
+
+        async def list_models(**kwargs):
+            return pager()
+
+        client.aio.models.list = list_models
+        with patch("alcheme.genai_clients.genai.Client", return_value=client):
+            assert await genai_clients.check_genai_client() is True
+        assert genai_clients.stats()["clients"] == 1
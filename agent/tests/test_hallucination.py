@@ -113,11 +113,15 @@ class TestValidateRecipeItemsTool:
         def mock_document(item_id):
             doc_ref = MagicMock()
             mock_doc = MagicMock()
+            mock_doc.id = item_id
             mock_doc.exists = item_id in INVENTORY_IDS
+            mock_doc.to_dict.return_value = {}
             doc_ref.get.return_value = mock_doc
             return doc_ref
 
         mock_ref.document.side_effect = mock_document
+        # Batched multi-get resolves the same per-document snapshots
+        mock_db.return_value.get_all.side_effect = lambda refs: [ref.get() for ref in refs]
 
         ids = ["item_001", "item_002", "item_004"]
         result = validate_recipe_items(json.dumps(ids), mock_tool_context)
@@ -134,11 +138,15 @@ class TestValidateRecipeItemsTool:
         def mock_document(item_id):
             doc_ref = MagicMock()
             mock_doc = MagicMock()
+            mock_doc.id = item_id
             mock_doc.exists = item_id in INVENTORY_IDS
+            mock_doc.to_dict.return_value = {}
             doc_ref.get.return_value = mock_doc
             return doc_ref
 
         mock_ref.document.side_effect = mock_document
+        # Batched multi-get resolves the same per-document snapshots
+        mock_db.return_value.get_all.side_effect = lambda refs: [ref.get() for ref in refs]
 
         ids = ["item_001", "item_HALLUCINATED", "item_999"]
         result = validate_recipe_items(json.dumps(ids), mock_tool_context)
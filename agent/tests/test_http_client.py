@@ -0,0 +1,76 @@
+"""Tests for http_client.py — pooled outbound HTTP clients."""
+
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+from alcheme import http_client
+
+
+class TestSyncSession:
+    def test_session_is_shared(self):
+        assert http_client.get_http_session() is http_client.get_http_session()
+
+    def test_adapter_pool_and_retry(self):
+        adapter = http_client.get_http_session().get_adapter("https://openapi.rakuten.co.jp/")
+        assert adapter._pool_maxsize == http_client.POOL_MAXSIZE
+        assert adapter.max_retries.total == http_client.MAX_RETRIES
+        assert 429 in adapter.max_retries.status_forcelist
+        assert 503 in adapter.max_retries.status_forcelist
+
+
+class TestAsyncGet:
+    def _client(self, handler):
+        return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    async def test_retries_then_succeeds(self):
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            if len(calls) < 2:
+                return httpx.Response(503)
+            return httpx.Response(200, json={"ok": True})
+
+        with patch.object(http_client, "get_async_http_client", return_value=self._client(handler)), \
+             patch.object(http_client, "BACKOFF_FACTOR", 0):
+            resp = await http_client.async_get("https://example.com/api")
+
+        assert resp.status_code == 200
+        assert len(calls) == 2
+
+    async def test_gives_up_after_max_retries(self):
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(429, headers={"Retry-After": "0"})
+
+        with patch.object(http_client, "get_async_http_client", return_value=self._client(handler)):
+            resp = await http_client.async_get("https://example.com/api")
+
+        assert resp.status_code == 429
+        assert len(calls) == http_client.MAX_RETRIES + 1
+
+    async def test_no_retry_on_client_error(self):
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(404)
+
+        with patch.object(http_client, "get_async_http_client", return_value=self._client(handler)):
+            resp = await http_client.async_get("https://example.com/api")
+
+        assert resp.status_code == 404
+        assert len(calls) == 1
+
+    async def test_transport_error_reraised(self):
+        def handler(request):
+            raise httpx.ConnectError("refused")
+
+        with patch.object(http_client, "get_async_http_client", return_value=self._client(handler)), \
+             patch.object(http_client, "BACKOFF_FACTOR", 0):
+            with pytest.raises(httpx.ConnectError):
+                await http_client.async_get("https://example.com/api")
@@ -0,0 +1,100 @@
+"""Tests for alcheme/tools/image_cache.py — prompt-keyed image cache."""
+
+from unittest.mock import MagicMock
+
+from alcheme.tools.image_cache import (
+    GeneratedImageCache,
+    LocalImageIndex,
+    copy_cached_image,
+    delete_superseded_images,
+    image_cache_key,
+)
+
+
+class TestImageCacheKey:
+    def test_deterministic(self):
+        assert image_cache_key("prompt", "model-a") == image_cache_key("prompt", "model-a")
+
+    def test_model_is_part_of_key(self):
+        assert image_cache_key("prompt", "model-a") != image_cache_key("prompt", "model-b")
+
+    def test_prompt_is_part_of_key(self):
+        assert image_cache_key("cute lip", "m") != image_cache_key("cool lip", "m")
+
+
+class TestGeneratedImageCache:
+    def test_miss_then_hit(self, tmp_path):
+        cache = GeneratedImageCache(LocalImageIndex(tmp_path))
+        key = image_cache_key("prompt", "m")
+        assert cache.lookup(key) is None
+        cache.store(key, "https://img/a.webp", "u/a.webp", "m")
+        entry = cache.lookup(key)
+        assert entry["image_url"] == "https://img/a.webp"
+        assert entry["blob_path"] == "u/a.webp"
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_rate"] == 0.5
+
+    def test_local_index_survives_new_instance(self, tmp_path):
+        GeneratedImageCache(LocalImageIndex(tmp_path)).store("k", "https://img/a.webp", "u/a.webp", "m")
+        assert GeneratedImageCache(LocalImageIndex(tmp_path)).lookup("k")["blob_path"] == "u/a.webp"
+
+    def test_entry_without_blob_path_is_a_miss(self, tmp_path):
+        LocalImageIndex(tmp_path).put("k", {"image_url": "https://img/a.webp", "model": "m"})
+        cache = GeneratedImageCache(LocalImageIndex(tmp_path))
+        assert cache.lookup("k") is None
+        assert cache.stats()["misses"] == 1
+
+    def test_mark_stale_turns_hit_into_miss(self, tmp_path):
+        cache = GeneratedImageCache(LocalImageIndex(tmp_path))
+        cache.store("k", "https://img/a.webp", "u/a.webp", "m")
+        cache.lookup("k")
+        cache.mark_stale()
+        assert cache.stats()["hits"] == 0
+        assert cache.stats()["misses"] == 1
+
+    def test_backend_error_is_a_miss(self):
+        backend = MagicMock()
+        backend.get.side_effect = Exception("GCS unavailable")
+        backend.put.side_effect = Exception("GCS unavailable")
+        cache = GeneratedImageCache(backend)
+        assert cache.lookup("k") is None
+        cache.store("k", "https://img/a.webp", "u/a.webp", "m")  # does not raise
+        assert cache.stats()["misses"] == 1
+
+    def test_disabled(self):
+        cache = GeneratedImageCache(None)
+        cache.store("k", "https://img/a.webp", "u/a.webp", "m")
+        assert cache.lookup("k") is None
+        assert cache.stats()["backend"] == "disabled"
+
+
+class TestBlobHelpers:
+    def test_copy_returns_none_when_source_is_gone(self):
+        from google.api_core.exceptions import NotFound
+
+        bucket = MagicMock()
+        bucket.copy_blob.side_effect = NotFound("gone")
+        assert copy_cached_image(bucket, "a/r1-x.webp", "b/r2-x.webp") is None
+
+    def test_copy_to_same_path_reuses_blob(self):
+        bucket = MagicMock()
+        assert copy_cached_image(bucket, "a/r1-x.webp", "a/r1-x.webp") == bucket.blob.return_value.public_url
+        bucket.copy_blob.assert_not_called()
+
+    def test_delete_superseded_keeps_current_and_other_docs(self):
+        bucket = MagicMock()
+        blobs = {name: MagicMock() for name in ("u/r1.webp", "u/r1-old.webp", "u/r1-new.webp", "u/r10-x.webp")}
+        for name, blob in blobs.items():
+            blob.name = name
+        bucket.list_blobs.return_value = list(blobs.values())
+
+        delete_superseded_images(bucket, "u/r1", "u/r1-new.webp")
+
+        assert [n for n, b in blobs.items() if b.delete.called] == ["u/r1.webp", "u/r1-old.webp"]
+
+    def test_delete_failure_is_logged_not_raised(self):
+        bucket = MagicMock()
+        bucket.list_blobs.side_effect = Exception("GCS unavailable")
+        delete_superseded_images(bucket, "u/r1", "u/r1-new.webp")
@@ -0,0 +1,118 @@
+"""Tests for alcheme/image_scheduler.py — image model rate limiting."""
+
+import asyncio
+import time
+
+import pytest
+
+from alcheme.image_scheduler import (
+    PRIORITY_INTERACTIVE,
+    PRIORITY_PREVIEW,
+    PRIORITY_THEME,
+    ImageRateLimited,
+    ImageScheduler,
+    ImageSchedulerBusy,
+)
+
+_WAIT = {PRIORITY_INTERACTIVE: 5, PRIORITY_PREVIEW: 5, PRIORITY_THEME: 5}
+
+
+def _scheduler(**kwargs) -> ImageScheduler:
+    kwargs.setdefault("max_wait", _WAIT)
+    kwargs.setdefault("retry_base", 0.01)
+    return ImageScheduler(**kwargs)
+
+
+class TestTokenBucket:
+    async def test_burst_then_rate_limited(self):
+        scheduler = _scheduler(rate_per_minute=600, burst=2)  # 10/s
+        start = time.monotonic()
+        for _ in range(4):
+            await scheduler.acquire()
+        elapsed = time.monotonic() - start
+        # 2 from the burst, then 2 more at 0.1s each
+        assert 0.15 < elapsed < 0.6
+        assert scheduler.stats()["granted"] == 4
+
+    async def test_priority_order(self):
+        scheduler = _scheduler(rate_per_minute=1200, burst=1)
+        await scheduler.acquire()  # drain the bucket
+        order = []
+
+        async def take(name, priority):
+            await scheduler.acquire(priority)
+            order.append(name)
+
+        tasks = [
+            asyncio.create_task(take("theme", PRIORITY_THEME)),
+            asyncio.create_task(take("preview", PRIORITY_PREVIEW)),
+            asyncio.create_task(take("interactive", PRIORITY_INTERACTIVE)),
+        ]
+        await asyncio.sleep(0)
+        assert scheduler.queue_depth() == {"interactive": 1, "preview": 1, "theme": 1}
+        await asyncio.gather(*tasks)
+        assert order == ["interactive", "preview", "theme"]
+
+    async def test_busy_after_wait_budget(self):
+        scheduler = _scheduler(rate_per_minute=1, burst=1, max_wait={PRIORITY_THEME: 0.05})
+        await scheduler.acquire(PRIORITY_THEME)
+        with pytest.raises(ImageSchedulerBusy):
+            await scheduler.acquire(PRIORITY_THEME)
+        assert scheduler.stats()["rejected"] == 1
+        assert scheduler.queue_depth()["theme"] == 0
+
+
+class TestGenerate:
+    async def test_retries_429_then_succeeds(self):
+        scheduler = _scheduler(rate_per_minute=6000, burst=5)
+        calls = 0
+
+        async def call():
+            nonlocal calls
+            calls += 1
+            if calls < 3:
+                raise Exception("429 RESOURCE_EXHAUSTED")
+            return "image"
+
+        assert await scheduler.generate(call) == "image"
+        assert calls == 3
+        assert scheduler.stats()["throttled"] == 2
+
+    async def test_429_pauses_other_requests(self):
+        """A 429 on one request holds back every other request, not just the caller."""
+        scheduler = _scheduler(rate_per_minute=6000, burst=5, retry_base=0.2)
+        failed = False
+
+        async def flaky():
+            nonlocal failed
+            if not failed:
+                failed = True
+                raise Exception("429 RESOURCE_EXHAUSTED")
+            return "ok"
+
+        first = asyncio.create_task(scheduler.generate(flaky))
+        await asyncio.sleep(0.01)  # first request has hit the 429
+        start = time.monotonic()
+        await scheduler.acquire(PRIORITY_INTERACTIVE)
+        # Pause is 0.1-0.3s (0.2s base with jitter) even though tokens were banked
+        assert time.monotonic() - start >= 0.05
+        assert await first == "ok"
+
+    async def test_gives_up_after_max_attempts(self):
+        scheduler = _scheduler(rate_per_minute=6000, burst=5, max_attempts=2)
+
+        async def always_429():
+            raise Exception("RESOURCE_EXHAUSTED")
+
+        with pytest.raises(ImageRateLimited):
+            await scheduler.generate(always_429)
+
+    async def test_other_errors_propagate(self):
+        scheduler = _scheduler(rate_per_minute=6000, burst=5)
+
+        async def broken():
+            raise ValueError("bad prompt")
+
+        with pytest.raises(ValueError):
+            await scheduler.generate(broken)
+        assert scheduler.stats()["throttled"] == 0
@@ -0,0 +1,69 @@
+"""Tests for inventory_index.py — bigram inverted index for search_inventory."""
+
+import pytest
+
+from alcheme.tools.inventory_index import InventorySearchIndex, ngrams, normalize_text
+
+
+def _linear_scan(items: list[dict], query: str) -> list[str]:
+    """Reference implementation: the original substring scan."""
+    q = query.lower()
+    fields = ("brand", "product_name", "color_code", "color_name", "color_description")
+    return [i["id"] for i in items if any(q in (i.get(f) or "").lower() for f in fields)]
+
+
+class TestNormalize:
+    def test_full_width_ascii(self):
+        assert normalize_text("ＫＡＴＥ") == "kate"
+
+    def test_half_width_kana(self):
+        assert normalize_text("ﾘｯﾌﾟ") == "リップ"
+
+    def test_none(self):
+        assert normalize_text(None) == ""
+
+
+class TestNgrams:
+    def test_unigrams_and_bigrams(self):
+        assert ngrams("陽炎") == {"陽", "炎", "陽炎"}
+
+    def test_no_bigram_across_space(self):
+        assert "e " not in ngrams("kate lip")
+        assert "el" not in ngrams("kate lip")
+
+
+class TestInventorySearchIndex:
+    def test_matches_linear_scan(self, sample_items):
+        """Single-term queries return the same items as the old substring scan."""
+        index = InventorySearchIndex(sample_items)
+        for query in ["KATE", "リップ", "03", "ブラウン", "陽", "s", "ファンデーション", "zzz"]:
+            assert sorted(i["id"] for i in index.search(query)) == sorted(_linear_scan(sample_items, query))
+
+    def test_kana_query(self, sample_items):
+        index = InventorySearchIndex(sample_items)
+        assert [i["id"] for i in index.search("モンスター")] == ["item_001"]
+
+    def test_multi_term_across_fields(self, sample_items):
+        """Whitespace-separated terms may match different fields."""
+        index = InventorySearchIndex(sample_items)
+        assert [i["id"] for i in index.search("kate 陽炎")] == ["item_001"]
+        assert index.search("kate ピーチ") == []
+
+    def test_ranking_prefers_exact_field(self):
+        items = [
+            {"id": "a", "brand": "X", "product_name": "Y", "color_description": "ローズ系"},
+            {"id": "b", "brand": "X", "product_name": "Y", "color_name": "ローズピンク"},
+            {"id": "c", "brand": "X", "product_name": "Y", "color_name": "ローズ"},
+        ]
+        index = InventorySearchIndex(items)
+        assert [i["id"] for i in index.search("ローズ")] == ["c", "b", "a"]
+
+    def test_incremental_add(self, sample_items):
+        index = InventorySearchIndex(sample_items)
+        assert index.search("ディオール") == []
+        index.add({"id": "item_new", "brand": "Dior", "product_name": "ルージュ ディオール"})
+        assert len(index) == len(sample_items) + 1
+        assert [i["id"] for i in index.search("ディオール")] == ["item_new"]
+
+    def test_empty_query(self, sample_items):
+        assert InventorySearchIndex(sample_items).search("   ") == []
@@ -1,6 +1,7 @@
 """Tests for inventory_tools.py — UT-P01~P10."""
 
 import json
+import uuid
 from unittest.mock import MagicMock, patch
 
 import pytest
@@ -12,6 +13,7 @@ from alcheme.tools.inventory_tools import (
     search_inventory,
     filter_inventory_by_category,
     add_items_to_inventory,
+    get_items_by_ids,
     validate_recipe_items,
 )
 
@@ -204,6 +206,39 @@ class TestAddItemsToInventory:
         assert result["status"] == "success"
         assert len(result["added_ids"]) == 2
 
+    @patch("alcheme.tools.catalog_tools.upsert_catalog_many")
+    @patch("alcheme.tools.inventory_tools._get_db")
+    def test_catalog_upserts_are_batched(self, mock_db, mock_upsert_many, mock_tool_context):
+        """All new products go to the catalog in one call; repeats of a product are not re-upserted."""
+        sub_ref = mock_db.return_value.collection.return_value.document.return_value.collection.return_value
+        sub_ref.stream.return_value = []
+        sub_ref.document.side_effect = lambda: MagicMock(id=uuid.uuid4().hex)
+        mock_upsert_many.return_value = ["cat_a", "cat_b"]
+
+        items = [
+            {"category": "Lip", "brand": "A", "product_name": "A"},
+            {"category": "Eye", "brand": "B", "product_name": "B"},
+            {"category": "Lip", "brand": "A", "product_name": "A"},
+        ]
+        result = add_items_to_inventory(json.dumps(items), mock_tool_context)
+
+        assert result["status"] == "success"
+        assert len(result["added_ids"]) == 3
+        mock_upsert_many.assert_called_once()
+        products = mock_upsert_many.call_args[0][0]
+        assert [p["brand"] for p in products] == ["A", "B"]
+        assert [p["catalog_id"] for p in products] == ["cat_a", "cat_b"]
+
+    @patch("alcheme.tools.catalog_tools.upsert_catalog_many", side_effect=RuntimeError("contention"))
+    @patch("alcheme.tools.inventory_tools._get_db")
+    def test_catalog_failure_does_not_block(self, mock_db, mock_upsert_many, mock_tool_context):
+        mock_db.return_value.collection.return_value.document.return_value.collection.return_value.stream.return_value = []
+
+        result = add_items_to_inventory(json.dumps([{"brand": "A", "product_name": "A"}]), mock_tool_context)
+
+        assert result["status"] == "success"
+        assert len(result["added_ids"]) == 1
+
     @patch("alcheme.tools.inventory_tools._get_db")
     def test_add_invalid_json(self, mock_db, mock_tool_context):
         """Add with invalid JSON returns error."""
@@ -216,45 +251,33 @@ class TestAddItemsToInventory:
 # ---------------------------------------------------------------------------
 class TestValidateRecipeItems:
     @patch("alcheme.tools.inventory_tools._get_db")
-    def test_all_valid(self, mock_db, mock_tool_context, sample_item_ids):
-        """All item IDs exist in inventory."""
-        mock_ref = MagicMock()
-        mock_db.return_value.collection.return_value.document.return_value.collection.return_value = mock_ref
-
-        # All docs exist
-        mock_doc = MagicMock()
-        mock_doc.exists = True
-        mock_ref.document.return_value.get.return_value = mock_doc
+    def test_all_valid(self, mock_db, mock_tool_context, sample_items):
+        """All item IDs exist in inventory; metadata comes back in the same call."""
+        db = _batched_db(inventory={item["id"]: item for item in sample_items}, products={})
+        mock_db.return_value = db
 
-        ids = list(sample_item_ids)
+        ids = [item["id"] for item in sample_items]
         result = validate_recipe_items(json.dumps(ids), mock_tool_context)
         assert result["status"] == "success"
         assert result["all_valid"] is True
         assert result["missing_items"] == []
+        assert result["items"]["item_001"] == {
+            "brand": "KATE",
+            "product_name": "リップモンスター",
+            "category": "Lip",
+            "color_code": "03",
+            "color_name": "陽炎",
+            "texture": "matte",
+        }
+        assert db.get_all.call_count == 1  # legacy items: no product lookup
 
     @patch("alcheme.tools.inventory_tools._get_db")
     def test_some_missing(self, mock_db, mock_tool_context):
         """Some item IDs don't exist in inventory."""
-        mock_ref = MagicMock()
-        mock_db.return_value.collection.return_value.document.return_value.collection.return_value = mock_ref
-
-        def get_doc(item_id):
-            doc = MagicMock()
-            # Only "item_001" exists
-            doc.exists = (item_id == "item_001")
-            return doc
-
-        mock_ref.document.return_value.get.side_effect = lambda: get_doc("unknown")
-
-        # We need to mock per-id
-        def mock_document(item_id):
-            doc_ref = MagicMock()
-            mock_doc = MagicMock()
-            mock_doc.exists = (item_id == "item_001")
-            doc_ref.get.return_value = mock_doc
-            return doc_ref
-
-        mock_ref.document.side_effect = mock_document
+        mock_db.return_value = _batched_db(
+            inventory={"item_001": {"product_id": "p1"}},
+            products={"p1": {"brand": "KATE", "product_name": "リップモンスター"}},
+        )
 
         result = validate_recipe_items(
             json.dumps(["item_001", "item_FAKE"]),
@@ -262,10 +285,228 @@ class TestValidateRecipeItems:
         )
         assert result["status"] == "success"
         assert result["all_valid"] is False
-        assert "item_FAKE" in result["missing_items"]
+        assert result["missing_items"] == ["item_FAKE"]
+        assert result["items"] == {"item_001": {"brand": "KATE", "product_name": "リップモンスター"}}
+
+    @patch("alcheme.tools.inventory_tools._get_db")
+    def test_uses_fresh_snapshot(self, mock_db, mock_tool_context, sample_items):
+        """A snapshot loaded earlier in the turn answers without Firestore reads."""
+        mock_tool_context.invocation_id = "inv-validate"
+        docs = []
+        for item in sample_items:
+            doc = MagicMock()
+            doc.id = item["id"]
+            doc.to_dict.return_value = item
+            docs.append(doc)
+        mock_db.return_value.collection.return_value.document.return_value.collection.return_value.stream.return_value = docs
+        get_inventory(mock_tool_context)
+
+        result = validate_recipe_items(json.dumps(["item_002", "item_FAKE"]), mock_tool_context)
+        assert result["missing_items"] == ["item_FAKE"]
+        assert result["items"]["item_002"]["brand"] == "EXCEL"
+        mock_db.return_value.get_all.assert_not_called()
 
     @patch("alcheme.tools.inventory_tools._get_db")
     def test_invalid_json(self, mock_db, mock_tool_context):
         """Invalid JSON returns error."""
         result = validate_recipe_items("not json", mock_tool_context)
         assert result["status"] == "error"
+
+
+# ---------------------------------------------------------------------------
+# Batched lookup by item ID
+# ---------------------------------------------------------------------------
+def _batched_db(inventory: dict[str, dict], products: dict[str, dict]) -> MagicMock:
+    """Mock client whose get_all resolves refs from the given collections."""
+    db = MagicMock()
+    collections = {"inventory": inventory, "products": products}
+
+    def collection(name):
+        coll = MagicMock()
+
+        def document(doc_id):
+            ref = MagicMock()
+            ref.id = doc_id
+            ref.data = collections[name].get(doc_id)
+            return ref
+
+        coll.document.side_effect = document
+        return coll
+
+    db.collection.return_value.document.return_value.collection.side_effect = collection
+
+    def get_all(refs):
+        for ref in refs:
+            snap = MagicMock()
+            snap.id = ref.id
+            snap.exists = ref.data is not None
+            snap.to_dict.return_value = ref.data
+            yield snap
+
+    db.get_all.side_effect = get_all
+    return db
+
+
+class TestGetItemsByIds:
+    @patch("alcheme.tools.inventory_tools._get_db")
+    def test_two_round_trips(self, mock_db):
+        db = _batched_db(
+            inventory={
+                "item_1": {"product_id": "p1", "estimated_remaining": "50%"},
+                "item_2": {"product_id": "p2"},
+                "item_3": {"product_id": "p1"},
+            },
+            products={
+                "p1": {"brand": "KATE", "product_name": "リップモンスター"},
+                "p2": {"brand": "CANMAKE", "product_name": "チーク"},
+            },
+        )
+        mock_db.return_value = db
+
+        items = get_items_by_ids("u1", ["item_3", "item_1", "item_FAKE", "item_2", "item_1"])
+
+        assert list(items) == ["item_3", "item_1", "item_2"]
+        assert items["item_1"]["brand"] == "KATE"
+        assert items["item_1"]["estimated_remaining"] == "50%"
+        assert items["item_2"]["product_name"] == "チーク"
+        assert db.get_all.call_count == 2
+        # Each product is requested once even when shared by several items
+        product_refs = db.get_all.call_args_list[1].args[0]
+        assert sorted(r.id for r in product_refs) == ["p1", "p2"]
+
+    @patch("alcheme.tools.inventory_tools._get_db")
+    def test_legacy_item_without_product(self, mock_db):
+        db = _batched_db(inventory={"item_1": {"brand": "EXCEL"}}, products={})
+        mock_db.return_value = db
+        items = get_items_by_ids("u1", ["item_1"])
+        assert items == {"item_1": {"brand": "EXCEL", "id": "item_1"}}
+        assert db.get_all.call_count == 1
+
+    @patch("alcheme.tools.inventory_tools._get_db")
+    def test_empty_ids_skip_firestore(self, mock_db):
+        assert get_items_by_ids("u1", []) == {}
+        mock_db.assert_not_called()
+
+
+# ---------------------------------------------------------------------------
+# Per-turn snapshot cache
+# ---------------------------------------------------------------------------
+class TestInventorySnapshotCache:
+    def _setup_docs(self, mock_db, sample_items):
+        mock_docs = []
+        for item in sample_items:
+            doc = MagicMock()
+            doc.id = item["id"]
+            doc.to_dict.return_value = item
+            mock_docs.append(doc)
+        collection = mock_db.return_value.collection.return_value.document.return_value.collection.return_value
+        collection.stream.return_value = mock_docs
+        return collection
+
+    def _ctx(self, user_id: str, invocation_id: str):
+        ctx = MagicMock()
+        ctx.state = {"user:id": user_id}
+        ctx.invocation_id = invocation_id
+        return ctx
+
+    @patch("alcheme.tools.inventory_tools._get_db")
+    def test_one_join_per_turn(self, mock_db, sample_items):
+        """Several inventory tools in one turn share a single products/inventory read."""
+        collection = self._setup_docs(mock_db, sample_items)
+        ctx = self._ctx("snapshot-user-1", "inv-1")
+
+        get_inventory(ctx)
+        search_inventory("KATE", ctx)
+        filter_inventory_by_category("Lip", ctx)
+        get_inventory_summary(ctx)
+
+        # products + inventory streamed once each
+        assert collection.stream.call_count == 2
+
+    @patch("alcheme.tools.inventory_tools._get_db")
+    def test_new_turn_reloads(self, mock_db, sample_items):
+        """A snapshot is not reused by a later invocation."""
+        collection = self._setup_docs(mock_db, sample_items)
+
+        get_inventory(self._ctx("snapshot-user-2", "inv-1"))
+        get_inventory(self._ctx("snapshot-user-2", "inv-2"))
+
+        assert collection.stream.call_count == 4
+
+    @patch("alcheme.tools.inventory_tools._get_db")
+    def test_add_updates_snapshot_in_place(self, mock_db, sample_items):
+        """add_items_to_inventory patches a current snapshot instead of re-joining."""
+        collection = self._setup_docs(mock_db, sample_items)
+        ctx = self._ctx("snapshot-user-3", "inv-1")
+
+        assert search_inventory("ルージュ", ctx)["count"] == 0
+        add_items_to_inventory(
+            json.dumps([{"brand": "Dior", "product_name": "ルージュ ディオール", "category": "リップ"}]),
+            ctx,
+        )
+        calls_after_add = collection.stream.call_count
+        result = search_inventory("ルージュ", ctx)
+
+        assert collection.stream.call_count == calls_after_add
+        assert result["count"] == 1
+        assert result["items"][0]["brand"] == "Dior"
+        assert len(get_inventory(ctx)["items"]) == len(sample_items) + 1
+
+    @patch("alcheme.tools.inventory_tools._get_db")
+    def test_added_item_keeps_inventory_id(self, mock_db, sample_items):
+        """A product doc carrying its own "id" field does not override the inventory doc ID."""
+        collection = self._setup_docs(mock_db, sample_items)
+        collection.document.return_value.id = "inv_new"
+        ctx = self._ctx("snapshot-user-4", "inv-1")
+
+        get_inventory(ctx)
+        # Same brand / name / color as the item_001 product doc, which has "id": "item_001"
+        add_items_to_inventory(
+            json.dumps([{"brand": "KATE", "product_name": "リップモンスター", "color_code": "03"}]),
+            ctx,
+        )
+
+        assert get_inventory(ctx)["items"][-1]["id"] == "inv_new"
+
+    @patch("alcheme.tools.inventory_tools._get_db")
+    def test_index_build_does_not_hold_global_lock(self, mock_db, sample_items):
+        """Building one user's index leaves the snapshot cache open to other users."""
+        from alcheme.tools import inventory_tools
+        from alcheme.tools.inventory_index import InventorySearchIndex
+
+        self._setup_docs(mock_db, sample_items)
+        ctx = self._ctx("snapshot-user-6", "inv-1")
+        lock_held: list[bool] = []
+
+        def build(items):
+            lock_held.append(inventory_tools._snapshot_lock.locked())
+            if lock_held[-1]:
+                return InventorySearchIndex(items)  # the add below would deadlock
+            # An add lands mid-build; its item must still reach the index
+            add_items_to_inventory(
+                json.dumps([{"brand": "Dior", "product_name": "ルージュ ディオール", "category": "リップ"}]),
+                ctx,
+            )
+            return InventorySearchIndex(items)
+
+        get_inventory(ctx)
+        with patch("alcheme.tools.inventory_tools.InventorySearchIndex", side_effect=build):
+            result = search_inventory("ルージュ", ctx)
+
+        assert lock_held == [False]
+        assert result["count"] == 1
+
+    @patch("alcheme.tools.inventory_tools._get_db")
+    def test_search_ranks_brand_over_description(self, mock_db, sample_items):
+        """Brand / product name matches rank above color_description matches."""
+        items = sample_items + [{
+            "id": "item_005",
+            "category": "リップ",
+            "brand": "ROMAND",
+            "product_name": "ジューシーラスティングティント",
+            "color_description": "CANMAKEに似たピーチ",
+        }]
+        self._setup_docs(mock_db, items)
+
+        result = search_inventory("canmake", self._ctx("snapshot-user-5", "inv-1"))
+        assert [i["id"] for i in result["items"]] == ["item_003", "item_005"]
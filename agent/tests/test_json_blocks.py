@@ -0,0 +1,64 @@
+"""Tests for alcheme/json_blocks.py — incremental fenced JSON extraction."""
+
+import json
+
+from alcheme.json_blocks import JsonBlockStream, extract_json_blocks
+
+RECIPE = {"recipe": {"recipe_name": "春メイク", "steps": [{"step": 1, "area": "lip"}]}}
+TEXT = "レシピです！\n```json\n" + json.dumps(RECIPE, ensure_ascii=False, indent=2) + "\n```\n楽しんでね"
+
+
+def _feed_in_chunks(text: str, size: int) -> tuple[JsonBlockStream, list[tuple[int, object]]]:
+    stream = JsonBlockStream()
+    seen = []
+    for offset in range(0, len(text), size):
+        for block in stream.feed(text[offset:offset + size]):
+            seen.append((offset + size, block))
+    return stream, seen
+
+
+class TestJsonBlockStream:
+    def test_block_emitted_when_fence_closes(self):
+        stream, seen = _feed_in_chunks(TEXT, 7)
+        assert [block for _, block in seen] == [RECIPE]
+        # Returned by the delta containing the closing fence, before the trailing text
+        assert seen[0][0] < len(TEXT)
+        assert stream.finish() == []
+        assert stream.text() == TEXT
+
+    def test_every_chunk_size_gives_same_blocks(self):
+        text = TEXT + "\n```json\n[1, 2]\n```"
+        for size in (1, 2, 3, 5, 64, len(text)):
+            stream, seen = _feed_in_chunks(text, size)
+            blocks = [block for _, block in seen] + stream.finish()
+            assert blocks == [RECIPE, [1, 2]], size
+
+    def test_closing_fence_without_trailing_newline(self):
+        stream = JsonBlockStream()
+        assert stream.feed('```json\n{"a": 1}\n') == []
+        assert stream.feed("``") == []
+        assert stream.feed("`") == [{"a": 1}]
+        assert stream.finish() == []
+
+    def test_untagged_fence(self):
+        assert extract_json_blocks('```\n{"a": 1}\n```') == [{"a": 1}]
+
+    def test_other_language_fence_is_skipped(self):
+        text = '```python\nprint("x")\n```\n```json\n{"a": 1}\n```'
+        assert extract_json_blocks(text) == [{"a": 1}]
+
+    def test_invalid_block_is_skipped(self):
+        assert extract_json_blocks('```json\n{not json}\n```\n```json\n{"a": 1}\n```') == [{"a": 1}]
+
+    def test_whole_text_fallback(self):
+        stream = JsonBlockStream()
+        stream.feed('{"recipe_name": ')
+        stream.feed('"x"}')
+        assert stream.finish() == [{"recipe_name": "x"}]
+
+    def test_no_fallback_when_a_block_parsed(self):
+        assert extract_json_blocks('```json\n{"a": 1}\n```') == [{"a": 1}]
+
+    def test_plain_text(self):
+        assert extract_json_blocks("こんにちは") == []
+        assert extract_json_blocks("") == []
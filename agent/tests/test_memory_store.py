@@ -0,0 +1,157 @@
+"""Tests for alcheme/memory_store.py — SQLite/FTS5 memory service."""
+
+import sqlite3
+import threading
+from unittest.mock import patch
+
+import pytest
+from google.adk.events.event import Event
+from google.adk.memory import InMemoryMemoryService
+from google.adk.sessions import Session
+from google.genai import types
+
+from alcheme.memory_store import SQLiteMemoryService, create_memory_service
+
+APP = "alcheme"
+
+
+def _event(text: str, author: str = "user", ts: float = 1_700_000_000.0) -> Event:
+    return Event(
+        author=author,
+        invocation_id="inv-1",
+        timestamp=ts,
+        content=types.Content(role="user" if author == "user" else "model", parts=[types.Part(text=text)]),
+    )
+
+
+def _session(user_id: str, events: list[Event], session_id: str = "chat-1") -> Session:
+    return Session(app_name=APP, user_id=user_id, id=session_id, events=events)
+
+
+@pytest.fixture
+def service(tmp_path):
+    svc = SQLiteMemoryService(str(tmp_path / "memory.db"), max_per_user=5, max_entries=8)
+    yield svc
+    svc.close()
+
+
+class TestSearch:
+    async def test_japanese_keyword_match(self, service):
+        await service.add_session_to_memory(_session("u1", [
+            _event("春っぽいピンクのリップメイクがしたい"),
+            _event("ブラウン系のアイシャドウを提案します", author="concierge"),
+        ]))
+        result = await service.search_memory(app_name=APP, user_id="u1", query="リップ")
+        assert len(result.memories) == 1
+        memory = result.memories[0]
+        assert memory.content.parts[0].text == "春っぽいピンクのリップメイクがしたい"
+        assert memory.author == "user"
+        assert memory.custom_metadata == {"session_id": "chat-1"}
+
+    async def test_short_terms_use_substring_scan(self, service):
+        await service.add_session_to_memory(_session("u1", [_event("春メイク"), _event("夏メイク")]))
+        result = await service.search_memory(app_name=APP, user_id="u1", query="春")
+        assert [m.content.parts[0].text for m in result.memories] == ["春メイク"]
+
+    async def test_case_and_width_insensitive(self, service):
+        await service.add_session_to_memory(_session("u1", [_event("KATE のリップモンスター")]))
+        result = await service.search_memory(app_name=APP, user_id="u1", query="ｋａｔｅ")
+        assert len(result.memories) == 1
+
+    async def test_partitioned_per_user(self, service):
+        await service.add_session_to_memory(_session("u1", [_event("リップモンスター")]))
+        result = await service.search_memory(app_name=APP, user_id="u2", query="リップモンスター")
+        assert result.memories == []
+
+    async def test_empty_query(self, service):
+        await service.add_session_to_memory(_session("u1", [_event("リップ")]))
+        result = await service.search_memory(app_name=APP, user_id="u1", query="  ")
+        assert result.memories == []
+
+
+class TestIngestion:
+    async def test_reingesting_a_session_does_not_duplicate(self, service):
+        events = [_event("リップモンスター"), _event("アイシャドウ")]
+        await service.add_session_to_memory(_session("u1", events))
+        await service.add_session_to_memory(_session("u1", events + [_event("チーク")]))
+        assert len(service) == 3
+        assert service.stats()["added"] == 3
+
+    async def test_add_events_to_memory(self, service):
+        await service.add_events_to_memory(app_name=APP, user_id="u1", events=[_event("下地")], session_id="s1")
+        result = await service.search_memory(app_name=APP, user_id="u1", query="下地")
+        assert result.memories[0].custom_metadata == {"session_id": "s1"}
+
+    async def test_textless_events_are_skipped(self, service):
+        await service.add_session_to_memory(_session("u1", [Event(author="concierge", invocation_id="i")]))
+        assert len(service) == 0
+
+
+class TestEviction:
+    async def test_per_user_bound_drops_oldest(self, service):
+        events = [_event(f"メモリー{i:02d}", ts=1_700_000_000.0 + i) for i in range(7)]
+        await service.add_session_to_memory(_session("u1", events))
+        assert len(service) == 5
+        result = await service.search_memory(app_name=APP, user_id="u1", query="メモリー00")
+        assert result.memories == []
+        result = await service.search_memory(app_name=APP, user_id="u1", query="メモリー06")
+        assert len(result.memories) == 1
+        assert service.stats()["evicted"] == 2
+
+    async def test_global_bound(self, service):
+        for user in ("u1", "u2", "u3"):
+            events = [_event(f"{user}-{i}", ts=1_700_000_000.0 + i) for i in range(4)]
+            await service.add_session_to_memory(_session(user, events, session_id=f"chat-{user}"))
+        assert len(service) == 8
+        assert service.stats()["entries"] == 8
+
+    async def test_stats_do_not_wait_for_the_write_lock(self, service):
+        await service.add_session_to_memory(_session("u1", [_event("下地")]))
+        stats: list[dict] = []
+        with service._lock:
+            reader = threading.Thread(target=lambda: stats.append(service.stats()))
+            reader.start()
+            reader.join(timeout=1)
+        assert stats and stats[0]["entries"] == 1
+
+    async def test_evicted_rows_leave_fts_index(self, service, tmp_path):
+        events = [_event(f"メモリー{i:02d}", ts=1_700_000_000.0 + i) for i in range(7)]
+        await service.add_session_to_memory(_session("u1", events))
+        conn = sqlite3.connect(tmp_path / "memory.db")
+        # Raises if the external-content index drifted from the table
+        conn.execute("INSERT INTO memories_fts (memories_fts) VALUES ('integrity-check')")
+        hits = conn.execute("SELECT COUNT(*) FROM memories_fts WHERE memories_fts MATCH '\"メモリー\"'").fetchone()[0]
+        conn.close()
+        assert hits == 5
+
+
+class TestPersistence:
+    async def test_survives_reopen(self, tmp_path):
+        path = str(tmp_path / "memory.db")
+        first = SQLiteMemoryService(path)
+        await first.add_session_to_memory(_session("u1", [_event("リップモンスター")]))
+        first.close()
+
+        second = SQLiteMemoryService(path)
+        result = await second.search_memory(app_name=APP, user_id="u1", query="リップ")
+        assert len(result.memories) == 1
+        assert second.stats()["entries"] == 1
+        second.close()
+
+
+class TestFactory:
+    def test_memory_backend(self):
+        with patch.dict("os.environ", {"MEMORY_BACKEND": "memory"}):
+            assert isinstance(create_memory_service(), InMemoryMemoryService)
+
+    def test_sqlite_backend_opens_lazily(self, tmp_path):
+        path = tmp_path / "memory.db"
+        with patch.dict("os.environ", {"MEMORY_BACKEND": "sqlite", "MEMORY_DB_PATH": str(path)}):
+            service = create_memory_service()
+        assert isinstance(service, SQLiteMemoryService)
+        assert not path.exists()
+
+    def test_falls_back_without_fts5(self):
+        with patch.dict("os.environ", {"MEMORY_BACKEND": "sqlite"}), \
+             patch("alcheme.memory_store._fts5_trigram_available", return_value=False):
+            assert isinstance(create_memory_service(), InMemoryMemoryService)
@@ -0,0 +1,136 @@
+"""Tests for alcheme/preview_jobs.py — background preview image queue."""
+
+import asyncio
+import time
+from unittest.mock import patch
+
+import pytest
+
+from alcheme.preview_jobs import PreviewJobQueue
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def written():
+    """Capture preview_status writes instead of hitting Firestore."""
+    calls = []
+    with patch(
+        "alcheme.preview_jobs._write_status",
+        side_effect=lambda uid, rid, status, error=None: calls.append((rid, status)),
+    ):
+        yield calls
+
+
+class TestPreviewJobQueue:
+    @pytest.mark.anyio
+    async def test_job_status_transitions(self, written):
+        async def fake_generate(**kwargs):
+            return {"status": "success", "image_url": f"https://img/{kwargs['recipe_id']}.webp"}
+
+        queue = PreviewJobQueue(workers=1)
+        with patch("alcheme.preview_jobs.generate_preview_image", side_effect=fake_generate):
+            assert await queue.submit("u1", "r1", [{"step": 1}])
+            await queue.join()
+            status = await queue.get_status("u1", "r1")
+        await queue.stop()
+
+        assert written == [("r1", "queued"), ("r1", "running"), ("r1", "done")]
+        assert status == {"status": "done", "image_url": "https://img/r1.webp"}
+        assert queue.stats()["completed"] == 1
+
+    @pytest.mark.anyio
+    async def test_slow_queued_write_cannot_land_after_running(self):
+        calls = []
+
+        def write_status(uid, rid, status, error=None):
+            if status == "queued":
+                time.sleep(0.05)  # the worker is idle and picks the job up meanwhile
+            calls.append(status)
+
+        async def fake_generate(**kwargs):
+            return {"status": "success", "image_url": "https://img/r1.webp"}
+
+        queue = PreviewJobQueue(workers=1)
+        with patch("alcheme.preview_jobs._write_status", side_effect=write_status), \
+             patch("alcheme.preview_jobs.generate_preview_image", side_effect=fake_generate):
+            await queue.submit("u1", "r1", [])
+            await queue.join()
+        await queue.stop()
+
+        assert calls == ["queued", "running", "done"]
+
+    @pytest.mark.anyio
+    async def test_concurrency_bounded_by_workers(self, written):
+        active = 0
+        peak = 0
+
+        async def fake_generate(**kwargs):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.05)
+            active -= 1
+            return {"status": "success", "image_url": "https://img/x.webp"}
+
+        queue = PreviewJobQueue(workers=2)
+        with patch("alcheme.preview_jobs.generate_preview_image", side_effect=fake_generate):
+            for i in range(6):
+                await queue.submit("u1", f"r{i}", [])
+            await queue.join()
+        await queue.stop()
+
+        assert peak == 2
+        assert queue.stats()["completed"] == 6
+
+    @pytest.mark.anyio
+    async def test_failure_and_timeout_mark_error(self, written):
+        async def fake_generate(**kwargs):
+            if kwargs["recipe_id"] == "slow":
+                await asyncio.sleep(1)
+            return {"status": "error", "error": "No image generated by model"}
+
+        queue = PreviewJobQueue(workers=2, job_timeout=0.05)
+        with patch("alcheme.preview_jobs.generate_preview_image", side_effect=fake_generate):
+            await queue.submit("u1", "bad", [])
+            await queue.submit("u1", "slow", [])
+            await queue.join()
+        await queue.stop()
+
+        assert ("bad", "error") in written
+        assert ("slow", "error") in written
+        assert queue.stats()["failed"] == 2
+
+    @pytest.mark.anyio
+    async def test_full_queue_rejects(self, written):
+        gate = asyncio.Event()
+
+        async def fake_generate(**kwargs):
+            await gate.wait()
+            return {"status": "success", "image_url": "https://img/x.webp"}
+
+        queue = PreviewJobQueue(workers=1, max_pending=1)
+        with patch("alcheme.preview_jobs.generate_preview_image", side_effect=fake_generate):
+            assert await queue.submit("u1", "r1", [])
+            await asyncio.sleep(0)  # worker picks up r1
+            assert await queue.submit("u1", "r2", [])
+            assert not await queue.submit("u1", "r3", [])
+            gate.set()
+            await queue.join()
+        await queue.stop()
+
+        assert queue.stats()["rejected"] == 1
+
+    @pytest.mark.anyio
+    async def test_status_falls_back_to_recipe_doc(self, written):
+        queue = PreviewJobQueue(workers=1)
+        with patch(
+            "alcheme.preview_jobs._read_status",
+            return_value={"status": "done", "image_url": "https://img/old.webp"},
+        ) as mock_read:
+            status = await queue.get_status("u1", "other-instance")
+        assert status["image_url"] == "https://img/old.webp"
+        mock_read.assert_called_once_with("u1", "other-instance")
@@ -0,0 +1,140 @@
+"""Tests for alcheme/profile_cache.py — cached users/{id} profile reads."""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+
+from alcheme.profile_cache import (
+    ProfileCache,
+    _read_profile,
+    get_hair_preferences,
+    get_user_profile,
+    invalidate_user_profile,
+)
+
+
+def _profile_doc(data: dict | None):
+    doc = MagicMock()
+    doc.exists = data is not None
+    doc.to_dict.return_value = data
+    return doc
+
+
+class TestReadProfile:
+    def test_keeps_consumer_fields_and_drops_tokens(self):
+        db = MagicMock()
+        db.collection.return_value.document.return_value.get.return_value = _profile_doc({
+            "personalColor": "イエベ春",
+            "skinType": "乾燥肌",
+            "hairType": "ボブ",
+            "hairColor": "",
+            "email": "a@example.com",
+            "calendarIntegration": {"connected": True, "accessToken": "secret"},
+        })
+        with patch("alcheme.profile_cache._get_firestore", return_value=db):
+            profile = _read_profile("u1")
+        assert profile == {
+            "personalColor": "イエベ春",
+            "skinType": "乾燥肌",
+            "hairType": "ボブ",
+            "calendarConnected": True,
+        }
+
+    def test_missing_doc(self):
+        db = MagicMock()
+        db.collection.return_value.document.return_value.get.return_value = _profile_doc(None)
+        with patch("alcheme.profile_cache._get_firestore", return_value=db):
+            assert _read_profile("u1") == {}
+
+
+class TestProfileCache:
+    def test_one_read_per_ttl(self):
+        cache = ProfileCache(ttl=60)
+        with patch("alcheme.profile_cache._read_profile", return_value={"skinType": "普通肌"}) as read:
+            for _ in range(5):
+                assert cache.get("u1") == {"skinType": "普通肌"}
+        assert read.call_count == 1
+        assert cache.stats()["hits"] == 4
+
+    def test_expired_entry_is_reread(self):
+        cache = ProfileCache(ttl=0.01)
+        with patch("alcheme.profile_cache._read_profile", return_value={}) as read:
+            cache.get("u1")
+            time.sleep(0.02)
+            cache.get("u1")
+        assert read.call_count == 2
+
+    def test_invalidate_forces_fresh_read(self):
+        cache = ProfileCache(ttl=60)
+        with patch("alcheme.profile_cache._read_profile", side_effect=[{"skinType": "a"}, {"skinType": "b"}]):
+            assert cache.get("u1")["skinType"] == "a"
+            cache.invalidate("u1")
+            assert cache.get("u1")["skinType"] == "b"
+        assert cache.stats()["invalidations"] == 1
+
+    def test_invalidate_during_read_is_not_lost(self):
+        cache = ProfileCache(ttl=60)
+        reading, written = threading.Event(), threading.Event()
+
+        def stale_read(user_id):
+            reading.set()
+            written.wait(1)
+            return {"skinType": "old"}
+
+        with patch("alcheme.profile_cache._read_profile", side_effect=stale_read):
+            with ThreadPoolExecutor(max_workers=1) as pool:
+                first = pool.submit(cache.get, "u1")
+                reading.wait(1)
+                cache.invalidate("u1")  # the settings write lands mid-read
+                written.set()
+                assert first.result()["skinType"] == "old"
+        with patch("alcheme.profile_cache._read_profile", return_value={"skinType": "new"}):
+            assert cache.get("u1")["skinType"] == "new"
+
+    def test_returned_profile_is_a_copy(self):
+        cache = ProfileCache(ttl=60)
+        with patch("alcheme.profile_cache._read_profile", return_value={"preferences": {"colors": ["pink"]}}):
+            cache.get("u1")["preferences"]["colors"].append("red")
+            cache.get("u1")["preferences"]["colors"].append("blue")
+            assert cache.get("u1")["preferences"] == {"colors": ["pink"]}
+
+    def test_concurrent_misses_share_one_read(self):
+        cache = ProfileCache(ttl=60)
+
+        def slow_read(user_id):
+            time.sleep(0.1)
+            return {"location": "東京"}
+
+        with patch("alcheme.profile_cache._read_profile", side_effect=slow_read) as read, \
+             ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(cache.get, ["u1"] * 8))
+        assert read.call_count == 1
+        assert all(r == {"location": "東京"} for r in results)
+
+    def test_read_failure_is_not_cached(self):
+        cache = ProfileCache(ttl=60)
+        with patch("alcheme.profile_cache._read_profile", side_effect=[RuntimeError("down"), {"skinType": "a"}]):
+            assert cache.get("u1") == {}
+            assert cache.get("u1") == {"skinType": "a"}
+
+    def test_lru_bound(self):
+        cache = ProfileCache(ttl=60, max_entries=2)
+        with patch("alcheme.profile_cache._read_profile", return_value={}):
+            for user in ("u1", "u2", "u3"):
+                cache.get(user)
+        assert cache.stats()["entries"] == 2
+
+
+class TestModuleHelpers:
+    def test_shared_singleton(self, profile_cache):
+        with patch("alcheme.profile_cache._read_profile", return_value={"hairType": "ロング"}) as read:
+            assert get_user_profile("u1")["hairType"] == "ロング"
+            assert get_user_profile("u1")["hairType"] == "ロング"
+            invalidate_user_profile("u1")
+            get_user_profile("u1")
+        assert read.call_count == 2
+
+    def test_hair_preferences(self, profile_cache):
+        with patch("alcheme.profile_cache._read_profile", return_value={"hairType": "ロング", "skinType": "乾燥肌"}):
+            assert get_hair_preferences("u1") == ("ロング", None)
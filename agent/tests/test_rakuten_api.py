@@ -6,16 +6,26 @@ from unittest.mock import patch, MagicMock
 import pytest
 
 from alcheme.tools.rakuten_api import search_rakuten_api
+from alcheme.tools.rakuten_cache import get_rakuten_cache
+
+
+@pytest.fixture(autouse=True)
+def _clear_rakuten_cache():
+    """Each test starts with an empty result cache."""
+    get_rakuten_cache().clear()
+    yield
+    get_rakuten_cache().clear()
 
 
 # ---------------------------------------------------------------------------
 # UT-P21: Successful search
 # ---------------------------------------------------------------------------
 class TestSearchRakutenApi:
-    @patch("alcheme.tools.rakuten_api.requests.get")
+    @patch("alcheme.tools.rakuten_api.get_http_session")
     @patch.dict(os.environ, {"RAKUTEN_APP_ID": "test_app_id"})
-    def test_success(self, mock_get):
+    def test_success(self, mock_session):
         """Successful search returns results."""
+        mock_get = mock_session.return_value.get
         mock_response = MagicMock()
         mock_response.status_code = 200
         mock_response.json.return_value = {
@@ -50,10 +60,11 @@ class TestSearchRakutenApi:
     # ---------------------------------------------------------------------------
     # UT-P22: Empty results
     # ---------------------------------------------------------------------------
-    @patch("alcheme.tools.rakuten_api.requests.get")
+    @patch("alcheme.tools.rakuten_api.get_http_session")
     @patch.dict(os.environ, {"RAKUTEN_APP_ID": "test_app_id"})
-    def test_empty_results(self, mock_get):
+    def test_empty_results(self, mock_session):
         """Search with no matches returns empty results."""
+        mock_get = mock_session.return_value.get
         mock_response = MagicMock()
         mock_response.status_code = 200
         mock_response.json.return_value = {"Items": []}
@@ -79,14 +90,61 @@ class TestSearchRakutenApi:
     # ---------------------------------------------------------------------------
     # UT-P23b: Timeout
     # ---------------------------------------------------------------------------
-    @patch("alcheme.tools.rakuten_api.requests.get")
+    @patch("alcheme.tools.rakuten_api.get_http_session")
     @patch.dict(os.environ, {"RAKUTEN_APP_ID": "test_app_id"})
-    def test_timeout(self, mock_get):
+    def test_timeout(self, mock_session):
         """Timeout raises and returns error."""
         import requests
 
+        mock_get = mock_session.return_value.get
+
         mock_get.side_effect = requests.exceptions.Timeout("Connection timed out")
 
         result = search_rakuten_api("test")
         assert result["status"] == "error"
         assert "timed out" in result["message"].lower() or "error" in result["status"]
+
+
+# ---------------------------------------------------------------------------
+# search_rakuten_for_candidates_async
+# ---------------------------------------------------------------------------
+class TestSearchRakutenForCandidatesAsync:
+    @patch("alcheme.tools.rakuten_api.async_get")
+    @patch.dict(os.environ, {"RAKUTEN_APP_ID": "test_app_id", "RAKUTEN_ACCESS_KEY": "test_key"})
+    async def test_success(self, mock_async_get):
+        """Async lookup parses candidates from the shared client response."""
+        from unittest.mock import AsyncMock
+
+        from alcheme.tools.rakuten_api import search_rakuten_for_candidates_async
+
+        mock_response = MagicMock()
+        mock_response.json.return_value = {
+            "Items": [{
+                "itemName": "KATE リップモンスター 03 陽炎",
+                "itemPrice": 1540,
+                "itemUrl": "https://example.com/item1",
+                "shopName": "テストショップ",
+                "mediumImageUrls": ["https://example.com/img1.jpg"],
+            }]
+        }
+        mock_async_get.side_effect = AsyncMock(return_value=mock_response)
+
+        result = await search_rakuten_for_candidates_async("KATE", "リップモンスター", "陽炎")
+        assert result["count"] == 1
+        assert result["candidates"][0]["color_code"] == "03"
+        params = mock_async_get.call_args.kwargs["params"]
+        assert params["keyword"] == "KATE リップモンスター 陽炎"
+
+    @patch("alcheme.tools.rakuten_api.async_get")
+    @patch.dict(os.environ, {"RAKUTEN_APP_ID": "test_app_id", "RAKUTEN_ACCESS_KEY": "test_key"})
+    async def test_http_error_returns_empty(self, mock_async_get):
+        """Transport errors degrade to no candidates."""
+        import httpx
+        from unittest.mock import AsyncMock
+
+        from alcheme.tools.rakuten_api import search_rakuten_for_candidates_async
+
+        mock_async_get.side_effect = httpx.ReadTimeout("timed out")
+
+        result = await search_rakuten_for_candidates_async("KATE", "リップモンスター")
+        assert result == {"candidates": []}
@@ -0,0 +1,144 @@
+"""Tests for rakuten_cache.py — TTL/LRU result cache for Rakuten searches."""
+
+import os
+import threading
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from alcheme.io_executor import run_blocking
+from alcheme.tools.rakuten_cache import (
+    MemoryCacheBackend,
+    RakutenResultCache,
+    SQLiteCacheBackend,
+    cache_key,
+)
+
+RESULTS = [{"name": "KATE リップモンスター 03 陽炎", "price": 1540}]
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend_factory(request, tmp_path):
+    def make(ttl: float = 60, max_entries: int = 100):
+        if request.param == "memory":
+            return MemoryCacheBackend(ttl, max_entries)
+        return SQLiteCacheBackend(str(tmp_path / "cache.db"), ttl, max_entries)
+    return make
+
+
+class TestCacheKey:
+    def test_normalizes_case_width_and_spaces(self):
+        assert cache_key("KATE  リップモンスター", 5) == cache_key("ｋａｔｅ　リップモンスター ", 5)
+
+    def test_hits_is_part_of_key(self):
+        assert cache_key("KATE", 5) != cache_key("KATE", 10)
+
+
+class TestBackends:
+    def test_roundtrip(self, backend_factory):
+        backend = backend_factory()
+        backend.set("k", RESULTS)
+        assert backend.get("k") == RESULTS
+        assert backend.get("missing") is None
+
+    def test_ttl_expiry(self, backend_factory):
+        backend = backend_factory(ttl=10)
+        with patch("alcheme.tools.rakuten_cache.time.time", return_value=1000.0):
+            backend.set("k", RESULTS)
+        with patch("alcheme.tools.rakuten_cache.time.time", return_value=1011.0):
+            assert backend.get("k") is None
+        assert len(backend) == 0
+
+    def test_lru_bound(self, backend_factory):
+        backend = backend_factory(ttl=1e12, max_entries=2)
+        with patch("alcheme.tools.rakuten_cache.time.time", side_effect=[1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0]):
+            backend.set("a", RESULTS)
+            backend.set("b", RESULTS)
+            backend.get("a")  # a is now most recently used
+            backend.set("c", RESULTS)
+        assert len(backend) == 2
+        assert backend.get("b") is None
+        assert backend.get("a") == RESULTS
+
+    def test_memory_backend_hands_out_copies(self):
+        backend = MemoryCacheBackend(60, 100)
+        stored = [dict(r) for r in RESULTS]
+        backend.set("k", stored)
+        stored[0]["price"] = 0
+        backend.get("k")[0]["price"] = 1
+        backend.get("k").append({"name": "extra"})
+        assert backend.get("k") == RESULTS
+
+    def test_sqlite_survives_reopen(self, tmp_path):
+        path = str(tmp_path / "cache.db")
+        SQLiteCacheBackend(path, 60, 100).set("k", RESULTS)
+        assert SQLiteCacheBackend(path, 60, 100).get("k") == RESULTS
+
+    def test_sqlite_len_does_not_wait_for_the_lock(self, tmp_path):
+        backend = SQLiteCacheBackend(str(tmp_path / "cache.db"), 60, 100)
+        backend.set("a", RESULTS)
+        backend.set("b", RESULTS)
+        backend.set("a", RESULTS)
+        counts: list[int] = []
+        with backend._lock:
+            reader = threading.Thread(target=lambda: counts.append(len(backend)))
+            reader.start()
+            reader.join(timeout=1)
+        assert counts == [2]
+        backend.clear()
+        assert len(backend) == 0
+        assert len(SQLiteCacheBackend(str(tmp_path / "cache.db"), 60, 100)) == 0
+
+
+class TestRakutenResultCache:
+    def test_counters(self):
+        cache = RakutenResultCache(MemoryCacheBackend(60, 100))
+        assert cache.get("KATE", 5) is None
+        cache.set("KATE", 5, RESULTS)
+        assert cache.get("kate", 5) == RESULTS
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["entries"] == 1
+        assert stats["hit_rate"] == 0.5
+
+    def test_disabled(self):
+        cache = RakutenResultCache(None)
+        cache.set("KATE", 5, RESULTS)
+        assert cache.get("KATE", 5) is None
+        assert cache.stats()["backend"] == "disabled"
+
+
+    async def test_async_access_runs_blocking_backend_off_loop(self, tmp_path):
+        cache = RakutenResultCache(SQLiteCacheBackend(str(tmp_path / "cache.db"), 60, 100))
+        with patch("alcheme.tools.rakuten_cache.run_blocking", wraps=run_blocking) as mock_run:
+            await cache.set_async("KATE", 5, RESULTS)
+            assert await cache.get_async("KATE", 5) == RESULTS
+        assert mock_run.await_count == 2
+
+    async def test_async_access_keeps_memory_backend_on_loop(self):
+        cache = RakutenResultCache(MemoryCacheBackend(60, 100))
+        with patch("alcheme.tools.rakuten_cache.run_blocking") as mock_run:
+            await cache.set_async("KATE", 5, RESULTS)
+            assert await cache.get_async("KATE", 5) == RESULTS
+        mock_run.assert_not_called()
+
+
+class TestSearchUsesCache:
+    @patch("alcheme.tools.rakuten_api.async_get")
+    @patch.dict(os.environ, {"RAKUTEN_APP_ID": "test_app_id", "RAKUTEN_ACCESS_KEY": "test_key"})
+    async def test_second_search_skips_api(self, mock_get):
+        from alcheme.tools.rakuten_api import search_rakuten_for_candidates_async
+
+        mock_response = MagicMock()
+        mock_response.json.return_value = {"Items": [{"itemName": "CANMAKE マシュマロフィニッシュパウダー"}]}
+        mock_get.side_effect = AsyncMock(return_value=mock_response)
+
+        cache = RakutenResultCache(MemoryCacheBackend(60, 100))
+        with patch("alcheme.tools.rakuten_api.get_rakuten_cache", return_value=cache):
+            first = await search_rakuten_for_candidates_async("CANMAKE", "マシュマロフィニッシュパウダー")
+            second = await search_rakuten_for_candidates_async("canmake", "マシュマロフィニッシュパウダー")
+
+        assert mock_get.call_count == 1
+        assert first["candidates"] == second["candidates"]
+        assert cache.stats()["hits"] == 1
@@ -36,6 +36,21 @@ class TestSaveRecipe:
         assert result["status"] == "success"
         assert "recipe_id" in result
 
+    @patch("alcheme.tools.recipe_tools._get_db")
+    def test_retry_overwrites_recipe_from_failed_attempt(self, mock_db, mock_tool_context):
+        """A retried turn's save_recipe writes to the doc the failed attempt created."""
+        from alcheme.turn_checkpoint import retry_doc_id_key
+
+        recipes = mock_db.return_value.collection.return_value.document.return_value.collection.return_value
+        recipes.document.return_value.id = "r-1"
+        mock_tool_context.state[retry_doc_id_key("save_recipe")] = "r-1"
+
+        result = save_recipe(json.dumps({"title": "春メイク", "steps": []}), mock_tool_context)
+
+        assert result == {"status": "success", "recipe_id": "r-1"}
+        recipes.document.assert_called_once_with("r-1")
+        recipes.document.return_value.set.assert_called_once()
+
     @patch("alcheme.tools.recipe_tools._get_db")
     def test_save_invalid_json(self, mock_db, mock_tool_context):
         """Save with invalid JSON returns error."""
@@ -1,11 +1,13 @@
 """Tests for server.py — FastAPI endpoint tests."""
 
+import asyncio
 import json
 from unittest.mock import patch, MagicMock, AsyncMock
 
 import pytest
 from httpx import AsyncClient, ASGITransport
 
+from alcheme import turn_checkpoint
 from server import app
 
 
@@ -17,6 +19,16 @@ def anyio_backend():
     return "asyncio"
 
 
+@pytest.fixture(autouse=True)
+def session_store():
+    """Keep every test off the real session DB and its background compaction."""
+    with patch("server.session_service") as mock_session, \
+         patch("server.session_compactor") as mock_compactor:
+        mock_session.stats.return_value = {}
+        mock_compactor.stats.return_value = {}
+        yield mock_session, mock_compactor
+
+
 @pytest.fixture
 async def client():
     """Create async test client for FastAPI app."""
@@ -179,3 +191,383 @@ class TestChatSSE:
             # Check last event is "done"
             last_event = json.loads(lines[-1].replace("data: ", ""))
             assert last_event["type"] == "done"
+
+
+# ---------------------------------------------------------------------------
+# Preview image generation is queued, not awaited in /chat
+# ---------------------------------------------------------------------------
+class TestChatPreviewQueued:
+    @pytest.mark.anyio
+    async def test_chat_queues_preview_and_finishes(self, client):
+        """A saved recipe enqueues a preview job and the stream ends right away."""
+        recipe = {"recipe": {"recipe_name": "春メイク", "steps": [{"step": 1, "area": "lip"}]}}
+        mock_event = MagicMock()
+        mock_part = MagicMock()
+        mock_part.text = "```json\n" + json.dumps(recipe, ensure_ascii=False) + "\n```"
+        mock_event.content.parts = [mock_part]
+        mock_event.get_function_responses.return_value = []
+
+        async def mock_run_async(**kwargs):
+            yield mock_event
+
+        mock_queue = MagicMock()
+        mock_queue.submit = AsyncMock(return_value=True)
+
+        with patch("server.runner") as mock_runner, \
+             patch("server.session_service") as mock_session, \
+             patch("server._build_user_state", return_value={}), \
+             patch("server._fallback_save_recipe", return_value="recipe-1"), \
+             patch("server.get_preview_queue", return_value=mock_queue), \
+             patch("server.AGENT_API_KEY", ""):
+            mock_runner.run_async = mock_run_async
+            mock_session.get_session = AsyncMock(return_value=None)
+            mock_session.create_session = AsyncMock()
+
+            resp = await client.post("/chat", json={"message": "hi", "user_id": "u1"})
+
+        events = [json.loads(l[6:]) for l in resp.text.split("\n") if l.startswith("data: ")]
+        types = [e["type"] for e in events]
+        assert types[-3:] == ["content_done", "preview_pending", "done"]
+        assert events[-2]["data"] == {"recipe_id": "recipe-1"}
+        mock_queue.submit.assert_awaited_once_with("u1", "recipe-1", [{"step": 1, "area": "lip"}])
+
+
+class TestChatStreamingRecipeCard:
+    @pytest.mark.anyio
+    async def test_recipe_card_sent_when_block_closes(self, client):
+        """With save_recipe done, the card goes out mid-stream, before later text."""
+        recipe = {"recipe": {"recipe_name": "春メイク", "steps": [{"step": 1, "area": "lip"}]}}
+        block = "```json\n" + json.dumps(recipe, ensure_ascii=False) + "\n```"
+
+        save_part = MagicMock()
+        save_part.text = None
+        save_part.function_response.name = "save_recipe"
+        save_part.function_response.response = {"status": "success", "recipe_id": "recipe-9"}
+
+        def text_event(*texts):
+            event = MagicMock()
+            parts = []
+            for text in texts:
+                part = MagicMock()
+                part.text = text
+                part.function_response = None
+                parts.append(part)
+            event.content.parts = parts
+            event.get_function_calls.return_value = []
+            return event
+
+        save_event = MagicMock()
+        save_event.content.parts = [save_part]
+        save_event.get_function_calls.return_value = []
+
+        async def mock_run_async(**kwargs):
+            yield save_event
+            yield text_event("できました！\n")
+            yield text_event(block[:20])
+            yield text_event(block[20:] + "\n")
+            yield text_event("楽しんでね")
+
+        mock_queue = MagicMock()
+        mock_queue.submit = AsyncMock(return_value=True)
+
+        with patch("server.runner") as mock_runner, \
+             patch("server.session_service") as mock_session, \
+             patch("server._build_user_state", return_value={}), \
+             patch("server._fallback_save_recipe") as mock_fallback, \
+             patch("server.get_preview_queue", return_value=mock_queue), \
+             patch("server.AGENT_API_KEY", ""):
+            mock_runner.run_async = mock_run_async
+            mock_session.get_session = AsyncMock(return_value=None)
+            mock_session.create_session = AsyncMock()
+
+            resp = await client.post("/chat", json={"message": "hi", "user_id": "u1"})
+
+        events = [json.loads(l[6:]) for l in resp.text.split("\n") if l.startswith("data: ")]
+        types = [e["type"] for e in events]
+        card_index = types.index("recipe_card")
+        assert events[card_index + 1] == {"type": "text_delta", "data": "楽しんでね"}
+        assert json.loads(events[card_index]["data"])["recipe"]["id"] == "recipe-9"
+        assert types.count("recipe_card") == 1
+        mock_fallback.assert_not_called()
+        mock_queue.submit.assert_awaited_once_with("u1", "recipe-9", [{"step": 1, "area": "lip"}])
+
+
+class TestChatRetryCheckpoint:
+    @pytest.mark.anyio
+    async def test_retry_reuses_recipe_saved_by_failed_attempt(self, client):
+        """The retried run replays the checkpoint and does not save the recipe again."""
+        recipe = {"recipe": {"recipe_name": "春メイク", "steps": [{"step": 1, "area": "lip"}]}}
+
+        save_part = MagicMock()
+        save_part.text = None
+        save_part.function_response.name = "save_recipe"
+        save_part.function_response.response = {"status": "success", "recipe_id": "recipe-1"}
+        save_event = MagicMock()
+        save_event.content.parts = [save_part]
+
+        text_part = MagicMock()
+        text_part.text = "```json\n" + json.dumps(recipe, ensure_ascii=False) + "\n```"
+        text_part.function_response = None
+        text_event = MagicMock()
+        text_event.content.parts = [text_part]
+
+        checkpoints = []
+        calls = 0
+
+        async def mock_run_async(**kwargs):
+            nonlocal calls
+            calls += 1
+            checkpoints.append(turn_checkpoint.current())
+            if calls == 1:
+                yield save_event
+                raise RuntimeError("400 INVALID_ARGUMENT: input token count exceeds the maximum")
+            yield text_event
+
+        mock_queue = MagicMock()
+        mock_queue.submit = AsyncMock(return_value=True)
+
+        with patch("server.runner") as mock_runner, \
+             patch("server.session_service") as mock_session, \
+             patch("server.memory_service") as mock_memory, \
+             patch("server._build_user_state", return_value={"user:id": "u1"}) as mock_state, \
+             patch("server._fallback_save_recipe") as mock_fallback, \
+             patch("server.get_preview_queue", return_value=mock_queue), \
+             patch("server.AGENT_API_KEY", ""):
+            mock_runner.run_async = mock_run_async
+            mock_session.get_session = AsyncMock(return_value=None)
+            mock_session.create_session = AsyncMock()
+            mock_session.delete_session = AsyncMock()
+            mock_session.flush_session = AsyncMock()
+            mock_memory.add_session_to_memory = AsyncMock()
+
+            resp = await client.post("/chat", json={"message": "hi", "user_id": "u1"})
+
+        events = [json.loads(l[6:]) for l in resp.text.split("\n") if l.startswith("data: ")]
+        cards = [json.loads(e["data"]) for e in events if e["type"] == "recipe_card"]
+        assert [card["recipe"]["id"] for card in cards] == ["recipe-1"]
+        mock_fallback.assert_not_called()
+        # One checkpoint for both runs, serving results in the retry
+        assert calls == 2 and checkpoints[0] is checkpoints[1] and checkpoints[1].replaying
+        mock_state.assert_called_once()
+        mock_queue.submit.assert_awaited_once_with("u1", "recipe-1", [{"step": 1, "area": "lip"}])
+
+
+class TestChatDisconnect:
+    @pytest.mark.anyio
+    async def test_disconnect_cancels_agent_run(self, client):
+        """A client that has gone away stops the agent run and skips the preview."""
+        cancelled = False
+
+        async def mock_run_async(**kwargs):
+            nonlocal cancelled
+            part = MagicMock()
+            part.text = "考え中..."
+            event = MagicMock()
+            event.content.parts = [part]
+            yield event
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled = True
+                raise
+            yield event
+
+        mock_queue = MagicMock()
+        mock_queue.submit = AsyncMock(return_value=True)
+
+        with patch("server.runner") as mock_runner, \
+             patch("server.session_service") as mock_session, \
+             patch("server._build_user_state", return_value={}), \
+             patch("server.get_preview_queue", return_value=mock_queue), \
+             patch("server.Request.is_disconnected", AsyncMock(return_value=True)), \
+             patch("server.AGENT_API_KEY", ""):
+            mock_runner.run_async = mock_run_async
+            mock_session.get_session = AsyncMock(return_value=None)
+            mock_session.create_session = AsyncMock()
+            mock_session.flush_session = AsyncMock()
+
+            resp = await asyncio.wait_for(client.post("/chat", json={"message": "hi", "user_id": "u1"}), 5)
+
+        assert cancelled
+        assert '"type":"done"' not in resp.text
+        mock_queue.submit.assert_not_called()
+        # The cancelled turn's session events are still written
+        mock_session.flush_session.assert_awaited_once_with("alcheme", "u1", "chat-u1")
+
+
+class TestChatCompaction:
+    @pytest.mark.anyio
+    async def test_turn_schedules_compaction_after_flush(self, client):
+        """Compaction is scheduled in the background once the turn is written."""
+        mock_event = MagicMock()
+        mock_part = MagicMock()
+        mock_part.text = "こんにちは"
+        mock_event.content.parts = [mock_part]
+
+        async def mock_run_async(**kwargs):
+            yield mock_event
+
+        with patch("server.runner") as mock_runner, \
+             patch("server.session_service") as mock_session, \
+             patch("server.session_compactor") as mock_compactor, \
+             patch("server.AGENT_API_KEY", ""):
+            mock_runner.run_async = mock_run_async
+            mock_session.get_session = AsyncMock(return_value=MagicMock(events=[MagicMock()] * 25))
+            mock_session.flush_session = AsyncMock()
+            mock_session.delete_session = AsyncMock()
+
+            resp = await client.post("/chat", json={"message": "hello", "user_id": "u1"})
+            assert resp.status_code == 200
+
+        # 25 events is over the compaction threshold but no longer resets the session
+        mock_session.delete_session.assert_not_called()
+        mock_session.flush_session.assert_awaited_once_with("alcheme", "u1", "chat-u1")
+        mock_compactor.schedule.assert_called_once_with("alcheme", "u1", "chat-u1")
+
+
+class TestProfileCache:
+    def test_user_state_built_from_cached_profile(self, profile_cache):
+        from server import _build_user_state
+
+        profile = {"personalColor": "イエベ春", "calendarConnected": True}
+        with patch("alcheme.profile_cache._read_profile", return_value=profile) as read:
+            first = _build_user_state("u1")
+            second = _build_user_state("u1")
+        assert first == second == {
+            "user:id": "u1",
+            "user:personal_color": "イエベ春",
+            "user:calendar_connected": True,
+        }
+        assert read.call_count == 1
+
+    @pytest.mark.anyio
+    async def test_invalidate_endpoint(self, client, profile_cache):
+        with patch("alcheme.profile_cache._read_profile", return_value={}) as read, \
+             patch("server.AGENT_API_KEY", ""):
+            profile_cache.get("u1")
+            resp = await client.post("/profile/invalidate", json={"user_id": "u1"})
+            profile_cache.get("u1")
+        assert resp.status_code == 200
+        assert read.call_count == 2
+
+
+class TestPreviewStatus:
+    @pytest.mark.anyio
+    async def test_returns_job_status(self, client):
+        mock_queue = MagicMock()
+        mock_queue.get_status = AsyncMock(return_value={"status": "done", "image_url": "https://x/r.webp"})
+        with patch("server.get_preview_queue", return_value=mock_queue), \
+             patch("server.AGENT_API_KEY", ""):
+            resp = await client.get("/preview-status/recipe-1", params={"user_id": "u1"})
+        assert resp.status_code == 200
+        assert resp.json() == {"recipe_id": "recipe-1", "status": "done", "image_url": "https://x/r.webp"}
+        mock_queue.get_status.assert_awaited_once_with("u1", "recipe-1")
+
+    @pytest.mark.anyio
+    async def test_unknown_recipe_404(self, client):
+        mock_queue = MagicMock()
+        mock_queue.get_status = AsyncMock(return_value=None)
+        with patch("server.get_preview_queue", return_value=mock_queue), \
+             patch("server.AGENT_API_KEY", ""):
+            resp = await client.get("/preview-status/missing", params={"user_id": "u1"})
+        assert resp.status_code == 404
+
+
+# ---------------------------------------------------------------------------
+# Blocking I/O does not serialize concurrent requests
+# ---------------------------------------------------------------------------
+class TestBlockingIOOffloaded:
+    @pytest.mark.anyio
+    async def test_concurrent_chats_do_not_serialize(self, client):
+        """Slow synchronous Firestore reads run on the I/O pool, not the event loop."""
+        import asyncio
+        import time
+
+        delay = 0.3
+        concurrency = 5
+
+        def slow_user_state(user_id):
+            time.sleep(delay)  # simulate a slow Firestore round trip
+            return {"user:id": user_id}
+
+        mock_event = MagicMock()
+        mock_part = MagicMock()
+        mock_part.text = "ok"
+        mock_event.content.parts = [mock_part]
+
+        async def mock_run_async(**kwargs):
+            yield mock_event
+
+        with patch("server.runner") as mock_runner, \
+             patch("server.session_service") as mock_session, \
+             patch("server._build_user_state", side_effect=slow_user_state), \
+             patch("server.AGENT_API_KEY", ""):
+            mock_runner.run_async = mock_run_async
+            mock_session.get_session = AsyncMock(return_value=None)
+            mock_session.create_session = AsyncMock()
+
+            start = time.monotonic()
+            responses = await asyncio.gather(*[
+                client.post("/chat", json={"message": "hi", "user_id": f"load-user-{i}"})
+                for i in range(concurrency)
+            ])
+            elapsed = time.monotonic() - start
+
+        assert all(r.status_code == 200 for r in responses)
+        # Serialized on the event loop this would take >= concurrency * delay
+        assert elapsed < delay * concurrency / 2
+
+
+# ---------------------------------------------------------------------------
+# /scan Rakuten fallback enrichment
+# ---------------------------------------------------------------------------
+class TestScanRakutenEnrichment:
+    @pytest.mark.anyio
+    async def test_enrichment_runs_concurrently(self):
+        """Lookups for several items overlap instead of running back to back."""
+        import asyncio
+        import time
+
+        from server import _enrich_items_with_rakuten
+
+        async def slow_lookup(brand, product_name, color_hint=""):
+            await asyncio.sleep(0.2)
+            return {"candidates": [{"name": f"{brand} {product_name}", "price": 1000}]}
+
+        items = [{"brand": f"B{i}", "product_name": "P"} for i in range(3)]
+        with patch("server.search_rakuten_for_candidates_async", side_effect=slow_lookup), \
+             patch("server.SCAN_RAKUTEN_CONCURRENCY", 3):
+            start = time.monotonic()
+            await _enrich_items_with_rakuten(items)
+            elapsed = time.monotonic() - start
+
+        assert elapsed < 0.5
+        assert all(item["price"] == 1000 for item in items)
+
+    @pytest.mark.anyio
+    async def test_deadline_returns_items_without_candidates(self):
+        """Lookups that miss the overall deadline leave the item untouched."""
+        import asyncio
+
+        from server import _enrich_items_with_rakuten
+
+        async def lookup(brand, product_name, color_hint=""):
+            if brand == "SLOW":
+                await asyncio.sleep(5)
+            return {"candidates": [{"name": "hit"}, {"name": "hit2"}]}
+
+        items = [
+            {"brand": "FAST", "product_name": "P"},
+            {"brand": "SLOW", "product_name": "P"},
+            {"brand": "不明", "product_name": "P"},
+            {"brand": "AGENT", "product_name": "P", "candidates": [{"name": "agent"}]},
+        ]
+        with patch("server.search_rakuten_for_candidates_async", side_effect=lookup) as mock_lookup, \
+             patch("server.SCAN_RAKUTEN_DEADLINE", 0.2):
+            await _enrich_items_with_rakuten(items)
+
+        assert len(items[0]["candidates"]) == 2
+        assert "candidates" not in items[1]
+        assert "candidates" not in items[2]
+        assert items[3]["candidates"] == [{"name": "agent"}]
+        assert mock_lookup.call_count == 2
@@ -0,0 +1,177 @@
+"""Tests for alcheme/session_compaction.py — rolling in-place session compaction."""
+
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from google.adk.events.event import Event
+from google.adk.events.event_actions import EventActions
+from google.adk.models import LlmRequest
+from google.genai import types
+
+from alcheme.session_compaction import (
+    SUMMARY_STATE_KEY,
+    SessionCompactor,
+    inject_conversation_summary,
+    summarize_events,
+)
+from alcheme.session_store import BatchedDatabaseSessionService
+
+APP = "alcheme"
+
+
+def _user(turn: int, text: str) -> Event:
+    return Event(
+        author="user",
+        invocation_id=f"inv-{turn}",
+        content=types.Content(role="user", parts=[types.Part(text=text)]),
+    )
+
+
+def _reply(turn: int, text: str) -> Event:
+    return Event(
+        author="concierge",
+        invocation_id=f"inv-{turn}",
+        content=types.Content(role="model", parts=[types.Part(text=text)]),
+    )
+
+
+def _tool_call(turn: int, name: str) -> Event:
+    return Event(
+        author="concierge",
+        invocation_id=f"inv-{turn}",
+        content=types.Content(role="model", parts=[
+            types.Part(function_call=types.FunctionCall(name=name, args={})),
+        ]),
+    )
+
+
+async def _add_turns(service, session, turns: range) -> None:
+    for turn in turns:
+        await service.append_event(session, _user(turn, f"質問{turn}"))
+        await service.append_event(session, _tool_call(turn, "search_inventory"))
+        await service.append_event(session, _reply(turn, f"回答{turn}"))
+    await service.flush_session(APP, session.user_id, session.id)
+
+
+@pytest.fixture
+async def service(tmp_path):
+    svc = BatchedDatabaseSessionService(
+        f"sqlite+aiosqlite:///{tmp_path / 'sessions.db'}", batch_size=8, flush_interval_ms=10_000,
+    )
+    yield svc
+    await svc.close()
+
+
+class TestSummarizeEvents:
+    def test_one_line_per_turn(self):
+        events = [
+            _user(1, "[SYSTEM: レシピ生成モード: 自由]\n春っぽいメイクにしたい"),
+            _tool_call(1, "search_inventory"),
+            _tool_call(1, "transfer_to_agent"),
+            _reply(1, 'いいですね！\n```json\n{"recipe": {"recipe_name": "春メイク"}}\n```'),
+            _user(2, "ありがとう"),
+        ]
+        summary = summarize_events(None, events)
+        lines = summary.splitlines()
+        assert len(lines) == 2
+        assert lines[0].startswith("- ユーザー: 春っぽいメイクにしたい → いいですね！")
+        assert "[レシピ: 春メイク]" in lines[0]
+        assert "[ツール: search_inventory]" in lines[0]
+        assert "SYSTEM" not in summary
+        assert "```" not in summary
+        assert lines[1] == "- ユーザー: ありがとう"
+
+    def test_strips_system_blocks(self):
+        text = "[SYSTEM: ユーザーが以下のコスメを指定しました。]\n- KATE リップ\n[/SYSTEM]\nこれで作って"
+        assert summarize_events(None, [_user(1, text)]) == "- ユーザー: これで作って"
+
+    def test_appends_to_previous_and_caps_size(self):
+        previous = "\n".join(f"- ユーザー: 古い{i}" for i in range(50))
+        summary = summarize_events(previous, [_user(1, "新しい")], max_chars=200)
+        assert len(summary) <= 200
+        assert summary.endswith("- ユーザー: 新しい")
+        assert "古い0" not in summary
+
+
+class TestCompactSession:
+    async def test_keeps_recent_turns_and_stores_summary(self, service):
+        session = await service.create_session(app_name=APP, user_id="u1", session_id="s1", state={"user:name": "A"})
+        await _add_turns(service, session, range(8))  # 24 events
+
+        removed = await service.compact_session(
+            APP, "u1", "s1", max_events=20, keep_turns=3, summarize=summarize_events,
+        )
+        assert len(removed) == 15
+        assert {e.invocation_id for e in removed} == {f"inv-{i}" for i in range(5)}
+
+        stored = await service.get_session(app_name=APP, user_id="u1", session_id="s1")
+        assert len(stored.events) == 9
+        assert stored.events[0].content.parts[0].text == "質問5"
+        assert len(stored.state[SUMMARY_STATE_KEY].splitlines()) == 5
+        assert stored.state["user:name"] == "A"
+        assert service.stats()["events_compacted"] == 15
+
+    async def test_below_threshold_is_noop(self, service):
+        session = await service.create_session(app_name=APP, user_id="u1", session_id="s1")
+        await _add_turns(service, session, range(2))
+        summarize = MagicMock()
+        removed = await service.compact_session(
+            APP, "u1", "s1", max_events=20, keep_turns=3, summarize=summarize,
+        )
+        assert removed == []
+        summarize.assert_not_called()
+
+    async def test_session_still_writable_after_compaction(self, service):
+        session = await service.create_session(app_name=APP, user_id="u1", session_id="s1")
+        await _add_turns(service, session, range(8))
+        await service.compact_session(APP, "u1", "s1", max_events=20, keep_turns=3, summarize=summarize_events)
+
+        # A turn started before compaction keeps appending to its Session object
+        await service.append_event(session, _user(8, "続き"))
+        await service.flush_session(APP, "u1", "s1")
+        stored = await service.get_session(app_name=APP, user_id="u1", session_id="s1")
+        assert stored.events[-1].content.parts[0].text == "続き"
+
+
+class TestSessionCompactor:
+    async def test_schedule_runs_in_background_and_feeds_memory(self, service):
+        session = await service.create_session(app_name=APP, user_id="u1", session_id="s1")
+        await _add_turns(service, session, range(8))
+        memory = MagicMock()
+        memory.add_events_to_memory = AsyncMock()
+        compactor = SessionCompactor(service, memory, max_events=20, keep_turns=3)
+
+        assert compactor.schedule(APP, "u1", "s1") is True
+        assert compactor.schedule(APP, "u1", "s1") is False  # already running
+        await compactor.drain()
+
+        assert compactor.stats() == {"running": 0, "runs": 1, "failures": 0}
+        kwargs = memory.add_events_to_memory.await_args.kwargs
+        assert kwargs["session_id"] == "s1"
+        assert len(kwargs["events"]) == 15
+
+    async def test_failure_is_counted_not_raised(self):
+        service = MagicMock()
+        service.compact_session = AsyncMock(side_effect=RuntimeError("db down"))
+        compactor = SessionCompactor(service)
+        compactor.schedule(APP, "u1", "s1")
+        await compactor.drain()
+        assert compactor.stats()["failures"] == 1
+        assert compactor.stats()["running"] == 0
+
+
+class TestInjectSummary:
+    def test_appends_summary_to_system_instruction(self):
+        ctx = MagicMock()
+        ctx.state = {SUMMARY_STATE_KEY: "- ユーザー: 春メイク"}
+        request = LlmRequest(config=types.GenerateContentConfig(system_instruction="base"))
+        assert inject_conversation_summary(ctx, request) is None
+        assert "- ユーザー: 春メイク" in request.config.system_instruction
+        assert request.config.system_instruction.startswith("base")
+
+    def test_no_summary_leaves_request_untouched(self):
+        ctx = MagicMock()
+        ctx.state = {}
+        request = LlmRequest(config=types.GenerateContentConfig(system_instruction="base"))
+        inject_conversation_summary(ctx, request)
+        assert request.config.system_instruction == "base"
@@ -0,0 +1,124 @@
+"""Tests for alcheme/session_store.py — pooled, write-batched session backend."""
+
+import asyncio
+import sqlite3
+
+import pytest
+from google.adk.errors._stale_session_error import StaleSessionError
+from google.adk.events.event import Event
+from google.adk.events.event_actions import EventActions
+from google.genai import types
+
+from alcheme.session_store import BatchedDatabaseSessionService, engine_kwargs_for
+
+APP = "alcheme"
+
+
+def _event(text: str, state_delta: dict | None = None) -> Event:
+    return Event(
+        author="user",
+        invocation_id="inv-1",
+        content=types.Content(role="user", parts=[types.Part(text=text)]),
+        actions=EventActions(state_delta=state_delta or {}),
+    )
+
+
+@pytest.fixture
+async def service(tmp_path):
+    svc = BatchedDatabaseSessionService(
+        f"sqlite+aiosqlite:///{tmp_path / 'sessions.db'}", batch_size=8, flush_interval_ms=10_000,
+    )
+    yield svc
+    await svc.close()
+
+
+class TestEngineKwargs:
+    def test_postgres_is_pooled(self):
+        kwargs = engine_kwargs_for("postgresql+asyncpg://u:p@localhost/alcheme")
+        assert kwargs["pool_size"] > 0
+        assert "max_overflow" in kwargs
+
+    def test_sqlite_has_no_pool_args(self):
+        assert engine_kwargs_for("sqlite+aiosqlite:///sessions.db") == {}
+
+
+class TestBatchedAppends:
+    async def test_turn_is_one_write(self, service):
+        session = await service.create_session(app_name=APP, user_id="u1", session_id="s1")
+        for i in range(3):
+            await service.append_event(session, _event(f"m{i}", {"user:turns": i, "mood": "ok"}))
+
+        # In-memory session is current before anything is written
+        assert len(session.events) == 3
+        assert session.state["user:turns"] == 2
+        assert service.batches_written == 0
+
+        await service.flush_session(APP, "u1", "s1")
+        assert service.batches_written == 1
+        assert service.events_written == 3
+
+        stored = await service.get_session(app_name=APP, user_id="u1", session_id="s1")
+        assert [e.content.parts[0].text for e in stored.events] == ["m0", "m1", "m2"]
+        assert stored.state["user:turns"] == 2
+        assert stored.state["mood"] == "ok"
+
+    async def test_read_flushes_pending(self, service):
+        session = await service.create_session(app_name=APP, user_id="u1", session_id="s1")
+        await service.append_event(session, _event("hello"))
+        stored = await service.get_session(app_name=APP, user_id="u1", session_id="s1")
+        assert len(stored.events) == 1
+
+    async def test_batch_size_triggers_write(self, service):
+        session = await service.create_session(app_name=APP, user_id="u1", session_id="s1")
+        for i in range(8):
+            await service.append_event(session, _event(f"m{i}"))
+        assert service.batches_written == 1
+        assert service.stats()["pending_sessions"] == 0
+
+    async def test_timer_flushes(self, tmp_path):
+        svc = BatchedDatabaseSessionService(
+            f"sqlite+aiosqlite:///{tmp_path / 't.db'}", batch_size=8, flush_interval_ms=20,
+        )
+        session = await svc.create_session(app_name=APP, user_id="u1", session_id="s1")
+        await svc.append_event(session, _event("hello"))
+        await asyncio.sleep(0.1)
+        assert svc.batches_written == 1
+        await svc.close()
+
+    async def test_next_turn_appends_after_flush(self, service):
+        session = await service.create_session(app_name=APP, user_id="u1", session_id="s1")
+        await service.append_event(session, _event("turn1"))
+        await service.flush_session(APP, "u1", "s1")
+
+        reloaded = await service.get_session(app_name=APP, user_id="u1", session_id="s1")
+        await service.append_event(reloaded, _event("turn2"))
+        stored = await service.get_session(app_name=APP, user_id="u1", session_id="s1")
+        assert [e.content.parts[0].text for e in stored.events] == ["turn1", "turn2"]
+
+    async def test_delete_discards_pending(self, service):
+        session = await service.create_session(app_name=APP, user_id="u1", session_id="s1")
+        await service.append_event(session, _event("hello"))
+        await service.delete_session(app_name=APP, user_id="u1", session_id="s1")
+        assert await service.get_session(app_name=APP, user_id="u1", session_id="s1") is None
+        assert service.batches_written == 0
+
+    async def test_stale_batch_is_rejected(self, service, tmp_path):
+        """A second instance writing the same session makes our buffered batch stale."""
+        session = await service.create_session(app_name=APP, user_id="u1", session_id="s1")
+        other = BatchedDatabaseSessionService(f"sqlite+aiosqlite:///{tmp_path / 'sessions.db'}", batch_size=1)
+        try:
+            theirs = await other.get_session(app_name=APP, user_id="u1", session_id="s1")
+            await other.append_event(theirs, _event("theirs"))
+        finally:
+            await other.close()
+
+        await service.append_event(session, _event("ours"))
+        with pytest.raises(StaleSessionError):
+            await service.flush_session(APP, "u1", "s1")
+        stored = await service.get_session(app_name=APP, user_id="u1", session_id="s1")
+        assert [e.content.parts[0].text for e in stored.events] == ["theirs"]
+
+    async def test_sqlite_file_uses_wal(self, service, tmp_path):
+        await service.create_session(app_name=APP, user_id="u1", session_id="s1")
+        mode = sqlite3.connect(tmp_path / "sessions.db").execute("PRAGMA journal_mode").fetchone()[0]
+        assert mode == "wal"
@@ -4,6 +4,25 @@ from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
+from alcheme.image_scheduler import ImageScheduler
+from alcheme.tools.image_cache import GeneratedImageCache, LocalImageIndex
+
+
+@pytest.fixture(autouse=True)
+def image_cache(tmp_path):
+    """Use an empty filesystem image cache instead of the GCS index."""
+    cache = GeneratedImageCache(LocalImageIndex(tmp_path / "image-cache"))
+    with patch("alcheme.tools.image_cache.get_image_cache", return_value=cache):
+        yield cache
+
+
+@pytest.fixture(autouse=True)
+def image_scheduler():
+    """Unthrottled scheduler so tests never wait on the production quota."""
+    scheduler = ImageScheduler(rate_per_minute=60000, burst=100)
+    with patch("alcheme.tools.image_cache.get_image_scheduler", return_value=scheduler):
+        yield scheduler
+
 
 # ---------------------------------------------------------------------------
 # generate_preview_image
@@ -40,7 +59,7 @@ class TestGeneratePreviewImage:
 
     @patch("alcheme.tools.simulator_tools._get_firestore")
     @patch("alcheme.tools.simulator_tools._get_storage")
-    @patch("alcheme.tools.simulator_tools.genai.Client")
+    @patch("alcheme.tools.image_cache.get_genai_client")
     async def test_success(self, mock_genai_cls, mock_get_storage, mock_get_firestore, sample_steps):
         """Successful generation returns image_url and updates Firestore."""
         from alcheme.tools.simulator_tools import generate_preview_image
@@ -68,7 +87,7 @@ class TestGeneratePreviewImage:
 
     @patch("alcheme.tools.simulator_tools._get_firestore")
     @patch("alcheme.tools.simulator_tools._get_storage")
-    @patch("alcheme.tools.simulator_tools.genai.Client")
+    @patch("alcheme.tools.image_cache.get_genai_client")
     async def test_no_image_in_response(self, mock_genai_cls, mock_get_storage, mock_get_firestore, sample_steps):
         """Model response without image data returns error."""
         from alcheme.tools.simulator_tools import generate_preview_image
@@ -94,7 +113,7 @@ class TestGeneratePreviewImage:
 
     @patch("alcheme.tools.simulator_tools._get_firestore")
     @patch("alcheme.tools.simulator_tools._get_storage")
-    @patch("alcheme.tools.simulator_tools.genai.Client")
+    @patch("alcheme.tools.image_cache.get_genai_client")
     async def test_empty_candidates(self, mock_genai_cls, mock_get_storage, mock_get_firestore, sample_steps):
         """Model response with empty candidates returns error."""
         from alcheme.tools.simulator_tools import generate_preview_image
@@ -116,7 +135,7 @@ class TestGeneratePreviewImage:
 
     @patch("alcheme.tools.simulator_tools._get_firestore")
     @patch("alcheme.tools.simulator_tools._get_storage")
-    @patch("alcheme.tools.simulator_tools.genai.Client")
+    @patch("alcheme.tools.image_cache.get_genai_client")
     async def test_storage_upload_failure(self, mock_genai_cls, mock_get_storage, mock_get_firestore, sample_steps):
         """GCS upload failure returns error gracefully."""
         from alcheme.tools.simulator_tools import generate_preview_image
@@ -139,7 +158,7 @@ class TestGeneratePreviewImage:
 
     @patch("alcheme.tools.simulator_tools._get_firestore")
     @patch("alcheme.tools.simulator_tools._get_storage")
-    @patch("alcheme.tools.simulator_tools.genai.Client")
+    @patch("alcheme.tools.image_cache.get_genai_client")
     async def test_firestore_update_fields(self, mock_genai_cls, mock_get_storage, mock_get_firestore, sample_steps):
         """Firestore update includes preview_image_url and character_theme."""
         from alcheme.tools.simulator_tools import generate_preview_image
@@ -161,3 +180,121 @@ class TestGeneratePreviewImage:
         update_args = mock_doc_ref.update.call_args[0][0]
         assert "preview_image_url" in update_args
         assert update_args["character_theme"] == "cool"
+
+    @patch("alcheme.tools.simulator_tools._get_firestore")
+    @patch("alcheme.tools.simulator_tools._get_storage")
+    @patch("alcheme.tools.image_cache.get_genai_client")
+    async def test_same_prompt_reuses_cached_image(
+        self, mock_genai_cls, mock_get_storage, mock_get_firestore, sample_steps, image_cache,
+    ):
+        """A second recipe with the same prompt reuses the URL without a model call."""
+        from alcheme.tools.simulator_tools import generate_preview_image
+
+        mock_client = self._mock_genai_success(mock_genai_cls)
+        mock_blob = self._mock_storage_success(mock_get_storage)
+        mock_get_firestore.return_value.collection.return_value.document.return_value.get.return_value.exists = False
+
+        bucket = mock_get_storage.return_value.bucket.return_value
+        bucket.copy_blob.return_value.public_url = "https://storage.googleapis.com/alcheme-previews/copy.webp"
+
+        first = await generate_preview_image(recipe_id="recipe-1", user_id="test-user", steps=sample_steps)
+        second = await generate_preview_image(recipe_id="recipe-2", user_id="test-user", steps=sample_steps)
+
+        assert first["image_url"] == mock_blob.public_url
+        assert second["image_url"] == bucket.copy_blob.return_value.public_url
+        assert mock_client.aio.models.generate_content.await_count == 1
+        mock_blob.upload_from_string.assert_called_once()
+        assert image_cache.stats()["hits"] == 1
+        assert image_cache.stats()["spend_avoided_usd"] > 0
+
+    @patch("alcheme.tools.simulator_tools._get_firestore")
+    @patch("alcheme.tools.simulator_tools._get_storage")
+    @patch("alcheme.tools.image_cache.get_genai_client")
+    async def test_cache_hit_copies_blob_into_requesting_users_path(
+        self, mock_genai_cls, mock_get_storage, mock_get_firestore, sample_steps,
+    ):
+        """Another user with the same prompt gets a copy under their own path."""
+        from alcheme.tools.simulator_tools import generate_preview_image
+
+        mock_client = self._mock_genai_success(mock_genai_cls)
+        self._mock_storage_success(mock_get_storage)
+        mock_get_firestore.return_value.collection.return_value.document.return_value.get.return_value.exists = False
+        bucket = mock_get_storage.return_value.bucket.return_value
+
+        await generate_preview_image(recipe_id="recipe-1", user_id="user-a", steps=sample_steps)
+        await generate_preview_image(recipe_id="recipe-2", user_id="user-b", steps=sample_steps)
+
+        assert mock_client.aio.models.generate_content.await_count == 1
+        source_path = bucket.blob.call_args_list[0].args[0]
+        assert source_path.startswith("user-a/recipe-1-")
+        bucket.copy_blob.assert_called_once()
+        dest_path = bucket.copy_blob.call_args.args[2]
+        assert dest_path.startswith("user-b/recipe-2-")
+        assert bucket.blob.call_args_list[-1].args == (source_path,)
+
+    @patch("alcheme.tools.simulator_tools._get_firestore")
+    @patch("alcheme.tools.simulator_tools._get_storage")
+    @patch("alcheme.tools.image_cache.get_genai_client")
+    async def test_stale_cache_entry_regenerates(
+        self, mock_genai_cls, mock_get_storage, mock_get_firestore, sample_steps, image_cache,
+    ):
+        """A cached blob that was deleted since is a miss, not a broken link."""
+        from google.api_core.exceptions import NotFound
+
+        from alcheme.tools.simulator_tools import generate_preview_image
+
+        mock_client = self._mock_genai_success(mock_genai_cls)
+        self._mock_storage_success(mock_get_storage)
+        mock_get_firestore.return_value.collection.return_value.document.return_value.get.return_value.exists = False
+        mock_get_storage.return_value.bucket.return_value.copy_blob.side_effect = NotFound("gone")
+
+        await generate_preview_image(recipe_id="recipe-1", user_id="user-a", steps=sample_steps)
+        result = await generate_preview_image(recipe_id="recipe-2", user_id="user-b", steps=sample_steps)
+
+        assert result["status"] == "success"
+        assert mock_client.aio.models.generate_content.await_count == 2
+        assert image_cache.stats()["hits"] == 0
+
+    @patch("alcheme.tools.simulator_tools._get_firestore")
+    @patch("alcheme.tools.simulator_tools._get_storage")
+    @patch("alcheme.tools.image_cache.get_genai_client")
+    async def test_regeneration_deletes_previous_blob(
+        self, mock_genai_cls, mock_get_storage, mock_get_firestore, sample_steps,
+    ):
+        """Only the recipe's current preview blob is kept."""
+        from alcheme.tools.simulator_tools import generate_preview_image
+
+        self._mock_genai_success(mock_genai_cls)
+        self._mock_storage_success(mock_get_storage)
+        mock_get_firestore.return_value.collection.return_value.document.return_value.get.return_value.exists = False
+        bucket = mock_get_storage.return_value.bucket.return_value
+        old, other_recipe = MagicMock(), MagicMock()
+        old.name = "test-user/recipe-1-0123456789abcdef.webp"
+        other_recipe.name = "test-user/recipe-10-0123456789abcdef.webp"
+        bucket.list_blobs.return_value = [old, other_recipe]
+
+        await generate_preview_image(recipe_id="recipe-1", user_id="test-user", steps=sample_steps, theme="cool")
+
+        bucket.list_blobs.assert_called_once_with(prefix="test-user/recipe-1")
+        old.delete.assert_called_once()
+        other_recipe.delete.assert_not_called()
+
+    @patch("alcheme.tools.simulator_tools._get_firestore")
+    @patch("alcheme.tools.simulator_tools._get_storage")
+    @patch("alcheme.tools.image_cache.get_genai_client")
+    async def test_different_theme_misses_cache(
+        self, mock_genai_cls, mock_get_storage, mock_get_firestore, sample_steps,
+    ):
+        """Changing the character theme changes the prompt and regenerates."""
+        from alcheme.tools.simulator_tools import generate_preview_image
+
+        mock_client = self._mock_genai_success(mock_genai_cls)
+        self._mock_storage_success(mock_get_storage)
+        mock_get_firestore.return_value.collection.return_value.document.return_value.get.return_value.exists = False
+
+        await generate_preview_image(recipe_id="recipe-1", user_id="test-user", steps=sample_steps, theme="cute")
+        await generate_preview_image(recipe_id="recipe-1", user_id="test-user", steps=sample_steps, theme="cool")
+
+        assert mock_client.aio.models.generate_content.await_count == 2
+        blob_paths = [c.args[0] for c in mock_get_storage.return_value.bucket.return_value.blob.call_args_list]
+        assert len(set(blob_paths)) == 2
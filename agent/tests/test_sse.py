@@ -0,0 +1,197 @@
+"""Tests for alcheme/sse.py — SSE frame encoding and text coalescing."""
+
+import asyncio
+import json
+from unittest.mock import patch
+
+import pytest
+
+from alcheme import sse
+from alcheme.sse import CONTENT_DONE_FRAME, DONE_FRAME, Nested, frame, stream
+
+RECIPE = {"recipe": {"recipe_name": "春メイク", "steps": [{"step": 1, "area": "lip", "note": "\"濃いめ\"\n"}]}}
+
+
+def _parse(frames: list[str]) -> list[dict]:
+    events = []
+    for f in frames:
+        assert f.startswith("data: ") and f.endswith("\n\n")
+        assert "\n" not in f[:-2]
+        events.append(json.loads(f[6:]))
+    return events
+
+
+async def _collect(events, **kwargs) -> list[str]:
+    return [f async for f in stream(events, **kwargs)]
+
+
+async def _events(items, delay: float = 0):
+    for item in items:
+        if delay:
+            await asyncio.sleep(delay)
+        yield item
+
+
+class TestFrame:
+    def test_matches_legacy_wire_format(self):
+        legacy = json.dumps({"type": "text_delta", "data": "こんにちは"}, ensure_ascii=False)
+        assert json.loads(frame("text_delta", "こんにちは")[6:]) == json.loads(legacy)
+        assert "こんにちは" in frame("text_delta", "こんにちは")
+
+    def test_nested_payload_is_a_json_string(self):
+        event = _parse([frame("recipe_card", Nested(RECIPE))])[0]
+        assert event["type"] == "recipe_card"
+        assert isinstance(event["data"], str)
+        assert json.loads(event["data"]) == RECIPE
+
+    def test_object_data_stays_an_object(self):
+        assert _parse([frame("preview_pending", {"recipe_id": "r1"})])[0]["data"] == {"recipe_id": "r1"}
+
+    def test_constant_frames(self):
+        assert _parse([DONE_FRAME, CONTENT_DONE_FRAME]) == [
+            {"type": "done", "data": ""},
+            {"type": "content_done", "data": ""},
+        ]
+
+    def test_json_fallback_without_orjson(self):
+        with patch.object(sse, "orjson", None):
+            event = _parse([frame("recipe_card", Nested(RECIPE))])[0]
+        assert json.loads(event["data"]) == RECIPE
+
+
+class TestStream:
+    async def test_burst_of_deltas_is_merged(self):
+        items = [("text_delta", c) for c in "こんにちは"] + [("done", "")]
+        events = _parse(await _collect(_events(items), coalesce_ms=50))
+        assert events == [{"type": "text_delta", "data": "こんにちは"}, {"type": "done", "data": ""}]
+
+    async def test_other_events_flush_pending_text_in_order(self):
+        items = [
+            ("text_delta", "a"), ("text_delta", "b"), ("progress", "検索中..."),
+            ("text_delta", "c"), ("recipe_card", Nested(RECIPE)), ("done", ""),
+        ]
+        events = _parse(await _collect(_events(items), coalesce_ms=50))
+        assert [(e["type"], e["data"] if e["type"] != "recipe_card" else None) for e in events] == [
+            ("text_delta", "ab"), ("progress", "検索中..."), ("text_delta", "c"), ("recipe_card", None), ("done", ""),
+        ]
+
+    async def test_quiet_interval_flushes_without_next_event(self):
+        release = asyncio.Event()
+
+        async def events():
+            yield "text_delta", "a"
+            await release.wait()
+            yield "done", ""
+
+        frames = stream(events(), coalesce_ms=10)
+        first = await asyncio.wait_for(frames.__anext__(), 1)
+        assert _parse([first]) == [{"type": "text_delta", "data": "a"}]
+        release.set()
+        assert _parse([await frames.__anext__()]) == [{"type": "done", "data": ""}]
+        await frames.aclose()
+
+    async def test_max_chars_flush(self):
+        items = [("text_delta", "x" * 6)] * 3
+        events = _parse(await _collect(_events(items), coalesce_ms=1000, max_chars=10))
+        assert [e["data"] for e in events] == ["x" * 12, "x" * 6]
+
+    async def test_disabled_passes_every_delta_through(self):
+        items = [("text_delta", "a"), ("text_delta", "b")]
+        events = _parse(await _collect(_events(items), coalesce_ms=0))
+        assert [e["data"] for e in events] == ["a", "b"]
+
+    async def test_producer_error_propagates(self):
+        async def events():
+            yield "text_delta", "a"
+            raise RuntimeError("boom")
+
+        with pytest.raises(RuntimeError, match="boom"):
+            await _collect(events(), coalesce_ms=10)
+
+    async def test_closing_stream_cancels_producer(self):
+        cancelled = asyncio.Event()
+
+        async def events():
+            yield "progress", "..."
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+            yield "done", ""
+
+        frames = stream(events(), coalesce_ms=10)
+        await frames.__anext__()
+        await frames.aclose()
+        assert cancelled.is_set()
+
+    async def test_closing_with_full_queue_does_not_hang(self):
+        async def events():
+            for i in range(sse._QUEUE_MAX * 3):
+                yield "progress", str(i)
+
+        frames = stream(events(), coalesce_ms=10)
+        await frames.__anext__()
+        await asyncio.sleep(0.01)  # producer fills the queue and blocks
+        await asyncio.wait_for(frames.aclose(), 1)
+
+
+class TestDisconnect:
+    async def test_disconnect_cancels_producer_mid_tool_call(self):
+        cancelled = asyncio.Event()
+        connected = True
+
+        async def is_disconnected():
+            return not connected
+
+        async def events():
+            yield "progress", "在庫データを取得中..."
+            try:
+                await asyncio.sleep(10)  # a long tool call, nothing to send
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+            yield "done", ""
+
+        before = sse.stats()
+        frames = stream(events(), coalesce_ms=10, is_disconnected=is_disconnected, poll_ms=5)
+        assert _parse([await frames.__anext__()])[0]["type"] == "progress"
+        connected = False
+        rest = await asyncio.wait_for(_drain(frames), 1)
+        assert rest == []
+        assert cancelled.is_set()
+        after = sse.stats()
+        assert after["disconnects"] == before["disconnects"] + 1
+        assert after["cancelled"] == before["cancelled"] + 1
+
+    async def test_disconnect_with_full_queue_does_not_hang(self):
+        connected = True
+
+        async def is_disconnected():
+            return not connected
+
+        async def events():
+            for i in range(sse._QUEUE_MAX * 3):
+                yield "progress", str(i)
+
+        frames = stream(events(), coalesce_ms=10, is_disconnected=is_disconnected, poll_ms=5)
+        await frames.__anext__()
+        await asyncio.sleep(0.01)  # slow client: the queue is full
+        connected = False
+        await asyncio.sleep(0.02)
+        rest = await asyncio.wait_for(_drain(frames), 1)
+        assert rest == []
+
+    async def test_connected_stream_completes(self):
+        async def is_disconnected():
+            return False
+
+        items = [("text_delta", "a"), ("done", "")]
+        before = sse.stats()["completed"]
+        frames = await _collect(_events(items), coalesce_ms=0, is_disconnected=is_disconnected, poll_ms=5)
+        assert [e["type"] for e in _parse(frames)] == ["text_delta", "done"]
+        assert sse.stats()["completed"] == before + 1
+
+
+async def _drain(frames) -> list[str]:
+    return [f async for f in frames]
@@ -1,10 +1,10 @@
-"""Tests for _extract_card_events_from_event in server.py."""
+"""Tests for card events built by alcheme/event_dispatch.py."""
 
 from unittest.mock import MagicMock
 
 import pytest
 
-from server import _extract_card_events_from_event
+from alcheme.event_dispatch import classify_event
 
 
 def _make_event_with_function_response(name: str, response: dict):
@@ -30,24 +30,24 @@ def _make_event_no_content():
 
 
 class TestExtractCardEvents:
-    """Test _extract_card_events_from_event extraction."""
+    """Test card events from classify_event."""
 
     def test_returns_empty_for_no_content(self):
         event = _make_event_no_content()
-        assert _extract_card_events_from_event(event) == []
+        assert classify_event(event).cards == []
 
     def test_returns_empty_for_unrelated_tool(self):
         event = _make_event_with_function_response(
             "search_rakuten", {"status": "success", "results": []}
         )
-        assert _extract_card_events_from_event(event) == []
+        assert classify_event(event).cards == []
 
     def test_returns_empty_for_failed_status(self):
         event = _make_event_with_function_response(
             "analyze_product_compatibility",
             {"status": "error", "message": "something went wrong"},
         )
-        assert _extract_card_events_from_event(event) == []
+        assert classify_event(event).cards == []
 
     def test_analyze_product_compatibility(self):
         event = _make_event_with_function_response(
@@ -67,7 +67,7 @@ class TestExtractCardEvents:
                 "similar_items": [],
             },
         )
-        results = _extract_card_events_from_event(event)
+        results = classify_event(event).cards
         assert len(results) == 1
         assert results[0]["type"] == "product_card"
         data = results[0]["data"]
@@ -106,7 +106,7 @@ class TestExtractCardEvents:
                 ],
             },
         )
-        results = _extract_card_events_from_event(event)
+        results = classify_event(event).cards
         assert len(results) == 2
         assert results[0]["data"]["brand"] == "DIOR"
         assert results[0]["data"]["duplicate_risk"] == "high"
@@ -127,7 +127,7 @@ class TestExtractCardEvents:
                 "general_tips": ["少量ずつ重ねる"],
             },
         )
-        results = _extract_card_events_from_event(event)
+        results = classify_event(event).cards
         assert len(results) == 1
         assert results[0]["type"] == "technique_card"
         data = results[0]["data"]
@@ -141,5 +141,88 @@ class TestExtractCardEvents:
         event.content = MagicMock()
         # parts raises an error when iterated
         type(event.content).parts = property(lambda self: (_ for _ in ()).throw(RuntimeError("broken")))
-        results = _extract_card_events_from_event(event)
+        results = classify_event(event).cards
         assert results == []
+
+
+def _make_event(*parts, transfer_to_agent=None):
+    event = MagicMock()
+    event.content.parts = list(parts)
+    event.actions.transfer_to_agent = transfer_to_agent
+    return event
+
+
+def _part(text=None, call=None, response=None):
+    part = MagicMock()
+    part.text = text
+    part.function_call = None
+    part.function_response = None
+    if call:
+        part.function_call = MagicMock()
+        part.function_call.name = call
+    if response:
+        part.function_response = MagicMock()
+        part.function_response.name, part.function_response.response = response
+    return part
+
+
+class TestClassifyEvent:
+    """Text, progress and recipe_id come from the same single pass."""
+
+    def test_text_parts_are_joined(self):
+        info = classify_event(_make_event(_part("こんにちは"), _part("！")))
+        assert info.text == "こんにちは！"
+        assert info.progress is None and info.cards == [] and info.recipe_id is None
+
+    def test_tool_call_progress(self):
+        info = classify_event(_make_event(_part(call="unknown_tool"), _part(call="get_inventory")))
+        assert info.progress == "在庫データを取得中..."
+
+    def test_agent_transfer_takes_precedence(self):
+        event = _make_event(_part(call="get_inventory"), transfer_to_agent="alchemist_agent")
+        assert classify_event(event).progress == "メイクレシピを作成中..."
+
+    def test_recipe_id_from_save_recipe(self):
+        event = _make_event(_part(response=("save_recipe", {"status": "success", "recipe_id": "r-1"})))
+        assert classify_event(event).recipe_id == "r-1"
+
+    def test_recipe_id_from_mapping_response(self):
+        class Struct:
+            def __init__(self, data):
+                self._data = data
+
+            def get(self, key, default=None):
+                return self._data.get(key, default)
+
+            def keys(self):
+                return self._data.keys()
+
+            def __getitem__(self, key):
+                return self._data[key]
+
+        event = _make_event(_part(response=("save_recipe", Struct({"recipe_id": "r-2"}))))
+        assert classify_event(event).recipe_id == "r-2"
+
+    def test_mixed_event(self):
+        event = _make_event(
+            _part(call="save_recipe"),
+            _part(response=("save_recipe", {"recipe_id": "r-3"})),
+            _part(response=("get_substitution_technique", {"status": "success", "title": "代用"})),
+            _part("保存しました"),
+        )
+        info = classify_event(event)
+        assert (info.text, info.progress, info.recipe_id) == ("保存しました", "メイクレシピを保存中...", "r-3")
+        assert [c["type"] for c in info.cards] == ["technique_card"]
+
+    def test_handler_registration(self):
+        from alcheme import event_dispatch
+
+        @event_dispatch.response_handler("custom_tool")
+        def handler(data, result):
+            result.cards.append({"type": "custom_card", "data": data})
+
+        try:
+            event = _make_event(_part(response=("custom_tool", {"x": 1})))
+            assert classify_event(event).cards == [{"type": "custom_card", "data": {"x": 1}}]
+        finally:
+            del event_dispatch._RESPONSE_HANDLERS["custom_tool"]
@@ -0,0 +1,160 @@
+"""Tests for suggestion_tools — keyed dedupe upsert and bounded history."""
+
+import json
+from unittest.mock import MagicMock, patch
+
+from alcheme.tools.suggestion_tools import (
+    HISTORY_LIMIT,
+    _dedupe_key,
+    _upsert_suggestion,
+    save_suggestion,
+    suggestion_doc_id,
+)
+
+KEY = _dedupe_key("KATE", "リップモンスター", "03")
+
+
+def _snapshot(doc_id: str, data: dict | None) -> MagicMock:
+    snap = MagicMock()
+    snap.id = doc_id
+    snap.exists = data is not None
+    snap.to_dict.return_value = data
+    snap.reference = MagicMock(name=f"ref-{doc_id}")
+    return snap
+
+
+def _col_ref(keyed: MagicMock, legacy: list | None = None) -> MagicMock:
+    col_ref = MagicMock()
+    doc_ref = MagicMock()
+    doc_ref.id = suggestion_doc_id(KEY)
+    doc_ref.get.return_value = keyed
+    col_ref.document.return_value = doc_ref
+    col_ref.where.return_value.limit.return_value.stream.return_value = iter(legacy or [])
+    return col_ref
+
+
+def _new_doc(reason: str = "春のリップに") -> dict:
+    return {"reason": reason, "dedupe_key": KEY, "recommendation_count": 1}
+
+
+class TestSuggestionDocId:
+    def test_deterministic_and_prefixed(self):
+        doc_id = suggestion_doc_id(KEY)
+        assert doc_id == suggestion_doc_id(KEY)
+        assert doc_id.startswith("sg_")
+        assert len(doc_id) == 35
+
+    def test_key_is_case_insensitive(self):
+        assert _dedupe_key("kate", "リップモンスター", "03") == KEY
+
+
+class TestUpsertSuggestion:
+    def test_creates_at_deterministic_id(self):
+        txn = MagicMock()
+        col_ref = _col_ref(_snapshot("x", None))
+        new_doc = _new_doc()
+
+        doc_id, incremented = _upsert_suggestion.to_wrap(txn, col_ref, KEY, new_doc, {"context": "c"})
+
+        assert (doc_id, incremented) == (suggestion_doc_id(KEY), False)
+        col_ref.document.assert_called_once_with(suggestion_doc_id(KEY))
+        doc_ref = col_ref.document.return_value
+        txn.create.assert_any_call(doc_ref, new_doc)
+        txn.create.assert_any_call(doc_ref.collection("history").document(), {"context": "c"})
+        doc_ref.collection.assert_called_with("history")
+        txn.update.assert_not_called()
+
+    def test_increments_keyed_doc_without_query(self):
+        txn = MagicMock()
+        existing = _snapshot(suggestion_doc_id(KEY), {"recommendation_count": 2, "history": [{"context": "a"}]})
+        col_ref = _col_ref(existing)
+
+        doc_id, incremented = _upsert_suggestion.to_wrap(txn, col_ref, KEY, _new_doc(), {"context": "b"})
+
+        assert incremented is True
+        assert doc_id == suggestion_doc_id(KEY)
+        col_ref.where.assert_not_called()
+        ref, update = txn.update.call_args[0]
+        assert ref is existing.reference
+        assert update["recommendation_count"] == 3
+        assert update["history"] == [{"context": "a"}, {"context": "b"}]
+        assert update["reason"] == "春のリップに"
+
+    def test_falls_back_to_indexed_field_for_legacy_docs(self):
+        txn = MagicMock()
+        legacy = _snapshot("legacy-id", {"recommendation_count": 1, "reason": "old"})
+        col_ref = _col_ref(_snapshot("x", None), legacy=[legacy])
+
+        doc_id, incremented = _upsert_suggestion.to_wrap(txn, col_ref, KEY, _new_doc(reason=""), {})
+
+        assert (doc_id, incremented) == ("legacy-id", True)
+        col_ref.where.assert_called_once_with("dedupe_key", "==", KEY)
+        col_ref.where.return_value.limit.assert_called_once_with(1)
+        col_ref.where.return_value.limit.return_value.stream.assert_called_once_with(transaction=txn)
+        assert txn.update.call_args[0][1]["reason"] == "old"
+        txn.create.assert_called_once_with(legacy.reference.collection("history").document(), {})
+
+    def test_history_ring_is_capped(self):
+        txn = MagicMock()
+        history = [{"context": str(i)} for i in range(HISTORY_LIMIT + 5)]
+        existing = _snapshot(suggestion_doc_id(KEY), {"recommendation_count": 15, "history": history})
+        col_ref = _col_ref(existing)
+
+        _upsert_suggestion.to_wrap(txn, col_ref, KEY, _new_doc(), {"context": "new"})
+
+        update = txn.update.call_args[0][1]
+        assert len(update["history"]) == HISTORY_LIMIT
+        assert update["history"][0] == {"context": "6"}
+        assert update["history"][-1] == {"context": "new"}
+        assert update["recommendation_count"] == 16
+        # The full log grows in the subcollection instead
+        txn.create.assert_called_once_with(existing.reference.collection("history").document(), {"context": "new"})
+
+
+class TestSaveSuggestion:
+    def _ctx(self) -> MagicMock:
+        ctx = MagicMock()
+        ctx.state = {"user:id": "u1"}
+        return ctx
+
+    def _payload(self) -> str:
+        return json.dumps({"brand": "KATE", "product_name": "リップモンスター", "color_code": "03", "reason": "春"})
+
+    @patch("alcheme.tools.catalog_tools.upsert_catalog")
+    @patch("alcheme.tools.suggestion_tools._upsert_suggestion", return_value=("sg_new", False))
+    @patch("alcheme.tools.suggestion_tools._get_db")
+    def test_create_writes_key_and_upserts_catalog(self, mock_db, mock_upsert, mock_catalog):
+        result = save_suggestion(self._payload(), self._ctx())
+
+        assert result == {"status": "success", "suggestion_id": "sg_new", "incremented": False}
+        _, _, key, new_doc, _ = mock_upsert.call_args[0]
+        assert key == KEY
+        assert new_doc["dedupe_key"] == KEY
+        # Sentinels are rejected inside arrays, so the entry carries a plain timestamp
+        assert isinstance(new_doc["history"][0]["suggested_at"], str)
+        mock_catalog.assert_called_once()
+
+    @patch("alcheme.tools.catalog_tools.upsert_catalog", side_effect=RuntimeError("contention"))
+    @patch("alcheme.tools.suggestion_tools._upsert_suggestion", return_value=("sg_new", False))
+    @patch("alcheme.tools.suggestion_tools._get_db")
+    def test_catalog_failure_is_logged_not_raised(self, mock_db, mock_upsert, mock_catalog, caplog):
+        result = save_suggestion(self._payload(), self._ctx())
+
+        assert result["status"] == "success"
+        record = next(r for r in caplog.records if "Catalog upsert failed" in r.message)
+        assert record.levelname == "WARNING" and record.exc_info
+
+    @patch("alcheme.tools.catalog_tools.upsert_catalog")
+    @patch("alcheme.tools.suggestion_tools._upsert_suggestion", return_value=("sg_old", True))
+    @patch("alcheme.tools.suggestion_tools._get_db")
+    def test_increment_skips_catalog(self, mock_db, mock_upsert, mock_catalog):
+        result = save_suggestion(self._payload(), self._ctx())
+
+        assert result["incremented"] is True
+        mock_catalog.assert_not_called()
+
+    @patch("alcheme.tools.suggestion_tools._get_db")
+    def test_requires_brand_and_name(self, mock_db):
+        result = save_suggestion(json.dumps({"brand": "KATE"}), self._ctx())
+        assert result["status"] == "error"
+        mock_db.return_value.transaction.assert_not_called()
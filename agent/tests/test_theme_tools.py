@@ -1,4 +1,4 @@
-"""Tests for theme generation prompts."""
+"""Tests for theme generation prompts and theme image generation."""
 
 import pytest
 from alcheme.prompts.theme_generator import (
@@ -124,3 +124,47 @@ class TestBuildThemeImagePrompt:
         }
         prompt = build_theme_image_prompt(theme)
         assert "natural beauty" in prompt  # fallback keyword
+
+
+class TestGenerateThemeImage:
+    """generate_theme_image() through the shared cached-image flow."""
+
+    @pytest.fixture(autouse=True)
+    def image_deps(self, tmp_path):
+        from unittest.mock import AsyncMock, MagicMock, patch
+
+        from alcheme.image_scheduler import ImageScheduler
+        from alcheme.tools.image_cache import GeneratedImageCache, LocalImageIndex
+
+        part = MagicMock()
+        part.inline_data.mime_type = "image/webp"
+        part.inline_data.data = b"fake_image_bytes"
+        client = MagicMock()
+        client.aio.models.generate_content = AsyncMock(
+            return_value=MagicMock(candidates=[MagicMock(content=MagicMock(parts=[part]))]),
+        )
+        with patch("alcheme.tools.image_cache.get_image_cache",
+                   return_value=GeneratedImageCache(LocalImageIndex(tmp_path / "image-cache"))), \
+             patch("alcheme.tools.image_cache.get_image_scheduler",
+                   return_value=ImageScheduler(rate_per_minute=60000, burst=100)), \
+             patch("alcheme.tools.image_cache.get_genai_client", return_value=client), \
+             patch("alcheme.tools.theme_tools._get_storage") as storage, \
+             patch("alcheme.tools.theme_tools._get_firestore") as firestore:
+            bucket = storage.return_value.bucket.return_value
+            bucket.blob.return_value.public_url = "https://storage.googleapis.com/alcheme-previews/a.webp"
+            bucket.copy_blob.return_value.public_url = "https://storage.googleapis.com/alcheme-previews/b.webp"
+            yield client, bucket, firestore
+
+    async def test_generates_into_theme_path_then_copies_on_hit(self, image_deps):
+        from alcheme.tools.theme_tools import generate_theme_image
+
+        client, bucket, _ = image_deps
+        theme = {"title": "春", "character_theme": "cute", "style_keywords": ["ピンク"]}
+
+        first = await generate_theme_image("theme-1", "user-a", theme)
+        second = await generate_theme_image("theme-2", "user-b", theme)
+
+        assert first["status"] == second["status"] == "success"
+        assert client.aio.models.generate_content.await_count == 1
+        assert bucket.blob.call_args_list[0].args[0].startswith("user-a/themes/theme-1-")
+        assert bucket.copy_blob.call_args.args[2].startswith("user-b/themes/theme-2-")
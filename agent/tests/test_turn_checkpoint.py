@@ -0,0 +1,131 @@
+"""Tests for alcheme/turn_checkpoint.py — per-turn tool result replay."""
+
+import asyncio
+from unittest.mock import MagicMock
+
+import pytest
+
+from alcheme import turn_checkpoint
+from alcheme.turn_checkpoint import TurnCheckpointPlugin
+
+
+def _tool(name: str):
+    tool = MagicMock()
+    tool.name = name
+    return tool
+
+
+def _tool_context(state_delta: dict | None = None):
+    ctx = MagicMock()
+    ctx.state = {}
+    ctx.actions.state_delta = state_delta or {}
+    return ctx
+
+
+@pytest.fixture
+def plugin():
+    yield TurnCheckpointPlugin()
+    turn_checkpoint.end_turn()
+
+
+async def _run_tool(plugin, name, args, result, state_delta=None):
+    """What ADK does around a tool call; returns (response, tool_ran)."""
+    ctx = _tool_context(state_delta)
+    replayed = await plugin.before_tool_callback(tool=_tool(name), tool_args=args, tool_context=ctx)
+    if replayed is not None:
+        response, ran = replayed, False
+    else:
+        response, ran = result, True
+    await plugin.after_tool_callback(tool=_tool(name), tool_args=args, tool_context=ctx, result=response)
+    return response, ran, ctx
+
+
+class TestTurnCheckpoint:
+    async def test_no_turn_no_effect(self, plugin):
+        response, ran, _ = await _run_tool(plugin, "get_inventory", {}, {"status": "success"})
+        assert ran and response == {"status": "success"}
+
+    async def test_first_run_never_replays(self, plugin):
+        turn_checkpoint.begin_turn()
+        await _run_tool(plugin, "get_inventory", {}, {"status": "success", "items": [1]})
+        _, ran, _ = await _run_tool(plugin, "get_inventory", {}, {"status": "success", "items": [1, 2]})
+        assert ran
+
+    async def test_retry_replays_matching_calls(self, plugin):
+        checkpoint = turn_checkpoint.begin_turn()
+        await _run_tool(plugin, "search_rakuten_api", {"keyword": "KATE"}, {"status": "success", "items": ["a"]})
+        checkpoint.start_replay()
+
+        response, ran, _ = await _run_tool(plugin, "search_rakuten_api", {"keyword": "KATE"}, None)
+        assert not ran and response == {"status": "success", "items": ["a"]}
+        _, ran, _ = await _run_tool(plugin, "search_rakuten_api", {"keyword": "CANMAKE"}, {"status": "success"})
+        assert ran
+
+    async def test_save_recipe_with_same_args_is_replayed(self, plugin):
+        checkpoint = turn_checkpoint.begin_turn()
+        await _run_tool(plugin, "save_recipe", {"recipe_json": "春"}, {"status": "success", "recipe_id": "r-1"})
+        checkpoint.start_replay()
+
+        response, ran, _ = await _run_tool(plugin, "save_recipe", {"recipe_json": "春"}, None)
+        assert not ran and response["recipe_id"] == "r-1"
+
+    async def test_divergent_save_recipe_runs_and_updates_first_recipe(self, plugin):
+        checkpoint = turn_checkpoint.begin_turn()
+        await _run_tool(plugin, "save_recipe", {"recipe_json": "春"}, {"status": "success", "recipe_id": "r-1"})
+        checkpoint.start_replay()
+
+        key = turn_checkpoint.retry_doc_id_key("save_recipe")
+        response, ran, ctx = await _run_tool(
+            plugin, "save_recipe", {"recipe_json": "春メイク"}, {"status": "success", "recipe_id": "r-1"},
+            {key: "r-1"},
+        )
+        assert ran and response["recipe_id"] == "r-1"
+        assert ctx.state[key] == "r-1"
+
+        # The new args are recorded, without the temp ID key
+        response, ran, ctx = await _run_tool(plugin, "save_recipe", {"recipe_json": "春メイク"}, None)
+        assert not ran and key not in ctx.state
+
+    async def test_first_run_save_recipe_gets_no_doc_id(self, plugin):
+        turn_checkpoint.begin_turn()
+        await _run_tool(plugin, "save_recipe", {"recipe_json": "春"}, {"status": "success", "recipe_id": "r-1"})
+        _, ran, ctx = await _run_tool(plugin, "save_recipe", {"recipe_json": "夏"}, {"status": "success"})
+        assert ran and ctx.state == {}
+
+    async def test_errors_are_not_recorded(self, plugin):
+        checkpoint = turn_checkpoint.begin_turn()
+        await _run_tool(plugin, "get_weather", {}, {"status": "error", "message": "timeout"})
+        checkpoint.start_replay()
+        _, ran, _ = await _run_tool(plugin, "get_weather", {}, {"status": "success"})
+        assert ran
+
+    async def test_state_delta_is_replayed(self, plugin):
+        checkpoint = turn_checkpoint.begin_turn()
+        summary = {"total": 3}
+        await _run_tool(plugin, "get_inventory_summary", {}, {"status": "success"},
+                        {"session:current_inventory_summary": summary})
+        checkpoint.start_replay()
+
+        _, ran, ctx = await _run_tool(plugin, "get_inventory_summary", {}, None)
+        assert not ran
+        assert ctx.state == {"session:current_inventory_summary": summary}
+
+    async def test_replayed_result_is_a_copy(self, plugin):
+        checkpoint = turn_checkpoint.begin_turn()
+        await _run_tool(plugin, "get_inventory", {}, {"status": "success", "items": [1]})
+        checkpoint.start_replay()
+        first, _, _ = await _run_tool(plugin, "get_inventory", {}, None)
+        first["items"].append(2)
+        second, _, _ = await _run_tool(plugin, "get_inventory", {}, None)
+        assert second["items"] == [1]
+
+    async def test_turns_are_isolated_per_task(self, plugin):
+        async def turn(keyword: str) -> bool:
+            checkpoint = turn_checkpoint.begin_turn()
+            await _run_tool(plugin, "search_rakuten_api", {"keyword": keyword}, {"status": "success"})
+            await asyncio.sleep(0)
+            checkpoint.start_replay()
+            _, ran, _ = await _run_tool(plugin, "search_rakuten_api", {"keyword": "other"}, {"status": "success"})
+            return ran
+
+        assert await asyncio.gather(asyncio.create_task(turn("A")), asyncio.create_task(turn("other"))) == [True, False]
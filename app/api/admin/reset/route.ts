@@ -63,8 +63,13 @@ export async function POST() {
       results[name] = await deleteCollection(colRef);
     }
 
-    // 2. Global catalog
-    results.catalog = await deleteCollection(adminDb.collection('catalog'));
+    // 2. Global catalog — recursive so counter_shards go too (catalog IDs are
+    // deterministic, and orphaned shards would be rolled into a re-created entry)
+    const catalogDocs = await adminDb.collection('catalog').listDocuments();
+    for (const doc of catalogDocs) {
+      await adminDb.recursiveDelete(doc);
+    }
+    results.catalog = catalogDocs.length;
 
     // 3. Social: posts, comments, likes, follows, user_stats
     // Posts
@@ -7,6 +7,7 @@ import { NextRequest, NextResponse } from "next/server";
 import { cookies } from "next/headers";
 import { getAuthUserId } from "@/lib/api/auth";
 import { adminDb } from "@/lib/firebase/admin";
+import { callAgent } from "@/lib/api/agent-client";
 import {
   exchangeCodeForTokens,
   fetchCalendarList,
@@ -80,6 +81,11 @@ export async function GET(request: NextRequest) {
       calendarIntegration: integration,
     });
 
+    // Agent caches profiles (calendarConnected) for a few minutes; drop this user's entry (best effort)
+    callAgent("/profile/invalidate", { user_id: userId }).catch((err) => {
+      console.warn("Profile cache invalidation failed:", err);
+    });
+
     return NextResponse.redirect(
       new URL("/settings/edit/calendar?connected=true", request.url),
     );
@@ -5,6 +5,7 @@
 import { NextResponse } from "next/server";
 import { getAuthUserId } from "@/lib/api/auth";
 import { adminDb } from "@/lib/firebase/admin";
+import { callAgent } from "@/lib/api/agent-client";
 import { revokeToken } from "@/lib/api/google-calendar";
 import { FieldValue } from "firebase-admin/firestore";
 
@@ -34,6 +35,11 @@ export async function DELETE() {
       calendarIntegration: FieldValue.delete(),
     });
 
+    // Agent caches profiles (calendarConnected) for a few minutes; drop this user's entry (best effort)
+    callAgent("/profile/invalidate", { user_id: userId }).catch((err) => {
+      console.warn("Profile cache invalidation failed:", err);
+    });
+
     return NextResponse.json({ success: true });
   } catch (error) {
     console.error("Calendar disconnect error:", error);
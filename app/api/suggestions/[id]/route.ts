@@ -42,9 +42,10 @@ export async function DELETE(_request: NextRequest, { params }: RouteParams) {
 
   try {
     const { id } = await params;
-    await adminDb
-      .collection('users').doc(userId).collection('suggested_items').doc(id)
-      .delete();
+    // Also removes the history subcollection
+    await adminDb.recursiveDelete(
+      adminDb.collection('users').doc(userId).collection('suggested_items').doc(id),
+    );
 
     return NextResponse.json({ success: true });
   } catch (error) {
@@ -6,11 +6,21 @@ import { adminDb } from '@/lib/firebase/admin';
 import { getAuthUserId } from '@/lib/api/auth';
 import { timestampToString } from '@/lib/firebase/firestore-helpers';
 import { Timestamp } from 'firebase-admin/firestore';
+import { createHash } from 'crypto';
 
 function dedupeKey(brand: string, productName: string, colorCode?: string): string {
   return `${(brand || '').toLowerCase()}::${(productName || '').toLowerCase()}::${(colorCode || '').toLowerCase()}`;
 }
 
+// Recent entries kept inline; the full log lives in suggested_items/{id}/history.
+// Must match HISTORY_LIMIT in agent/alcheme/tools/suggestion_tools.py
+const HISTORY_LIMIT = 10;
+
+// Must match suggestion_doc_id() in agent/alcheme/tools/suggestion_tools.py
+function suggestionDocId(key: string): string {
+  return `sg_${createHash('sha256').update(key, 'utf8').digest('hex').slice(0, 32)}`;
+}
+
 export async function GET(_request: NextRequest) {
   const userId = await getAuthUserId();
   if (!userId) {
@@ -59,13 +69,6 @@ export async function POST(request: NextRequest) {
     const key = dedupeKey(brand, product_name, color_code);
     const now = Timestamp.now();
 
-    // Check for existing suggestion
-    const snapshot = await colRef.get();
-    const existing = snapshot.docs.find((doc) => {
-      const d = doc.data();
-      return dedupeKey(d.brand, d.product_name, d.color_code) === key;
-    });
-
     const historyEntry = {
       recipe_id: recipe_id || null,
       recipe_name: recipe_name || null,
@@ -73,25 +76,12 @@ export async function POST(request: NextRequest) {
       context: context || reason || '',
     };
 
-    if (existing) {
-      // Increment count and append history
-      const data = existing.data();
-      const history = data.history || [];
-      await existing.ref.update({
-        recommendation_count: (data.recommendation_count || 1) + 1,
-        history: [...history, historyEntry],
-        reason: reason || data.reason,
-        updated_at: now,
-      });
-      return NextResponse.json({ success: true, id: existing.id, incremented: true });
-    }
-
-    // Create new suggestion — only include defined fields (Firestore rejects undefined)
-    const docRef = colRef.doc();
-    const doc: Record<string, unknown> = {
+    // Only include defined fields (Firestore rejects undefined)
+    const newDoc: Record<string, unknown> = {
       brand,
       product_name,
       reason: reason || '',
+      dedupe_key: key,
       recommendation_count: 1,
       history: [historyEntry],
       status: '候補',
@@ -99,16 +89,47 @@ export async function POST(request: NextRequest) {
       created_at: now,
       updated_at: now,
     };
-    if (color_code) doc.color_code = color_code;
-    if (color_name) doc.color_name = color_name;
-    if (category) doc.category = category;
-    if (item_type) doc.item_type = item_type;
-    if (price_range) doc.price_range = price_range;
-    if (product_url) doc.product_url = product_url;
-    if (image_url) doc.image_url = image_url;
-    await docRef.set(doc);
-
-    return NextResponse.json({ success: true, id: docRef.id, incremented: false }, { status: 201 });
+    if (color_code) newDoc.color_code = color_code;
+    if (color_name) newDoc.color_name = color_name;
+    if (category) newDoc.category = category;
+    if (item_type) newDoc.item_type = item_type;
+    if (price_range) newDoc.price_range = price_range;
+    if (product_url) newDoc.product_url = product_url;
+    if (image_url) newDoc.image_url = image_url;
+
+    // Keyed read-modify-write: deterministic doc ID, or the indexed dedupe_key
+    // for suggestions created before deterministic IDs
+    const result = await adminDb.runTransaction(async (tx) => {
+      const docRef = colRef.doc(suggestionDocId(key));
+      let existing = await tx.get(docRef);
+      if (!existing.exists) {
+        const legacy = await tx.get(colRef.where('dedupe_key', '==', key).limit(1));
+        if (!legacy.empty) existing = legacy.docs[0];
+      }
+
+      if (existing.exists) {
+        // Increment count, keep the latest entries inline and log the full history
+        const data = existing.data() || {};
+        const history = data.history || [];
+        tx.update(existing.ref, {
+          recommendation_count: (data.recommendation_count || 1) + 1,
+          history: [...history.slice(Math.max(0, history.length - HISTORY_LIMIT + 1)), historyEntry],
+          reason: reason || data.reason,
+          updated_at: now,
+        });
+        tx.create(existing.ref.collection('history').doc(), historyEntry);
+        return { id: existing.id, incremented: true };
+      }
+
+      tx.create(docRef, newDoc);
+      tx.create(docRef.collection('history').doc(), historyEntry);
+      return { id: docRef.id, incremented: false };
+    });
+
+    return NextResponse.json(
+      { success: true, ...result },
+      { status: result.incremented ? 200 : 201 },
+    );
   } catch (error) {
     console.error('POST /api/suggestions error:', error);
     return NextResponse.json({ error: 'Internal Server Error' }, { status: 500 });
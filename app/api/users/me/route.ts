@@ -4,6 +4,7 @@
 import { NextRequest, NextResponse } from 'next/server';
 import { adminDb } from '@/lib/firebase/admin';
 import { getAuthUserId } from '@/lib/api/auth';
+import { callAgent } from '@/lib/api/agent-client';
 import { Timestamp } from 'firebase-admin/firestore';
 
 export async function GET() {
@@ -44,6 +45,11 @@ export async function PATCH(request: NextRequest) {
       { merge: true }
     );
 
+    // Agent caches profiles for a few minutes; drop this user's entry (best effort)
+    callAgent('/profile/invalidate', { user_id: userId }).catch((err) => {
+      console.warn('Profile cache invalidation failed:', err);
+    });
+
     return NextResponse.json({ success: true });
   } catch (error) {
     console.error('PATCH /api/users/me error:', error);
@@ -74,6 +74,32 @@ async function apiUpdateConversationTitle(id: string, title: string) {
   if (!res.ok) throw new Error("Failed to update title");
 }
 
+// Preview images are generated by a background job after the chat stream
+// closes; poll the recipe doc until the job finishes. Go by preview_status,
+// not preview_image_url: a recipe merged into a theme already carries the
+// theme's old image until the new one is done.
+const PREVIEW_POLL_INTERVAL_MS = 3000;
+const PREVIEW_POLL_MAX_ATTEMPTS = 40;
+
+async function pollPreviewImage(recipeId: string, signal: AbortSignal): Promise<string | undefined> {
+  for (let attempt = 0; attempt < PREVIEW_POLL_MAX_ATTEMPTS; attempt++) {
+    await new Promise((resolve) => setTimeout(resolve, PREVIEW_POLL_INTERVAL_MS));
+    if (signal.aborted) return undefined;
+    try {
+      const res = await fetch(`/api/recipes/${recipeId}`, { signal });
+      if (!res.ok) continue;
+      const { recipe } = await res.json();
+      const status = recipe?.preview_status;
+      if (status === "error") return undefined;
+      // Docs written before preview_status existed only have the URL
+      if (recipe?.preview_image_url && (status === "done" || !status)) return recipe.preview_image_url;
+    } catch (err: any) {
+      if (err?.name === "AbortError") return undefined;
+    }
+  }
+  return undefined;
+}
+
 // --- Hook ---
 
 export function useChat() {
@@ -167,7 +193,7 @@ export function useChat() {
     async (text: string, imageBase64?: string, imageMimeType?: string, selectedItemIds?: string[], mode?: MatchMode, brands?: string[], themeId?: string) => {
       if (!text.trim() && !imageBase64) return;
 
-      // Abort any in-flight stream (e.g. still waiting for preview_image after content_done)
+      // Abort any in-flight stream or preview poll from the previous message
       if (abortRef.current) {
         abortRef.current.abort();
         abortRef.current = null;
@@ -225,10 +251,12 @@ export function useChat() {
       let finalTechniqueCard: ChatMessage["technique_card"] | undefined;
       let finalProfilerCard: ChatMessage["profiler_card"] | undefined;
       let finalPreviewUrl: string | undefined;
+      let pendingPreviewRecipeId: string | undefined;
       let finalAgentUsed: string | undefined;
 
       try {
-        abortRef.current = new AbortController();
+        const controller = new AbortController();
+        abortRef.current = controller;
 
         const res = await fetch("/api/chat", {
           method: "POST",
@@ -242,7 +270,7 @@ export function useChat() {
             ...(brands?.length ? { selected_brands: brands } : {}),
             ...(themeId ? { theme_id: themeId } : {}),
           }),
-          signal: abortRef.current.signal,
+          signal: controller.signal,
         });
 
         if (!res.ok || !res.body) {
@@ -292,6 +320,9 @@ export function useChat() {
                     : m
                 )
               );
+            } else if (event.type === "preview_pending") {
+              const pendingData = typeof event.data === "string" ? JSON.parse(event.data) : event.data;
+              pendingPreviewRecipeId = pendingData.recipe_id;
             } else if (event.type === "product_card") {
               const cardData = typeof event.data === "string" ? JSON.parse(event.data) : event.data;
               finalProductCards = [...(finalProductCards || []), cardData];
@@ -326,7 +357,6 @@ export function useChat() {
               finalAgentUsed = event.data;
             } else if (event.type === "content_done") {
               // All text/card content delivered — unlock UI immediately
-              // SSE stream stays open for preview_image
               setMessages((prev) =>
                 prev.map((m) =>
                   m.id === assistantId ? { ...m, is_streaming: false } : m
@@ -374,6 +404,21 @@ export function useChat() {
             processLine(line);
           }
         }
+
+        // Stream is closed; wait for the queued preview image job
+        if (pendingPreviewRecipeId && !finalPreviewUrl) {
+          const previewUrl = await pollPreviewImage(pendingPreviewRecipeId, controller.signal);
+          if (previewUrl) {
+            finalPreviewUrl = previewUrl;
+            setMessages((prev) =>
+              prev.map((m) =>
+                m.id === assistantId
+                  ? { ...m, preview_image_url: previewUrl }
+                  : m
+              )
+            );
+          }
+        }
       } catch (err: any) {
         if (err.name === "AbortError") {
         // Keep whatever content was received, just stop streaming
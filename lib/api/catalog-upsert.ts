@@ -3,12 +3,22 @@
  *
  * 全ての商品登録フロー（スキャン、楽天、Web検索、手動、AI）から呼ばれる。
  * 決定的 ID（SHA-256ハッシュ）で O(1) の重複チェックを実現。
+ *
+ * CATALOG_COUNTER_SHARDS > 1 の場合、既存エントリのカウンタは agent の
+ * alcheme/catalog_counters.py と同じ catalog/{id}/counter_shards/{n} に加算し、
+ * 人気商品の catalog doc への書き込み集中を避ける。シャードは agent の
+ * ロールアップ（そのエントリが agent 側で更新された時）と
+ * agent/scripts/rollup_catalog_counters.py の定期実行で catalog doc に集約される。
  */
 
 import { createHash } from 'crypto';
 import { adminDb } from '@/lib/firebase/admin';
 import { FieldValue } from 'firebase-admin/firestore';
 
+/** エントリあたりのカウンタシャード数（1 = シャーディング無効、agent と同じ値にする） */
+const CATALOG_COUNTER_SHARDS = Math.max(1, Number(process.env.CATALOG_COUNTER_SHARDS) || 1);
+const SHARDS_COLLECTION = 'counter_shards';
+
 /** カタログに含める普遍的フィールド */
 const CATALOG_FIELDS = [
   'brand', 'product_name', 'category', 'item_type', 'color_code', 'color_name',
@@ -60,37 +70,49 @@ export async function upsertCatalogEntry(
   catalogData.product_name_normalized = productName.trim().toLowerCase();
   catalogData.dedupe_key = `${brand.trim().toLowerCase()}::${productName.trim().toLowerCase()}::${(colorCode || '').trim().toLowerCase()}`;
 
-  const existing = await catalogRef.get();
-
-  if (existing.exists) {
-    const existingData = existing.data()!;
-    const updates: Record<string, unknown> = {
-      updated_at: FieldValue.serverTimestamp(),
-      contributor_count: FieldValue.increment(1),
-      [countType === 'have' ? 'have_count' : 'want_count']: FieldValue.increment(1),
-    };
+  // 読み取りと書き込みをトランザクションで行い、同時登録での競合を防ぐ
+  await adminDb.runTransaction(async (tx) => {
+    const existing = await tx.get(catalogRef);
+
+    if (existing.exists) {
+      const existingData = existing.data()!;
+      const counts: Record<string, FieldValue> = {
+        contributor_count: FieldValue.increment(1),
+        [countType === 'have' ? 'have_count' : 'want_count']: FieldValue.increment(1),
+      };
+
+      // 既存の非null値は上書きしない — 空フィールドのみ補完
+      const fills: Record<string, unknown> = {};
+      for (const [key, val] of Object.entries(catalogData)) {
+        if (val != null && val !== '' && (existingData[key] == null || existingData[key] === '')) {
+          fills[key] = val;
+        }
+      }
 
-    // 既存の非null値は上書きしない — 空フィールドのみ補完
-    for (const [key, val] of Object.entries(catalogData)) {
-      if (val != null && val !== '' && (existingData[key] == null || existingData[key] === '')) {
-        updates[key] = val;
+      if (CATALOG_COUNTER_SHARDS > 1) {
+        // カウンタはランダムなシャードへ。catalog doc は補完するフィールドがある時だけ書く
+        const shard = String(Math.floor(Math.random() * CATALOG_COUNTER_SHARDS));
+        tx.set(catalogRef.collection(SHARDS_COLLECTION).doc(shard), counts, { merge: true });
+        if (Object.keys(fills).length > 0) {
+          tx.update(catalogRef, { ...fills, updated_at: FieldValue.serverTimestamp() });
+        }
+      } else {
+        tx.update(catalogRef, { ...fills, ...counts, updated_at: FieldValue.serverTimestamp() });
       }
+    } else {
+      tx.create(catalogRef, {
+        ...catalogData,
+        contributor_count: 1,
+        have_count: countType === 'have' ? 1 : 0,
+        want_count: countType === 'want' ? 1 : 0,
+        use_count: 0,
+        total_rating: 0,
+        rating_count: 0,
+        created_at: FieldValue.serverTimestamp(),
+        updated_at: FieldValue.serverTimestamp(),
+      });
     }
-
-    await catalogRef.update(updates);
-  } else {
-    await catalogRef.set({
-      ...catalogData,
-      contributor_count: 1,
-      have_count: countType === 'have' ? 1 : 0,
-      want_count: countType === 'want' ? 1 : 0,
-      use_count: 0,
-      total_rating: 0,
-      rating_count: 0,
-      created_at: FieldValue.serverTimestamp(),
-      updated_at: FieldValue.serverTimestamp(),
-    });
-  }
+  });
 
   return docId;
 }
@@ -6,6 +6,7 @@
  */
 
 import { adminDb } from "@/lib/firebase/admin";
+import { callAgent } from "@/lib/api/agent-client";
 import type {
   CalendarIntegration,
   GoogleCalendarEntry,
@@ -171,6 +172,10 @@ export async function getValidAccessToken(
     await adminDb.collection("users").doc(userId).update({
       "calendarIntegration.connected": false,
     });
+    // The agent's cached profile still says calendarConnected (best effort)
+    callAgent("/profile/invalidate", { user_id: userId }).catch((err) => {
+      console.warn("Profile cache invalidation failed:", err);
+    });
     return null;
   }
 }
@@ -102,6 +102,7 @@ export type SSEEventType =
   | "text_delta"
   | "recipe_card"
   | "preview_image"
+  | "preview_pending"
   | "product_card"
   | "technique_card"
   | "profiler_card"
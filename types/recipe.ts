@@ -54,6 +54,7 @@ export interface Recipe {
   };
   pro_tips: string[];
   preview_image_url?: string;
+  preview_status?: "queued" | "running" | "done" | "error";
   character_theme?: "cute" | "cool" | "elegant";
   is_favorite: boolean;
   source?: "manual" | "ai" | "theme";